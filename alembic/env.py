@@ -20,14 +20,23 @@ from app.db import Base
 # Import models so Base.metadata is populated
 from app.models.customer import Customer  # noqa: F401
 from app.models.loyalty_tier import LoyaltyTier  # noqa: F401
+from app.models.internal_job import InternalJob  # noqa: F401
+from app.models.internal_job_partition import InternalJobPartition  # noqa: F401
 from app.models.rule import Rule  # noqa: F401
+from app.models.rule_cost_stat import RuleCostStat  # noqa: F401
+from app.models.brand_kpi_snapshot import BrandKpiSnapshot  # noqa: F401
+from app.models.brand_transaction_rollup import BrandTransactionRollup  # noqa: F401
+from app.models.transaction_type_payload_shape import TransactionTypePayloadShape  # noqa: F401
 from app.models.brand_loyalty_settings import BrandLoyaltySettings  # noqa: F401
 from app.models.reward import Reward  # noqa: F401
 from app.models.customer_reward import CustomerReward  # noqa: F401
 from app.models.coupon_type import CouponType  # noqa: F401
 from app.models.coupon_type_reward import CouponTypeReward  # noqa: F401
 from app.models.customer_coupon import CustomerCoupon  # noqa: F401
+from app.models.customer_import_job import CustomerImportJob  # noqa: F401
 from app.models.customer_metrics import CustomerMetrics  # noqa: F401
+from app.models.point_balance import PointBalance  # noqa: F401
+from app.models.point_balance_bucket import PointBalanceBucket  # noqa: F401
 from app.models.product_category import ProductCategory  # noqa: F401
 from app.models.product import Product  # noqa: F401
 from app.models.reward_product import RewardProduct  # noqa: F401
@@ -36,6 +45,7 @@ from app.models.segment_member import SegmentMember  # noqa: F401
 from app.models.customer_unomi_profile_alias import CustomerUnomiProfileAlias  # noqa: F401
 from app.models.transaction import Transaction  # noqa: F401
 from app.models.transaction_rule_execution import TransactionRuleExecution  # noqa: F401
+from app.models.unomi_sync_outbox import UnomiSyncOutbox  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
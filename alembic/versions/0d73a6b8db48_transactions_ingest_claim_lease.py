@@ -0,0 +1,65 @@
+"""transactions claimed_at / claimed_by / ingest_attempts: ingest worker lease
+
+Revision ID: 0d73a6b8db48
+Revises: 4ba97e1986c4
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0d73a6b8db48"
+down_revision = "4ba97e1986c4"
+branch_labels = None
+depends_on = None
+
+
+_INDEX = "ix_transactions_pending_claimed_at"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    if "claimed_at" not in cols:
+        op.add_column("transactions", sa.Column("claimed_at", sa.TIMESTAMP(), nullable=True))
+    if "claimed_by" not in cols:
+        op.add_column("transactions", sa.Column("claimed_by", sa.String(length=100), nullable=True))
+    if "ingest_attempts" not in cols:
+        op.add_column(
+            "transactions",
+            sa.Column("ingest_attempts", sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    with op.get_context().autocommit_block():
+        indexes = {i["name"] for i in insp.get_indexes("transactions")}
+        if _INDEX not in indexes:
+            op.create_index(
+                _INDEX,
+                "transactions",
+                ["claimed_at"],
+                unique=False,
+                postgresql_where=sa.text("status = 'PENDING' AND claimed_at IS NOT NULL"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    indexes = {i["name"] for i in insp.get_indexes("transactions")}
+    if _INDEX in indexes:
+        op.drop_index(_INDEX, table_name="transactions")
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    for name in ("ingest_attempts", "claimed_by", "claimed_at"):
+        if name in cols:
+            op.drop_column("transactions", name)
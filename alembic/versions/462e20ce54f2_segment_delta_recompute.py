@@ -0,0 +1,61 @@
+"""segments.computed_conditions_hash + change-tracking indexes for delta segment recompute
+
+Revision ID: 462e20ce54f2
+Revises: cc9a9b665b58
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "462e20ce54f2"
+down_revision = "cc9a9b665b58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("segments"):
+        cols = {c["name"] for c in insp.get_columns("segments")}
+        if "computed_conditions_hash" not in cols:
+            op.add_column("segments", sa.Column("computed_conditions_hash", sa.String(length=64), nullable=True))
+
+    if insp.has_table("customers"):
+        indexes = {i["name"] for i in insp.get_indexes("customers")}
+        if "ix_customers_brand_updated_at" not in indexes:
+            op.create_index("ix_customers_brand_updated_at", "customers", ["brand", "updated_at"], unique=False)
+
+    if insp.has_table("customer_metrics"):
+        indexes = {i["name"] for i in insp.get_indexes("customer_metrics")}
+        if "ix_customer_metrics_brand_computed_at" not in indexes:
+            op.create_index(
+                "ix_customer_metrics_brand_computed_at",
+                "customer_metrics",
+                ["brand", "computed_at"],
+                unique=False,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("customer_metrics"):
+        indexes = {i["name"] for i in insp.get_indexes("customer_metrics")}
+        if "ix_customer_metrics_brand_computed_at" in indexes:
+            op.drop_index("ix_customer_metrics_brand_computed_at", table_name="customer_metrics")
+
+    if insp.has_table("customers"):
+        indexes = {i["name"] for i in insp.get_indexes("customers")}
+        if "ix_customers_brand_updated_at" in indexes:
+            op.drop_index("ix_customers_brand_updated_at", table_name="customers")
+
+    if insp.has_table("segments"):
+        cols = {c["name"] for c in insp.get_columns("segments")}
+        if "computed_conditions_hash" in cols:
+            op.drop_column("segments", "computed_conditions_hash")
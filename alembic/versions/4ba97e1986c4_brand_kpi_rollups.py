@@ -0,0 +1,58 @@
+"""brand_transaction_rollups / brand_kpi_snapshots: precomputed /admin/brand-kpis data
+
+Revision ID: 4ba97e1986c4
+Revises: 9953ad6881ee
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "4ba97e1986c4"
+down_revision = "9953ad6881ee"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("brand_transaction_rollups"):
+        op.create_table(
+            "brand_transaction_rollups",
+            sa.Column("brand", sa.String(length=50), primary_key=True, nullable=False),
+            sa.Column("hour", sa.TIMESTAMP(), primary_key=True, nullable=False),
+            sa.Column("status", sa.String(length=20), primary_key=True, nullable=False),
+            sa.Column("transaction_type", sa.String(length=50), primary_key=True, nullable=False),
+            sa.Column("error_code", sa.String(length=50), primary_key=True, nullable=False, server_default=""),
+            sa.Column("count", sa.BigInteger(), nullable=False, server_default="0"),
+        )
+
+    if not insp.has_table("brand_kpi_snapshots"):
+        op.create_table(
+            "brand_kpi_snapshots",
+            sa.Column("brand", sa.String(length=50), primary_key=True, nullable=False),
+            sa.Column("transactions_rolled_up_to", sa.TIMESTAMP(), nullable=True),
+            sa.Column("customers_total", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_new_7d", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_new_30d", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_active_7d", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_active_30d", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_configured", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("customers_by_loyalty_status", postgresql.JSONB(), nullable=True),
+            sa.Column("computed_at", sa.TIMESTAMP(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("brand_kpi_snapshots"):
+        op.drop_table("brand_kpi_snapshots")
+    if insp.has_table("brand_transaction_rollups"):
+        op.drop_table("brand_transaction_rollups")
@@ -0,0 +1,39 @@
+"""transaction_type_payload_shapes: payload shapes already merged by off-path schema learning
+
+Revision ID: 884c71100574
+Revises: a0eb8c9cb49e
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "884c71100574"
+down_revision = "a0eb8c9cb49e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("transaction_type_payload_shapes"):
+        op.create_table(
+            "transaction_type_payload_shapes",
+            sa.Column("brand", sa.String(length=50), primary_key=True, nullable=False),
+            sa.Column("transaction_type", sa.String(length=100), primary_key=True, nullable=False),
+            sa.Column("fingerprint", sa.String(length=32), primary_key=True, nullable=False),
+            sa.Column("payload_schema", sa.JSON(), nullable=True),
+            sa.Column("first_seen_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("transaction_type_payload_shapes"):
+        op.drop_table("transaction_type_payload_shapes")
@@ -0,0 +1,79 @@
+"""hot JSON columns to JSONB; GIN index on customer_rewards productSnapshots
+
+Revision ID: 8ea4d31672d2
+Revises: ecdd5eb22feb
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "8ea4d31672d2"
+down_revision = "ecdd5eb22feb"
+branch_labels = None
+depends_on = None
+
+
+_JSONB_COLUMNS = [
+    ("transactions", "payload"),
+    ("customer_rewards", "payload"),
+    ("customer_coupons", "payload"),
+    ("rules", "conditions"),
+    ("rules", "actions"),
+]
+
+_SNAPSHOTS_INDEX = "ix_customer_rewards_payload_product_snapshots"
+
+
+def _column_types(insp, table: str) -> dict:
+    return {c["name"]: c["type"] for c in insp.get_columns(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    # ALTER ... TYPE rewrites the table under an exclusive lock; run it in a maintenance window
+    # on large ``transactions`` tables.
+    for table, column in _JSONB_COLUMNS:
+        if not insp.has_table(table):
+            continue
+        col_type = _column_types(insp, table).get(column)
+        if col_type is None or isinstance(col_type, postgresql.JSONB):
+            continue
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb")
+
+    if not insp.has_table("customer_rewards"):
+        return
+    with op.get_context().autocommit_block():
+        indexes = {i["name"] for i in insp.get_indexes("customer_rewards")}
+        if _SNAPSHOTS_INDEX not in indexes:
+            op.create_index(
+                _SNAPSHOTS_INDEX,
+                "customer_rewards",
+                [sa.text("(payload -> 'productSnapshots') jsonb_path_ops")],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("customer_rewards"):
+        indexes = {i["name"] for i in insp.get_indexes("customer_rewards")}
+        if _SNAPSHOTS_INDEX in indexes:
+            op.drop_index(_SNAPSHOTS_INDEX, table_name="customer_rewards")
+
+    for table, column in _JSONB_COLUMNS:
+        if not insp.has_table(table):
+            continue
+        col_type = _column_types(insp, table).get(column)
+        if not isinstance(col_type, postgresql.JSONB):
+            continue
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSON USING {column}::json")
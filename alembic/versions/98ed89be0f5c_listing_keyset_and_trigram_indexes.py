@@ -0,0 +1,84 @@
+"""transactions / customers listing indexes: (brand, created_at) keysets, status and profile filters, pg_trgm search
+
+Revision ID: 98ed89be0f5c
+Revises: 884c71100574
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "98ed89be0f5c"
+down_revision = "884c71100574"
+branch_labels = None
+depends_on = None
+
+
+_BTREE_INDEXES = {
+    "transactions": [
+        ("ix_transactions_brand_created_at", ["brand", "created_at"]),
+        ("ix_transactions_brand_profile_id", ["brand", "profile_id"]),
+        ("ix_transactions_brand_status_created_at", ["brand", "status", "created_at"]),
+    ],
+    "customers": [
+        ("ix_customers_brand_created_at", ["brand", "created_at"]),
+        ("ix_customers_brand_profile_id", ["brand", "profile_id"]),
+    ],
+}
+
+_TRGM_INDEXES = [
+    ("ix_customers_profile_id_trgm", "profile_id"),
+    ("ix_customers_email_trgm", "email"),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Built concurrently: these tables are the largest ones and stay writable meanwhile.
+    with op.get_context().autocommit_block():
+        for table, indexes in _BTREE_INDEXES.items():
+            if not insp.has_table(table):
+                continue
+            existing = {i["name"] for i in insp.get_indexes(table)}
+            for name, columns in indexes:
+                if name not in existing:
+                    op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+        if insp.has_table("customers"):
+            existing = {i["name"] for i in insp.get_indexes("customers")}
+            for name, column in _TRGM_INDEXES:
+                if name not in existing:
+                    op.create_index(
+                        name,
+                        "customers",
+                        [column],
+                        unique=False,
+                        postgresql_using="gin",
+                        postgresql_ops={column: "gin_trgm_ops"},
+                        postgresql_concurrently=True,
+                    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("customers"):
+        existing = {i["name"] for i in insp.get_indexes("customers")}
+        for name, _ in _TRGM_INDEXES:
+            if name in existing:
+                op.drop_index(name, table_name="customers")
+
+    for table, indexes in _BTREE_INDEXES.items():
+        if not insp.has_table(table):
+            continue
+        existing = {i["name"] for i in insp.get_indexes(table)}
+        for name, _ in indexes:
+            if name in existing:
+                op.drop_index(name, table_name=table)
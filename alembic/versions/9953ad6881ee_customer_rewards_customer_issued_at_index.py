@@ -0,0 +1,48 @@
+"""customer_rewards (customer_id, issued_at) index for paged entitlement history
+
+Revision ID: 9953ad6881ee
+Revises: 8ea4d31672d2
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9953ad6881ee"
+down_revision = "8ea4d31672d2"
+branch_labels = None
+depends_on = None
+
+
+_INDEX = "ix_customer_rewards_customer_id_issued_at"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("customer_rewards"):
+        return
+
+    with op.get_context().autocommit_block():
+        indexes = {i["name"] for i in insp.get_indexes("customer_rewards")}
+        if _INDEX not in indexes:
+            op.create_index(
+                _INDEX,
+                "customer_rewards",
+                ["customer_id", "issued_at"],
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("customer_rewards"):
+        return
+
+    indexes = {i["name"] for i in insp.get_indexes("customer_rewards")}
+    if _INDEX in indexes:
+        op.drop_index(_INDEX, table_name="customer_rewards")
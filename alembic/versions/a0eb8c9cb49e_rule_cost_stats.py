@@ -0,0 +1,63 @@
+"""rule_cost_stats: daily per-rule cost buckets of opt-in rule profiling
+
+Revision ID: a0eb8c9cb49e
+Revises: a40caa6624b7
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "a0eb8c9cb49e"
+down_revision = "a40caa6624b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("rule_cost_stats"):
+        op.create_table(
+            "rule_cost_stats",
+            sa.Column(
+                "rule_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("rules.id", ondelete="CASCADE"),
+                primary_key=True,
+                nullable=False,
+            ),
+            sa.Column("bucket_date", sa.Date(), primary_key=True, nullable=False),
+            sa.Column("brand", sa.String(length=50), nullable=False),
+            sa.Column("evaluations", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("matched", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("failed", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("segment_ms", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("condition_ms", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("action_ms", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("sql_statements", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("max_ms", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("rule_cost_stats")}
+    if "ix_rule_cost_stats_brand_bucket_date" not in indexes:
+        op.create_index(
+            "ix_rule_cost_stats_brand_bucket_date",
+            "rule_cost_stats",
+            ["brand", "bucket_date"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("rule_cost_stats"):
+        op.drop_table("rule_cost_stats")
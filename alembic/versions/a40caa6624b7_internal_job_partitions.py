@@ -0,0 +1,74 @@
+"""internal_job_partitions: partitioned work units of generic internal jobs
+
+Revision ID: a40caa6624b7
+Revises: bb824a1e1290
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "a40caa6624b7"
+down_revision = "bb824a1e1290"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("internal_job_partitions"):
+        op.create_table(
+            "internal_job_partitions",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column(
+                "job_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("internal_jobs.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("run_key", sa.String(length=64), nullable=False),
+            sa.Column("partition_index", sa.Integer(), nullable=False),
+            sa.Column("partition_count", sa.Integer(), nullable=False),
+            sa.Column("range_start", postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column("range_end", postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=False, server_default="PENDING"),
+            sa.Column("cursor", postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("idempotent_existing", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("locked_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("locked_by", sa.String(length=100), nullable=True),
+            sa.Column("last_error", sa.String(length=2000), nullable=True),
+            sa.Column("started_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("finished_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.UniqueConstraint(
+                "job_id", "run_key", "partition_index", name="uq_internal_job_partitions_job_run_index"
+            ),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("internal_job_partitions")}
+    if "ix_internal_job_partitions_status_created_at" not in indexes:
+        op.create_index(
+            "ix_internal_job_partitions_status_created_at",
+            "internal_job_partitions",
+            ["status", "created_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("internal_job_partitions"):
+        op.drop_table("internal_job_partitions")
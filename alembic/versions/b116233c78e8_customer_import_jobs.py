@@ -0,0 +1,63 @@
+"""customer_import_jobs: tracked, streaming CSV customer imports
+
+Revision ID: b116233c78e8
+Revises: dcda068328a4
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "b116233c78e8"
+down_revision = "dcda068328a4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("customer_import_jobs"):
+        op.create_table(
+            "customer_import_jobs",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("brand", sa.String(length=50), nullable=False),
+            sa.Column("filename", sa.String(length=255), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=False, server_default="QUEUED"),
+            sa.Column("bytes_total", sa.BigInteger(), nullable=True),
+            sa.Column("bytes_read", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("processed_rows", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("staged_rows", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("error_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("error_summary", sa.JSON(), nullable=True),
+            sa.Column("errors", sa.JSON(), nullable=True),
+            sa.Column("message", sa.String(length=2000), nullable=True),
+            sa.Column("started_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("finished_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("customer_import_jobs")}
+    if "ix_customer_import_jobs_brand_created_at" not in indexes:
+        op.create_index(
+            "ix_customer_import_jobs_brand_created_at",
+            "customer_import_jobs",
+            ["brand", "created_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("customer_import_jobs"):
+        op.drop_table("customer_import_jobs")
@@ -0,0 +1,88 @@
+"""point_balances / point_balance_buckets: materialized status points ledger
+
+Revision ID: bb824a1e1290
+Revises: b116233c78e8
+Create Date: 2026-10-18
+
+Tables only: fill them with ``python scripts/rebuild_point_balances.py --brand <brand> --commit``
+(customers without a row are also materialized on their next point movement).
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "bb824a1e1290"
+down_revision = "b116233c78e8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("point_balances"):
+        op.create_table(
+            "point_balances",
+            sa.Column(
+                "customer_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("customers.id", ondelete="CASCADE"),
+                primary_key=True,
+                nullable=False,
+            ),
+            sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("debt", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("next_expires_at", sa.Date(), nullable=True),
+            sa.Column("rebuilt_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("point_balances")}
+    if "ix_point_balances_next_expires_at" not in indexes:
+        op.create_index(
+            "ix_point_balances_next_expires_at",
+            "point_balances",
+            ["next_expires_at"],
+            unique=False,
+        )
+
+    if not insp.has_table("point_balance_buckets"):
+        op.create_table(
+            "point_balance_buckets",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column(
+                "customer_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("customers.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("expires_at", sa.Date(), nullable=True),
+            sa.Column("remaining", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("point_balance_buckets")}
+    if "ix_point_balance_buckets_customer_expires_at" not in indexes:
+        op.create_index(
+            "ix_point_balance_buckets_customer_expires_at",
+            "point_balance_buckets",
+            ["customer_id", "expires_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("point_balance_buckets"):
+        op.drop_table("point_balance_buckets")
+    if insp.has_table("point_balances"):
+        op.drop_table("point_balances")
@@ -0,0 +1,52 @@
+"""transactions.queued_at for async ingest (worker queue)
+
+Revision ID: cc9a9b665b58
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "cc9a9b665b58"
+down_revision = "e2f3a4b5c6d7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    if "queued_at" not in cols:
+        op.add_column("transactions", sa.Column("queued_at", sa.TIMESTAMP(), nullable=True))
+
+    indexes = {i["name"] for i in insp.get_indexes("transactions")}
+    if "ix_transactions_ingest_queue" not in indexes:
+        op.create_index(
+            "ix_transactions_ingest_queue",
+            "transactions",
+            ["queued_at"],
+            unique=False,
+            postgresql_where=sa.text("status = 'PENDING' AND queued_at IS NOT NULL"),
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    indexes = {i["name"] for i in insp.get_indexes("transactions")}
+    if "ix_transactions_ingest_queue" in indexes:
+        op.drop_index("ix_transactions_ingest_queue", table_name="transactions")
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    if "queued_at" in cols:
+        op.drop_column("transactions", "queued_at")
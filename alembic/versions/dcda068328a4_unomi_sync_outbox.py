@@ -0,0 +1,72 @@
+"""unomi_sync_outbox: transactional, coalescing queue for Loyalty → Unomi profile pushes
+
+Revision ID: dcda068328a4
+Revises: 462e20ce54f2
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "dcda068328a4"
+down_revision = "462e20ce54f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if not insp.has_table("unomi_sync_outbox"):
+        op.create_table(
+            "unomi_sync_outbox",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("brand", sa.String(length=50), nullable=False),
+            sa.Column("profile_id", sa.String(length=100), nullable=False),
+            sa.Column(
+                "customer_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("customers.id", ondelete="CASCADE"),
+                nullable=True,
+            ),
+            sa.Column("reason", sa.String(length=50), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=False, server_default="PENDING"),
+            sa.Column("coalesced_count", sa.Integer(), nullable=False, server_default="1"),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("last_error", sa.String(length=1000), nullable=True),
+            sa.Column("next_attempt_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=False),
+            sa.Column("claimed_at", sa.TIMESTAMP(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+            sa.Column("updated_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        )
+        insp = sa.inspect(bind)
+
+    indexes = {i["name"] for i in insp.get_indexes("unomi_sync_outbox")}
+    if "uq_unomi_sync_outbox_pending_profile" not in indexes:
+        # One PENDING entry per customer: enqueue coalesces with ON CONFLICT on this index.
+        op.create_index(
+            "uq_unomi_sync_outbox_pending_profile",
+            "unomi_sync_outbox",
+            ["brand", "profile_id"],
+            unique=True,
+            postgresql_where=sa.text("status = 'PENDING'"),
+        )
+    if "ix_unomi_sync_outbox_status_next_attempt_at" not in indexes:
+        op.create_index(
+            "ix_unomi_sync_outbox_status_next_attempt_at",
+            "unomi_sync_outbox",
+            ["status", "next_attempt_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    if insp.has_table("unomi_sync_outbox"):
+        op.drop_table("unomi_sync_outbox")
@@ -0,0 +1,104 @@
+"""transactions.customer_email: indexed identity email extracted from the payload, with backfill
+
+Revision ID: ecdd5eb22feb
+Revises: 98ed89be0f5c
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "ecdd5eb22feb"
+down_revision = "98ed89be0f5c"
+branch_labels = None
+depends_on = None
+
+
+_BATCH_SIZE = 5000
+
+# Same rule as contact_service.transaction_identity_email: ``email`` when it looks like an
+# address, else the brand-scoped ``scopeEmail`` ("<brand>-user@x.com") without its prefix.
+_IDENTITY_EMAIL_SQL = """
+    CASE
+        WHEN json_typeof(payload->'email') = 'string'
+             AND position('@' in payload->>'email') > 0
+            THEN lower(btrim(payload->>'email'))
+        WHEN json_typeof(payload->'scopeEmail') = 'string'
+             AND position('@' in payload->>'scopeEmail') > 0
+             AND left(lower(btrim(payload->>'scopeEmail')), length(brand) + 1) = lower(brand) || '-'
+            THEN lower(btrim(substr(btrim(payload->>'scopeEmail'), length(brand) + 2)))
+    END
+"""
+
+
+def _backfill(bind) -> None:
+    """Fill ``customer_email`` in id-ordered batches, one transaction per batch.
+
+    Re-runnable; ``MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL`` does the same per brand
+    from the scheduler when the migration should not wait for the backfill.
+    """
+    after_id = None
+    while True:
+        upper_id = bind.execute(
+            sa.text(
+                "SELECT max(id) FROM (SELECT id FROM transactions"
+                " WHERE (CAST(:after_id AS uuid) IS NULL OR id > CAST(:after_id AS uuid))"
+                " ORDER BY id LIMIT :batch_size) AS batch"
+            ),
+            {"after_id": after_id, "batch_size": _BATCH_SIZE},
+        ).scalar()
+        if upper_id is None:
+            return
+        bind.execute(
+            sa.text(
+                f"UPDATE transactions SET customer_email = {_IDENTITY_EMAIL_SQL}"
+                " WHERE (CAST(:after_id AS uuid) IS NULL OR id > CAST(:after_id AS uuid))"
+                " AND id <= :upper_id AND customer_email IS NULL"
+                " AND payload IS NOT NULL AND json_typeof(payload) = 'object'"
+            ),
+            {"after_id": after_id, "upper_id": upper_id},
+        )
+        after_id = str(upper_id)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    if "customer_email" not in cols:
+        op.add_column("transactions", sa.Column("customer_email", sa.String(length=255), nullable=True))
+
+    with op.get_context().autocommit_block():
+        if (bind.dialect.name or "") == "postgresql":
+            _backfill(bind)
+
+        indexes = {i["name"] for i in insp.get_indexes("transactions")}
+        if "ix_transactions_brand_customer_email" not in indexes:
+            op.create_index(
+                "ix_transactions_brand_customer_email",
+                "transactions",
+                ["brand", "customer_email"],
+                unique=False,
+                postgresql_where=sa.text("customer_email IS NOT NULL"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("transactions"):
+        return
+
+    indexes = {i["name"] for i in insp.get_indexes("transactions")}
+    if "ix_transactions_brand_customer_email" in indexes:
+        op.drop_index("ix_transactions_brand_customer_email", table_name="transactions")
+
+    cols = {c["name"] for c in insp.get_columns("transactions")}
+    if "customer_email" in cols:
+        op.drop_column("transactions", "customer_email")
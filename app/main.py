@@ -2,6 +2,7 @@ import base64
 import hmac
 import os
 import re
+import time
 
 import logging
 
@@ -9,7 +10,7 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError, ProgrammingError, SQLAlchemyError
-from app.db import engine, Base
+from app.db import engine, Base, SessionLocal
 
 from app.models.transaction import Transaction
 from app.models.rule import Rule
@@ -41,6 +42,15 @@ from app.routes.internal_jobs import router as internal_jobs_router
 from app.routes.event_types import router as transaction_types_router
 from app.routes.loyalty_tiers import router as loyalty_tiers_router
 from app.routes.unomi_integrations import router as unomi_integrations_router
+from app.routes.metrics import router as metrics_router
+from app.services.metrics import (
+    HTTP_REQUEST_DB_QUERIES,
+    HTTP_REQUEST_DB_TRANSACTIONS,
+    HTTP_REQUEST_DURATION,
+    begin_request_db_usage,
+    end_request_db_usage,
+    install_db_instrumentation,
+)
 
 app = FastAPI(title="Loyalty Engine")
 
@@ -76,7 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Unomi-Sync", "X-Unomi-Sync-Detail"],
+    expose_headers=["X-Unomi-Sync", "X-Unomi-Sync-Detail", "X-Next-Cursor"],
 )
 
 
@@ -215,6 +225,29 @@ async def basic_auth_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+install_db_instrumentation(engine, SessionLocal)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    # Outermost middleware: times auth failures too. Routes are labelled by template, never raw path.
+    token, usage = begin_request_db_usage()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=str(status)
+        )
+        HTTP_REQUEST_DB_QUERIES.observe(usage.queries, method=request.method, route=route)
+        HTTP_REQUEST_DB_TRANSACTIONS.observe(usage.transactions, method=request.method, route=route)
+        end_request_db_usage(token)
+
+
 @app.on_event("startup")
 def startup():
     Base.metadata.create_all(bind=engine)
@@ -234,6 +267,7 @@ app.include_router(internal_jobs_router)
 app.include_router(transaction_types_router)
 app.include_router(loyalty_tiers_router)
 app.include_router(unomi_integrations_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Column, String, TIMESTAMP
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db import Base
+
+
+class BrandKpiSnapshot(Base):
+    """Per-brand KPI state written by ``MAINT_ROLLUP_BRAND_KPIS`` (see ``brand_kpi_service``).
+
+    ``transactions_rolled_up_to`` is the end (exclusive) of the hours present in
+    ``brand_transaction_rollups``; customer counters are as of ``computed_at``.
+    """
+
+    __tablename__ = "brand_kpi_snapshots"
+
+    brand = Column(String(50), primary_key=True)
+
+    transactions_rolled_up_to = Column(TIMESTAMP, nullable=True)
+
+    customers_total = Column(BigInteger, nullable=False, default=0)
+    customers_new_7d = Column(BigInteger, nullable=False, default=0)
+    customers_new_30d = Column(BigInteger, nullable=False, default=0)
+    customers_active_7d = Column(BigInteger, nullable=False, default=0)
+    customers_active_30d = Column(BigInteger, nullable=False, default=0)
+    customers_configured = Column(BigInteger, nullable=False, default=0)
+    # [{"key": loyalty_status or "UNCONFIGURED", "count": n}]
+    customers_by_loyalty_status = Column(JSONB, nullable=True)
+
+    computed_at = Column(TIMESTAMP, nullable=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import BigInteger, Column, String, TIMESTAMP
+
+from app.db import Base
+
+
+class BrandTransactionRollup(Base):
+    """Transactions of one brand ingested during one hour, per status / type / error code.
+
+    Rebuilt hour by hour by ``MAINT_ROLLUP_BRAND_KPIS`` (see ``brand_kpi_service``);
+    ``error_code`` is ``""`` for transactions without one (primary key column).
+    """
+
+    __tablename__ = "brand_transaction_rollups"
+
+    brand = Column(String(50), primary_key=True)
+    hour = Column(TIMESTAMP, primary_key=True)
+    status = Column(String(20), primary_key=True)
+    transaction_type = Column(String(50), primary_key=True)
+    error_code = Column(String(50), primary_key=True, default="")
+
+    count = Column(BigInteger, nullable=False, default=0)
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, Date, Integer
+from sqlalchemy import Column, String, TIMESTAMP, Date, Index, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db import Base
@@ -8,6 +8,16 @@ from app.db import Base
 class Customer(Base):
     __tablename__ = "customers"
 
+    __table_args__ = (
+        Index("ix_customers_brand_created_at", "brand", "created_at"),
+        Index("ix_customers_brand_profile_id", "brand", "profile_id"),
+        Index("ix_customers_brand_updated_at", "brand", "updated_at"),
+        # ILIKE '%q%' search of GET /customers is served by the pg_trgm GIN indexes
+        # ix_customers_profile_id_trgm / ix_customers_email_trgm. They live only in migration
+        # 98ed89be0f5c (which runs CREATE EXTENSION pg_trgm): declared here, create_all()
+        # would fail on databases without the extension.
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
     brand = Column(String(50), nullable=False)
@@ -1,7 +1,7 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, Integer, JSON, String, TIMESTAMP, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, ForeignKey, Integer, String, TIMESTAMP, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 
 from app.db import Base
@@ -41,7 +41,7 @@ class CustomerCoupon(Base):
 
     idempotency_key = Column(String(255), nullable=True)
 
-    payload = Column(JSON, nullable=True)
+    payload = Column(JSONB, nullable=True)
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,41 @@
+import uuid
+
+from sqlalchemy import BigInteger, Column, Integer, JSON, String, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class CustomerImportJob(Base):
+    """One CSV customer import (``POST /imports/customers``) and its progress."""
+
+    __tablename__ = "customer_import_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    brand = Column(String(50), nullable=False)
+    filename = Column(String(255), nullable=True)
+
+    # QUEUED | STAGING | MERGING | SUCCEEDED | REJECTED (validation errors) | FAILED
+    status = Column(String(20), nullable=False, default="QUEUED")
+
+    bytes_total = Column(BigInteger, nullable=True)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+
+    processed_rows = Column(Integer, nullable=False, default=0)
+    staged_rows = Column(Integer, nullable=False, default=0)
+    created_count = Column(Integer, nullable=False, default=0)
+    updated_count = Column(Integer, nullable=False, default=0)
+
+    # Total number of invalid rows; ``errors`` keeps the first CUSTOMER_IMPORT_MAX_ERRORS.
+    error_count = Column(Integer, nullable=False, default=0)
+    error_summary = Column(JSON, nullable=True)
+    errors = Column(JSON, nullable=True)
+    message = Column(String(2000), nullable=True)
+
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -8,6 +8,17 @@ from app.db import Base
 class CustomerReward(Base):
     __tablename__ = "customer_rewards"
 
+    __table_args__ = (
+        Index("ix_customer_rewards_customer_id_issued_at", "customer_id", "issued_at"),
+        # Catalog product removal looks up snapshots with
+        # ``payload -> 'productSnapshots' @> '[{"id": ...}]'`` (see jsonb_filters).
+        Index(
+            "ix_customer_rewards_payload_product_snapshots",
+            text("(payload -> 'productSnapshots') jsonb_path_ops"),
+            postgresql_using="gin",
+        ),
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
     customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
@@ -41,4 +52,4 @@ class CustomerReward(Base):
 
     idempotency_key = Column(String(255), nullable=True)
 
-    payload = Column(JSON, nullable=True)
+    payload = Column(JSONB, nullable=True)
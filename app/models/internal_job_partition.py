@@ -0,0 +1,55 @@
+import uuid
+
+from sqlalchemy import Column, ForeignKey, Integer, String, TIMESTAMP, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class InternalJobPartition(Base):
+    """One work unit of a partitioned internal job run: a slice of the customer id keyspace.
+
+    The scheduler creates ``partition_count`` rows per (job, run_key) covering
+    ``[range_start, range_end)`` (NULL: open bound). Partition workers claim them with
+    ``FOR UPDATE SKIP LOCKED`` and persist ``cursor`` (last customer id done) after every
+    chunk, so a crashed unit resumes where it stopped once its lock goes stale.
+    """
+
+    __tablename__ = "internal_job_partitions"
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "run_key", "partition_index", name="uq_internal_job_partitions_job_run_index"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    job_id = Column(UUID(as_uuid=True), ForeignKey("internal_jobs.id", ondelete="CASCADE"), nullable=False)
+
+    # Schedule bucket of the run (compute_run_bucket_key_from_schedule); part of the event ids.
+    run_key = Column(String(64), nullable=False)
+
+    partition_index = Column(Integer, nullable=False)
+    partition_count = Column(Integer, nullable=False)
+    range_start = Column(UUID(as_uuid=True), nullable=True)
+    range_end = Column(UUID(as_uuid=True), nullable=True)
+
+    # PENDING | RUNNING | DONE | FAILED
+    status = Column(String(20), nullable=False, default="PENDING")
+
+    cursor = Column(UUID(as_uuid=True), nullable=True)
+
+    processed = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    idempotent_existing = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    locked_at = Column(TIMESTAMP, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(String(2000), nullable=True)
+
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class PointBalance(Base):
+    """Materialized status points balance of a customer (see ``point_ledger_service``).
+
+    ``total`` is the sum of the customer's ``point_balance_buckets``; ``debt`` holds
+    deductions that exceeded every bucket and is paid back by the next earns.
+    ``next_expires_at`` is the earliest bucket expiry: while it is today or later,
+    ``total`` is the live balance without reading the buckets.
+    """
+
+    __tablename__ = "point_balances"
+
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+
+    total = Column(Integer, nullable=False, default=0)
+    debt = Column(Integer, nullable=False, default=0)
+    next_expires_at = Column(Date, nullable=True)
+
+    rebuilt_at = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,23 @@
+import uuid
+
+from sqlalchemy import Column, Date, ForeignKey, Integer, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class PointBalanceBucket(Base):
+    """Points still available for one customer and one expiry date (NULL: never expires)."""
+
+    __tablename__ = "point_balance_buckets"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+
+    expires_at = Column(Date, nullable=True)
+    remaining = Column(Integer, nullable=False)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
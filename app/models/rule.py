@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Boolean, JSON, TIMESTAMP
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Column, String, Integer, Boolean, TIMESTAMP
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db import Base
@@ -21,8 +21,8 @@ class Rule(Base):
 
     segment_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=True)
 
-    conditions = Column(JSON)
-    actions = Column(JSON)
+    conditions = Column(JSONB)
+    actions = Column(JSONB)
 
     active = Column(Boolean, default=True)
 
@@ -0,0 +1,34 @@
+from sqlalchemy import BigInteger, Column, Date, Float, ForeignKey, Index, String, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class RuleCostStat(Base):
+    """Daily cost bucket of one rule, filled by opt-in rule profiling (see ``rule_profiling``).
+
+    Counters are additive: processes buffer deltas and upsert them periodically, and the
+    slow-rule report sums the buckets of its window. Times are milliseconds.
+    """
+
+    __tablename__ = "rule_cost_stats"
+
+    __table_args__ = (Index("ix_rule_cost_stats_brand_bucket_date", "brand", "bucket_date"),)
+
+    rule_id = Column(UUID(as_uuid=True), ForeignKey("rules.id", ondelete="CASCADE"), primary_key=True)
+    bucket_date = Column(Date, primary_key=True)
+
+    brand = Column(String(50), nullable=False)
+
+    evaluations = Column(BigInteger, nullable=False, default=0)
+    matched = Column(BigInteger, nullable=False, default=0)
+    failed = Column(BigInteger, nullable=False, default=0)
+
+    segment_ms = Column(Float, nullable=False, default=0.0)
+    condition_ms = Column(Float, nullable=False, default=0.0)
+    action_ms = Column(Float, nullable=False, default=0.0)
+    sql_statements = Column(BigInteger, nullable=False, default=0)
+    max_ms = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -33,6 +33,8 @@ class Segment(Base):
     active = Column(Boolean, default=True)
 
     last_computed_at = Column(TIMESTAMP, nullable=True)
+    # sha256 of the conditions membership was last computed with (delta recompute guard).
+    computed_conditions_hash = Column(String(64), nullable=True)
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, JSON, String, TIMESTAMP, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Index, Integer, String, TIMESTAMP, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -8,7 +8,29 @@ from app.db import Base
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    __table_args__ = (UniqueConstraint("brand", "event_id", name="uq_transactions_brand_event_id"),)
+    __table_args__ = (
+        UniqueConstraint("brand", "event_id", name="uq_transactions_brand_event_id"),
+        Index("ix_transactions_brand_created_at", "brand", "created_at"),
+        Index("ix_transactions_brand_profile_id", "brand", "profile_id"),
+        Index("ix_transactions_brand_status_created_at", "brand", "status", "created_at"),
+        Index(
+            "ix_transactions_brand_customer_email",
+            "brand",
+            "customer_email",
+            postgresql_where=text("customer_email IS NOT NULL"),
+        ),
+        # Ingest worker queue: claim (queued_at order) and stale-lease sweep.
+        Index(
+            "ix_transactions_ingest_queue",
+            "queued_at",
+            postgresql_where=text("status = 'PENDING' AND queued_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_transactions_pending_claimed_at",
+            "claimed_at",
+            postgresql_where=text("status = 'PENDING' AND claimed_at IS NOT NULL"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
@@ -18,7 +40,11 @@ class Transaction(Base):
     transaction_id = Column("event_id", String(100), nullable=False)
 
     source = Column(String(20))
-    payload = Column(JSON)
+    payload = Column(JSONB)
+
+    # Trusted identity email of the payload (``email`` / brand ``scopeEmail``), lowercased at
+    # ingest so customer history filters are index lookups instead of JSON scans.
+    customer_email = Column(String(255), nullable=True)
 
     status = Column(String(20), nullable=False, default="PENDING")
 
@@ -28,3 +54,11 @@ class Transaction(Base):
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     processed_at = Column(TIMESTAMP)
+
+    # Set when accepted in async ingest mode; cleared when the ingest worker claims the row.
+    queued_at = Column(TIMESTAMP, nullable=True)
+    # Ingest worker lease: set on claim, requeued only once ``claimed_at`` is older than
+    # ``INGEST_WORKER_STALE_SECONDS``; ``ingest_attempts`` counts claims (capped, then FAILED).
+    claimed_at = Column(TIMESTAMP, nullable=True)
+    claimed_by = Column(String(100), nullable=True)
+    ingest_attempts = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, JSON, String, TIMESTAMP
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class TransactionTypePayloadShape(Base):
+    """A payload shape (fingerprint of key paths and value types) already merged into a type's schema.
+
+    Filled by off-path schema learning (see ``payload_schema_learning``); the primary key
+    makes each shape merge at most once across processes.
+    """
+
+    __tablename__ = "transaction_type_payload_shapes"
+
+    brand = Column(String(50), primary_key=True)
+    transaction_type = Column(String(100), primary_key=True)
+    fingerprint = Column(String(32), primary_key=True)
+
+    payload_schema = Column(JSON, nullable=True)  # inferred from the first payload of this shape (no values)
+
+    first_seen_at = Column(TIMESTAMP, server_default=func.now())
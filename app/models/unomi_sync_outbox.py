@@ -0,0 +1,51 @@
+import uuid
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class UnomiSyncOutbox(Base):
+    """Pending Loyalty → Unomi profile push, written in the caller's DB transaction.
+
+    At most one PENDING row per (brand, profile_id) (partial unique index): further
+    requests for the same customer coalesce into it. The dispatcher builds the payload
+    from the customer row at push time, so the latest state is always what is sent.
+    """
+
+    __tablename__ = "unomi_sync_outbox"
+
+    __table_args__ = (
+        # One PENDING entry per customer: enqueue coalesces with ON CONFLICT on this index.
+        Index(
+            "uq_unomi_sync_outbox_pending_profile",
+            "brand",
+            "profile_id",
+            unique=True,
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index("ix_unomi_sync_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    brand = Column(String(50), nullable=False)
+    profile_id = Column(String(100), nullable=False)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=True)
+
+    # Last sync reason merged into this entry (transaction_processed, loyalty_status, ...)
+    reason = Column(String(50), nullable=True)
+
+    # PENDING | DISPATCHING | FAILED
+    status = Column(String(20), nullable=False, default="PENDING")
+    coalesced_count = Column(Integer, nullable=False, default=1)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(1000), nullable=True)
+
+    next_attempt_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    claimed_at = Column(TIMESTAMP, nullable=True)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -24,6 +24,8 @@ from app.models.segment import Segment
 from app.models.transaction import Transaction
 from app.models.transaction_rule_execution import TransactionRuleExecution
 from app.services.birthdate_targeting import BIRTHDATE_FIELD_META, BIRTHDATE_VALUE_PRESETS
+from app.services.brand_config_cache import invalidate_brand_config
+from app.services.brand_kpi_service import customer_window_kpis, transaction_window_kpis
 from app.services.payload_schema_service import (
     get_transaction_type_rule_hints,
     payload_schema_field_catalog,
@@ -31,8 +33,13 @@ from app.services.payload_schema_service import (
 )
 from app.services.coupon_service import expire_coupons
 from app.services.entitlement_history_service import build_global_entitlement_history
-from app.services.loyalty_settings_service import ensure_brand_transaction_catalog, get_or_create_loyalty_settings
+from app.services.loyalty_settings_service import (
+    ensure_brand_transaction_catalog,
+    get_loyalty_settings as find_loyalty_settings,
+    get_or_create_loyalty_settings,
+)
 from app.services.loyalty_validity_service import initialize_validity_windows_for_existing_customers
+from app.services.rule_profiling import slow_rules_report
 from app.services.transaction_protection import delete_transaction_if_allowed
 from app.schemas.loyalty_settings import LoyaltySettingsOut, LoyaltySettingsUpdate
 from app.schemas.rule_condition_catalog import get_rule_conditions_catalog
@@ -81,6 +88,8 @@ def admin_schema_health(db: Session = Depends(get_db)):
         "brand_loyalty_settings.segmentation_mode": (
             "SELECT segmentation_mode FROM brand_loyalty_settings LIMIT 1"
         ),
+        "point_balance_buckets.remaining": "SELECT remaining FROM point_balance_buckets LIMIT 1",
+        "rule_cost_stats.max_ms": "SELECT max_ms FROM rule_cost_stats LIMIT 1",
     }
     missing: list[str] = []
     errors: dict[str, str] = {}
@@ -107,8 +116,12 @@ def get_loyalty_settings(
     brand: str = Depends(get_active_brand),
     db: Session = Depends(get_db),
 ):
+    created = find_loyalty_settings(db, brand=brand) is None
     obj = get_or_create_loyalty_settings(db, brand=brand)
     db.commit()
+    if created:
+        # Plain reads keep the brand config cache warm; only a first-time insert bumps it.
+        invalidate_brand_config(brand)
     return {
         "brand": obj.brand,
         "points_validity_days": obj.points_validity_days,
@@ -293,6 +306,7 @@ def update_loyalty_settings(
         initialize_validity_windows_for_existing_customers(db, brand=brand)
 
     db.commit()
+    invalidate_brand_config(brand)
     db.refresh(obj)
     return {
         "brand": obj.brand,
@@ -317,110 +331,12 @@ def get_brand_kpis(
     now = datetime.utcnow()
     window_from = now - timedelta(days=windowDays)
 
-    total_customers = (
-        db.query(func.count(Customer.id))
-        .filter(Customer.brand == brand)
-        .scalar()
-        or 0
-    )
-    new_customers = (
-        db.query(func.count(Customer.id))
-        .filter(Customer.brand == brand)
-        .filter(Customer.created_at >= window_from)
-        .scalar()
-        or 0
-    )
-    active_customers = (
-        db.query(func.count(Customer.id))
-        .filter(Customer.brand == brand)
-        .filter(Customer.last_activity_at.isnot(None))
-        .filter(Customer.last_activity_at >= window_from)
-        .scalar()
-        or 0
-    )
-    configured_customers = (
-        db.query(func.count(Customer.id))
-        .filter(Customer.brand == brand)
-        .filter(Customer.loyalty_status.isnot(None))
-        .filter(Customer.loyalty_status != "UNCONFIGURED")
-        .scalar()
-        or 0
-    )
-    by_status_rows = (
-        db.query(Customer.loyalty_status, func.count(Customer.id))
-        .filter(Customer.brand == brand)
-        .group_by(Customer.loyalty_status)
-        .all()
-    )
-    customers_by_loyalty_status = [
-        {"key": (row[0] or "UNCONFIGURED"), "count": int(row[1] or 0)} for row in by_status_rows
-    ]
-
-    ingested_in_window = (
-        db.query(func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .scalar()
-        or 0
-    )
-    tx_by_status_rows = (
-        db.query(Transaction.status, func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .group_by(Transaction.status)
-        .all()
-    )
-    tx_by_status = [
-        {"status": (row[0] or "UNKNOWN"), "count": int(row[1] or 0)} for row in tx_by_status_rows
-    ]
-
-    top_types_rows = (
-        db.query(Transaction.transaction_type, func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .group_by(Transaction.transaction_type)
-        .order_by(desc(func.count(Transaction.id)))
-        .limit(10)
-        .all()
-    )
-    top_types = [
-        {"transactionType": (row[0] or "UNKNOWN"), "count": int(row[1] or 0)} for row in top_types_rows
-    ]
-
-    top_error_codes_rows = (
-        db.query(Transaction.error_code, func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .filter(Transaction.error_code.isnot(None))
-        .filter(Transaction.error_code != "TRANSACTION_TYPE_CREATED")
-        .group_by(Transaction.error_code)
-        .order_by(desc(func.count(Transaction.id)))
-        .limit(10)
-        .all()
-    )
-    top_error_codes = [
-        {"errorCode": row[0], "count": int(row[1] or 0)} for row in top_error_codes_rows if row[0]
-    ]
-
-    no_rules_count = (
-        db.query(func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .filter(Transaction.error_code == "NO_RULES")
-        .scalar()
-        or 0
-    )
+    # Customers and transactions come from the MAINT_ROLLUP_BRAND_KPIS rollups (+ live edges).
+    customers = customer_window_kpis(db, brand=brand, window_days=windowDays, now=now)
+    tx_kpis = transaction_window_kpis(db, brand=brand, window_from=window_from)
+    ingested_in_window = tx_kpis["ingested"]
+    no_rules_count = tx_kpis["no_rules"]
     rules_applied_count = max(0, int(ingested_in_window) - int(no_rules_count))
-    blocked_customer_not_found = (
-        db.query(func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .filter(
-            Transaction.error_code.in_(["CUSTOMER_NOT_FOUND", "CUSTOMER_NOT_REGISTERED"])
-        )
-        .scalar()
-        or 0
-    )
 
     active_rules = (
         db.query(func.count(Rule.id))
@@ -515,23 +431,6 @@ def get_brand_kpis(
         or 0
     )
 
-    tier_upgraded = (
-        db.query(func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .filter(Transaction.transaction_type == "TIER_UPGRADED")
-        .scalar()
-        or 0
-    )
-    tier_downgraded = (
-        db.query(func.count(Transaction.id))
-        .filter(Transaction.brand == brand)
-        .filter(Transaction.created_at >= window_from)
-        .filter(Transaction.transaction_type == "TIER_DOWNGRADED")
-        .scalar()
-        or 0
-    )
-
     jobs_base = (
         db.query(InternalJob)
         .filter(InternalJob.brand == brand)
@@ -580,20 +479,22 @@ def get_brand_kpis(
             "to": now,
         },
         "customers": {
-            "total": int(total_customers),
-            "newInWindow": int(new_customers),
-            "activeInWindow": int(active_customers),
-            "withLoyaltyStatusConfigured": int(configured_customers),
-            "byLoyaltyStatus": customers_by_loyalty_status,
+            "total": int(customers["total"]),
+            "newInWindow": int(customers["new"]),
+            "activeInWindow": int(customers["active"]),
+            "withLoyaltyStatusConfigured": int(customers["configured"]),
+            "byLoyaltyStatus": customers["by_loyalty_status"],
+            "asOf": customers["as_of"],
         },
         "transactions": {
             "ingestedInWindow": int(ingested_in_window),
-            "byStatus": tx_by_status,
-            "topTypesInWindow": top_types,
-            "topErrorCodesInWindow": top_error_codes,
+            "byStatus": tx_kpis["by_status"],
+            "topTypesInWindow": tx_kpis["top_types"],
+            "topErrorCodesInWindow": tx_kpis["top_error_codes"],
             "noRulesCountInWindow": int(no_rules_count),
             "rulesAppliedCountInWindow": int(rules_applied_count),
-            "blockedCustomerNotFoundInWindow": int(blocked_customer_not_found),
+            "blockedCustomerNotFoundInWindow": int(tx_kpis["blocked_customer_not_found"]),
+            "rolledUpTo": tx_kpis["rolled_up_to"],
         },
         "rules": {
             "activeRules": int(active_rules),
@@ -614,8 +515,8 @@ def get_brand_kpis(
                 "expiredInWindow": int(rewards_expired_in_window),
             },
             "tierEventsInWindow": {
-                "upgraded": int(tier_upgraded),
-                "downgraded": int(tier_downgraded),
+                "upgraded": int(tx_kpis["tier_upgraded"]),
+                "downgraded": int(tx_kpis["tier_downgraded"]),
             },
         },
         "internalJobs": {
@@ -1371,6 +1272,25 @@ def get_rules_ui_catalog():
     }
 
 
+@router.get("/rules/slow")
+def get_slow_rules(
+    days: int = 7,
+    limit: int = 20,
+    orderBy: str = "avg_ms",
+    brand: str = Depends(get_active_brand),
+    db: Session = Depends(get_db),
+):
+    """Most expensive rules of the brand (rule_cost_stats; filled when RULE_PROFILING_ENABLED=true)."""
+    if days < 1 or days > 90:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 90")
+    if limit < 1 or limit > 200:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 200")
+    try:
+        return slow_rules_report(db, brand=brand, days=days, limit=limit, order_by=orderBy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/rules/ui-bundle")
 def get_rules_ui_bundle(
     brand: str = Depends(get_active_brand),
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import func, or_
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.deps.brand import assert_brand_matches, get_active_brand
@@ -21,6 +21,8 @@ from app.schemas.customer_coupon import CustomerCouponOut, CustomerCouponStatusU
 from app.schemas.customer_reward import CustomerRewardOut
 from app.schemas.point_movement import PointMovementOut
 from app.services.customer_upsert_service import customer_identity_payload, parse_customer_upsert_payload
+from app.services.keyset_pagination import count_rows, newest_first_page, next_cursor, normalize_total_mode
+from app.services.jsonb_filters import jsonb_contains
 from app.services.contact_service import (
     customer_transaction_filters,
     get_customer,
@@ -41,7 +43,7 @@ from app.services.customer_entitlement_serialization import (
 from app.services.entitlement_history_service import build_customer_entitlement_history
 from app.services.transaction_protection import transaction_deletion_meta
 from app.services.customer_loyalty_service import set_customer_loyalty_tier
-from app.services.customer_serialization import serialize_customer_out
+from app.services.customer_serialization import serialize_customer_out, serialize_customers_out
 from app.services.loyalty_status_service import update_customer_status
 from app.services.profile_reconciliation_service import reconcile_profile_view
 from app.services.wallet_service import get_status_points_balance
@@ -114,15 +116,22 @@ def list_customers(
     loyalty_status: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
+    total: str | None = None,
     active_brand: str = Depends(get_active_brand),
     db: Session = Depends(get_db),
 ):
+    """Newest first. Pass ``nextCursor`` back as ``cursor`` for the next page (keyset, any depth);
+    ``total=exact|estimate|none`` picks how ``count`` is computed (``estimate``: planner rows;
+    default ``exact`` on the first page, ``none`` with a cursor)."""
     limit = max(1, min(limit, 500))
     offset = max(0, offset)
+    total_mode = normalize_total_mode(total, cursor=cursor)
 
     query = db.query(Customer).filter(Customer.brand == active_brand)
 
     if q:
+        # Served by the pg_trgm GIN indexes on profile_id / email.
         like = f"%{q}%"
         query = query.filter(
             or_(
@@ -137,22 +146,19 @@ def list_customers(
     if loyalty_status:
         query = query.filter(Customer.loyalty_status == loyalty_status)
 
-    total = query.with_entities(func.count()).scalar() or 0
-    items = (
-        query.order_by(Customer.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    count = count_rows(db, query, total_mode)
+    items = newest_first_page(query, Customer, cursor=cursor, limit=limit, offset=offset).all()
 
-    out_items = [serialize_customer_out(db, customer=c, brand=active_brand) for c in items]
+    out_items = serialize_customers_out(db, customers=items, brand=active_brand)
 
     return {
         "brand": active_brand,
-        "count": int(total),
+        "count": count,
+        "countMode": total_mode,
         "items": out_items,
         "limit": limit,
         "offset": offset,
+        "nextCursor": next_cursor(items, limit),
     }
 
 
@@ -396,8 +402,13 @@ def get_customer_entitlements_history(
     active_brand: str = Depends(get_active_brand),
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
+    total: str | None = None,
     db: Session = Depends(get_db),
 ):
+    """Newest first. Pass ``nextCursor`` back as ``cursor`` for the next page;
+    ``total=exact|estimate|none`` picks how ``total`` is computed (default ``exact`` on the
+    first page, ``none`` with a cursor)."""
     assert_brand_matches(path_or_query_brand=brand, active_brand=active_brand)
     customer = _require_customer(db, brand=brand, profile_id=profile_id, email=email)
     limit = max(1, min(limit, 500))
@@ -408,6 +419,8 @@ def get_customer_entitlements_history(
         customer=customer,
         limit=limit,
         offset=offset,
+        cursor=cursor,
+        total_mode=normalize_total_mode(total, cursor=cursor),
     )
 
 
@@ -596,8 +609,8 @@ def get_customer_loyalty(
             )
             .filter(
                 or_(
-                    Transaction.payload["toTier"].as_string() == current_tier.key,
-                    Transaction.payload["toStatus"].as_string() == current_tier.key,
+                    jsonb_contains(Transaction.payload, {"toTier": current_tier.key}),
+                    jsonb_contains(Transaction.payload, {"toStatus": current_tier.key}),
                 )
             )
             .order_by(Transaction.created_at.desc())
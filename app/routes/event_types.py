@@ -12,6 +12,7 @@ from app.schemas.event_type import (
     TransactionTypeOut,
     TransactionTypeUpdate,
 )
+from app.services.brand_config_cache import invalidate_brand_config
 from app.services.loyalty_settings_service import ensure_brand_transaction_catalog
 from app.services.payload_schema_service import (
     get_transaction_type_rule_hints,
@@ -175,6 +176,7 @@ def create_transaction_type(
     )
     db.add(obj)
     db.commit()
+    invalidate_brand_config(active_brand)
     db.refresh(obj)
     return obj
 
@@ -243,6 +245,7 @@ def update_transaction_type(
         setattr(obj, k, v)
 
     db.commit()
+    invalidate_brand_config(active_brand)
     db.refresh(obj)
     return obj
 
@@ -263,4 +266,5 @@ def delete_transaction_type(
 
     db.delete(obj)
     db.commit()
+    invalidate_brand_config(active_brand)
     return {"deleted": True}
@@ -1,111 +1,170 @@
-import csv
-import io
+import os
+import tempfile
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Response, UploadFile
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.db import get_db
 from app.deps.brand import get_active_brand
-from app.services.birthdate_targeting import parse_birthdate_wire
-from app.services.contact_service import get_or_create_customer
+from app.models.customer_import_job import CustomerImportJob
+from app.schemas.customer_import import CustomerImportErrorsOut, CustomerImportJobOut
+from app.services.customer_import_service import create_customer_import_job, run_customer_import_job
 
 
 router = APIRouter(prefix="/imports", tags=["imports"])
 
-
-def _parse_date(value: str | None):
-    if not value:
-        return None
-    s = str(value).strip()
-    if not s:
-        return None
-    target = parse_birthdate_wire(s)
-    if target.full_date is not None:
-        return target.full_date
-    return target.wire
+_UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def _import_mode_is_async(mode: str | None) -> bool:
+    """Per-request ``mode`` wins; otherwise ``CUSTOMER_IMPORT_MODE`` (sync | async, default sync)."""
+    raw = mode if mode is not None and mode.strip() else os.getenv("CUSTOMER_IMPORT_MODE", "sync")
+    value = (raw or "sync").strip().lower()
+    if value not in {"sync", "async"}:
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
+    return value == "async"
+
+
+async def _spool_upload(file: UploadFile) -> tuple[str, int]:
+    """Copy the upload to a private temp file in fixed-size chunks (the job reads it later)."""
+    fd, path = tempfile.mkstemp(prefix="customer-import-", suffix=".csv")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(_UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def _job_out(job: CustomerImportJob) -> CustomerImportJobOut:
+    out = CustomerImportJobOut.model_validate(job)
+    if job.bytes_total:
+        out.progress = round(min(1.0, (job.bytes_read or 0) / job.bytes_total), 4)
+    if job.status in {"SUCCEEDED", "REJECTED"}:
+        out.progress = 1.0
+    return out
+
+
+def _get_job(db: Session, *, job_id: UUID, brand: str) -> CustomerImportJob:
+    job = (
+        db.query(CustomerImportJob)
+        .filter(CustomerImportJob.id == job_id)
+        .filter(CustomerImportJob.brand == brand)
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
 
 
 @router.post("/customers")
 async def import_customers_csv(
+    response: Response,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    mode: str | None = None,
     active_brand: str = Depends(get_active_brand),
     db: Session = Depends(get_db),
 ):
     if not file.filename or not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="CSV file is required")
+    run_async = _import_mode_is_async(mode)
 
-    content = await file.read()
-    text = content.decode("utf-8-sig")
-
-    reader = csv.DictReader(io.StringIO(text))
-
-    processed = 0
-    created_or_updated = 0
-    errors: list[dict] = []
-
-    rows: list[tuple[int, dict]] = []
-
-    for idx, row in enumerate(reader, start=2):
-        processed += 1
-        rows.append((idx, row))
-
-    for idx, row in rows:
-        try:
-            brand_in = (row.get("brand") or "").strip()
-            if not brand_in:
-                raise ValueError("brand is required")
-            if brand_in != active_brand:
-                raise ValueError(f"brand mismatch: expected '{active_brand}' got '{brand_in}'")
+    path, size = await _spool_upload(file)
+    try:
+        job = create_customer_import_job(db, brand=active_brand, filename=file.filename, bytes_total=size)
+    except BaseException:
+        os.remove(path)
+        raise
 
-            profile_id = (row.get("profileId") or row.get("profile_id") or "").strip()
-            if not profile_id:
-                raise ValueError("profileId is required")
+    if run_async:
+        background_tasks.add_task(run_customer_import_job, job.id, path)
+        response.status_code = 202
+        return _job_out(job)
 
-            gender = (row.get("gender") or "").strip() or None
-            birthdate = _parse_date((row.get("birthdate") or "").strip() or None)
-        except Exception as e:
-            errors.append({"line": idx, "error": str(e), "row": row})
+    await run_in_threadpool(run_customer_import_job, job.id, path)
+    db.expire_all()
+    job = _get_job(db, job_id=job.id, brand=active_brand)
 
-    if errors:
-        brand_missing = sum(1 for e in errors if e.get("error") == "brand is required")
-        brand_mismatch = sum(
-            1
-            for e in errors
-            if isinstance(e.get("error"), str) and e.get("error", "").startswith("brand mismatch:")
-        )
-        profile_missing = sum(1 for e in errors if e.get("error") == "profileId is required")
+    if job.status == "REJECTED":
         raise HTTPException(
             status_code=400,
             detail={
-                "message": "Import rejected: CSV validation failed. No customers were imported.",
-                "processed": processed,
-                "summary": {
-                    "brandMissing": brand_missing,
-                    "brandMismatch": brand_mismatch,
-                    "profileIdMissing": profile_missing,
-                },
-                "errors": errors,
+                "message": job.message,
+                "jobId": str(job.id),
+                "processed": job.processed_rows,
+                "summary": job.error_summary or {},
+                "errorCount": job.error_count,
+                "errors": job.errors or [],
             },
         )
-
-    for idx, row in rows:
-        brand = (row.get("brand") or "").strip()
-        profile_id = (row.get("profileId") or row.get("profile_id") or "").strip()
-        gender = (row.get("gender") or "").strip() or None
-        birthdate = _parse_date((row.get("birthdate") or "").strip() or None)
-
-        get_or_create_customer(
-            db,
-            brand,
-            profile_id,
-            {"gender": gender, "birthdate": birthdate},
+    if job.status != "SUCCEEDED":
+        raise HTTPException(
+            status_code=500,
+            detail={"message": job.message or "Import failed", "jobId": str(job.id)},
         )
-        created_or_updated += 1
-
-    db.commit()
 
     return {
-        "processed": processed,
-        "upserted": created_or_updated,
+        "jobId": str(job.id),
+        "processed": job.processed_rows,
+        "upserted": job.staged_rows,
+        "created": job.created_count,
+        "updated": job.updated_count,
         "errors": [],
     }
+
+
+@router.get("/customers/jobs", response_model=list[CustomerImportJobOut])
+def list_customer_import_jobs(
+    limit: int = 20,
+    active_brand: str = Depends(get_active_brand),
+    db: Session = Depends(get_db),
+):
+    jobs = (
+        db.query(CustomerImportJob)
+        .filter(CustomerImportJob.brand == active_brand)
+        .order_by(CustomerImportJob.created_at.desc())
+        .limit(max(1, min(int(limit), 200)))
+        .all()
+    )
+    return [_job_out(j) for j in jobs]
+
+
+@router.get("/customers/jobs/{job_id}", response_model=CustomerImportJobOut)
+def get_customer_import_job(
+    job_id: UUID,
+    active_brand: str = Depends(get_active_brand),
+    db: Session = Depends(get_db),
+):
+    return _job_out(_get_job(db, job_id=job_id, brand=active_brand))
+
+
+@router.get("/customers/jobs/{job_id}/errors", response_model=CustomerImportErrorsOut)
+def get_customer_import_job_errors(
+    job_id: UUID,
+    offset: int = 0,
+    limit: int = 100,
+    active_brand: str = Depends(get_active_brand),
+    db: Session = Depends(get_db),
+):
+    job = _get_job(db, job_id=job_id, brand=active_brand)
+    stored = job.errors or []
+    start = max(0, int(offset))
+    end = start + max(1, min(int(limit), 1000))
+    return CustomerImportErrorsOut(
+        job_id=job.id,
+        status=job.status,
+        error_count=job.error_count or 0,
+        stored=len(stored),
+        summary=job.error_summary,
+        errors=stored[start:end],
+    )
@@ -37,6 +37,8 @@ _SYSTEM_MANAGED_JOB_KEYS = {
     "MAINT_RECOMPUTE_CUSTOMER_METRICS",
     "MAINT_RECOMPUTE_SEGMENTS",
     "MAINT_BACKFILL_COUPONS",
+    "MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL",
+    "MAINT_ROLLUP_BRAND_KPIS",
 }
 
 
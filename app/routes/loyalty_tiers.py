@@ -12,6 +12,7 @@ from app.models.customer import Customer
 from app.models.internal_job import InternalJob
 from app.models.loyalty_tier import LoyaltyTier
 from app.schemas.loyalty_tier import LoyaltyTierCreate, LoyaltyTierOut, LoyaltyTierUpdate
+from app.services.brand_config_cache import invalidate_brand_config
 from app.services.loyalty_status_service import update_customer_status
 
 
@@ -285,6 +286,7 @@ def create_loyalty_tier(
     db.flush()
     _recompute_tier_ranks(db, active_brand)
     db.commit()
+    invalidate_brand_config(active_brand)
     db.refresh(obj)
 
     _enqueue_recompute_customers_job(db, active_brand)
@@ -354,6 +356,7 @@ def update_loyalty_tier(
     db.flush()
     _recompute_tier_ranks(db, active_brand)
     db.commit()
+    invalidate_brand_config(active_brand)
     db.refresh(obj)
 
     _enqueue_recompute_customers_job(db, active_brand)
@@ -389,6 +392,7 @@ def delete_loyalty_tier(
 
     db.delete(obj)
     db.commit()
+    invalidate_brand_config(active_brand)
 
     _enqueue_recompute_customers_job(db, active_brand)
 
@@ -431,6 +435,7 @@ def ensure_base_loyalty_tier(
             db.flush()
             _recompute_tier_ranks(db, active_brand)
             db.commit()
+            invalidate_brand_config(active_brand)
             db.refresh(existing)
 
             _enqueue_recompute_customers_job(db, active_brand)
@@ -473,6 +478,7 @@ def ensure_base_loyalty_tier(
     db.flush()
     _recompute_tier_ranks(db, active_brand)
     db.commit()
+    invalidate_brand_config(active_brand)
     db.refresh(obj)
 
     _enqueue_recompute_customers_job(db, active_brand)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import CONTENT_TYPE, REGISTRY
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (this API process only; behind the same basic auth as the API)."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
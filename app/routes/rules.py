@@ -12,6 +12,7 @@ from app.models.rule import Rule
 from app.models.segment import Segment
 from app.schemas.rule import RuleCreate, RuleOut, RuleUpdate, RuleReorderRequest
 from app.deps.brand import get_active_brand
+from app.services.rule_plan_cache import invalidate_rule_plans
 
 
 router = APIRouter(prefix="/rules", tags=["rules"])
@@ -181,6 +182,7 @@ def create_rule(
                 detail="Rule priority conflict detected. Please retry.",
             )
         raise
+    invalidate_rule_plans(active_brand)
     db.refresh(rule)
     return rule
 
@@ -231,6 +233,7 @@ def reorder_rules(
             )
         raise HTTPException(status_code=409, detail="Unable to reorder rules due to data conflict")
 
+    invalidate_rule_plans(active_brand)
     return {"updated": len(rule_ids)}
 
 
@@ -329,6 +332,7 @@ def update_rule(
                 detail="A rule with this priority already exists for this brand.",
             )
         raise
+    invalidate_rule_plans(active_brand)
     db.refresh(rule)
     return rule
 
@@ -365,6 +369,7 @@ def delete_rule(
             status_code=409,
             detail="Cannot delete rule due to existing references (apply latest DB migrations or remove dependent records).",
         )
+    invalidate_rule_plans(active_brand)
     return {"deleted": True}
 
 
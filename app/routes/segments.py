@@ -502,9 +502,10 @@ def list_segments(
 def recompute_brand_segments(
     active_brand: str = Depends(get_active_brand),
     batch_size: int = Query(500, ge=1, le=5000),
+    full: bool = Query(False, description="Re-evaluate every customer instead of only those changed since last recompute"),
     db: Session = Depends(get_db),
 ):
-    stats = recompute_brand_dynamic_segments(db, brand=active_brand, batch_size=batch_size)
+    stats = recompute_brand_dynamic_segments(db, brand=active_brand, batch_size=batch_size, full=full)
     db.commit()
     return stats
 
@@ -702,6 +703,7 @@ def recompute_segment(
     segment_id: UUID,
     active_brand: str = Depends(get_active_brand),
     batch_size: int = Query(500, ge=1, le=5000),
+    full: bool = Query(False, description="Re-evaluate every customer instead of only those changed since last recompute"),
     db: Session = Depends(get_db),
 ):
     obj = db.query(Segment).filter(Segment.id == segment_id).first()
@@ -715,7 +717,7 @@ def recompute_segment(
         raise HTTPException(status_code=400, detail="Dynamic segment has no conditions")
 
     try:
-        stats = trigger_recompute_if_needed(db, seg=obj, recompute=True, batch_size=batch_size)
+        stats = trigger_recompute_if_needed(db, seg=obj, recompute=True, batch_size=batch_size, full=full)
         if stats is None:
             raise HTTPException(status_code=400, detail="Segment could not be recomputed")
         db.commit()
@@ -1,7 +1,9 @@
 import logging
+import os
 import uuid
+from collections import Counter
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from app.db import get_db
@@ -13,13 +15,33 @@ from app.schemas.event import EventCreate, UnomiEventCreate
 from app.schemas.transaction import TransactionOut
 from app.schemas.execution import RuleExecutionOut
 from app.services.contact_service import customer_transaction_filters, resolve_customer_for_lookup
+from app.services.keyset_pagination import newest_first_page, next_cursor
 from app.services.transaction_protection import transaction_deletion_meta
-from app.services.transaction_service import create_transaction
+from app.services.transaction_service import (
+    create_transaction,
+    create_transactions_batch,
+    enqueue_transaction,
+    ingest_mode_is_async,
+)
 
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 logger = logging.getLogger(__name__)
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _transaction_page(q, *, response: Response, cursor: str | None, limit: int, offset: int) -> list[dict]:
+    """Newest first; pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page."""
+    limit = max(1, min(limit, 200))
+    offset = max(0, offset)
+
+    rows = newest_first_page(q, Transaction, cursor=cursor, limit=limit, offset=offset).all()
+    following = next_cursor(rows, limit)
+    if following:
+        response.headers[NEXT_CURSOR_HEADER] = following
+    return [_serialize_transaction_out(tx) for tx in rows]
+
 
 def _serialize_transaction_out(tx: Transaction) -> dict:
     meta = transaction_deletion_meta(tx)
@@ -57,6 +79,8 @@ def _resolve_transaction(db: Session, *, active_brand: str, identifier: str) ->
 @router.post("")
 def ingest_transaction(
     event: UnomiEventCreate,
+    response: Response,
+    mode: str | None = None,
     db: Session = Depends(get_db),
 ):
     if not (event.brand or "").strip():
@@ -82,7 +106,13 @@ def ingest_transaction(
         payload=payload,
     )
 
-    transaction = create_transaction(db, mapped)
+    if ingest_mode_is_async(mode):
+        transaction = enqueue_transaction(db, mapped)
+        if transaction.status == "PENDING":
+            # Accepted: rules run in app.services.ingest_worker.
+            response.status_code = 202
+    else:
+        transaction = create_transaction(db, mapped)
     logger.info(
         "transaction ingested brand=%s type=%s profileId=%s eventId=%s status=%s errorCode=%s",
         transaction.brand,
@@ -100,14 +130,54 @@ def ingest_transaction(
     }
 
 
+def _batch_max_items() -> int:
+    try:
+        return max(1, int(os.getenv("TRANSACTION_BATCH_MAX_ITEMS") or "1000"))
+    except ValueError:
+        return 1000
+
+
+@router.post("/batch")
+def ingest_transactions_batch(
+    events: list[EventCreate],
+    db: Session = Depends(get_db),
+):
+    if not events:
+        raise HTTPException(status_code=400, detail="events must be a non-empty list")
+    max_items = _batch_max_items()
+    if len(events) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(events)} events (max {max_items})")
+
+    items = create_transactions_batch(db, events)
+    counts = Counter(item["result"] for item in items)
+    logger.info(
+        "transaction batch ingested count=%s created=%s existing=%s duplicates=%s rejected=%s",
+        len(items),
+        counts.get("CREATED", 0),
+        counts.get("EXISTING", 0),
+        counts.get("DUPLICATE_IN_BATCH", 0),
+        counts.get("REJECTED", 0),
+    )
+    return {
+        "count": len(items),
+        "created": counts.get("CREATED", 0),
+        "existing": counts.get("EXISTING", 0),
+        "duplicates": counts.get("DUPLICATE_IN_BATCH", 0),
+        "rejected": counts.get("REJECTED", 0),
+        "items": items,
+    }
+
+
 @router.get("", response_model=list[TransactionOut])
 def list_transactions(
+    response: Response,
     active_brand: str = Depends(get_active_brand),
     brand: str | None = None,
     profileId: str | None = None,
     status: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
     q = db.query(Transaction)
@@ -119,11 +189,7 @@ def list_transactions(
     if status:
         q = q.filter(Transaction.status == status)
 
-    limit = max(1, min(limit, 200))
-    offset = max(0, offset)
-
-    rows = q.order_by(Transaction.created_at.desc()).offset(offset).limit(limit).all()
-    return [_serialize_transaction_out(tx) for tx in rows]
+    return _transaction_page(q, response=response, cursor=cursor, limit=limit, offset=offset)
 
 
 def _resolve_customer_for_transaction_list(
@@ -151,10 +217,12 @@ def _resolve_customer_for_transaction_list(
 def list_transactions_by_user(
     brand: str,
     profileId: str,
+    response: Response,
     email: str | None = None,
     active_brand: str = Depends(get_active_brand),
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
     assert_brand_matches(path_or_query_brand=brand, active_brand=active_brand)
@@ -172,11 +240,7 @@ def list_transactions_by_user(
         .filter(customer_transaction_filters(db, brand=active_brand, customer=customer))
     )
 
-    limit = max(1, min(limit, 200))
-    offset = max(0, offset)
-
-    rows = q.order_by(Transaction.created_at.desc()).offset(offset).limit(limit).all()
-    return [_serialize_transaction_out(tx) for tx in rows]
+    return _transaction_page(q, response=response, cursor=cursor, limit=limit, offset=offset)
 
 
 @router.get("/by-user-and-type", response_model=list[TransactionOut])
@@ -184,10 +248,12 @@ def list_transactions_by_user_and_type(
     brand: str,
     transactionType: str,
     profileId: str,
+    response: Response,
     email: str | None = None,
     active_brand: str = Depends(get_active_brand),
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
     assert_brand_matches(path_or_query_brand=brand, active_brand=active_brand)
@@ -206,11 +272,7 @@ def list_transactions_by_user_and_type(
         .filter(Transaction.transaction_type == transactionType)
     )
 
-    limit = max(1, min(limit, 200))
-    offset = max(0, offset)
-
-    rows = q.order_by(Transaction.created_at.desc()).offset(offset).limit(limit).all()
-    return [_serialize_transaction_out(tx) for tx in rows]
+    return _transaction_page(q, response=response, cursor=cursor, limit=limit, offset=offset)
 
 
 @router.get("/{transaction_id}", response_model=TransactionOut)
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class CustomerImportJobOut(BaseModel):
+    id: UUID
+    brand: str
+    filename: Optional[str] = None
+    status: str
+
+    bytes_total: Optional[int] = None
+    bytes_read: int = 0
+    progress: Optional[float] = None
+
+    processed_rows: int = 0
+    staged_rows: int = 0
+    created_count: int = 0
+    updated_count: int = 0
+    error_count: int = 0
+    error_summary: Optional[Dict[str, int]] = None
+    message: Optional[str] = None
+
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CustomerImportErrorsOut(BaseModel):
+    job_id: UUID
+    status: str
+    error_count: int = 0
+    # Only the first CUSTOMER_IMPORT_MAX_ERRORS invalid rows are kept.
+    stored: int = 0
+    summary: Optional[Dict[str, int]] = None
+    errors: List[Dict[str, Any]]
@@ -35,6 +35,9 @@ class SegmentRecomputeResult(BaseModel):
     brand: str
     segments: int
     members: int
+    added: int = 0
+    removed: int = 0
+    incremental_segments: int = 0
     computed_at: datetime
 
 
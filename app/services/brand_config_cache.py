@@ -0,0 +1,208 @@
+"""Per-brand loyalty configuration cached in process: tier ladder, settings, transaction types.
+
+Every earn used to re-query ``brand_loyalty_settings`` and ``loyalty_tiers`` several
+times (status from points, base tier, min points of the old/new tier), and every ingested
+event re-queried ``transaction_types``. This configuration changes a few times a month.
+``BrandConfig`` is an immutable snapshot of it; tier resolution is a bisect over the
+sorted ladder.
+
+Invalidation (same model as ``rule_plan_cache``):
+  - ``invalidate_brand_config(brand)`` bumps the brand's version; it is called after the
+    commits of ``app/routes/loyalty_tiers.py``, ``app/routes/event_types.py`` and the
+    admin loyalty-settings writes (a GET only when it creates the brand's settings row),
+    when ingest auto-creates a type, and when the buffered post-commit payload shape
+    flush (``payload_schema_learning.flush_payload_shapes``) changes a brand's schema.
+  - ``BRAND_CONFIG_CACHE_TTL_SECONDS`` (default 60) bounds staleness for processes that do
+    not see the bump (other uvicorn workers, ingest worker, scheduler). ``0`` disables the
+    cache entirely.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models.brand_loyalty_settings import BrandLoyaltySettings
+from app.models.event_type import TransactionType
+from app.models.loyalty_tier import LoyaltyTier
+
+
+@dataclass(frozen=True)
+class TierStep:
+    key: str
+    min_status_points: int
+
+
+@dataclass(frozen=True)
+class TierLadder:
+    """Active tiers ordered by ``(min_status_points, created_at)``."""
+
+    steps: tuple[TierStep, ...] = ()
+    _mins: tuple[int, ...] = field(default=(), repr=False)
+    _min_by_key: Mapping[str, int] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, steps) -> "TierLadder":
+        steps = tuple(steps)
+        min_by_key: dict[str, int] = {}
+        for s in steps:
+            min_by_key.setdefault(s.key, s.min_status_points)
+        return cls(
+            steps=steps,
+            _mins=tuple(s.min_status_points for s in steps),
+            _min_by_key=MappingProxyType(min_by_key),
+        )
+
+    @property
+    def base_key(self) -> str | None:
+        return self.steps[0].key if self.steps else None
+
+    def status_for_points(self, status_points) -> str | None:
+        """Highest tier whose minimum is reached; the lowest tier below every minimum."""
+        if not self.steps:
+            return None
+        idx = bisect_right(self._mins, int(status_points or 0)) - 1
+        return self.steps[max(idx, 0)].key
+
+    def min_points(self, key: str | None) -> int | None:
+        if not key:
+            return None
+        return self._min_by_key.get(key)
+
+
+@dataclass(frozen=True)
+class LoyaltySettingsSnapshot:
+    points_validity_days: int | None
+    loyalty_status_validity_days: int | None
+    segmentation_mode: str | None
+
+
+@dataclass(frozen=True)
+class TransactionTypeSnapshot:
+    id: UUID
+    key: str
+    origin: str
+    # Shared between callers: treat as read-only.
+    payload_schema: Any
+
+
+@dataclass(frozen=True)
+class BrandConfig:
+    brand: str
+    version: int
+    loaded_at: float
+    tiers: TierLadder
+    settings: LoyaltySettingsSnapshot | None
+    transaction_types: Mapping[str, TransactionTypeSnapshot]
+
+
+_lock = threading.Lock()
+_brand_versions: dict[str, int] = {}
+_configs: dict[str, BrandConfig] = {}
+
+
+def _brand_key(brand: str | None) -> str:
+    return (brand or "").strip().lower()
+
+
+def _ttl_seconds() -> float:
+    raw = os.getenv("BRAND_CONFIG_CACHE_TTL_SECONDS")
+    if raw is None or not str(raw).strip():
+        return 60.0
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return 60.0
+
+
+def brand_config_version(brand: str) -> int:
+    with _lock:
+        return _brand_versions.get(_brand_key(brand), 0)
+
+
+def invalidate_brand_config(brand: str) -> int:
+    """Bump the brand's config version and drop its cached snapshot. Returns the new version."""
+    key = _brand_key(brand)
+    with _lock:
+        version = _brand_versions.get(key, 0) + 1
+        _brand_versions[key] = version
+        for cached in [b for b in _configs if _brand_key(b) == key]:
+            del _configs[cached]
+    return version
+
+
+def clear_brand_config_cache() -> None:
+    with _lock:
+        _configs.clear()
+
+
+def load_brand_config(db: Session, *, brand: str, version: int = 0) -> BrandConfig:
+    tiers = (
+        db.query(LoyaltyTier.key, LoyaltyTier.min_status_points)
+        .filter(LoyaltyTier.brand == brand)
+        .filter(LoyaltyTier.active.is_(True))
+        .order_by(LoyaltyTier.min_status_points.asc(), LoyaltyTier.created_at.asc())
+        .all()
+    )
+
+    settings_row = (
+        db.query(
+            BrandLoyaltySettings.points_validity_days,
+            BrandLoyaltySettings.loyalty_status_validity_days,
+            BrandLoyaltySettings.segmentation_mode,
+        )
+        .filter(BrandLoyaltySettings.brand == brand)
+        .first()
+    )
+    settings = None
+    if settings_row is not None:
+        settings = LoyaltySettingsSnapshot(
+            points_validity_days=settings_row[0],
+            loyalty_status_validity_days=settings_row[1],
+            segmentation_mode=settings_row[2],
+        )
+
+    types: dict[str, TransactionTypeSnapshot] = {}
+    for tt_id, key, origin, payload_schema in (
+        db.query(TransactionType.id, TransactionType.key, TransactionType.origin, TransactionType.payload_schema)
+        .filter(TransactionType.brand == brand)
+        .filter(TransactionType.active.is_(True))
+        .order_by(TransactionType.created_at.asc())
+        .all()
+    ):
+        types.setdefault(key, TransactionTypeSnapshot(id=tt_id, key=key, origin=origin, payload_schema=payload_schema))
+
+    return BrandConfig(
+        brand=brand,
+        version=version,
+        loaded_at=time.monotonic(),
+        tiers=TierLadder.build(TierStep(key=k, min_status_points=int(m)) for k, m in tiers),
+        settings=settings,
+        transaction_types=MappingProxyType(types),
+    )
+
+
+def get_brand_config(db: Session, *, brand: str) -> BrandConfig:
+    ttl = _ttl_seconds()
+
+    with _lock:
+        version = _brand_versions.get(_brand_key(brand), 0)
+        config = _configs.get(brand) if ttl > 0 else None
+    if config is not None and config.version == version and (time.monotonic() - config.loaded_at) < ttl:
+        return config
+
+    config = load_brand_config(db, brand=brand, version=version)
+    if ttl > 0:
+        with _lock:
+            # A concurrent invalidation wins: do not publish a snapshot built from the old version.
+            if _brand_versions.get(_brand_key(brand), 0) == version:
+                _configs[brand] = config
+    return config
@@ -0,0 +1,268 @@
+"""Brand KPI rollups behind ``GET /admin/brand-kpis``.
+
+``MAINT_ROLLUP_BRAND_KPIS`` keeps, per brand:
+  - ``brand_transaction_rollups``: transactions counted per ingest hour, status, type and
+    error code, rebuilt hour by hour up to the last closed hour. The last
+    ``SETTLE_HOURS`` are rebuilt again on every run because the async ingest worker and
+    rule processing update ``status`` / ``error_code`` after the row is inserted;
+  - ``brand_kpi_snapshots``: the rollup watermark and the customer counters (total, new
+    and active over 7 / 30 days, configured, tier distribution) as of the last run.
+
+The endpoint sums the rollup hours of its window and counts live only the uncovered
+edges: the partial hour at the start of the window and everything since the watermark.
+Its cost therefore depends on the job lag, not on the size of ``transactions``.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.brand_kpi_snapshot import BrandKpiSnapshot
+from app.models.brand_transaction_rollup import BrandTransactionRollup
+from app.models.customer import Customer
+from app.models.transaction import Transaction
+
+
+SETTLE_HOURS = 2
+DEFAULT_BATCH_HOURS = 24 * 7
+
+_CUSTOMER_WINDOWS = (7, 30)
+_BLOCKED_CUSTOMER_ERROR_CODES = ("CUSTOMER_NOT_FOUND", "CUSTOMER_NOT_REGISTERED")
+# Informational error code (new transaction type auto-created), not a failure.
+_IGNORED_ERROR_CODES = ("TRANSACTION_TYPE_CREATED",)
+
+
+@dataclass
+class BrandKpiRollupRunStats:
+    processed: int  # hours rebuilt
+    updated: int  # rollup rows written
+    finished: bool
+
+
+def _hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+# ============================================================
+# JOB: rollup maintenance
+# ============================================================
+def rebuild_transaction_rollups(db: Session, *, brand: str, start: datetime, end: datetime) -> int:
+    """Replace the rollup rows of ``[start, end)`` (whole hours) from ``transactions``."""
+    db.query(BrandTransactionRollup).filter(
+        BrandTransactionRollup.brand == brand,
+        BrandTransactionRollup.hour >= start,
+        BrandTransactionRollup.hour < end,
+    ).delete(synchronize_session=False)
+
+    hour = func.date_trunc("hour", Transaction.created_at)
+    error_code = func.coalesce(Transaction.error_code, "")
+    grouped = (
+        sa.select(
+            sa.literal(brand, sa.String),
+            hour,
+            Transaction.status,
+            Transaction.transaction_type,
+            error_code,
+            func.count(Transaction.id),
+        )
+        .where(Transaction.brand == brand)
+        .where(Transaction.created_at >= start)
+        .where(Transaction.created_at < end)
+        .group_by(hour, Transaction.status, Transaction.transaction_type, error_code)
+    )
+    result = db.execute(
+        sa.insert(BrandTransactionRollup).from_select(
+            ["brand", "hour", "status", "transaction_type", "error_code", "count"], grouped
+        )
+    )
+    return int(result.rowcount or 0)
+
+
+def _customer_counters(db: Session, *, brand: str, now: datetime) -> dict:
+    """Customer KPIs of a brand in one aggregate pass plus one ``GROUP BY`` for tiers."""
+    columns = [func.count(Customer.id)]
+    for days in _CUSTOMER_WINDOWS:
+        since = now - timedelta(days=days)
+        columns.append(func.count(Customer.id).filter(Customer.created_at >= since))
+        columns.append(func.count(Customer.id).filter(Customer.last_activity_at >= since))
+    columns.append(
+        func.count(Customer.id).filter(
+            Customer.loyalty_status.isnot(None), Customer.loyalty_status != "UNCONFIGURED"
+        )
+    )
+    total, new_7d, active_7d, new_30d, active_30d, configured = (
+        db.query(*columns).filter(Customer.brand == brand).one()
+    )
+    by_status = (
+        db.query(Customer.loyalty_status, func.count(Customer.id))
+        .filter(Customer.brand == brand)
+        .group_by(Customer.loyalty_status)
+        .all()
+    )
+    return {
+        "total": int(total or 0),
+        "new": {7: int(new_7d or 0), 30: int(new_30d or 0)},
+        "active": {7: int(active_7d or 0), 30: int(active_30d or 0)},
+        "configured": int(configured or 0),
+        "by_loyalty_status": [
+            {"key": (key or "UNCONFIGURED"), "count": int(count or 0)} for key, count in by_status
+        ],
+    }
+
+
+def rollup_brand_kpis(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime,
+    batch_hours: int = DEFAULT_BATCH_HOURS,
+) -> BrandKpiRollupRunStats:
+    """Advance the brand's rollups by at most ``batch_hours`` closed hours and refresh
+    the customer counters. ``finished`` once the rollups reach the current hour."""
+    snapshot = (
+        db.query(BrandKpiSnapshot).filter(BrandKpiSnapshot.brand == brand).with_for_update().first()
+    )
+    if snapshot is None:
+        snapshot = BrandKpiSnapshot(brand=brand)
+        db.add(snapshot)
+
+    current_hour = _hour(now)
+    rolled_up_to = snapshot.transactions_rolled_up_to
+    if rolled_up_to is None:
+        first = db.query(func.min(Transaction.created_at)).filter(Transaction.brand == brand).scalar()
+        rolled_up_to = _hour(first) if first is not None else current_hour
+
+    start = rolled_up_to - timedelta(hours=SETTLE_HOURS)
+    end = max(rolled_up_to, min(rolled_up_to + timedelta(hours=batch_hours), current_hour))
+    updated = rebuild_transaction_rollups(db, brand=brand, start=start, end=end) if end > start else 0
+    snapshot.transactions_rolled_up_to = end
+
+    counters = _customer_counters(db, brand=brand, now=now)
+    snapshot.customers_total = counters["total"]
+    snapshot.customers_new_7d = counters["new"][7]
+    snapshot.customers_new_30d = counters["new"][30]
+    snapshot.customers_active_7d = counters["active"][7]
+    snapshot.customers_active_30d = counters["active"][30]
+    snapshot.customers_configured = counters["configured"]
+    snapshot.customers_by_loyalty_status = counters["by_loyalty_status"]
+    snapshot.computed_at = now
+
+    db.flush()
+    return BrandKpiRollupRunStats(
+        processed=int((end - start).total_seconds() // 3600),
+        updated=updated,
+        finished=end >= current_hour,
+    )
+
+
+# ============================================================
+# READ: /admin/brand-kpis
+# ============================================================
+def _live_transaction_counts(db: Session, *, brand: str, start: datetime, end: datetime | None = None):
+    q = (
+        db.query(Transaction.status, Transaction.transaction_type, Transaction.error_code, func.count(Transaction.id))
+        .filter(Transaction.brand == brand)
+        .filter(Transaction.created_at >= start)
+    )
+    if end is not None:
+        q = q.filter(Transaction.created_at < end)
+    return q.group_by(Transaction.status, Transaction.transaction_type, Transaction.error_code).all()
+
+
+def _window_transaction_counts(
+    db: Session, *, brand: str, window_from: datetime, rolled_up_to: datetime | None
+) -> Counter:
+    """``(status, transaction_type, error_code) -> count`` of transactions since ``window_from``."""
+    counts: Counter = Counter()
+    first_full_hour = _hour(window_from)
+    if first_full_hour < window_from:
+        first_full_hour += timedelta(hours=1)
+
+    if rolled_up_to is None or rolled_up_to <= first_full_hour:
+        live = _live_transaction_counts(db, brand=brand, start=window_from)
+    else:
+        rolled = (
+            db.query(
+                BrandTransactionRollup.status,
+                BrandTransactionRollup.transaction_type,
+                BrandTransactionRollup.error_code,
+                func.sum(BrandTransactionRollup.count),
+            )
+            .filter(BrandTransactionRollup.brand == brand)
+            .filter(BrandTransactionRollup.hour >= first_full_hour)
+            .filter(BrandTransactionRollup.hour < rolled_up_to)
+            .group_by(
+                BrandTransactionRollup.status,
+                BrandTransactionRollup.transaction_type,
+                BrandTransactionRollup.error_code,
+            )
+            .all()
+        )
+        live = list(rolled)
+        if window_from < first_full_hour:
+            live += _live_transaction_counts(db, brand=brand, start=window_from, end=first_full_hour)
+        live += _live_transaction_counts(db, brand=brand, start=rolled_up_to)
+
+    for status, transaction_type, error_code, count in live:
+        counts[(status, transaction_type, error_code or None)] += int(count or 0)
+    return counts
+
+
+def _top(counter: Counter, *, limit: int = 10) -> list[tuple]:
+    return sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+
+
+def transaction_window_kpis(db: Session, *, brand: str, window_from: datetime) -> dict:
+    snapshot = db.get(BrandKpiSnapshot, brand)
+    rolled_up_to = snapshot.transactions_rolled_up_to if snapshot is not None else None
+    counts = _window_transaction_counts(db, brand=brand, window_from=window_from, rolled_up_to=rolled_up_to)
+
+    by_status: Counter = Counter()
+    by_type: Counter = Counter()
+    by_error_code: Counter = Counter()
+    for (status, transaction_type, error_code), count in counts.items():
+        by_status[status or "UNKNOWN"] += count
+        by_type[transaction_type or "UNKNOWN"] += count
+        if error_code and error_code not in _IGNORED_ERROR_CODES:
+            by_error_code[error_code] += count
+
+    return {
+        "ingested": sum(counts.values()),
+        "by_status": [{"status": key, "count": count} for key, count in by_status.items()],
+        "top_types": [{"transactionType": key, "count": count} for key, count in _top(by_type)],
+        "top_error_codes": [{"errorCode": key, "count": count} for key, count in _top(by_error_code)],
+        "no_rules": by_error_code.get("NO_RULES", 0),
+        "blocked_customer_not_found": sum(by_error_code.get(code, 0) for code in _BLOCKED_CUSTOMER_ERROR_CODES),
+        "tier_upgraded": by_type.get("TIER_UPGRADED", 0),
+        "tier_downgraded": by_type.get("TIER_DOWNGRADED", 0),
+        "rolled_up_to": rolled_up_to,
+    }
+
+
+def customer_window_kpis(db: Session, *, brand: str, window_days: int, now: datetime) -> dict:
+    """Customer KPIs from the last snapshot; computed live until the job has run once."""
+    snapshot = db.get(BrandKpiSnapshot, brand)
+    if snapshot is None or snapshot.computed_at is None:
+        counters = _customer_counters(db, brand=brand, now=now)
+        return {
+            "total": counters["total"],
+            "new": counters["new"].get(window_days, 0),
+            "active": counters["active"].get(window_days, 0),
+            "configured": counters["configured"],
+            "by_loyalty_status": counters["by_loyalty_status"],
+            "as_of": now,
+        }
+    return {
+        "total": int(snapshot.customers_total or 0),
+        "new": int((snapshot.customers_new_7d if window_days == 7 else snapshot.customers_new_30d) or 0),
+        "active": int((snapshot.customers_active_7d if window_days == 7 else snapshot.customers_active_30d) or 0),
+        "configured": int(snapshot.customers_configured or 0),
+        "by_loyalty_status": list(snapshot.customers_by_loyalty_status or []),
+        "as_of": snapshot.computed_at,
+    }
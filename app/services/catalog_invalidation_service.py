@@ -17,6 +17,7 @@ from app.models.product import Product
 from app.models.reward import Reward
 from app.models.reward_product import RewardProduct
 from app.models.transaction import Transaction
+from app.services.jsonb_filters import product_snapshot_contains
 
 TERMINAL_COUPON_STATUSES = frozenset({"EXPIRED", "INVALIDATED"})
 ACTIVE_COUPON_STATUSES = frozenset({"ISSUED"})
@@ -278,14 +279,11 @@ def preview_product_delete(db: Session, *, product: Product) -> dict[str, Any]:
 
     affected_snapshots = 0
     if reward_links:
-        pid = str(product.id)
-        for cr in db.query(CustomerReward).filter(CustomerReward.payload.isnot(None)).all():
-            payload = _payload_dict(cr.payload)
-            snapshots = payload.get("productSnapshots")
-            if not isinstance(snapshots, list):
-                continue
-            if any(str(s.get("id") or "") == pid for s in snapshots if isinstance(s, dict)):
-                affected_snapshots += 1
+        affected_snapshots = (
+            db.query(CustomerReward.id)
+            .filter(product_snapshot_contains(CustomerReward.payload, product.id))
+            .count()
+        )
 
     message = (
         f"Le produit « {product.name} » sera retiré du catalogue. "
@@ -651,16 +649,13 @@ def apply_product_catalog_delete(db: Session, *, product: Product) -> dict[str,
         .delete(synchronize_session=False)
     )
 
-    rows = db.query(CustomerReward).filter(CustomerReward.payload.isnot(None)).all()
+    rows = (
+        db.query(CustomerReward)
+        .filter(product_snapshot_contains(CustomerReward.payload, entity_id))
+        .all()
+    )
     per_customer: dict[Any, int] = {}
     for cr in rows:
-        payload = _payload_dict(cr.payload)
-        snapshots = payload.get("productSnapshots")
-        if not isinstance(snapshots, list):
-            continue
-        found = any(str(s.get("id") or "") == entity_id for s in snapshots if isinstance(s, dict))
-        if not found:
-            continue
         cr.payload = invalidate_product_in_snapshot(
             cr.payload,
             product_id=entity_id,
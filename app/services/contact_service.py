@@ -269,13 +269,8 @@ def customer_transaction_filters(db: Session, *, brand: str, customer: Customer)
 
     email = (customer.email or "").strip().lower()
     if email:
-        scope_email = f"{brand}-{email}".lower()
-        clauses.extend(
-            [
-                func.lower(Transaction.payload["email"].as_string()) == email,
-                func.lower(Transaction.payload["scopeEmail"].as_string()) == scope_email,
-            ]
-        )
+        # ``customer_email`` is extracted at ingest (``transaction_identity_email``).
+        clauses.append(Transaction.customer_email == email)
     if not clauses:
         return Transaction.profile_id == customer.profile_id
     return or_(*clauses)
@@ -376,6 +371,11 @@ def _extract_trusted_identity_email_from_payload(payload: dict | None, *, brand:
     return None
 
 
+def transaction_identity_email(payload: dict | None, *, brand: str) -> str | None:
+    """Normalized identity email stored in ``transactions.customer_email`` at ingest."""
+    return _extract_trusted_identity_email_from_payload(payload, brand=brand)
+
+
 def _extract_email_from_payload(payload: dict | None, *, brand: str) -> str | None:
     """Broad email extraction (repair scripts / diagnostics). Includes billing fields."""
     if not isinstance(payload, dict):
@@ -9,7 +9,6 @@ from sqlalchemy.exc import IntegrityError
 
 from app.models.coupon_type import CouponType
 from app.models.customer_coupon import CustomerCoupon
-from app.models.customer_reward import CustomerReward
 from app.services.coupon_rewards_service import resolve_rewards_catalog, resolve_rewards_to_issue
 from app.services.reward_service import issue_reward
 
@@ -301,30 +300,8 @@ def use_coupon(
 
 
 
-def expire_coupons(db: Session, *, brand: str):
-    now = datetime.utcnow()
-
-    expiring = (
-        db.query(CustomerCoupon)
-        .join(CouponType, CouponType.id == CustomerCoupon.coupon_type_id)
-        .filter(CouponType.brand == brand)
-        .filter(CustomerCoupon.status.in_(("ISSUED",)))
-        .filter(CustomerCoupon.expires_at.isnot(None))
-        .filter(CustomerCoupon.expires_at < now)
-        .all()
-    )
-
-    for cc in expiring:
-        cc.status = "EXPIRED"
-
-        rewards = (
-            db.query(CustomerReward)
-            .filter(CustomerReward.customer_coupon_id == cc.id)
-            .filter(CustomerReward.status.in_(("ISSUED",)))
-            .all()
-        )
-        for cr in rewards:
-            cr.status = "EXPIRED"
+def expire_coupons(db: Session, *, brand: str, chunk_size: int | None = None, commit: bool = False) -> int:
+    """Expire ISSUED coupons past their date (and their ISSUED rewards); see ``expiry_engine``."""
+    from app.services.expiry_engine import expire_coupons_chunked
 
-    db.flush()
-    return len(expiring)
+    return expire_coupons_chunked(db, brand=brand, chunk_size=chunk_size, commit=commit).expired
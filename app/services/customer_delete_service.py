@@ -11,6 +11,8 @@ from app.models.customer import Customer
 from app.models.customer_coupon import CustomerCoupon
 from app.models.customer_metrics import CustomerMetrics
 from app.models.customer_reward import CustomerReward
+from app.models.point_balance import PointBalance
+from app.models.point_balance_bucket import PointBalanceBucket
 from app.models.point_movement import PointMovement
 from app.services.contact_service import get_customer
 from app.services.unomi_profile_service import delete_profile_from_unomi, set_profile_sync_source, reset_profile_sync_source
@@ -32,6 +34,8 @@ def delete_loyalty_customer(
 
     customer_id = customer.id
 
+    db.query(PointBalanceBucket).filter(PointBalanceBucket.customer_id == customer_id).delete(synchronize_session=False)
+    db.query(PointBalance).filter(PointBalance.customer_id == customer_id).delete(synchronize_session=False)
     db.query(PointMovement).filter(PointMovement.customer_id == customer_id).delete(synchronize_session=False)
     db.query(CustomerCoupon).filter(CustomerCoupon.customer_id == customer_id).delete(synchronize_session=False)
     db.query(CustomerReward).filter(CustomerReward.customer_id == customer_id).delete(synchronize_session=False)
@@ -0,0 +1,458 @@
+"""Streaming CSV customer import (``POST /imports/customers``).
+
+The upload is parsed row by row and validated in chunks of ``CUSTOMER_IMPORT_CHUNK_SIZE``
+rows; valid rows are ``COPY``-ed into a temporary staging table, so memory does not grow
+with the file. Staging and merge run in one transaction: any invalid row rejects the
+whole import and nothing is written (same contract as the previous in-memory import).
+
+The merge is set-based: staged rows are collapsed per ``profileId`` (later rows win, as
+with the row-by-row ``get_or_create_customer`` loop), matched to existing customers by
+master ``profile_id`` then Unomi alias, changed identity fields are UPDATEd and unknown
+profiles INSERTed in one statement each.
+
+Progress is committed to ``customer_import_jobs`` from a separate session after each chunk.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.customer_import_job import CustomerImportJob
+from app.services.birthdate_targeting import parse_customer_birthdate_storage
+from app.services.contact_service import _normalize_gender
+from app.services.loyalty_status_service import compute_loyalty_status_from_tiers
+
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID_MAX_LENGTH = 100
+
+_STAGE_COLUMNS = (
+    "line",
+    "profile_id",
+    "new_id",
+    "gender",
+    "has_birthdate",
+    "birthdate",
+    "birth_month",
+    "birth_day",
+    "birth_year",
+)
+
+
+def _utcnow() -> datetime:
+    # Keep naive UTC timestamps to match existing DB column types/semantics.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or str(default)))
+    except ValueError:
+        return default
+
+
+def import_chunk_size() -> int:
+    return _env_int("CUSTOMER_IMPORT_CHUNK_SIZE", 5000)
+
+
+def import_max_errors() -> int:
+    return _env_int("CUSTOMER_IMPORT_MAX_ERRORS", 1000)
+
+
+@dataclass(frozen=True)
+class StagedCustomer:
+    line: int
+    profile_id: str
+    gender: str | None
+    has_birthdate: bool
+    birthdate: date | None
+    birth_month: int | None
+    birth_day: int | None
+    birth_year: int | None
+
+
+def iter_csv_rows(stream) -> Iterator[tuple[int, dict]]:
+    """``(line, row)`` for each CSV record of a binary stream, without reading it all."""
+    wrapper = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        for idx, row in enumerate(csv.DictReader(wrapper), start=2):
+            yield idx, row
+    finally:
+        # Leave the underlying file open: the caller owns it.
+        wrapper.detach()
+
+
+def validate_import_row(line: int, row: dict, *, brand: str) -> StagedCustomer:
+    brand_in = (row.get("brand") or "").strip()
+    if not brand_in:
+        raise ValueError("brand is required")
+    if brand_in != brand:
+        raise ValueError(f"brand mismatch: expected '{brand}' got '{brand_in}'")
+
+    profile_id = (row.get("profileId") or row.get("profile_id") or "").strip()
+    if not profile_id:
+        raise ValueError("profileId is required")
+    if len(profile_id) > _PROFILE_ID_MAX_LENGTH:
+        raise ValueError(f"profileId is longer than {_PROFILE_ID_MAX_LENGTH} characters")
+
+    raw_gender = (row.get("gender") or "").strip()
+    raw_birthdate = (row.get("birthdate") or "").strip()
+    full, month, day, year = parse_customer_birthdate_storage(raw_birthdate or None)
+
+    return StagedCustomer(
+        line=line,
+        profile_id=profile_id,
+        gender=_normalize_gender(raw_gender) if raw_gender else None,
+        has_birthdate=bool(raw_birthdate),
+        birthdate=full,
+        birth_month=month,
+        birth_day=day,
+        birth_year=year,
+    )
+
+
+class ImportErrors:
+    """Invalid rows: total count, per-kind summary and the first ``limit`` entries."""
+
+    def __init__(self, *, limit: int):
+        self.limit = limit
+        self.count = 0
+        self.summary = {"brandMissing": 0, "brandMismatch": 0, "profileIdMissing": 0, "invalid": 0}
+        self.items: list[dict] = []
+
+    def add(self, line: int, row: dict, error: str) -> None:
+        self.count += 1
+        if error == "brand is required":
+            self.summary["brandMissing"] += 1
+        elif error.startswith("brand mismatch:"):
+            self.summary["brandMismatch"] += 1
+        elif error == "profileId is required":
+            self.summary["profileIdMissing"] += 1
+        else:
+            self.summary["invalid"] += 1
+        if len(self.items) < self.limit:
+            self.items.append({"line": line, "error": error, "row": row})
+
+
+def stage_chunk_csv(rows: list[StagedCustomer]) -> io.StringIO:
+    """CSV body for ``COPY customer_import_stage FROM STDIN`` (empty field = NULL)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow(
+            [
+                r.line,
+                r.profile_id,
+                uuid.uuid4(),
+                r.gender or "",
+                "t" if r.has_birthdate else "f",
+                r.birthdate.isoformat() if r.birthdate else "",
+                "" if r.birth_month is None else r.birth_month,
+                "" if r.birth_day is None else r.birth_day,
+                "" if r.birth_year is None else r.birth_year,
+            ]
+        )
+    buf.seek(0)
+    return buf
+
+
+def _create_stage_table(db: Session) -> None:
+    db.execute(
+        text(
+            """
+            CREATE TEMP TABLE customer_import_stage (
+                line integer NOT NULL,
+                profile_id varchar(100) NOT NULL,
+                new_id uuid NOT NULL,
+                gender varchar(10),
+                has_birthdate boolean NOT NULL,
+                birthdate date,
+                birth_month integer,
+                birth_day integer,
+                birth_year integer
+            ) ON COMMIT DROP
+            """
+        )
+    )
+
+
+def _copy_into_stage(db: Session, rows: list[StagedCustomer]) -> None:
+    if not rows:
+        return
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY customer_import_stage ({', '.join(_STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            stage_chunk_csv(rows),
+        )
+    finally:
+        cursor.close()
+
+
+def _merge_stage(db: Session, *, brand: str) -> tuple[int, int]:
+    """Set-based upsert of the staged rows into ``customers``. Returns ``(created, updated)``."""
+    params = {"brand": brand}
+
+    # Serialize imports of the same brand (no unique constraint on customers.profile_id).
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('customer_import:' || :brand))"), params)
+
+    db.execute(
+        text(
+            """
+            CREATE TEMP TABLE customer_import_merged ON COMMIT DROP AS
+            SELECT
+                p.profile_id,
+                p.new_id,
+                g.gender,
+                (b.profile_id IS NOT NULL) AS has_birthdate,
+                b.birthdate,
+                b.birth_month,
+                b.birth_day,
+                b.birth_year,
+                NULL::uuid AS customer_id
+            FROM (
+                SELECT DISTINCT ON (profile_id) profile_id, new_id
+                FROM customer_import_stage ORDER BY profile_id, line
+            ) p
+            LEFT JOIN (
+                SELECT DISTINCT ON (profile_id) profile_id, gender
+                FROM customer_import_stage WHERE gender IS NOT NULL ORDER BY profile_id, line DESC
+            ) g ON g.profile_id = p.profile_id
+            LEFT JOIN (
+                SELECT DISTINCT ON (profile_id) profile_id, birthdate, birth_month, birth_day, birth_year
+                FROM customer_import_stage WHERE has_birthdate ORDER BY profile_id, line DESC
+            ) b ON b.profile_id = p.profile_id
+            """
+        )
+    )
+    db.execute(text("ANALYZE customer_import_merged"))
+
+    db.execute(
+        text(
+            """
+            UPDATE customer_import_merged m SET customer_id = c.id
+            FROM customers c
+            WHERE c.brand = :brand AND c.profile_id = m.profile_id
+            """
+        ),
+        params,
+    )
+    db.execute(
+        text(
+            """
+            UPDATE customer_import_merged m SET customer_id = a.customer_id
+            FROM customer_unomi_profile_aliases a
+            WHERE m.customer_id IS NULL AND a.brand = :brand AND a.profile_id = m.profile_id
+            """
+        ),
+        params,
+    )
+
+    updated = db.execute(
+        text(
+            """
+            UPDATE customers c SET
+                gender = COALESCE(m.gender, c.gender),
+                birthdate = CASE WHEN m.has_birthdate THEN m.birthdate ELSE c.birthdate END,
+                birth_month = CASE WHEN m.has_birthdate THEN m.birth_month ELSE c.birth_month END,
+                birth_day = CASE WHEN m.has_birthdate THEN m.birth_day ELSE c.birth_day END,
+                birth_year = CASE WHEN m.has_birthdate THEN m.birth_year ELSE c.birth_year END,
+                updated_at = now()
+            FROM customer_import_merged m
+            WHERE c.id = m.customer_id
+              AND (
+                (m.gender IS NOT NULL AND m.gender IS DISTINCT FROM c.gender)
+                OR (
+                  m.has_birthdate
+                  AND (m.birthdate, m.birth_month, m.birth_day, m.birth_year)
+                      IS DISTINCT FROM (c.birthdate, c.birth_month, c.birth_day, c.birth_year)
+                )
+              )
+            """
+        )
+    ).rowcount
+
+    initial_status = compute_loyalty_status_from_tiers(db, brand, status_points=0)
+    created = db.execute(
+        text(
+            """
+            INSERT INTO customers (
+                id, brand, profile_id, status, loyalty_status, status_points,
+                gender, birthdate, birth_month, birth_day, birth_year
+            )
+            SELECT
+                m.new_id, :brand, m.profile_id, 'ACTIVE', :loyalty_status, 0,
+                m.gender, m.birthdate, m.birth_month, m.birth_day, m.birth_year
+            FROM customer_import_merged m
+            WHERE m.customer_id IS NULL
+            """
+        ),
+        {**params, "loyalty_status": initial_status or "UNCONFIGURED"},
+    ).rowcount
+
+    return int(created or 0), int(updated or 0)
+
+
+def import_customers_csv_stream(
+    db: Session,
+    *,
+    brand: str,
+    stream,
+    chunk_size: int | None = None,
+    max_errors: int | None = None,
+    on_progress: Callable[[str, dict], None] | None = None,
+) -> dict:
+    """Stage and merge one CSV upload in the current transaction (the caller commits).
+
+    Returns counters; ``rejected`` is True when some rows were invalid (nothing merged).
+    """
+    chunk_size = chunk_size or import_chunk_size()
+    errors = ImportErrors(limit=max_errors or import_max_errors())
+    stats = {"processed": 0, "staged": 0, "created": 0, "updated": 0}
+
+    def report(phase: str) -> None:
+        if on_progress is not None:
+            on_progress(phase, {**stats, "errorCount": errors.count})
+
+    _create_stage_table(db)
+    chunk: list[StagedCustomer] = []
+    for line, row in iter_csv_rows(stream):
+        stats["processed"] += 1
+        try:
+            chunk.append(validate_import_row(line, row, brand=brand))
+        except ValueError as e:
+            errors.add(line, row, str(e))
+        if len(chunk) >= chunk_size:
+            # Once a row is invalid the import is rejected; keep validating, stop staging.
+            if not errors.count:
+                _copy_into_stage(db, chunk)
+                stats["staged"] += len(chunk)
+            chunk = []
+            report("STAGING")
+    if chunk and not errors.count:
+        _copy_into_stage(db, chunk)
+        stats["staged"] += len(chunk)
+    report("STAGING")
+
+    rejected = errors.count > 0
+    if not rejected:
+        report("MERGING")
+        stats["created"], stats["updated"] = _merge_stage(db, brand=brand)
+
+    return {
+        **stats,
+        "rejected": rejected,
+        "errorCount": errors.count,
+        "summary": errors.summary,
+        "errors": errors.items,
+    }
+
+
+def create_customer_import_job(db: Session, *, brand: str, filename: str | None, bytes_total: int | None) -> CustomerImportJob:
+    job = CustomerImportJob(
+        brand=brand,
+        filename=(filename or "")[:255] or None,
+        status="QUEUED",
+        bytes_total=bytes_total,
+        bytes_read=0,
+        processed_rows=0,
+        staged_rows=0,
+        created_count=0,
+        updated_count=0,
+        error_count=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _update_job(job_id, **fields) -> None:
+    db = SessionLocal()
+    try:
+        db.query(CustomerImportJob).filter(CustomerImportJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_customer_import_job(job_id, path: str, *, remove_file: bool = True) -> None:
+    """Run a QUEUED import job from the uploaded file at ``path`` (API background task)."""
+    _update_job(job_id, status="STAGING", started_at=_utcnow())
+    db = SessionLocal()
+    try:
+        job = db.query(CustomerImportJob).filter(CustomerImportJob.id == job_id).one()
+        brand = job.brand
+        db.rollback()
+
+        with open(path, "rb") as f:
+
+            def on_progress(phase: str, stats: dict) -> None:
+                _update_job(
+                    job_id,
+                    status=phase,
+                    bytes_read=f.tell(),
+                    processed_rows=stats["processed"],
+                    staged_rows=stats["staged"],
+                    error_count=stats["errorCount"],
+                )
+
+            result = import_customers_csv_stream(db, brand=brand, stream=f, on_progress=on_progress)
+            bytes_read = f.tell()
+
+        if result["rejected"]:
+            db.rollback()
+            status = "REJECTED"
+            message = "Import rejected: CSV validation failed. No customers were imported."
+        else:
+            db.commit()
+            status = "SUCCEEDED"
+            message = None
+
+        _update_job(
+            job_id,
+            status=status,
+            message=message,
+            bytes_read=bytes_read,
+            processed_rows=result["processed"],
+            staged_rows=result["staged"],
+            created_count=result["created"],
+            updated_count=result["updated"],
+            error_count=result["errorCount"],
+            error_summary=result["summary"],
+            errors=result["errors"],
+            finished_at=_utcnow(),
+        )
+        logger.info(
+            "customer import job=%s brand=%s status=%s processed=%s created=%s updated=%s errors=%s",
+            job_id,
+            brand,
+            status,
+            result["processed"],
+            result["created"],
+            result["updated"],
+            result["errorCount"],
+        )
+    except Exception as e:
+        db.rollback()
+        logger.exception("customer import failed job=%s", job_id)
+        _update_job(job_id, status="FAILED", message=str(e)[:2000], finished_at=_utcnow())
+    finally:
+        db.close()
+        if remove_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
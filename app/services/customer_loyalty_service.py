@@ -8,11 +8,11 @@ from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
 from app.models.loyalty_tier import LoyaltyTier
-from app.models.point_movement import PointMovement
 from app.models.transaction import Transaction
+from app.services.brand_config_cache import get_brand_config
 from app.services.contact_service import get_customer
-from app.services.loyalty_settings_service import get_loyalty_settings
 from app.services.loyalty_status_service import update_customer_status
+from app.services.point_ledger_service import add_point_movement
 from app.services.wallet_service import get_status_points_balance
 
 
@@ -98,19 +98,17 @@ def set_customer_loyalty_tier(
         pm_type = "EARN" if delta > 0 else "DEDUCT"
         expires_at = None
         if delta > 0:
-            settings = get_loyalty_settings(db, brand=customer.brand)
-            points_days = getattr(settings, "points_validity_days", None) if settings else None
+            settings = get_brand_config(db, brand=customer.brand).settings
+            points_days = settings.points_validity_days if settings else None
             expires_at = (date.today() + timedelta(days=int(points_days))) if points_days is not None else None
-        db.add(
-            PointMovement(
-                customer_id=customer.id,
-                points=int(delta),
-                type=pm_type,
-                source_transaction_id=tx.id,
-                expires_at=expires_at,
-            )
+        add_point_movement(
+            db,
+            customer_id=customer.id,
+            points=int(delta),
+            type=pm_type,
+            source_transaction_id=tx.id,
+            expires_at=expires_at,
         )
-        db.flush()
 
     customer.status_points = int(get_status_points_balance(db, customer.id) or 0)
 
@@ -6,7 +6,7 @@ from app.models.customer import Customer
 from app.models.loyalty_tier import LoyaltyTier
 from app.schemas.customer import CustomerOut
 from app.services.birthdate_targeting import format_customer_birthdate_wire
-from app.services.wallet_service import get_status_points_balance
+from app.services.wallet_service import get_status_points_balance, get_status_points_balances
 
 
 def _format_birthdate(customer: Customer) -> str | None:
@@ -24,6 +24,18 @@ def _tier_name_for_customer(db: Session, *, brand: str, customer: Customer) -> s
     )
 
 
+def _tier_names_for_customers(db: Session, *, brand: str, customers: list[Customer]) -> dict[str, str | None]:
+    keys = {c.loyalty_status for c in customers if c.loyalty_status}
+    if not keys:
+        return {}
+    return dict(
+        db.query(LoyaltyTier.key, LoyaltyTier.name)
+        .filter(LoyaltyTier.brand == brand)
+        .filter(LoyaltyTier.key.in_(keys))
+        .all()
+    )
+
+
 def serialize_customer_out(
     db: Session,
     *,
@@ -44,3 +56,28 @@ def serialize_customer_out(
     if extra:
         data.update(extra)
     return data
+
+
+def serialize_customers_out(
+    db: Session,
+    *,
+    customers: list[Customer],
+    brand: str,
+    include_points_balance: bool = True,
+) -> list[dict]:
+    """``serialize_customer_out`` for a list page: tier names and balances are read for
+    the whole page at once, so the query count does not grow with the page size."""
+    if not customers:
+        return []
+    tier_names = _tier_names_for_customers(db, brand=brand, customers=customers)
+    balances = get_status_points_balances(db, [c.id for c in customers]) if include_points_balance else {}
+
+    out: list[dict] = []
+    for customer in customers:
+        data = CustomerOut.model_validate(customer).model_dump()
+        data["birthdate"] = _format_birthdate(customer)
+        data["loyalty_status_name"] = tier_names.get(customer.loyalty_status) if customer.loyalty_status else None
+        if include_points_balance:
+            data["points_balance"] = balances.get(customer.id, 0)
+        out.append(data)
+    return out
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 from typing import Any
 
+import sqlalchemy as sa
 from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
@@ -12,6 +13,7 @@ from app.models.customer_reward import CustomerReward
 from app.models.transaction import Transaction
 from app.services.catalog_invalidation_service import ENTITLEMENT_HISTORY_TX_TYPES
 from app.services.contact_service import customer_transaction_filters, get_customer
+from app.services.keyset_pagination import count_rows, decode_cursor, encode_cursor, normalize_total_mode
 
 
 def _coupon_label(coupon: CustomerCoupon) -> str:
@@ -104,6 +106,87 @@ def _reward_issue_event(*, customer: Customer, reward: CustomerReward) -> dict[s
     }
 
 
+def _customer_history_sources(db: Session, *, brand: str, customer: Customer) -> list[tuple]:
+    """``(query, occurred_at, id)`` per history source; each query selects
+    ``(kind, id, occurred_at)``, unordered and unpaged."""
+    tx_at = sa.func.coalesce(Transaction.processed_at, Transaction.created_at)
+    coupon_at = sa.func.coalesce(CustomerCoupon.issued_at, CustomerCoupon.created_at)
+    return [
+        (
+            db.query(
+                sa.literal("transaction", sa.String).label("kind"),
+                Transaction.id.label("id"),
+                tx_at.label("occurred_at"),
+            )
+            .filter(Transaction.brand == brand)
+            .filter(customer_transaction_filters(db, brand=brand, customer=customer))
+            .filter(Transaction.transaction_type.in_(sorted(ENTITLEMENT_HISTORY_TX_TYPES))),
+            tx_at,
+            Transaction.id,
+        ),
+        (
+            db.query(
+                sa.literal("coupon_issued", sa.String).label("kind"),
+                CustomerCoupon.id.label("id"),
+                coupon_at.label("occurred_at"),
+            )
+            .filter(CustomerCoupon.customer_id == customer.id),
+            coupon_at,
+            CustomerCoupon.id,
+        ),
+        (
+            db.query(
+                sa.literal("reward_issued", sa.String).label("kind"),
+                CustomerReward.id.label("id"),
+                CustomerReward.issued_at.label("occurred_at"),
+            )
+            .filter(CustomerReward.customer_id == customer.id),
+            CustomerReward.issued_at,
+            CustomerReward.id,
+        ),
+    ]
+
+
+def _history_page_statement(sources: list[tuple], *, cursor: str | None, limit: int, offset: int):
+    """``UNION ALL`` of the sources, each cut to the rows the page can use, newest first.
+
+    Every branch applies the ``(occurred_at, id)`` keyset and its own ``LIMIT`` before the
+    union, so a page reads at most ``limit`` (+ ``offset``) rows per source.
+    """
+    seek = decode_cursor(cursor) if cursor else None
+    per_source = limit + (0 if seek else offset)
+    branches = []
+    for query, occurred_at, row_id in sources:
+        if seek:
+            query = query.filter(sa.tuple_(occurred_at, row_id) < sa.tuple_(*seek))
+        branches.append(query.order_by(occurred_at.desc(), row_id.desc()).limit(per_source).statement)
+
+    history = sa.union_all(*branches).subquery("history")
+    stmt = sa.select(history).order_by(history.c.occurred_at.desc(), history.c.id.desc()).limit(limit)
+    if not seek and offset:
+        stmt = stmt.offset(offset)
+    return stmt
+
+
+def _load_history_events(db: Session, *, customer: Customer, rows: list) -> list[dict[str, Any]]:
+    """Page rows to events: one ``IN`` query per kind present on the page, page order kept."""
+    ids_by_kind: dict[str, list] = {}
+    for kind, row_id, _ in rows:
+        ids_by_kind.setdefault(kind, []).append(row_id)
+
+    events: dict[tuple[str, Any], dict[str, Any]] = {}
+    if ids_by_kind.get("transaction"):
+        for tx in db.query(Transaction).filter(Transaction.id.in_(ids_by_kind["transaction"])).all():
+            events[("transaction", tx.id)] = _tx_to_event(tx)
+    if ids_by_kind.get("coupon_issued"):
+        for c in db.query(CustomerCoupon).filter(CustomerCoupon.id.in_(ids_by_kind["coupon_issued"])).all():
+            events[("coupon_issued", c.id)] = _coupon_issue_event(customer=customer, coupon=c)
+    if ids_by_kind.get("reward_issued"):
+        for r in db.query(CustomerReward).filter(CustomerReward.id.in_(ids_by_kind["reward_issued"])).all():
+            events[("reward_issued", r.id)] = _reward_issue_event(customer=customer, reward=r)
+    return [events[(kind, row_id)] for kind, row_id, _ in rows if (kind, row_id) in events]
+
+
 def build_customer_entitlement_history(
     db: Session,
     *,
@@ -111,41 +194,37 @@ def build_customer_entitlement_history(
     customer: Customer,
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
+    total_mode: str | None = None,
 ) -> dict[str, Any]:
-    tx_rows = (
-        db.query(Transaction)
-        .filter(Transaction.brand == brand)
-        .filter(customer_transaction_filters(db, brand=brand, customer=customer))
-        .filter(Transaction.transaction_type.in_(sorted(ENTITLEMENT_HISTORY_TX_TYPES)))
-        .order_by(Transaction.created_at.desc())
-        .all()
-    )
-    coupons = (
-        db.query(CustomerCoupon)
-        .filter(CustomerCoupon.customer_id == customer.id)
-        .order_by(CustomerCoupon.issued_at.desc())
-        .all()
-    )
-    rewards = (
-        db.query(CustomerReward)
-        .filter(CustomerReward.customer_id == customer.id)
-        .order_by(CustomerReward.issued_at.desc())
-        .all()
-    )
+    """Transactions, coupon and reward issues of a customer, newest first.
+
+    Pass ``nextCursor`` back as ``cursor`` for the next page (keyset on
+    ``(occurred_at, id)``); ``offset`` is only applied without a cursor. Without an
+    explicit ``total_mode``, cursor pages skip the per-source counts.
+    """
+    total_mode = normalize_total_mode(total_mode, cursor=cursor)
+    sources = _customer_history_sources(db, brand=brand, customer=customer)
+    rows = db.execute(_history_page_statement(sources, cursor=cursor, limit=limit, offset=offset)).all()
+    page = _load_history_events(db, customer=customer, rows=rows)
 
-    events: list[dict[str, Any]] = [_tx_to_event(tx) for tx in tx_rows]
-    events.extend(_coupon_issue_event(customer=customer, coupon=c) for c in coupons)
-    events.extend(_reward_issue_event(customer=customer, reward=r) for r in rewards)
-    events.sort(key=lambda e: e.get("occurred_at") or "", reverse=True)
+    total = None
+    if total_mode != "none":
+        total = sum(count_rows(db, query, total_mode) for query, _, _ in sources)
 
-    total = len(events)
-    page = events[offset : offset + limit]
+    last = rows[-1] if rows else None
     return {
         "brand": brand,
         "profileId": customer.profile_id,
         "total": total,
+        "countMode": total_mode,
         "limit": limit,
         "offset": offset,
+        "nextCursor": (
+            encode_cursor(last.occurred_at, last.id)
+            if last is not None and len(rows) == limit and last.occurred_at is not None
+            else None
+        ),
         "items": page,
     }
 
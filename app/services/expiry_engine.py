@@ -0,0 +1,491 @@
+"""Set-based, chunked expiry of coupons, rewards, points and loyalty status.
+
+The ``MAINT_EXPIRE_*`` jobs used to load every expiring row as an ORM object, flip
+statuses in Python (one ``CustomerReward`` query per coupon), recompute each customer's
+point balance with its own SUM and hold every lock until the end of the run.
+
+Each expiry here walks the brand in keyset chunks ordered by id:
+  - coupons / rewards: one ``UPDATE ... WHERE id IN (SELECT ... ORDER BY id LIMIT n
+    FOR UPDATE SKIP LOCKED) RETURNING id`` per chunk; the rewards issued with the expired
+    coupons are expired by a single follow-up UPDATE;
+  - points: customers whose earliest bucket (``point_balances.next_expires_at``) is past;
+    their expired ``point_balance_buckets`` are deleted, one grouped aggregate over the
+    remaining buckets refreshes ``point_balances`` and ``customers.status_points``; only
+    customers whose tier would actually move are passed to ``update_customer_status``;
+  - loyalty status: customers with an expired window are loaded one chunk at a time.
+
+With ``commit=True`` every chunk is committed before the next one starts, so row locks
+last one chunk. Rows locked by a concurrent writer are skipped and picked up by the next
+run. ``on_chunk`` receives an ``ExpiryChunk`` after each chunk (the internal job runner
+uses it to report progress).
+
+``EXPIRY_CHUNK_SIZE`` (default 1000) sets the chunk size.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.models.coupon_type import CouponType
+from app.models.customer import Customer
+from app.models.customer_coupon import CustomerCoupon
+from app.models.customer_reward import CustomerReward
+from app.models.point_balance import PointBalance
+from app.models.point_balance_bucket import PointBalanceBucket
+from app.services.brand_config_cache import TierLadder, get_brand_config
+from app.services.loyalty_status_service import update_customer_status
+
+
+@dataclass
+class ExpiryChunk:
+    kind: str
+    index: int
+    selected: int
+    expired: int
+    # Dependent rows touched by the chunk: rewards of expired coupons, tier re-evaluations after point expiry.
+    cascaded: int = 0
+    # Points: customers whose stored status_points changed; loyalty status: customers whose tier changed.
+    updated: int = 0
+    last_id: UUID | None = None
+
+
+@dataclass
+class ExpiryRunResult:
+    kind: str
+    expired: int = 0
+    cascaded: int = 0
+    updated: int = 0
+    chunks: list[ExpiryChunk] = field(default_factory=list)
+
+    def add(self, chunk: ExpiryChunk) -> None:
+        self.expired += chunk.expired
+        self.cascaded += chunk.cascaded
+        self.updated += chunk.updated
+        self.chunks.append(chunk)
+
+
+OnChunk = Callable[[ExpiryChunk], None]
+
+
+def expiry_chunk_size() -> int:
+    raw = os.getenv("EXPIRY_CHUNK_SIZE")
+    try:
+        value = int(raw) if raw is not None and str(raw).strip() else 1000
+    except ValueError:
+        value = 1000
+    return max(1, min(value, 50_000))
+
+
+def _run_chunks(
+    db: Session,
+    *,
+    kind: str,
+    step: Callable[[UUID | None, int], tuple[int, int, int, int, UUID | None]],
+    chunk_size: int | None,
+    commit: bool,
+    on_chunk: OnChunk | None,
+) -> ExpiryRunResult:
+    """Drive ``step(after_id, limit)`` until a chunk comes back short."""
+    limit = int(chunk_size) if chunk_size else expiry_chunk_size()
+    limit = max(1, limit)
+
+    result = ExpiryRunResult(kind=kind)
+    after_id: UUID | None = None
+    while True:
+        selected, expired, cascaded, updated, last_id = step(after_id, limit)
+        if selected == 0:
+            break
+
+        chunk = ExpiryChunk(
+            kind=kind,
+            index=len(result.chunks),
+            selected=selected,
+            expired=expired,
+            cascaded=cascaded,
+            updated=updated,
+            last_id=last_id,
+        )
+        result.add(chunk)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        if on_chunk is not None:
+            on_chunk(chunk)
+
+        if selected < limit or last_id is None:
+            break
+        after_id = last_id
+    return result
+
+
+# ============================================================
+# COUPONS / REWARDS
+# ============================================================
+def _expire_coupons_chunk(db: Session, *, brand: str, now: datetime, after_id: UUID | None, limit: int):
+    batch = (
+        select(CustomerCoupon.id)
+        .join(CouponType, CouponType.id == CustomerCoupon.coupon_type_id)
+        .where(CouponType.brand == brand)
+        .where(CustomerCoupon.status == "ISSUED")
+        .where(CustomerCoupon.expires_at.isnot(None))
+        .where(CustomerCoupon.expires_at < now)
+        .order_by(CustomerCoupon.id.asc())
+        .limit(limit)
+        .with_for_update(of=CustomerCoupon, skip_locked=True)
+    )
+    if after_id is not None:
+        batch = batch.where(CustomerCoupon.id > after_id)
+
+    coupon_ids = (
+        db.execute(
+            update(CustomerCoupon)
+            .where(CustomerCoupon.id.in_(batch))
+            .values(status="EXPIRED")
+            .returning(CustomerCoupon.id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    if not coupon_ids:
+        return 0, 0, 0, 0, None
+
+    cascaded = db.execute(
+        update(CustomerReward)
+        .where(CustomerReward.customer_coupon_id.in_(coupon_ids))
+        .where(CustomerReward.status == "ISSUED")
+        .values(status="EXPIRED")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    return len(coupon_ids), len(coupon_ids), int(cascaded or 0), 0, max(coupon_ids)
+
+
+def expire_coupons_chunked(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime | None = None,
+    chunk_size: int | None = None,
+    commit: bool = False,
+    on_chunk: OnChunk | None = None,
+) -> ExpiryRunResult:
+    now = now or datetime.utcnow()
+    return _run_chunks(
+        db,
+        kind="coupons",
+        step=lambda after_id, limit: _expire_coupons_chunk(db, brand=brand, now=now, after_id=after_id, limit=limit),
+        chunk_size=chunk_size,
+        commit=commit,
+        on_chunk=on_chunk,
+    )
+
+
+def _expire_rewards_chunk(db: Session, *, brand: str, now: datetime, after_id: UUID | None, limit: int):
+    batch = (
+        select(CustomerReward.id)
+        .join(Customer, Customer.id == CustomerReward.customer_id)
+        .where(Customer.brand == brand)
+        .where(CustomerReward.status == "ISSUED")
+        .where(CustomerReward.expires_at.isnot(None))
+        .where(CustomerReward.expires_at < now)
+        .order_by(CustomerReward.id.asc())
+        .limit(limit)
+        .with_for_update(of=CustomerReward, skip_locked=True)
+    )
+    if after_id is not None:
+        batch = batch.where(CustomerReward.id > after_id)
+
+    reward_ids = (
+        db.execute(
+            update(CustomerReward)
+            .where(CustomerReward.id.in_(batch))
+            .values(status="EXPIRED")
+            .returning(CustomerReward.id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    if not reward_ids:
+        return 0, 0, 0, 0, None
+    return len(reward_ids), len(reward_ids), 0, 0, max(reward_ids)
+
+
+def expire_rewards_chunked(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime | None = None,
+    chunk_size: int | None = None,
+    commit: bool = False,
+    on_chunk: OnChunk | None = None,
+) -> ExpiryRunResult:
+    now = now or datetime.utcnow()
+    return _run_chunks(
+        db,
+        kind="rewards",
+        step=lambda after_id, limit: _expire_rewards_chunk(db, brand=brand, now=now, after_id=after_id, limit=limit),
+        chunk_size=chunk_size,
+        commit=commit,
+        on_chunk=on_chunk,
+    )
+
+
+# ============================================================
+# POINTS
+# ============================================================
+def status_refresh_needed(
+    tiers: TierLadder,
+    *,
+    status_points,
+    loyalty_status: str | None,
+    assigned_at: datetime | None,
+    expires_at: datetime | None,
+    now: datetime,
+) -> bool:
+    """Whether ``update_customer_status(refresh_window=False)`` would change anything."""
+    target = tiers.status_for_points(status_points)
+    if target is None:
+        return not loyalty_status
+
+    if loyalty_status == target:
+        # Base tier safety fix-up (never expires, always has an assigned_at).
+        return target == tiers.base_key and (expires_at is not None or assigned_at is None)
+
+    old_min = tiers.min_points(loyalty_status)
+    new_min = tiers.min_points(target)
+    blocked_downgrade = bool(
+        loyalty_status
+        and old_min is not None
+        and new_min is not None
+        and int(new_min) < int(old_min)
+        and expires_at is not None
+        and expires_at > now
+    )
+    return not blocked_downgrade
+
+
+def _expire_points_chunk(
+    db: Session,
+    *,
+    brand: str,
+    today: date,
+    now: datetime,
+    tiers: TierLadder,
+    after_id: UUID | None,
+    limit: int,
+):
+    ids_q = (
+        select(PointBalance.customer_id)
+        .join(Customer, Customer.id == PointBalance.customer_id)
+        .where(Customer.brand == brand)
+        .where(PointBalance.next_expires_at < today)
+        .order_by(PointBalance.customer_id.asc())
+        .limit(limit)
+        .with_for_update(of=Customer, skip_locked=True)
+    )
+    if after_id is not None:
+        ids_q = ids_q.where(PointBalance.customer_id > after_id)
+    customer_ids = db.execute(ids_q).scalars().all()
+    if not customer_ids:
+        return 0, 0, 0, 0, None
+
+    db.execute(
+        delete(PointBalanceBucket)
+        .where(PointBalanceBucket.customer_id.in_(customer_ids))
+        .where(PointBalanceBucket.expires_at < today)
+        .execution_options(synchronize_session=False)
+    )
+
+    # One grouped aggregate over the remaining buckets of the chunk (outer join: emptied balances go to 0).
+    balance = aliased(PointBalance)
+    remaining = (
+        select(
+            balance.customer_id.label("customer_id"),
+            func.coalesce(func.sum(PointBalanceBucket.remaining), 0).label("total"),
+            func.min(PointBalanceBucket.expires_at).label("next_expires_at"),
+        )
+        .select_from(balance)
+        .outerjoin(PointBalanceBucket, PointBalanceBucket.customer_id == balance.customer_id)
+        .where(balance.customer_id.in_(customer_ids))
+        .group_by(balance.customer_id)
+        .subquery("remaining")
+    )
+    db.execute(
+        update(PointBalance)
+        .where(PointBalance.customer_id == remaining.c.customer_id)
+        .values(total=remaining.c.total, next_expires_at=remaining.c.next_expires_at)
+        .execution_options(synchronize_session=False)
+    )
+
+    changed = db.execute(
+        update(Customer)
+        .where(Customer.id == PointBalance.customer_id)
+        .where(Customer.id.in_(customer_ids))
+        .where(Customer.status_points.is_distinct_from(PointBalance.total))
+        .values(status_points=PointBalance.total, status_points_reset_at=now)
+        .returning(Customer.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    rows = db.execute(
+        select(
+            Customer.id,
+            Customer.status_points,
+            Customer.loyalty_status,
+            Customer.loyalty_status_assigned_at,
+            Customer.loyalty_status_expires_at,
+        ).where(Customer.id.in_(customer_ids))
+    ).all()
+    refresh_ids = [
+        row[0]
+        for row in rows
+        if status_refresh_needed(
+            tiers,
+            status_points=row[1],
+            loyalty_status=row[2],
+            assigned_at=row[3],
+            expires_at=row[4],
+            now=now,
+        )
+    ]
+
+    if refresh_ids:
+        customers = (
+            db.query(Customer)
+            .filter(Customer.id.in_(refresh_ids))
+            .order_by(Customer.id.asc())
+            .populate_existing()
+            .with_for_update()
+            .all()
+        )
+        for c in customers:
+            update_customer_status(
+                db,
+                c,
+                reason="POINTS_EXPIRED",
+                source_transaction_id=None,
+                depth=0,
+                refresh_window=False,
+                emit_events=True,
+            )
+
+    return len(customer_ids), len(customer_ids), len(refresh_ids), len(changed), max(customer_ids)
+
+
+def expire_points_chunked(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime | None = None,
+    chunk_size: int | None = None,
+    commit: bool = False,
+    on_chunk: OnChunk | None = None,
+) -> ExpiryRunResult:
+    """Drop expired point buckets and refresh the balance of the customers holding them.
+
+    Customers without a ``point_balances`` row yet are not seen here: materialize them with
+    ``scripts/rebuild_point_balances.py`` (or their next point movement).
+    ``expired`` counts the customers re-evaluated (the former ``expire_points`` result),
+    ``updated`` those whose ``status_points`` changed and ``cascaded`` the tier refreshes.
+    """
+    now = now or datetime.utcnow()
+    config = get_brand_config(db, brand=brand)
+    if config.settings is None or config.settings.points_validity_days is None:
+        return ExpiryRunResult(kind="points")
+
+    today = date.today()
+    return _run_chunks(
+        db,
+        kind="points",
+        step=lambda after_id, limit: _expire_points_chunk(
+            db, brand=brand, today=today, now=now, tiers=config.tiers, after_id=after_id, limit=limit
+        ),
+        chunk_size=chunk_size,
+        commit=commit,
+        on_chunk=on_chunk,
+    )
+
+
+# ============================================================
+# LOYALTY STATUS
+# ============================================================
+def _expire_loyalty_status_chunk(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime,
+    base_key: str | None,
+    after_id: UUID | None,
+    limit: int,
+):
+    q = (
+        db.query(Customer)
+        .filter(Customer.brand == brand)
+        .filter(Customer.loyalty_status_expires_at.isnot(None))
+        .filter(Customer.loyalty_status_expires_at < now)
+        .order_by(Customer.id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if base_key:
+        q = q.filter(Customer.loyalty_status != base_key)
+    if after_id is not None:
+        q = q.filter(Customer.id > after_id)
+
+    customers = q.all()
+    if not customers:
+        return 0, 0, 0, 0, None
+
+    changed = 0
+    for c in customers:
+        before = c.loyalty_status
+        update_customer_status(
+            db,
+            c,
+            reason="LOYALTY_STATUS_EXPIRED",
+            source_transaction_id=None,
+            depth=0,
+            refresh_window=True,
+            emit_events=True,
+        )
+        if c.loyalty_status != before:
+            changed += 1
+
+    return len(customers), len(customers), 0, changed, customers[-1].id
+
+
+def expire_loyalty_status_chunked(
+    db: Session,
+    *,
+    brand: str,
+    now: datetime | None = None,
+    chunk_size: int | None = None,
+    commit: bool = False,
+    on_chunk: OnChunk | None = None,
+) -> ExpiryRunResult:
+    now = now or datetime.utcnow()
+    config = get_brand_config(db, brand=brand)
+    if config.settings is None or config.settings.loyalty_status_validity_days is None:
+        return ExpiryRunResult(kind="loyalty_status")
+
+    base_key = config.tiers.base_key
+    return _run_chunks(
+        db,
+        kind="loyalty_status",
+        step=lambda after_id, limit: _expire_loyalty_status_chunk(
+            db, brand=brand, now=now, base_key=base_key, after_id=after_id, limit=limit
+        ),
+        chunk_size=chunk_size,
+        commit=commit,
+        on_chunk=on_chunk,
+    )
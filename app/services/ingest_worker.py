@@ -0,0 +1,280 @@
+"""Async ingest worker: runs rules for transactions accepted with ``mode=async``.
+
+Run next to the API and the internal job scheduler:
+
+    python -m app.services.ingest_worker
+
+Each loop claims queued PENDING transactions (``queued_at IS NOT NULL``) with
+``FOR UPDATE SKIP LOCKED``, dequeues them (``queued_at = NULL``), stamps a lease
+(``claimed_at`` / ``claimed_by``, ``ingest_attempts + 1``) and commits the claim. A lane
+re-reads each row ``FOR UPDATE`` and processes it only if it is still PENDING and still
+leased to this worker.
+Claimed events are grouped into lanes by ``(brand, profile_id)``; lanes run in a thread
+pool and each lane processes its events in ``queued_at`` order. The next claim waits for
+the whole batch, so a customer's later events never overtake earlier ones.
+
+Several worker processes can share the queue: ``INGEST_WORKER_SHARD=i/N`` makes a
+process claim only the profiles hashed to shard ``i`` (ordering stays per process).
+Rows whose lease is older than ``INGEST_WORKER_STALE_SECONDS`` (worker crashed or failed
+after the claim) are put back in the queue; after ``INGEST_WORKER_MAX_ATTEMPTS`` claims
+they are marked FAILED instead. Only rows the queue claimed are swept: PENDING rows of
+the sync path never carry a lease.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.transaction import Transaction
+from app.services.metrics import maybe_start_metrics_server
+from app.services.transaction_service import process_ingested_transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    # Keep naive UTC timestamps to match existing DB column types/semantics.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def parse_shard(raw: str | None) -> tuple[int, int]:
+    """``"i/N"`` -> ``(i, N)``; empty means a single shard ``(0, 1)``."""
+    if not raw or not raw.strip():
+        return 0, 1
+    try:
+        index_s, count_s = raw.strip().split("/", 1)
+        index, count = int(index_s), int(count_s)
+    except ValueError as e:
+        raise ValueError(f"Invalid INGEST_WORKER_SHARD {raw!r}: expected 'i/N'") from e
+    if count < 1 or not (0 <= index < count):
+        raise ValueError(f"Invalid INGEST_WORKER_SHARD {raw!r}: expected 0 <= i < N")
+    return index, count
+
+
+def _shard_filter(q, *, shard: tuple[int, int]):
+    index, count = shard
+    if count <= 1:
+        return q
+    key = func.hashtext(Transaction.brand + ":" + Transaction.profile_id)
+    return q.filter(func.abs(key % count) == index)
+
+
+def default_worker_id() -> str:
+    return os.getenv("INGEST_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim_queued_transactions(
+    db: Session,
+    *,
+    batch_size: int,
+    shard: tuple[int, int],
+    worker_id: str,
+    now: datetime,
+) -> list[tuple]:
+    q = (
+        db.query(Transaction)
+        .filter(Transaction.status == "PENDING")
+        .filter(Transaction.queued_at.isnot(None))
+    )
+    q = _shard_filter(q, shard=shard)
+    rows = (
+        q.order_by(Transaction.queued_at.asc(), Transaction.created_at.asc())
+        .with_for_update(skip_locked=True)
+        .limit(batch_size)
+        .all()
+    )
+
+    claimed = []
+    for tx in rows:
+        claimed.append((tx.id, tx.brand, tx.profile_id))
+        tx.queued_at = None
+        tx.claimed_at = now
+        tx.claimed_by = worker_id
+        tx.ingest_attempts = int(tx.ingest_attempts or 0) + 1
+    return claimed
+
+
+def _requeue_stale_transactions(
+    db: Session,
+    *,
+    now: datetime,
+    stale_seconds: int,
+    shard: tuple[int, int],
+    max_attempts: int = 5,
+) -> tuple[int, int]:
+    """Requeue PENDING rows whose lease expired; FAIL those already claimed ``max_attempts`` times.
+
+    Returns ``(requeued, failed)``. Rows being processed are locked by their lane and
+    skipped here, so a slow lane never has its rows handed to another worker.
+    """
+    stale_before = now - timedelta(seconds=int(stale_seconds))
+    q = (
+        db.query(Transaction)
+        .filter(Transaction.status == "PENDING")
+        .filter(Transaction.queued_at.is_(None))
+        .filter(Transaction.claimed_at.isnot(None))
+        .filter(Transaction.claimed_at < stale_before)
+    )
+    q = _shard_filter(q, shard=shard)
+    rows = q.with_for_update(skip_locked=True).limit(1000).all()
+    requeued = 0
+    failed = 0
+    for tx in rows:
+        tx.claimed_at = None
+        tx.claimed_by = None
+        if int(tx.ingest_attempts or 0) >= max_attempts:
+            tx.status = "FAILED"
+            tx.error_code = "INGEST_MAX_ATTEMPTS"
+            tx.error_message = f"Async ingest gave up after {tx.ingest_attempts} attempts"
+            tx.processed_at = now
+            failed += 1
+            continue
+        # Requeue at the original position so the customer's order is kept as far as possible.
+        tx.queued_at = tx.created_at or now
+        requeued += 1
+    return requeued, failed
+
+
+def group_into_lanes(claimed: list[tuple]) -> list[list[UUID]]:
+    """Group claimed ``(id, brand, profile_id)`` rows per customer, keeping claim order."""
+    lanes: dict[tuple[str, str], list[UUID]] = {}
+    for tx_id, brand, profile_id in claimed:
+        lanes.setdefault((brand, profile_id), []).append(tx_id)
+    return list(lanes.values())
+
+
+def _process_lane(transaction_ids: list[UUID], *, worker_id: str) -> tuple[int, int]:
+    processed = 0
+    failed = 0
+    db = SessionLocal()
+    try:
+        for tx_id in transaction_ids:
+            try:
+                # The row lock is held until process_ingested_transaction commits, so the
+                # stale sweep (SKIP LOCKED) cannot requeue it mid-processing.
+                tx = db.query(Transaction).filter(Transaction.id == tx_id).with_for_update().first()
+                if not tx or tx.status != "PENDING" or tx.claimed_by != worker_id:
+                    db.rollback()
+                    continue
+                process_ingested_transaction(db, tx)
+                processed += 1
+            except Exception:
+                db.rollback()
+                failed += 1
+                logger.exception("async ingest failed tx=%s", tx_id)
+    finally:
+        db.close()
+    return processed, failed
+
+
+def run_ingest_worker_loop(
+    *,
+    threads: int = 4,
+    batch_size: int = 100,
+    idle_sleep_seconds: float = 1.0,
+    stale_seconds: int = 600,
+    max_attempts: int = 5,
+    shard: tuple[int, int] = (0, 1),
+    worker_id: str | None = None,
+):
+    worker_id = worker_id or default_worker_id()
+    logger.info(
+        "ingest worker started",
+        extra={
+            "threads": threads,
+            "batch_size": batch_size,
+            "idle_sleep_seconds": idle_sleep_seconds,
+            "stale_seconds": stale_seconds,
+            "max_attempts": max_attempts,
+            "shard": f"{shard[0]}/{shard[1]}",
+            "worker_id": worker_id,
+        },
+    )
+
+    last_stale_check = 0.0
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="ingest") as pool:
+        while True:
+            db = SessionLocal()
+            try:
+                if time.monotonic() - last_stale_check >= 60:
+                    requeued, gave_up = _requeue_stale_transactions(
+                        db,
+                        now=_utcnow(),
+                        stale_seconds=stale_seconds,
+                        shard=shard,
+                        max_attempts=max_attempts,
+                    )
+                    db.commit()
+                    last_stale_check = time.monotonic()
+                    if requeued or gave_up:
+                        logger.warning(
+                            "stale ingest leases requeued=%s failed_max_attempts=%s", requeued, gave_up
+                        )
+
+                claimed = _claim_queued_transactions(
+                    db, batch_size=batch_size, shard=shard, worker_id=worker_id, now=_utcnow()
+                )
+                db.commit()
+            finally:
+                db.close()
+
+            if not claimed:
+                time.sleep(idle_sleep_seconds)
+                continue
+
+            started_at = time.perf_counter()
+            lanes = group_into_lanes(claimed)
+            results = list(pool.map(partial(_process_lane, worker_id=worker_id), lanes))
+            duration_ms = int((time.perf_counter() - started_at) * 1000)
+            logger.info(
+                "async ingest batch claimed=%s lanes=%s processed=%s failed=%s duration_ms=%s",
+                len(claimed),
+                len(lanes),
+                sum(p for p, _ in results),
+                sum(f for _, f in results),
+                duration_ms,
+            )
+
+
+def main():
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        )
+
+    threads = int(os.getenv("INGEST_WORKER_THREADS") or "4")
+    batch_size = int(os.getenv("INGEST_WORKER_BATCH_SIZE") or "100")
+    idle_sleep_seconds = float(os.getenv("INGEST_WORKER_IDLE_SLEEP_SECONDS") or "1")
+    stale_seconds = int(os.getenv("INGEST_WORKER_STALE_SECONDS") or "600")
+    max_attempts = int(os.getenv("INGEST_WORKER_MAX_ATTEMPTS") or "5")
+    shard = parse_shard(os.getenv("INGEST_WORKER_SHARD"))
+
+    logger.info("starting ingest worker")
+    maybe_start_metrics_server()
+    run_ingest_worker_loop(
+        threads=threads,
+        batch_size=batch_size,
+        idle_sleep_seconds=idle_sleep_seconds,
+        stale_seconds=stale_seconds,
+        max_attempts=max_attempts,
+        shard=shard,
+        worker_id=default_worker_id(),
+    )
+
+
+if __name__ == "__main__":
+    main()
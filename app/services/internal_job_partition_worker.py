@@ -0,0 +1,394 @@
+"""Partitioned, multi-process execution of generic internal jobs.
+
+Generic (selector-based) jobs used to run inside the scheduler loop: one thread, one
+session, every selected customer loaded with ``q.all()``. With ``INTERNAL_JOB_PARTITIONS``
+above 1 the scheduler instead splits each run into that many ``internal_job_partitions``
+rows, equal slices of the customer UUID keyspace, and moves on (``plan_job_partitions``).
+
+This worker executes them:
+
+    python -m app.services.internal_job_partition_worker
+
+It starts ``INTERNAL_JOB_PARTITION_PROCESSES`` processes (default: CPU count). Each one
+claims a unit with ``FOR UPDATE SKIP LOCKED`` and walks its id range in keyset chunks of
+``INTERNAL_JOB_PARTITION_CHUNK_SIZE`` customers, committing ``cursor`` and the counters
+after every chunk. ``locked_at`` doubles as a heartbeat: a RUNNING unit whose lock is older
+than ``INTERNAL_JOB_PARTITION_STALE_SECONDS`` (crashed process) is claimed again and resumes
+after its cursor. Any number of workers, on one host or several, can share the queue. Event
+ids stay ``job_{id}_{bucket}_{brand}_{profile}``, so a replayed chunk never emits twice.
+
+When the last unit of a run completes, the job's ``last_status`` goes from RUNNING to
+SUCCESS, or FAILED if a unit exhausted ``INTERNAL_JOB_PARTITION_MAX_ATTEMPTS``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal, engine
+from app.models.internal_job import InternalJob
+from app.models.internal_job_partition import InternalJobPartition
+from app.services.internal_job_runner import (
+    compute_run_bucket_key_from_schedule,
+    emit_job_transactions,
+    fetch_job_customer_chunk,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_KEYSPACE = 1 << 128
+
+
+def _utcnow() -> datetime:
+    # Keep naive UTC timestamps to match existing DB column types/semantics.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def partition_count_setting() -> int:
+    """``INTERNAL_JOB_PARTITIONS`` (default 1: generic jobs run inline in the scheduler)."""
+    raw = os.getenv("INTERNAL_JOB_PARTITIONS")
+    try:
+        value = int(raw) if raw is not None and str(raw).strip() else 1
+    except ValueError:
+        value = 1
+    return max(1, min(value, 1024))
+
+
+def partition_bounds(count: int) -> list[tuple[UUID | None, UUID | None]]:
+    """``count`` contiguous ``[start, end)`` slices of the UUID keyspace (None: open bound)."""
+    count = max(1, int(count))
+    edges = [UUID(int=(i * _KEYSPACE) // count) for i in range(1, count)]
+    return list(zip([None, *edges], [*edges, None]))
+
+
+@dataclass
+class PartitionPlanStats:
+    partitions: int
+    planned: int
+    # The scheduler stores this as job.last_status until the last unit completes.
+    job_status: str = "RUNNING"
+
+
+@dataclass
+class PartitionRunStats:
+    status: str
+    chunks: int = 0
+    processed: int = 0
+    created: int = 0
+    idempotent_existing: int = 0
+    failed: int = 0
+
+
+def plan_job_partitions(db: Session, *, job: InternalJob, now: datetime, count: int) -> PartitionPlanStats:
+    """Create the work units of this run (idempotent per schedule bucket); no commit."""
+    run_key = compute_run_bucket_key_from_schedule(now_utc=now, schedule=job.schedule)
+    rows = [
+        {
+            "id": uuid4(),
+            "job_id": job.id,
+            "run_key": run_key,
+            "partition_index": index,
+            "partition_count": count,
+            "range_start": start,
+            "range_end": end,
+            "status": "PENDING",
+        }
+        for index, (start, end) in enumerate(partition_bounds(count))
+    ]
+    stmt = (
+        pg_insert(InternalJobPartition)
+        .values(rows)
+        .on_conflict_do_nothing(constraint="uq_internal_job_partitions_job_run_index")
+        .returning(InternalJobPartition.id)
+    )
+    planned = len(db.execute(stmt).scalars().all())
+    return PartitionPlanStats(partitions=len(rows), planned=planned)
+
+
+def claim_partition(db: Session, *, worker_id: str, now: datetime, stale_seconds: int) -> InternalJobPartition | None:
+    """Lock the oldest runnable unit: PENDING, or RUNNING with a stale lock. Caller commits."""
+    stale_before = now - timedelta(seconds=int(stale_seconds))
+    unit = (
+        db.query(InternalJobPartition)
+        .filter(
+            or_(
+                InternalJobPartition.status == "PENDING",
+                and_(
+                    InternalJobPartition.status == "RUNNING",
+                    or_(InternalJobPartition.locked_at.is_(None), InternalJobPartition.locked_at < stale_before),
+                ),
+            )
+        )
+        .order_by(InternalJobPartition.created_at.asc(), InternalJobPartition.partition_index.asc())
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if unit is None:
+        return None
+
+    unit.status = "RUNNING"
+    unit.locked_by = worker_id
+    unit.locked_at = now
+    unit.attempts = int(unit.attempts or 0) + 1
+    if unit.started_at is None:
+        unit.started_at = now
+    return unit
+
+
+def _run_date(run_key: str, fallback: date) -> date:
+    try:
+        return datetime.fromisoformat(run_key).date()
+    except (TypeError, ValueError):
+        return fallback
+
+
+def _fetch_chunk(db: Session, *, job: InternalJob, unit: InternalJobPartition, run_date: date, limit: int) -> list:
+    return fetch_job_customer_chunk(
+        db,
+        job=job,
+        today=run_date,
+        after_id=unit.cursor,
+        limit=limit,
+        range_start=unit.range_start,
+        range_end=unit.range_end,
+    )
+
+
+def finalize_partitioned_run(db: Session, *, job_id, run_key: str) -> bool:
+    """Close the job's run once no unit is PENDING/RUNNING. Returns whether it was closed."""
+    rows = (
+        db.query(
+            InternalJobPartition.status,
+            func.count(InternalJobPartition.id),
+            func.coalesce(func.sum(InternalJobPartition.processed), 0),
+            func.coalesce(func.sum(InternalJobPartition.created), 0),
+            func.coalesce(func.sum(InternalJobPartition.idempotent_existing), 0),
+            func.coalesce(func.sum(InternalJobPartition.failed), 0),
+        )
+        .filter(InternalJobPartition.job_id == job_id)
+        .filter(InternalJobPartition.run_key == run_key)
+        .group_by(InternalJobPartition.status)
+        .all()
+    )
+    by_status = {r[0]: r for r in rows}
+    if not rows or "PENDING" in by_status or "RUNNING" in by_status:
+        return False
+
+    failed_units = int(by_status["FAILED"][1]) if "FAILED" in by_status else 0
+    totals = [sum(int(r[i]) for r in rows) for i in range(2, 6)]
+
+    job = db.query(InternalJob).filter(InternalJob.id == job_id).with_for_update().first()
+    if job is None:
+        return False
+    job.last_status = "FAILED" if failed_units else "SUCCESS"
+    job.last_error = f"{failed_units} partition(s) failed for run {run_key}" if failed_units else None
+    db.commit()
+
+    logger.info(
+        "partitioned internal job run finished job_id=%s run_key=%s status=%s processed=%s created=%s idempotent_existing=%s failed=%s failed_partitions=%s",
+        str(job_id),
+        run_key,
+        "FAILED" if failed_units else "SUCCESS",
+        *totals,
+        failed_units,
+    )
+    return True
+
+
+def run_partition(
+    db: Session,
+    *,
+    unit_id: UUID,
+    worker_id: str,
+    chunk_size: int = 500,
+    max_attempts: int = 5,
+) -> PartitionRunStats:
+    """Process a claimed unit from its cursor to the end of its range, one commit per chunk."""
+    unit = db.get(InternalJobPartition, unit_id)
+    job = db.get(InternalJob, unit.job_id)
+    job_id, run_key = unit.job_id, unit.run_key
+    stats = PartitionRunStats(status="RUNNING")
+
+    if job is None or int(unit.attempts or 0) > max_attempts:
+        unit.status = "FAILED"
+        unit.last_error = "job deleted" if job is None else f"gave up after {max_attempts} attempts"
+        unit.locked_at = None
+        unit.locked_by = None
+        unit.finished_at = _utcnow()
+        db.commit()
+        finalize_partitioned_run(db, job_id=job_id, run_key=run_key)
+        stats.status = "FAILED"
+        return stats
+
+    run_date = _run_date(run_key, _utcnow().date())
+    limit = max(1, int(chunk_size))
+    try:
+        while True:
+            rows = _fetch_chunk(db, job=job, unit=unit, run_date=run_date, limit=limit)
+            if rows:
+                chunk = emit_job_transactions(db, job=job, customers=rows, bucket_key=run_key)
+                stats.chunks += 1
+                stats.processed += chunk.processed
+                stats.created += chunk.created
+                stats.idempotent_existing += chunk.idempotent_existing
+                stats.failed += chunk.failed
+
+            # create_transaction commits per event: re-read the unit before checkpointing.
+            db.refresh(unit)
+            if unit.locked_by != worker_id:
+                # Lock went stale and another worker took over: stop without checkpointing.
+                stats.status = "LOST"
+                logger.warning("partition lease lost unit_id=%s worker_id=%s", str(unit_id), worker_id)
+                return stats
+
+            if rows:
+                unit.cursor = rows[-1][0]
+                unit.processed = int(unit.processed or 0) + chunk.processed
+                unit.created = int(unit.created or 0) + chunk.created
+                unit.idempotent_existing = int(unit.idempotent_existing or 0) + chunk.idempotent_existing
+                unit.failed = int(unit.failed or 0) + chunk.failed
+            unit.locked_at = _utcnow()
+
+            if len(rows) < limit:
+                unit.status = "DONE"
+                unit.locked_at = None
+                unit.locked_by = None
+                unit.last_error = None
+                unit.finished_at = _utcnow()
+                db.commit()
+                break
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        unit = db.get(InternalJobPartition, unit_id)
+        give_up = int(unit.attempts or 0) >= max_attempts
+        unit.status = "FAILED" if give_up else "PENDING"
+        unit.last_error = str(e)[:2000]
+        unit.locked_at = None
+        unit.locked_by = None
+        if give_up:
+            unit.finished_at = _utcnow()
+        db.commit()
+        logger.exception("partition failed unit_id=%s job_id=%s run_key=%s", str(unit_id), str(job_id), run_key)
+        stats.status = unit.status
+        if not give_up:
+            return stats
+    else:
+        stats.status = "DONE"
+
+    finalize_partitioned_run(db, job_id=job_id, run_key=run_key)
+    return stats
+
+
+def run_partition_worker_loop(
+    *,
+    worker_id: str,
+    chunk_size: int = 500,
+    max_attempts: int = 5,
+    stale_seconds: int = 600,
+    idle_sleep_seconds: float = 5.0,
+):
+    logger.info(
+        "internal job partition worker started",
+        extra={
+            "worker_id": worker_id,
+            "chunk_size": chunk_size,
+            "max_attempts": max_attempts,
+            "stale_seconds": stale_seconds,
+        },
+    )
+
+    while True:
+        db = SessionLocal()
+        try:
+            unit = claim_partition(db, worker_id=worker_id, now=_utcnow(), stale_seconds=stale_seconds)
+            claimed = (unit.id, unit.job_id, unit.partition_index, unit.partition_count) if unit else None
+            db.commit()
+
+            if claimed is None:
+                time.sleep(idle_sleep_seconds)
+                continue
+
+            started_at = time.perf_counter()
+            stats = run_partition(
+                db,
+                unit_id=claimed[0],
+                worker_id=worker_id,
+                chunk_size=chunk_size,
+                max_attempts=max_attempts,
+            )
+            logger.info(
+                "partition %s job_id=%s partition=%s/%s chunks=%s processed=%s created=%s idempotent_existing=%s failed=%s duration_ms=%s",
+                stats.status,
+                str(claimed[1]),
+                claimed[2] + 1,
+                claimed[3],
+                stats.chunks,
+                stats.processed,
+                stats.created,
+                stats.idempotent_existing,
+                stats.failed,
+                int((time.perf_counter() - started_at) * 1000),
+            )
+        except Exception:
+            db.rollback()
+            logger.exception("partition worker iteration failed worker_id=%s", worker_id)
+            time.sleep(idle_sleep_seconds)
+        finally:
+            db.close()
+
+
+def _init_worker_process():
+    # Forked children must not share the parent's pooled connections.
+    engine.dispose(close=False)
+
+
+def main():
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        )
+
+    processes = int(os.getenv("INTERNAL_JOB_PARTITION_PROCESSES") or str(os.cpu_count() or 1))
+    chunk_size = int(os.getenv("INTERNAL_JOB_PARTITION_CHUNK_SIZE") or "500")
+    max_attempts = int(os.getenv("INTERNAL_JOB_PARTITION_MAX_ATTEMPTS") or "5")
+    stale_seconds = int(os.getenv("INTERNAL_JOB_PARTITION_STALE_SECONDS") or "600")
+    idle_sleep_seconds = float(os.getenv("INTERNAL_JOB_PARTITION_IDLE_SLEEP_SECONDS") or "5")
+    base_id = os.getenv("INTERNAL_JOB_WORKER_ID") or os.getenv("HOSTNAME") or "partition-worker"
+
+    kwargs = {
+        "chunk_size": chunk_size,
+        "max_attempts": max_attempts,
+        "stale_seconds": stale_seconds,
+        "idle_sleep_seconds": idle_sleep_seconds,
+    }
+
+    logger.info("starting internal job partition worker processes=%s", processes)
+    if processes <= 1:
+        run_partition_worker_loop(worker_id=f"{base_id}:0", **kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker_process) as pool:
+        futures = [
+            pool.submit(run_partition_worker_loop, worker_id=f"{base_id}:{i}", **kwargs) for i in range(processes)
+        ]
+        # The loops never return: surface the first crash so a supervisor restarts the worker.
+        for future in as_completed(futures):
+            future.result()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import logging
+import os
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from zoneinfo import ZoneInfo
 from uuid import UUID
 
 from croniter import croniter
 
+from sqlalchemy import update as sa_update
 from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
 from app.models.internal_job import InternalJob
 from app.models.segment import Segment
 from app.models.segment import Segment
+from app.services.brand_config_cache import invalidate_brand_config
+from app.services.contact_service import transaction_identity_email
 from app.services.segment_membership_service import filter_customers_by_segment
 from app.models.transaction import Transaction
 from app.schemas.event import EventCreate
@@ -20,17 +25,26 @@ from app.services.transaction_service import create_transaction
 from app.services.loyalty_status_service import update_customer_status
 
 
+logger = logging.getLogger(__name__)
+
+
 @dataclass
 class InternalJobRunStats:
     processed: int
     created: int
     idempotent_existing: int
     failed: int
+    chunks: int = 0
 
 
 @dataclass
 class MaintenanceJobRunStats:
     expired: int
+    cascaded: int = 0
+    updated: int = 0
+    chunks: int = 0
+    # One entry per committed chunk, see _chunk_progress.
+    progress: list[dict] = field(default_factory=list)
 
 
 @dataclass
@@ -56,6 +70,35 @@ class CouponBackfillRunStats:
     finished: bool
 
 
+@dataclass
+class TransactionEmailBackfillRunStats:
+    processed: int
+    updated: int
+    finished: bool
+
+
+# Job keys with a dedicated branch in run_internal_job_once; any other key is a generic
+# selector-based customer job (see generic_job_customer_query / emit_job_transactions).
+DEDICATED_JOB_KEYS = frozenset(
+    {
+        "MAINT_EXPIRE_REWARDS",
+        "MAINT_EXPIRE_COUPONS",
+        "MAINT_EXPIRE_POINTS",
+        "MAINT_EXPIRE_LOYALTY_STATUS",
+        "MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS",
+        "MAINT_RECOMPUTE_CUSTOMER_METRICS",
+        "MAINT_RECOMPUTE_SEGMENTS",
+        "MAINT_BACKFILL_COUPONS",
+        "MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL",
+        "MAINT_ROLLUP_BRAND_KPIS",
+    }
+)
+
+
+def is_generic_customer_job(job: InternalJob) -> bool:
+    return job.job_key not in DEDICATED_JOB_KEYS
+
+
 def _as_utc_aware(dt: datetime) -> datetime:
     if dt.tzinfo is None:
         return dt.replace(tzinfo=ZoneInfo("UTC"))
@@ -66,6 +109,17 @@ def _to_utc_naive(dt: datetime) -> datetime:
     return _as_utc_aware(dt).replace(tzinfo=None)
 
 
+def _chunk_progress(chunk) -> dict:
+    return {
+        "chunk": chunk.index,
+        "selected": chunk.selected,
+        "expired": chunk.expired,
+        "cascaded": chunk.cascaded,
+        "updated": chunk.updated,
+        "last_id": str(chunk.last_id) if chunk.last_id else None,
+    }
+
+
 def compute_next_run_at_from_schedule(*, base_utc: datetime, schedule: dict | None) -> datetime | None:
     if not schedule or not isinstance(schedule, dict):
         return None
@@ -115,41 +169,48 @@ def run_internal_job_once(
     if now is None:
         now = datetime.utcnow()
 
-    if job.job_key == "MAINT_EXPIRE_REWARDS":
-        if not job.brand:
-            raise ValueError("MAINT_EXPIRE_REWARDS requires job.brand")
-
-        from app.services.reward_service import expire_rewards
-
-        expired = expire_rewards(db, brand=job.brand)
-        return MaintenanceJobRunStats(expired=int(expired))
-
-    if job.job_key == "MAINT_EXPIRE_COUPONS":
-        if not job.brand:
-            raise ValueError("MAINT_EXPIRE_COUPONS requires job.brand")
-
-        from app.services.coupon_service import expire_coupons
-
-        expired = expire_coupons(db, brand=job.brand)
-        return MaintenanceJobRunStats(expired=int(expired))
-
-    if job.job_key == "MAINT_EXPIRE_POINTS":
+    expiry_runners = {
+        "MAINT_EXPIRE_REWARDS": "expire_rewards_chunked",
+        "MAINT_EXPIRE_COUPONS": "expire_coupons_chunked",
+        "MAINT_EXPIRE_POINTS": "expire_points_chunked",
+        "MAINT_EXPIRE_LOYALTY_STATUS": "expire_loyalty_status_chunked",
+    }
+    if job.job_key in expiry_runners:
         if not job.brand:
-            raise ValueError("MAINT_EXPIRE_POINTS requires job.brand")
-
-        from app.services.loyalty_validity_service import expire_points
-
-        expired = expire_points(db, brand=job.brand)
-        return MaintenanceJobRunStats(expired=int(expired))
-
-    if job.job_key == "MAINT_EXPIRE_LOYALTY_STATUS":
-        if not job.brand:
-            raise ValueError("MAINT_EXPIRE_LOYALTY_STATUS requires job.brand")
-
-        from app.services.loyalty_validity_service import expire_loyalty_status
+            raise ValueError(f"{job.job_key} requires job.brand")
+
+        from app.services import expiry_engine
+
+        job_id, job_key, brand = str(job.id), job.job_key, job.brand
+
+        def _log_chunk(chunk) -> None:
+            logger.info(
+                "expiry chunk job_id=%s job_key=%s brand=%s chunk=%s expired=%s cascaded=%s updated=%s",
+                job_id,
+                job_key,
+                brand,
+                chunk.index,
+                chunk.expired,
+                chunk.cascaded,
+                chunk.updated,
+                extra={"job_id": job_id, "job_key": job_key, "brand": brand, **_chunk_progress(chunk)},
+            )
 
-        expired = expire_loyalty_status(db, brand=job.brand)
-        return MaintenanceJobRunStats(expired=int(expired))
+        # Each chunk commits: the job row is re-read afterwards, its lock columns were committed at claim time.
+        result = getattr(expiry_engine, expiry_runners[job.job_key])(
+            db,
+            brand=brand,
+            now=now,
+            commit=True,
+            on_chunk=_log_chunk,
+        )
+        return MaintenanceJobRunStats(
+            expired=int(result.expired),
+            cascaded=int(result.cascaded),
+            updated=int(result.updated),
+            chunks=len(result.chunks),
+            progress=[_chunk_progress(c) for c in result.chunks],
+        )
 
     if job.job_key == "MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS":
         if not job.brand:
@@ -177,6 +238,10 @@ def run_internal_job_once(
         if after_id:
             q = q.filter(Customer.id > after_id)
 
+        if after_id is None:
+            # First batch of a recompute: tiers just changed, possibly in another process.
+            invalidate_brand_config(job.brand)
+
         customers = q.limit(batch_size).all()
 
         processed = 0
@@ -260,7 +325,11 @@ def run_internal_job_once(
             batch_size = 500
         batch_size = max(1, min(batch_size, 5000))
 
-        stats = recompute_dynamic_segments_for_brand(db, brand=job.brand, now_utc=now, batch_size=batch_size)
+        # Incremental by default: only customers changed since each segment's last run.
+        full = selector.get("full") is True
+        stats = recompute_dynamic_segments_for_brand(
+            db, brand=job.brand, now_utc=now, batch_size=batch_size, full=full
+        )
         db.flush()
         return stats
 
@@ -373,8 +442,106 @@ def run_internal_job_once(
             finished=bool(finished),
         )
 
+    if job.job_key == "MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL":
+        if not job.brand:
+            raise ValueError("MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL requires job.brand")
+
+        selector = job.selector or {}
+        after_id_raw = selector.get("after_id")
+        after_id: UUID | None = None
+        if after_id_raw:
+            try:
+                after_id = UUID(str(after_id_raw))
+            except Exception:
+                after_id = None
+        try:
+            batch_size = int(selector.get("batch_size") or 2000)
+        except Exception:
+            batch_size = 2000
+        batch_size = max(1, min(batch_size, 5000))
+
+        q = (
+            db.query(Transaction.id, Transaction.payload)
+            .filter(Transaction.brand == job.brand)
+            .filter(Transaction.customer_email.is_(None))
+            .order_by(Transaction.id.asc())
+        )
+        if after_id:
+            q = q.filter(Transaction.id > after_id)
+        rows = q.limit(batch_size).all()
+
+        updates = []
+        for tx_id, payload in rows:
+            email = transaction_identity_email(payload if isinstance(payload, dict) else None, brand=job.brand)
+            if email:
+                updates.append({"id": tx_id, "customer_email": email})
+        if updates:
+            db.execute(sa_update(Transaction), updates)
+
+        finished = len(rows) < batch_size
+        if finished:
+            job.selector = {"batch_size": batch_size}
+        else:
+            job.selector = {"after_id": str(rows[-1][0]), "batch_size": batch_size}
+
+        db.flush()
+        return TransactionEmailBackfillRunStats(processed=len(rows), updated=len(updates), finished=bool(finished))
+
+    if job.job_key == "MAINT_ROLLUP_BRAND_KPIS":
+        if not job.brand:
+            raise ValueError("MAINT_ROLLUP_BRAND_KPIS requires job.brand")
+
+        from app.services.brand_kpi_service import DEFAULT_BATCH_HOURS, rollup_brand_kpis
+
+        selector = job.selector or {}
+        try:
+            batch_hours = int(selector.get("batch_hours") or DEFAULT_BATCH_HOURS)
+        except Exception:
+            batch_hours = DEFAULT_BATCH_HOURS
+        batch_hours = max(1, min(batch_hours, 24 * 31))
+
+        return rollup_brand_kpis(db, brand=job.brand, now=now, batch_hours=batch_hours)
+
     today: date = now.date()
 
+    bucket_key = compute_run_bucket_key_from_schedule(now_utc=now, schedule=job.schedule)
+    limit = job_chunk_size()
+
+    totals = InternalJobRunStats(processed=0, created=0, idempotent_existing=0, failed=0)
+    after_id = None
+    while True:
+        rows = fetch_job_customer_chunk(db, job=job, today=today, after_id=after_id, limit=limit)
+        if not rows:
+            break
+
+        chunk = emit_job_transactions(db, job=job, customers=rows, bucket_key=bucket_key)
+        db.commit()
+
+        totals.chunks += 1
+        totals.processed += chunk.processed
+        totals.created += chunk.created
+        totals.idempotent_existing += chunk.idempotent_existing
+        totals.failed += chunk.failed
+
+        after_id = rows[-1][0]
+        if len(rows) < limit:
+            break
+
+    return totals
+
+
+def job_chunk_size() -> int:
+    """``INTERNAL_JOB_CHUNK_SIZE``: customers per keyset chunk of a generic job (default 500)."""
+    raw = os.getenv("INTERNAL_JOB_CHUNK_SIZE")
+    try:
+        value = int(raw) if raw is not None and str(raw).strip() else 500
+    except ValueError:
+        value = 500
+    return max(1, min(value, 10000))
+
+
+def generic_job_customer_query(db: Session, *, job: InternalJob, today: date):
+    """Customers targeted by a generic (selector-based) job: brand, segment, selector AST."""
     q = db.query(Customer)
     if job.brand:
         q = q.filter(Customer.brand == job.brand)
@@ -388,35 +555,72 @@ def run_internal_job_once(
 
     from app.routes.internal_jobs import _apply_selector
 
-    q = _apply_selector(q, job.selector or {}, today)
-    customers = q.all()
+    return _apply_selector(q, job.selector or {}, today)
 
-    bucket_key = compute_run_bucket_key_from_schedule(now_utc=now, schedule=job.schedule)
 
+def fetch_job_customer_chunk(
+    db: Session,
+    *,
+    job: InternalJob,
+    today: date,
+    after_id: UUID | None,
+    limit: int,
+    range_start: UUID | None = None,
+    range_end: UUID | None = None,
+) -> list:
+    """Next ``(id, brand, profile_id)`` keyset chunk of a generic job, optionally within ``[range_start, range_end)``.
+
+    The chunk is materialized (bounded by ``limit``) rather than streamed: create_transaction
+    commits per event, which would close a server-side cursor held across the loop.
+    """
+    q = generic_job_customer_query(db, job=job, today=today).with_entities(
+        Customer.id, Customer.brand, Customer.profile_id
+    )
+    if range_start is not None:
+        q = q.filter(Customer.id >= range_start)
+    if range_end is not None:
+        q = q.filter(Customer.id < range_end)
+    if after_id is not None:
+        q = q.filter(Customer.id > after_id)
+    return q.order_by(Customer.id.asc()).limit(limit).all()
+
+
+def emit_job_transactions(db: Session, *, job: InternalJob, customers, bucket_key: str) -> InternalJobRunStats:
+    """One deterministic ``job_{id}_{bucket}_{brand}_{profile}`` event per customer (rows need brand, profile_id)."""
     processed = 0
     created = 0
     idempotent_existing = 0
     failed = 0
 
-    for c in customers:
+    job_id = job.id
+    transaction_type = job.transaction_type
+    payload = job.payload_template or {}
+
+    customers = list(customers)
+    event_ids = [(c.brand, f"job_{job_id}_{bucket_key}_{c.brand}_{c.profile_id}") for c in customers]
+
+    # One existence round trip per chunk instead of one per customer.
+    existing = set()
+    if event_ids:
+        existing = {
+            (brand, transaction_id)
+            for brand, transaction_id in db.query(Transaction.brand, Transaction.transaction_id)
+            .filter(Transaction.transaction_id.in_({t for _, t in event_ids}))
+            .all()
+        }
+
+    for c, key in zip(customers, event_ids):
         processed += 1
-        transaction_id = f"job_{job.id}_{bucket_key}_{c.brand}_{c.profile_id}"
+        transaction_id = key[1]
 
-        already_exists = (
-            db.query(Transaction.id)
-            .filter(Transaction.transaction_id == transaction_id)
-            .filter(Transaction.brand == c.brand)
-            .first()
-        )
-        if already_exists:
+        if key in existing:
             idempotent_existing += 1
             continue
 
-        payload = job.payload_template or {}
         event = EventCreate(
             brand=c.brand,
             profileId=c.profile_id,
-            eventType=job.transaction_type,
+            eventType=transaction_type,
             eventId=transaction_id,
             source="INTERNAL_JOB",
             payload=payload,
@@ -14,11 +14,26 @@ from app.models.coupon_type import CouponType
 from app.models.internal_job import InternalJob
 from app.models.reward import Reward
 from app.models.segment import Segment
-from app.services.internal_job_runner import compute_next_run_at_from_schedule, run_internal_job_once
+from app.services.metrics import INTERNAL_JOB_DURATION, maybe_start_metrics_server
+from app.services.internal_job_partition_worker import partition_count_setting, plan_job_partitions
+from app.services.internal_job_runner import (
+    compute_next_run_at_from_schedule,
+    is_generic_customer_job,
+    run_internal_job_once,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# Cursor-driven maintenance jobs: re-run back-to-back until a batch reports ``finished``,
+# then deactivate themselves.
+_BATCHED_MAINTENANCE_JOB_KEYS = frozenset(
+    {"MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS", "MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL"}
+)
+
+# Scheduled jobs with a backlog cursor: re-run back-to-back while behind, then follow their cron.
+_CATCH_UP_MAINTENANCE_JOB_KEYS = frozenset({"MAINT_ROLLUP_BRAND_KPIS"})
+
 
 def _utcnow() -> datetime:
     # Keep naive UTC timestamps to match existing DB column types/semantics.
@@ -72,6 +87,8 @@ def _ensure_system_managed_jobs(db: Session, *, now: datetime):
 
     default_schedule = {"type": "cron", "cron": "0 0 * * *", "timezone": "UTC"}
     on_demand_schedule = {"type": "cron", "cron": "*/1 * * * *", "timezone": "UTC"}
+    # A few minutes past the hour so the closed hour is settled before it is rolled up.
+    hourly_schedule = {"type": "cron", "cron": "5 * * * *", "timezone": "UTC"}
 
     job_names = {
         "MAINT_EXPIRE_REWARDS": "Maintenance: Expire Rewards",
@@ -81,6 +98,7 @@ def _ensure_system_managed_jobs(db: Session, *, now: datetime):
         "MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS": "Maintenance: Recompute Customers Loyalty Status",
         "MAINT_RECOMPUTE_CUSTOMER_METRICS": "Maintenance: Recompute Customer Metrics",
         "MAINT_RECOMPUTE_SEGMENTS": "Maintenance: Recompute Segments",
+        "MAINT_ROLLUP_BRAND_KPIS": "Maintenance: Rollup Brand KPIs",
     }
 
     created_any = False
@@ -93,6 +111,7 @@ def _ensure_system_managed_jobs(db: Session, *, now: datetime):
             "MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS",
             "MAINT_RECOMPUTE_CUSTOMER_METRICS",
             "MAINT_RECOMPUTE_SEGMENTS",
+            "MAINT_ROLLUP_BRAND_KPIS",
         ]:
             exists = (
                 db.query(InternalJob.id)
@@ -112,6 +131,9 @@ def _ensure_system_managed_jobs(db: Session, *, now: datetime):
                 schedule = on_demand_schedule
                 active = False
                 next_run_at = None
+            elif job_key == "MAINT_ROLLUP_BRAND_KPIS":
+                schedule = hourly_schedule
+                next_run_at = compute_next_run_at_from_schedule(base_utc=now, schedule=hourly_schedule)
 
             job = InternalJob(
                 job_key=job_key,
@@ -139,6 +161,7 @@ def run_scheduler_loop(
     lock_ttl_seconds: int = 600,
     idle_sleep_seconds: int = 5,
     max_sleep_seconds: int = 30,
+    partitions: int = 1,
 ):
     if worker_id is None:
         worker_id = os.getenv("INTERNAL_JOB_WORKER_ID") or os.getenv("HOSTNAME") or "worker"
@@ -151,6 +174,7 @@ def run_scheduler_loop(
             "lock_ttl_seconds": lock_ttl_seconds,
             "idle_sleep_seconds": idle_sleep_seconds,
             "max_sleep_seconds": max_sleep_seconds,
+            "partitions": partitions,
         },
     )
 
@@ -222,15 +246,19 @@ def run_scheduler_loop(
                             "prev_next_run_at": (prev_next_run_at.isoformat() if prev_next_run_at else None),
                         },
                     )
-                    stats = run_internal_job_once(db, job=job, now=run_now)
-                    job.last_status = "SUCCESS"
+                    if partitions > 1 and is_generic_customer_job(job):
+                        # Fan out to the partition worker; the last unit closes last_status.
+                        stats = plan_job_partitions(db, job=job, now=run_now, count=partitions)
+                    else:
+                        stats = run_internal_job_once(db, job=job, now=run_now)
+                    job.last_status = getattr(stats, "job_status", None) or "SUCCESS"
                     job.last_error = None
 
                     job.last_run_at = run_now
 
                     # On-demand maintenance jobs can stop themselves when their cursor is exhausted.
                     finished = bool(getattr(stats, "finished", False))
-                    if job.job_key == "MAINT_RECOMPUTE_CUSTOMERS_LOYALTY_STATUS":
+                    if job.job_key in _BATCHED_MAINTENANCE_JOB_KEYS:
                         if finished:
                             job.active = False
                             job.next_run_at = None
@@ -238,6 +266,8 @@ def run_scheduler_loop(
                             # Process batches back-to-back without waiting for the cron tick.
                             job.active = True
                             job.next_run_at = run_now + timedelta(seconds=2)
+                    elif job.job_key in _CATCH_UP_MAINTENANCE_JOB_KEYS and not finished:
+                        job.next_run_at = run_now + timedelta(seconds=2)
                     else:
                         job.next_run_at = compute_next_run_at_from_schedule(base_utc=run_now, schedule=job.schedule)
 
@@ -248,8 +278,12 @@ def run_scheduler_loop(
                         "idempotent_existing": "idempotent_existing_count",
                         "failed": "failed_count",
                         "expired": "expired_count",
+                        "cascaded": "cascaded_count",
+                        "chunks": "chunks_count",
                         "updated": "updated_count",
                         "touched": "touched_count",
+                        "partitions": "partitions_count",
+                        "planned": "planned_count",
                         "finished": "finished",
                     }
                     for k, out_k in key_map.items():
@@ -257,6 +291,7 @@ def run_scheduler_loop(
                             stats_payload[out_k] = getattr(stats, k)
 
                     duration_ms = int((time.perf_counter() - started_at) * 1000)
+                    INTERNAL_JOB_DURATION.observe(duration_ms / 1000, job_key=job.job_key, status=job.last_status)
 
                     logger.info(
                         "internal job success job_id=%s job_key=%s brand=%s name=%s duration_ms=%s %s next_run_at=%s",
@@ -283,6 +318,7 @@ def run_scheduler_loop(
                     job.last_error = str(e)
 
                     duration_ms = int((time.perf_counter() - started_at) * 1000)
+                    INTERNAL_JOB_DURATION.observe(duration_ms / 1000, job_key=job.job_key, status="FAILED")
 
                     # On failure, keep moving next_run_at forward to avoid a tight retry loop.
                     job.next_run_at = compute_next_run_at_from_schedule(base_utc=run_now, schedule=job.schedule)
@@ -326,13 +362,16 @@ def main():
     lock_ttl_seconds = int(os.getenv("INTERNAL_JOB_LOCK_TTL_SECONDS") or "600")
     idle_sleep_seconds = int(os.getenv("INTERNAL_JOB_IDLE_SLEEP_SECONDS") or "5")
     max_sleep_seconds = int(os.getenv("INTERNAL_JOB_MAX_SLEEP_SECONDS") or "30")
+    partitions = partition_count_setting()
 
     logger.info("starting internal job scheduler")
+    maybe_start_metrics_server()
     run_scheduler_loop(
         batch_size=batch_size,
         lock_ttl_seconds=lock_ttl_seconds,
         idle_sleep_seconds=idle_sleep_seconds,
         max_sleep_seconds=max_sleep_seconds,
+        partitions=partitions,
     )
 
 
@@ -0,0 +1,29 @@
+"""JSONB containment predicates (``@>``) evaluated by Postgres instead of in Python.
+
+Containment (``@>``) is what the ``jsonb_path_ops`` GIN indexes can answer; keep
+filters in that form when a matching index exists on the column or expression.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def jsonb_contains(column, fragment: Any) -> ColumnElement[bool]:
+    """``column @> fragment`` — true when ``fragment`` is a sub-document of the column."""
+    return column.contains(fragment)
+
+
+def product_snapshot_contains(column, product_id: Any) -> ColumnElement[bool]:
+    """Payloads whose ``productSnapshots`` list has an item with ``id == product_id``.
+
+    Matches ``ix_customer_rewards_payload_product_snapshots``
+    (GIN ``(payload -> 'productSnapshots') jsonb_path_ops``). Spelled with ``->`` rather
+    than ``column[...]``: SQLAlchemy renders the latter as a Postgres 14 subscript, which the
+    planner does not match against the ``->`` index expression.
+    """
+    snapshots = column.op("->", return_type=JSONB)("productSnapshots")
+    return snapshots.contains([{"id": str(product_id)}])
@@ -0,0 +1,83 @@
+"""Keyset (cursor) pagination for newest-first listings ordered by ``(created_at, id)``.
+
+A cursor is the opaque, URL-safe encoding of the last row's ``(created_at, id)``; the
+next page is ``WHERE (created_at, id) < cursor ORDER BY created_at DESC, id DESC``,
+served by the ``(brand, created_at)`` indexes whatever the page depth, unlike ``OFFSET``.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+import sqlalchemy as sa
+from fastapi import HTTPException
+
+
+TOTAL_MODES = ("exact", "estimate", "none")
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = json.dumps([created_at.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def newest_first_page(query, model, *, cursor: str | None, limit: int, offset: int = 0):
+    """``query`` ordered by ``(created_at, id)`` descending, after ``cursor`` (or ``offset`` when no cursor)."""
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(sa.tuple_(model.created_at, model.id) < sa.tuple_(created_at, row_id))
+    elif offset:
+        query = query.offset(offset)
+    return query.limit(limit)
+
+
+def next_cursor(rows, limit: int) -> str | None:
+    """Cursor of the page after ``rows`` (None once a page comes back short)."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    if last.created_at is None:
+        return None
+    return encode_cursor(last.created_at, last.id)
+
+
+def normalize_total_mode(total: str | None, *, cursor: str | None = None) -> str:
+    """Requested total mode; unset, it is ``exact`` on the first page and ``none`` on cursor
+    pages, so paging deeper never re-counts what the first page already reported."""
+    mode = (total or ("none" if cursor else "exact")).strip().lower()
+    if mode not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total must be one of {', '.join(TOTAL_MODES)}")
+    return mode
+
+
+def estimated_count(db, query) -> int:
+    """Planner row estimate of ``query`` (``EXPLAIN``, no scan): cheap, approximate."""
+    stmt = query.statement
+    # Expand ``IN`` lists: plain compilation leaves ``__[POSTCOMPILE_...]`` placeholders.
+    compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(db, query, mode: str) -> int | None:
+    """Total for a listing: ``exact`` (``count(*)``), ``estimate`` (planner) or ``none``."""
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        return estimated_count(db, query)
+    return int(query.with_entities(sa.func.count()).scalar() or 0)
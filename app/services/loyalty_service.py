@@ -1,10 +1,10 @@
 from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
 
-from app.models.point_movement import PointMovement
 from app.models.customer import Customer
 from app.services.loyalty_status_service import update_customer_status
-from app.services.loyalty_settings_service import get_loyalty_settings
+from app.services.brand_config_cache import get_brand_config
+from app.services.point_ledger_service import add_point_movement
 
 
 # ============================================================
@@ -27,14 +27,15 @@ def earn_points(
     if points <= 0:
         return None
 
-    settings = get_loyalty_settings(db, brand=customer.brand)
-    points_days = getattr(settings, "points_validity_days", None) if settings else None
+    settings = get_brand_config(db, brand=customer.brand).settings
+    points_days = settings.points_validity_days if settings else None
     expires_at = (date.today() + timedelta(days=int(points_days))) if points_days is not None else None
 
     # 🔹 sécuriser le customer attaché à la session
     customer = db.query(Customer).filter(Customer.id == customer.id).with_for_update().one()
 
-    movement = PointMovement(
+    movement = add_point_movement(
+        db,
         customer_id=customer.id,
         points=points,
         type="EARN",
@@ -42,8 +43,6 @@ def earn_points(
         expires_at=expires_at,
     )
 
-    db.add(movement)
-
     customer.status_points = (customer.status_points or 0) + points
 
     # Keep a best-effort customer-level expiration marker in sync with the most recent earned points.
@@ -98,15 +97,15 @@ def burn_points(
 
     # Status points are not a spendable wallet. We allow deductions and clamp status_points to 0.
 
-    movement = PointMovement(
+    # FIFO: consumes the points closest to expiry first (point_ledger_service).
+    movement = add_point_movement(
+        db,
         customer_id=customer.id,
         points=-points,
         type="DEDUCT",
         source_transaction_id=source_transaction_id,
     )
 
-    db.add(movement)
-
     customer.status_points = max(0, int(customer.status_points or 0) - points)
 
     try:
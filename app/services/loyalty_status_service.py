@@ -2,71 +2,14 @@ from datetime import datetime, timedelta
 
 from sqlalchemy.orm import Session
 
-from app.models.loyalty_tier import LoyaltyTier
-from app.services.loyalty_settings_service import get_loyalty_settings
+from app.services.brand_config_cache import get_brand_config
 
 
 def compute_loyalty_status_from_tiers(db: Session, brand: str, status_points: int) -> str | None:
-    points = int(status_points or 0)
-
-    tier = (
-        db.query(LoyaltyTier)
-        .filter(LoyaltyTier.brand == brand)
-        .filter(LoyaltyTier.active.is_(True))
-        .filter(LoyaltyTier.min_status_points <= points)
-        .order_by(LoyaltyTier.min_status_points.desc())
-        .first()
-    )
-    if tier:
-        return tier.key
-
-    # Tiers exist but points don't satisfy any min_status_points (e.g. negative status points).
-    # Fallback to the lowest active tier to avoid leaving customers UNCONFIGURED when tiers are configured.
-    lowest = (
-        db.query(LoyaltyTier)
-        .filter(LoyaltyTier.brand == brand)
-        .filter(LoyaltyTier.active.is_(True))
-        .order_by(LoyaltyTier.min_status_points.asc())
-        .first()
-    )
-    if lowest:
-        return lowest.key
-
-    # No tiers configured for this brand: do not update loyalty_status.
-    return None
-
-
-def _get_base_tier_key(db: Session, brand: str) -> str | None:
-    tier = (
-        db.query(LoyaltyTier.key)
-        .filter(LoyaltyTier.brand == brand)
-        .filter(LoyaltyTier.active.is_(True))
-        .order_by(LoyaltyTier.min_status_points.asc(), LoyaltyTier.created_at.asc())
-        .first()
-    )
-    if not tier:
-        return None
-    return tier[0]
-
-
-def _get_tier_min_points(db: Session, brand: str, tier_key: str) -> int | None:
-    if not tier_key:
-        return None
-
-    tier = (
-        db.query(LoyaltyTier.min_status_points)
-        .filter(LoyaltyTier.brand == brand)
-        .filter(LoyaltyTier.active.is_(True))
-        .filter(LoyaltyTier.key == tier_key)
-        .first()
-    )
-    if not tier:
-        return None
-
-    try:
-        return int(tier[0])
-    except Exception:
-        return None
+    # Tiers exist but points don't satisfy any min_status_points (e.g. negative status points):
+    # the ladder falls back to the lowest active tier to avoid leaving customers UNCONFIGURED.
+    # No tiers configured for this brand: None (do not update loyalty_status).
+    return get_brand_config(db, brand=brand).tiers.status_for_points(status_points)
 
 
 # ============================================================
@@ -88,20 +31,22 @@ def update_customer_status(
     Recalcule et met à jour le statut fidélité du client
     """
 
-    new_status = compute_loyalty_status_from_tiers(db, customer.brand, customer.status_points)
+    config = get_brand_config(db, brand=customer.brand)
+    tiers = config.tiers
+    new_status = tiers.status_for_points(customer.status_points)
     if new_status is None:
         if not customer.loyalty_status:
             customer.loyalty_status = "UNCONFIGURED"
             db.flush()
         if sync_unomi:
-            from app.services.unomi_profile_service import sync_customer_profile_to_unomi
+            from app.services.unomi_profile_service import request_customer_profile_sync
 
-            sync_customer_profile_to_unomi(db, customer=customer, reason="loyalty_status")
+            request_customer_profile_sync(db, customer=customer, reason="loyalty_status")
         return customer.loyalty_status
 
-    settings = get_loyalty_settings(db, brand=customer.brand)
-    status_days = getattr(settings, "loyalty_status_validity_days", None) if settings else None
-    base_tier_key = _get_base_tier_key(db, customer.brand)
+    settings = config.settings
+    status_days = settings.loyalty_status_validity_days if settings else None
+    base_tier_key = tiers.base_key
     now = datetime.utcnow()
 
     old_status = customer.loyalty_status
@@ -111,8 +56,8 @@ def update_customer_status(
     # Prevent automatic downgrades before the current loyalty status validity window expires.
     # Upgrades are still applied immediately.
     if customer.loyalty_status and customer.loyalty_status != new_status:
-        old_min = _get_tier_min_points(db, customer.brand, customer.loyalty_status)
-        new_min = _get_tier_min_points(db, customer.brand, new_status)
+        old_min = tiers.min_points(customer.loyalty_status)
+        new_min = tiers.min_points(new_status)
         is_downgrade = bool(
             new_min is not None
             and old_min is not None
@@ -161,8 +106,8 @@ def update_customer_status(
         customer.loyalty_status = new_status
         db.flush()
 
-        old_min = _get_tier_min_points(db, customer.brand, old_status)
-        new_min = _get_tier_min_points(db, customer.brand, new_status)
+        old_min = tiers.min_points(old_status)
+        new_min = tiers.min_points(new_status)
         transaction_type = "TIER_UPGRADED" if (new_min is not None and (old_min is None or new_min > old_min)) else "TIER_DOWNGRADED"
 
         if emit_events:
@@ -220,7 +165,7 @@ def update_customer_status(
         )
 
     if sync_unomi:
-        from app.services.unomi_profile_service import sync_customer_profile_to_unomi
+        from app.services.unomi_profile_service import request_customer_profile_sync
 
-        sync_customer_profile_to_unomi(db, customer=customer, reason="loyalty_status")
+        request_customer_profile_sync(db, customer=customer, reason="loyalty_status")
     return customer.loyalty_status
@@ -0,0 +1,331 @@
+"""In-process Prometheus metrics (text exposition format 0.0.4, stdlib only).
+
+The API serves them on ``GET /metrics``. Worker processes (scheduler, ingest worker,
+Unomi sync dispatcher) have their own registry: set ``METRICS_PORT`` to expose it on a
+plain HTTP listener (``maybe_start_metrics_server``). Each process reports its own
+series, so scrape every uvicorn worker / replica separately.
+
+Hot-path metrics are declared at the bottom of this module and recorded by the
+ingest pipeline, the rule engine, ``UnomiClient`` and the internal job scheduler.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+@dataclass
+class _HistogramSeries:
+    counts: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(counts=[0] * (len(self.buckets) + 1))
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels) -> tuple[int, float]:
+        """``(count, sum)`` of one series (0, 0.0 when never observed)."""
+        series = self._series.get(self._key(labels))
+        return (series.count, series.total) if series else (0, 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(s.counts), s.total, s.count) for k, s in self._series.items())
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} already registered with another type/labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ── Per-request DB usage ────────────────────────────────────────────────────
+
+@dataclass
+class RequestDbUsage:
+    queries: int = 0
+    transactions: int = 0
+
+
+_request_db_usage: ContextVar[RequestDbUsage | None] = ContextVar("metrics_request_db_usage", default=None)
+_db_instrumented: set[int] = set()
+
+
+def begin_request_db_usage():
+    """Start counting statements/transactions for the current request; returns ``(token, usage)``.
+
+    Sync endpoints run in a copied context, so they mutate the same ``RequestDbUsage``.
+    """
+    usage = RequestDbUsage()
+    return _request_db_usage.set(usage), usage
+
+
+def end_request_db_usage(token) -> None:
+    _request_db_usage.reset(token)
+
+
+def _on_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage.queries += 1
+
+
+def _on_session_begin(session, transaction, connection):
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage.transactions += 1
+
+
+def install_db_instrumentation(engine, session_factory) -> None:
+    """Count statements (engine) and transactions (sessions) of the current request. Idempotent."""
+    if id(engine) in _db_instrumented:
+        return
+    event.listen(engine, "before_cursor_execute", _on_cursor_execute)
+    event.listen(session_factory, "after_begin", _on_session_begin)
+    _db_instrumented.add(id(engine))
+
+
+# ── Exposition for worker processes ─────────────────────────────────────────
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802 (http.server API)
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002
+        return
+
+
+def maybe_start_metrics_server(port: int | None = None) -> ThreadingHTTPServer | None:
+    """Serve ``REGISTRY`` on ``METRICS_PORT`` from a daemon thread (no-op when unset)."""
+    if port is None:
+        raw = (os.getenv("METRICS_PORT") or "").strip()
+        if not raw:
+            return None
+        try:
+            port = int(raw)
+        except ValueError:
+            logger.warning("invalid METRICS_PORT=%r; metrics listener disabled", raw)
+            return None
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("metrics listener started port=%s", port)
+    return server
+
+
+# ── Hot-path metrics ────────────────────────────────────────────────────────
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template.",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries",
+    "SQL statements executed per API request.",
+    ("method", "route"),
+    buckets=COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_TRANSACTIONS = REGISTRY.histogram(
+    "http_request_db_transactions",
+    "Session transactions (one per commit/rollback cycle) begun per API request.",
+    ("method", "route"),
+    buckets=COUNT_BUCKETS,
+)
+INGEST_DURATION = REGISTRY.histogram(
+    "ingest_duration_seconds",
+    "End-to-end synchronous ingest latency by final transaction status.",
+    ("status",),
+)
+INGEST_STAGE_DURATION = REGISTRY.histogram(
+    "ingest_stage_duration_seconds",
+    "Ingest latency per stage (idempotency_check, schema_merge, customer_resolution, rule_evaluation, actions, unomi_sync).",
+    ("stage",),
+)
+RULE_EVALUATION_DURATION = REGISTRY.histogram(
+    "rule_evaluation_duration_seconds",
+    "Condition evaluation time per rule (segment gate + AST), actions excluded.",
+    ("rule_id",),
+)
+RULE_EVALUATIONS = REGISTRY.counter(
+    "rule_evaluations_total",
+    "Rule evaluations by outcome (matched, skipped, not_in_segment, failed).",
+    ("rule_id", "outcome"),
+)
+UNOMI_REQUEST_DURATION = REGISTRY.histogram(
+    "unomi_request_duration_seconds",
+    "Unomi HTTP attempt latency by method and path template.",
+    ("method", "path"),
+)
+UNOMI_REQUEST_ERRORS = REGISTRY.counter(
+    "unomi_request_errors_total",
+    "Failed Unomi HTTP attempts by method, path template and kind (http_4xx, http_5xx, connection).",
+    ("method", "path", "kind"),
+)
+INTERNAL_JOB_DURATION = REGISTRY.histogram(
+    "internal_job_duration_seconds",
+    "Internal job run duration by job_key and status.",
+    ("job_key", "status"),
+    buckets=JOB_BUCKETS,
+)
+
+
+@contextmanager
+def ingest_stage(stage: str):
+    with INGEST_STAGE_DURATION.time(stage=stage):
+        yield
@@ -0,0 +1,184 @@
+"""Off-path payload schema learning for TransactionTypes.
+
+Ingest no longer merges every payload into ``transaction_types.payload_schema``. It
+fingerprints a sample of payloads (``PAYLOAD_SCHEMA_SAMPLE_RATE``, default 1.0) by their
+key paths and value types, skips shapes this process has already seen, and buffers the
+inferred schema of each new shape. At most every ``PAYLOAD_SCHEMA_FLUSH_SECONDS``
+(default 10) the buffer is flushed on a separate short session:
+
+- ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` into ``transaction_type_payload_shapes``
+  keeps only the shapes no process has merged yet;
+- those are merged into the active types' schemas in the same transaction (rows locked
+  in id order), and the brand config cache is invalidated after the commit.
+
+A TransactionType row is therefore written once per genuinely new shape instead of being
+compared (and possibly updated) by every event. Unknown types are still auto-created on
+ingest, with the schema of their first payload.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.event_type import TransactionType
+from app.models.transaction_type_payload_shape import TransactionTypePayloadShape
+from app.services.brand_config_cache import invalidate_brand_config
+from app.services.payload_schema_service import (
+    infer_json_schema_from_payload,
+    merge_inferred_payload_schema,
+    payload_shape_fingerprint,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Fingerprints remembered per process before the set is reset (bounds memory on odd payloads).
+_SEEN_MAX = 50_000
+
+
+def _sample_rate() -> float:
+    raw = os.getenv("PAYLOAD_SCHEMA_SAMPLE_RATE")
+    try:
+        return min(1.0, max(0.0, float(raw))) if raw is not None and str(raw).strip() else 1.0
+    except ValueError:
+        return 1.0
+
+
+def _flush_interval_seconds() -> float:
+    raw = os.getenv("PAYLOAD_SCHEMA_FLUSH_SECONDS")
+    try:
+        return max(0.0, float(raw)) if raw is not None and str(raw).strip() else 10.0
+    except ValueError:
+        return 10.0
+
+
+ShapeKey = tuple[str, str, str]  # (brand, transaction_type, fingerprint)
+
+_lock = threading.Lock()
+_seen: set[ShapeKey] = set()
+_pending: dict[ShapeKey, dict] = {}
+_last_flush = time.monotonic()
+
+
+def record_payload_shape(*, brand: str, transaction_type: str, payload) -> bool:
+    """Buffer the payload's shape if it is sampled and new to this process. Returns True when buffered."""
+    if payload is None or not brand or not transaction_type:
+        return False
+    rate = _sample_rate()
+    if rate < 1.0 and random.random() >= rate:
+        return False
+
+    key = (brand, transaction_type, payload_shape_fingerprint(payload))
+    with _lock:
+        if key in _seen or key in _pending:
+            return False
+    inferred = infer_json_schema_from_payload(payload)
+    if not inferred:
+        return False
+    with _lock:
+        _pending.setdefault(key, inferred)
+    return True
+
+
+def _take_pending() -> dict[ShapeKey, dict]:
+    global _pending, _last_flush
+    with _lock:
+        taken, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    return taken
+
+
+def _mark_seen(keys) -> None:
+    with _lock:
+        if len(_seen) > _SEEN_MAX:
+            _seen.clear()
+        _seen.update(keys)
+
+
+def merge_payload_shapes(db, shapes: dict[ShapeKey, dict]) -> set[str]:
+    """Store new shapes and merge them into the active types' schemas (caller commits).
+
+    Returns the brands whose TransactionType config changed.
+    """
+    if not shapes:
+        return set()
+
+    rows = [
+        {"brand": brand, "transaction_type": key, "fingerprint": fp, "payload_schema": schema}
+        for (brand, key, fp), schema in sorted(shapes.items(), key=lambda kv: kv[0])
+    ]
+    stmt = (
+        pg_insert(TransactionTypePayloadShape)
+        .values(rows)
+        .on_conflict_do_nothing(
+            index_elements=[
+                TransactionTypePayloadShape.brand,
+                TransactionTypePayloadShape.transaction_type,
+                TransactionTypePayloadShape.fingerprint,
+            ]
+        )
+        .returning(
+            TransactionTypePayloadShape.brand,
+            TransactionTypePayloadShape.transaction_type,
+            TransactionTypePayloadShape.fingerprint,
+        )
+    )
+    new_schemas: dict[tuple[str, str], list[dict]] = {}
+    for brand, key, fp in db.execute(stmt).all():
+        new_schemas.setdefault((brand, key), []).append(shapes[(brand, key, fp)])
+    if not new_schemas:
+        return set()
+
+    types = (
+        db.query(TransactionType)
+        .filter(TransactionType.active.is_(True))
+        .filter(sa.tuple_(TransactionType.brand, TransactionType.key).in_(sorted(new_schemas)))
+        .order_by(TransactionType.id)
+        .with_for_update()
+        .all()
+    )
+    changed: set[str] = set()
+    for tt in types:
+        schema = tt.payload_schema
+        for inferred in new_schemas[(tt.brand, tt.key)]:
+            schema = merge_inferred_payload_schema(schema, inferred)
+        if schema and schema != tt.payload_schema:
+            tt.payload_schema = schema
+            changed.add(tt.brand)
+    return changed
+
+
+def flush_payload_shapes(*, session_factory=None, force: bool = False) -> int:
+    """Merge buffered shapes (when due, or ``force``). Returns the number of shapes flushed."""
+    if not force and time.monotonic() - _last_flush < _flush_interval_seconds():
+        return 0
+    shapes = _take_pending()
+    if not shapes:
+        return 0
+
+    if session_factory is None:
+        from app.db import SessionLocal as session_factory
+
+    db = session_factory()
+    try:
+        changed_brands = merge_payload_shapes(db, shapes)
+        db.commit()
+    except Exception:
+        # Schema learning must never break ingest; the shapes are buffered again when seen next.
+        db.rollback()
+        logger.warning("payload shape flush failed; %s buffered shapes dropped", len(shapes), exc_info=True)
+        return 0
+    finally:
+        db.close()
+
+    _mark_seen(shapes)
+    for brand in changed_brands:
+        invalidate_brand_config(brand)
+    return len(shapes)
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 from typing import Any
 
 _RESERVED_JSON_SCHEMA_KEYS = frozenset({"type", "properties", "items", "required", "additionalProperties", "anyOf", "oneOf", "allOf"})
@@ -229,9 +230,50 @@ def merge_json_schemas(a: dict | None, b: dict | None) -> dict | None:
     return out
 
 
-def enrich_payload_schema_on_ingest(existing: dict | None, payload: dict | None) -> dict | None:
-    """Merge inferred payload shape into stored schema; heal corrupted schemas."""
-    inferred = infer_json_schema_from_payload(payload) if payload is not None else None
+def _shape_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return "unknown"
+
+
+def payload_shape_fingerprint(payload: Any, *, _max_depth: int = 6) -> str:
+    """Hash of a payload's key paths and value types (what ``infer_json_schema_from_payload`` sees).
+
+    Values are ignored, so every sale with the same fields shares one fingerprint.
+    """
+    paths: set[tuple] = set()
+
+    def walk(value: Any, path: tuple, depth: int) -> None:
+        if depth >= _max_depth:
+            return
+        paths.add((path, _shape_type(value)))
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if isinstance(k, str):
+                    walk(v, path + (k,), depth + 1)
+        elif isinstance(value, list):
+            for item in value[:50]:
+                walk(item, path + (None,), depth + 1)  # None: array item (keys are strings)
+
+    walk(payload, (), 0)
+    canonical = "\n".join(sorted(repr(p) for p in paths))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def merge_inferred_payload_schema(existing: dict | None, inferred: dict | None) -> dict | None:
+    """Merge an inferred payload schema into the stored one; heal corrupted schemas."""
     if not inferred:
         return existing
     if existing is None or is_mistaken_json_schema_root_as_fields(existing):
@@ -242,6 +284,12 @@ def enrich_payload_schema_on_ingest(existing: dict | None, payload: dict | None)
     return merge_json_schemas(normalized, inferred)
 
 
+def enrich_payload_schema_on_ingest(existing: dict | None, payload: dict | None) -> dict | None:
+    """Merge inferred payload shape into stored schema; heal corrupted schemas."""
+    inferred = infer_json_schema_from_payload(payload) if payload is not None else None
+    return merge_inferred_payload_schema(existing, inferred)
+
+
 def payload_schema_format(schema: Any) -> str | None:
     if schema is None:
         return None
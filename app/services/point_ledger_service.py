@@ -0,0 +1,394 @@
+"""Materialized status points ledger: per-customer total and remaining points per expiry date.
+
+``point_movements`` stays the ledger of record. Every movement is written through
+``add_point_movement``, which applies it to the customer's ``point_balances`` row and
+``point_balance_buckets`` in the same transaction:
+  - a positive movement first pays back ``debt``, then lands in the bucket of its
+    ``expires_at`` (NULL: never expires);
+  - a negative movement consumes buckets FIFO, earliest expiry first and never-expiring
+    points last; whatever no bucket covers becomes ``debt``.
+Buckets past their date are dropped before a movement is applied, and by the
+``MAINT_EXPIRE_POINTS`` job (``expiry_engine``).
+
+Balance reads are O(1) while no bucket is past its date, O(buckets) otherwise, instead
+of a SUM over the customer's whole history.
+
+``replay_movements`` applies the same rules to a customer's history. It materializes a
+customer on its first movement after the upgrade, answers reads for customers not
+materialized yet, and backs ``rebuild_point_balances``
+(``scripts/rebuild_point_balances.py``).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Iterable
+from uuid import UUID
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.models.customer import Customer
+from app.models.point_balance import PointBalance
+from app.models.point_balance_bucket import PointBalanceBucket
+from app.models.point_movement import PointMovement
+
+
+def _fifo_key(expires_at: date | None):
+    return (expires_at is None, expires_at or date.max)
+
+
+@dataclass
+class LedgerState:
+    buckets: dict[date | None, int] = field(default_factory=dict)
+    debt: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.buckets.values())
+
+    @property
+    def next_expires_at(self) -> date | None:
+        dated = [k for k in self.buckets if k is not None]
+        return min(dated) if dated else None
+
+    def is_empty(self) -> bool:
+        return not self.buckets and not self.debt
+
+    def balance(self, today: date) -> int:
+        return sum(v for k, v in self.buckets.items() if k is None or k >= today)
+
+    def expire(self, *, today: date) -> int:
+        """Drop the buckets past their date; returns the points dropped."""
+        expired = 0
+        for key in [k for k in self.buckets if k is not None and k < today]:
+            expired += self.buckets.pop(key)
+        return expired
+
+    def apply(self, points: int, expires_at: date | None, *, today: date) -> None:
+        self.expire(today=today)
+        points = int(points)
+
+        if points > 0:
+            paid = min(self.debt, points)
+            self.debt -= paid
+            points -= paid
+            if points:
+                self.buckets[expires_at] = self.buckets.get(expires_at, 0) + points
+            return
+
+        needed = -points
+        for key in sorted(self.buckets, key=_fifo_key):
+            if not needed:
+                break
+            taken = min(self.buckets[key], needed)
+            needed -= taken
+            if taken == self.buckets[key]:
+                del self.buckets[key]
+            else:
+                self.buckets[key] -= taken
+        self.debt += needed
+
+
+def replay_movements(rows: Iterable[tuple], *, today: date) -> LedgerState:
+    """Replay ``(points, expires_at, created_at)`` rows in chronological order."""
+    state = LedgerState()
+    for points, expires_at, created_at in rows:
+        on = created_at.date() if created_at is not None else today
+        state.apply(points, expires_at, today=min(on, today))
+    state.expire(today=today)
+    return state
+
+
+def replay_customers(db: Session, customer_ids: list, *, today: date) -> dict[UUID, LedgerState]:
+    """One ledger query for the whole list; customers without movements are absent."""
+    if not customer_ids:
+        return {}
+    rows = (
+        db.query(PointMovement.customer_id, PointMovement.points, PointMovement.expires_at, PointMovement.created_at)
+        .filter(PointMovement.customer_id.in_(customer_ids))
+        .order_by(PointMovement.customer_id.asc(), PointMovement.created_at.asc(), PointMovement.id.asc())
+        .all()
+    )
+    grouped: dict[UUID, list[tuple]] = {}
+    for customer_id, points, expires_at, created_at in rows:
+        grouped.setdefault(customer_id, []).append((points, expires_at, created_at))
+    return {cid: replay_movements(movements, today=today) for cid, movements in grouped.items()}
+
+
+def _state_of(balance: PointBalance, buckets: list[PointBalanceBucket]) -> LedgerState:
+    state = LedgerState(debt=int(balance.debt or 0))
+    for row in buckets:
+        state.buckets[row.expires_at] = state.buckets.get(row.expires_at, 0) + int(row.remaining or 0)
+    return state
+
+
+def _load_buckets(db: Session, customer_ids: list) -> dict[UUID, list[PointBalanceBucket]]:
+    out: dict[UUID, list[PointBalanceBucket]] = {}
+    if not customer_ids:
+        return out
+    for row in db.query(PointBalanceBucket).filter(PointBalanceBucket.customer_id.in_(customer_ids)).all():
+        out.setdefault(row.customer_id, []).append(row)
+    return out
+
+
+def _write_state(
+    db: Session,
+    customer_id,
+    state: LedgerState,
+    *,
+    balance: PointBalance | None,
+    buckets: list[PointBalanceBucket],
+    rebuilt: bool = False,
+) -> PointBalance:
+    if balance is None:
+        balance = PointBalance(customer_id=customer_id)
+        db.add(balance)
+
+    by_key: dict[date | None, PointBalanceBucket] = {}
+    for row in buckets:
+        if row.expires_at in by_key or row.expires_at not in state.buckets:
+            db.delete(row)
+            continue
+        by_key[row.expires_at] = row
+
+    for key, remaining in state.buckets.items():
+        row = by_key.get(key)
+        if row is None:
+            db.add(PointBalanceBucket(customer_id=customer_id, expires_at=key, remaining=int(remaining)))
+        elif row.remaining != remaining:
+            row.remaining = int(remaining)
+
+    balance.total = state.total
+    balance.debt = int(state.debt)
+    balance.next_expires_at = state.next_expires_at
+    if rebuilt:
+        balance.rebuilt_at = datetime.utcnow()
+    return balance
+
+
+def add_point_movement(
+    db: Session,
+    *,
+    customer_id,
+    points: int,
+    type: str,
+    source_transaction_id=None,
+    expires_at: date | None = None,
+    today: date | None = None,
+) -> PointMovement:
+    """Insert a ``PointMovement`` and apply it to the materialized balance.
+
+    The caller holds the customer row lock (``with_for_update``), as every writer does.
+    """
+    today = today or date.today()
+
+    balance = db.get(PointBalance, customer_id)
+    if balance is None:
+        buckets: list[PointBalanceBucket] = []
+        state = replay_customers(db, [customer_id], today=today).get(customer_id) or LedgerState()
+    else:
+        buckets = _load_buckets(db, [customer_id]).get(customer_id, [])
+        state = _state_of(balance, buckets)
+
+    state.apply(int(points), expires_at, today=today)
+    _write_state(db, customer_id, state, balance=balance, buckets=buckets)
+
+    movement = PointMovement(
+        customer_id=customer_id,
+        points=int(points),
+        type=type,
+        source_transaction_id=source_transaction_id,
+        expires_at=expires_at,
+    )
+    db.add(movement)
+    # The session does not autoflush: make the new rows visible to the next read.
+    db.flush()
+    return movement
+
+
+def get_point_balance(db: Session, customer_id, *, today: date | None = None) -> int:
+    today = today or date.today()
+
+    row = (
+        db.query(PointBalance.total, PointBalance.next_expires_at)
+        .filter(PointBalance.customer_id == customer_id)
+        .first()
+    )
+    if row is None:
+        state = replay_customers(db, [customer_id], today=today).get(customer_id)
+        return max(0, state.balance(today)) if state else 0
+
+    total, next_expires_at = row
+    if next_expires_at is None or next_expires_at >= today:
+        return max(0, int(total or 0))
+
+    live = (
+        db.query(func.coalesce(func.sum(PointBalanceBucket.remaining), 0))
+        .filter(PointBalanceBucket.customer_id == customer_id)
+        .filter(or_(PointBalanceBucket.expires_at.is_(None), PointBalanceBucket.expires_at >= today))
+        .scalar()
+    )
+    return max(0, int(live or 0))
+
+
+def get_point_balances(db: Session, customer_ids: list, *, today: date | None = None) -> dict[UUID, int]:
+    """``get_point_balance`` for a page of customers in a bounded number of queries.
+
+    One query on ``point_balances``, one grouped bucket sum for balances past their
+    ``next_expires_at``, one ledger replay for customers not materialized yet.
+    """
+    today = today or date.today()
+    ids = list(dict.fromkeys(cid for cid in customer_ids if cid is not None))
+    if not ids:
+        return {}
+
+    rows = (
+        db.query(PointBalance.customer_id, PointBalance.total, PointBalance.next_expires_at)
+        .filter(PointBalance.customer_id.in_(ids))
+        .all()
+    )
+    balances: dict[UUID, int] = {}
+    stale: list = []
+    for customer_id, total, next_expires_at in rows:
+        if next_expires_at is None or next_expires_at >= today:
+            balances[customer_id] = max(0, int(total or 0))
+        else:
+            stale.append(customer_id)
+
+    if stale:
+        live = dict(
+            db.query(PointBalanceBucket.customer_id, func.coalesce(func.sum(PointBalanceBucket.remaining), 0))
+            .filter(PointBalanceBucket.customer_id.in_(stale))
+            .filter(or_(PointBalanceBucket.expires_at.is_(None), PointBalanceBucket.expires_at >= today))
+            .group_by(PointBalanceBucket.customer_id)
+            .all()
+        )
+        for customer_id in stale:
+            balances[customer_id] = max(0, int(live.get(customer_id) or 0))
+
+    missing = [cid for cid in ids if cid not in balances]
+    if missing:
+        states = replay_customers(db, missing, today=today)
+        for customer_id in missing:
+            state = states.get(customer_id)
+            balances[customer_id] = max(0, state.balance(today)) if state else 0
+
+    return balances
+
+
+# ============================================================
+# REBUILD / CHECK
+# ============================================================
+@dataclass
+class LedgerMismatch:
+    customer_id: UUID
+    stored_buckets: dict | None
+    stored_debt: int | None
+    expected_buckets: dict
+    expected_debt: int
+
+
+@dataclass
+class PointBalanceRebuildStats:
+    customers: int = 0
+    # Customers with movements but no point_balances row.
+    missing: int = 0
+    mismatched: int = 0
+    written: int = 0
+    # Customers whose customers.status_points differs from the replayed balance.
+    status_points_drift: int = 0
+    mismatches: list[LedgerMismatch] = field(default_factory=list)
+
+
+def rebuild_point_balances(
+    db: Session,
+    *,
+    brand: str,
+    customer_ids: list | None = None,
+    write: bool = True,
+    commit: bool = False,
+    chunk_size: int = 500,
+    today: date | None = None,
+    max_samples: int = 50,
+    on_chunk: Callable[[PointBalanceRebuildStats], None] | None = None,
+) -> PointBalanceRebuildStats:
+    """Replay ``point_movements`` and compare (``write=False``) or rewrite the materialized rows.
+
+    Customers are walked in keyset chunks; with ``write`` each chunk is locked
+    (``FOR UPDATE``) so concurrent earns wait, and committed when ``commit`` is set.
+    """
+    today = today or date.today()
+    chunk_size = max(1, int(chunk_size))
+    stats = PointBalanceRebuildStats()
+
+    after_id = None
+    while True:
+        q = (
+            db.query(Customer.id, Customer.status_points)
+            .filter(Customer.brand == brand)
+            .order_by(Customer.id.asc())
+            .limit(chunk_size)
+        )
+        if customer_ids is not None:
+            q = q.filter(Customer.id.in_(customer_ids))
+        if after_id is not None:
+            q = q.filter(Customer.id > after_id)
+        if write:
+            q = q.with_for_update(of=Customer)
+        rows = q.all()
+        if not rows:
+            break
+
+        ids = [r[0] for r in rows]
+        expected_by_id = replay_customers(db, ids, today=today)
+        balances = {b.customer_id: b for b in db.query(PointBalance).filter(PointBalance.customer_id.in_(ids)).all()}
+        buckets_by_id = _load_buckets(db, ids)
+
+        for customer_id, status_points in rows:
+            stats.customers += 1
+            expected = expected_by_id.get(customer_id) or LedgerState()
+            balance = balances.get(customer_id)
+            buckets = buckets_by_id.get(customer_id, [])
+
+            if int(status_points or 0) != max(0, expected.balance(today)):
+                stats.status_points_drift += 1
+
+            if balance is None:
+                if expected.is_empty():
+                    continue
+                stats.missing += 1
+            else:
+                stored = _state_of(balance, buckets)
+                stored.expire(today=today)
+                if stored.buckets == expected.buckets and stored.debt == expected.debt:
+                    continue
+                stats.mismatched += 1
+                if len(stats.mismatches) < max_samples:
+                    stats.mismatches.append(
+                        LedgerMismatch(
+                            customer_id=customer_id,
+                            stored_buckets=dict(stored.buckets),
+                            stored_debt=stored.debt,
+                            expected_buckets=dict(expected.buckets),
+                            expected_debt=expected.debt,
+                        )
+                    )
+
+            if write:
+                _write_state(db, customer_id, expected, balance=balance, buckets=buckets, rebuilt=True)
+                stats.written += 1
+
+        if write:
+            db.flush()
+            if commit:
+                db.commit()
+        if on_chunk is not None:
+            on_chunk(stats)
+
+        if len(rows) < chunk_size:
+            break
+        after_id = ids[-1]
+
+    return stats
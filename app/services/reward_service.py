@@ -7,7 +7,6 @@ from fastapi import HTTPException
 from app.models.coupon_type import CouponType
 from app.models.reward import Reward
 from app.models.customer_reward import CustomerReward
-from app.models.customer import Customer
 from app.services.catalog_admin_service import build_customer_reward_snapshot_payload
 
 
@@ -160,21 +159,8 @@ def reopen_reward(db: Session, customer_reward: CustomerReward):
 # ============================================================
 # EXPIRE REWARDS (job batch / cron)
 # ============================================================
-def expire_rewards(db: Session, *, brand: str):
-    now = datetime.utcnow()
-
-    expired = (
-        db.query(CustomerReward)
-        .join(Customer, Customer.id == CustomerReward.customer_id)
-        .filter(Customer.brand == brand)
-        .filter(CustomerReward.status == "ISSUED")
-        .filter(CustomerReward.expires_at.isnot(None))
-        .filter(CustomerReward.expires_at < now)
-        .all()
-    )
+def expire_rewards(db: Session, *, brand: str, chunk_size: int | None = None, commit: bool = False) -> int:
+    """Expire ISSUED rewards past their date; see ``expiry_engine``."""
+    from app.services.expiry_engine import expire_rewards_chunked
 
-    for cr in expired:
-        cr.status = "EXPIRED"
-
-    db.flush()
-    return len(expired)
+    return expire_rewards_chunked(db, brand=brand, chunk_size=chunk_size, commit=commit).expired
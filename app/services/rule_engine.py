@@ -1,34 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 import logging
 from itertools import zip_longest
+import operator
 import re
+import time
 
-import sqlalchemy as sa
 from sqlalchemy.orm import Session
-from sqlalchemy import asc
 from app.models.customer import Customer
 from app.models.loyalty_tier import LoyaltyTier
-from app.models.rule import Rule
 from app.models.transaction_rule_execution import TransactionRuleExecution
-from app.models.point_movement import PointMovement
 from app.models.customer_reward import CustomerReward
 from app.models.customer_metrics import CustomerMetrics
 from app.models.product import Product
 from app.services.birthdate_targeting import compare_birthdate, format_customer_birthdate_wire
 from app.services.contact_service import resolve_customer_for_transaction
 from app.services.loyalty_service import earn_points, burn_points
+from app.services.metrics import INGEST_STAGE_DURATION, RULE_EVALUATION_DURATION, RULE_EVALUATIONS, ingest_stage
 from app.services.reward_service import issue_reward
+from app.services import rule_profiling
 from app.services.coupon_service import issue_coupon, use_coupon
+from app.services.rule_plan_cache import get_rule_plan
+from app.services.segment_membership_service import SegmentMembershipResolver
 
 
 logger = logging.getLogger(__name__)
 
 
 def _get_by_path(obj, path: str):
+    return _get_by_parts(obj, path.split("."))
+
+
+def _get_by_parts(obj, parts):
     if obj is None:
         return None
     current = obj
-    for part in path.split("."):
+    for part in parts:
         if current is None:
             return None
         if isinstance(current, dict):
@@ -38,6 +46,51 @@ def _get_by_path(obj, path: str):
     return current
 
 
+class RuleEvaluationContext:
+    """Per-transaction memo for condition fields that hit the database.
+
+    Each field family (``customer.metrics``, ``customer.rewards``, product lookups) is
+    loaded at most once while the context is active; ``db_round_trips`` counts the loads
+    actually issued. Actions may change these tables, so callers ``invalidate()`` after
+    executing them.
+    """
+
+    def __init__(self, db: Session, customer):
+        self.db = db
+        self.customer = customer
+        self.db_round_trips = 0
+        self._families: dict = {}
+
+    def load(self, family, loader):
+        if family not in self._families:
+            self.db_round_trips += 1
+            self._families[family] = loader()
+        return self._families[family]
+
+    def invalidate(self) -> None:
+        self._families.clear()
+
+
+_evaluation_context: ContextVar[RuleEvaluationContext | None] = ContextVar("rule_evaluation_context", default=None)
+
+
+@contextmanager
+def rule_evaluation_context(db: Session, customer):
+    ctx = RuleEvaluationContext(db, customer)
+    token = _evaluation_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _evaluation_context.reset(token)
+
+
+def _load_field_family(db: Session, customer, family, loader):
+    ctx = _evaluation_context.get()
+    if ctx is None or ctx.db is not db or ctx.customer is not customer:
+        return loader()
+    return ctx.load(family, loader)
+
+
 def _normalize_match_key(value) -> str | None:
     if value is None:
         return None
@@ -125,148 +178,135 @@ def _as_float(value):
         return None
 
 
-def _eval_expr(*, db: Session, customer, transaction, expr):
-    if expr is None:
+def _fn_to_number(evaled, *, db, transaction):
+    if len(evaled) != 1:
+        raise ValueError("to_number expects exactly 1 argument")
+    n = _as_float(evaled[0])
+    return None if n is None else int(n)
+
+
+def _fn_lower(evaled, *, db, transaction):
+    if len(evaled) != 1:
+        raise ValueError("lower expects exactly 1 argument")
+    v = evaled[0]
+    return None if v is None else str(v).lower()
+
+
+def _fn_upper(evaled, *, db, transaction):
+    if len(evaled) != 1:
+        raise ValueError("upper expects exactly 1 argument")
+    v = evaled[0]
+    return None if v is None else str(v).upper()
+
+
+def _fn_length(evaled, *, db, transaction):
+    if len(evaled) != 1:
+        raise ValueError("length expects exactly 1 argument")
+    v = evaled[0]
+    if v is None:
         return None
+    if isinstance(v, (list, str, dict)):
+        return len(v)
+    return None
 
-    if isinstance(expr, list):
-        return [_eval_expr(db=db, customer=customer, transaction=transaction, expr=e) for e in expr]
 
-    if not isinstance(expr, dict):
-        return expr
+def _fn_coalesce(evaled, *, db, transaction):
+    for v in evaled:
+        if v not in (None, ""):
+            return v
+    return None
 
-    if "$system" in expr:
-        key = expr.get("$system")
-        if not isinstance(key, str) or not key:
-            raise ValueError("Invalid system preset: expected non-empty '$system' string")
-        if len(expr) > 1:
-            from app.services.system_value_presets import resolve_system_preset_value
 
-            return resolve_system_preset_value(expr, context="generic")
-        return _resolve_system_value(key=key, customer=customer)
+def _fn_date_diff_days(evaled, *, db, transaction):
+    if len(evaled) != 2:
+        raise ValueError("date_diff_days expects exactly 2 arguments")
+    a = _as_datetime(evaled[0])
+    b = _as_datetime(evaled[1])
+    if a is None or b is None:
+        return None
+    delta = a - b
+    return int(delta.total_seconds() // 86400)
 
-    if "$path" in expr:
-        path = expr.get("$path")
-        if not isinstance(path, str) or not path.strip():
-            raise ValueError("Invalid $path: expected non-empty string")
-        return _resolve_field_value(db=db, field=path.strip(), customer=customer, transaction=transaction)
 
-    if "$fn" in expr:
-        fn = expr.get("$fn")
-        args = expr.get("args")
-        if not isinstance(fn, str) or not fn:
-            raise ValueError("Invalid $fn: expected non-empty string")
-        if args is None:
-            args = []
-        if not isinstance(args, list):
-            raise ValueError("Invalid $fn args: expected list")
-
-        evaled = [_eval_expr(db=db, customer=customer, transaction=transaction, expr=a) for a in args]
-        fn_norm = fn.strip().lower()
-
-        if fn_norm == "to_number":
-            if len(evaled) != 1:
-                raise ValueError("to_number expects exactly 1 argument")
-            v = evaled[0]
-            n = _as_float(v)
-            return None if n is None else int(n)
-
-        if fn_norm == "lower":
-            if len(evaled) != 1:
-                raise ValueError("lower expects exactly 1 argument")
-            v = evaled[0]
-            return None if v is None else str(v).lower()
-
-        if fn_norm == "upper":
-            if len(evaled) != 1:
-                raise ValueError("upper expects exactly 1 argument")
-            v = evaled[0]
-            return None if v is None else str(v).upper()
-
-        if fn_norm == "length":
-            if len(evaled) != 1:
-                raise ValueError("length expects exactly 1 argument")
-            v = evaled[0]
-            if v is None:
-                return None
-            if isinstance(v, (list, str, dict)):
-                return len(v)
-            return None
+def _fn_sum_product_points_unomi(evaled, *, db, transaction):
+    if len(evaled) != 2:
+        raise ValueError("sum_product_points_unomi expects exactly 2 arguments: productNames, productQuantities")
 
-        if fn_norm == "coalesce":
-            for v in evaled:
-                if v not in (None, ""):
-                    return v
-            return None
+    brand = getattr(transaction, "brand", None)
+    if not brand or db is None:
+        return 0
 
-        if fn_norm == "date_diff_days":
-            if len(evaled) != 2:
-                raise ValueError("date_diff_days expects exactly 2 arguments")
-            a = _as_datetime(evaled[0])
-            b = _as_datetime(evaled[1])
-            if a is None or b is None:
-                return None
-            delta = a - b
-            return int(delta.total_seconds() // 86400)
+    names = evaled[0] if isinstance(evaled[0], list) else []
+    quantities = evaled[1] if isinstance(evaled[1], list) else []
 
-        if fn_norm in {"sum_product_points_unomi", "sum_product_points_unomi_arrays", "sum_product_points_unomi_arrays_v1"}:
-            if len(evaled) != 2:
-                raise ValueError("sum_product_points_unomi expects exactly 2 arguments: productNames, productQuantities")
+    pairs: list[tuple[str, int]] = []
+    for name, qty in zip_longest(names, quantities, fillvalue=None):
+        mk = _normalize_match_key(name)
+        if not mk:
+            continue
+        q = _as_int(qty)
+        if q is None:
+            q = 1
+        if q <= 0:
+            continue
+        pairs.append((mk, q))
 
-            brand = getattr(transaction, "brand", None)
-            if not brand or db is None:
-                return 0
+    if not pairs:
+        return 0
 
-            names = evaled[0] if isinstance(evaled[0], list) else []
-            quantities = evaled[1] if isinstance(evaled[1], list) else []
+    match_keys = tuple(sorted({mk for mk, _ in pairs}))
 
-            pairs: list[tuple[str, int]] = []
-            for name, qty in zip_longest(names, quantities, fillvalue=None):
-                mk = _normalize_match_key(name)
-                if not mk:
-                    continue
-                q = _as_int(qty)
-                if q is None:
-                    q = 1
-                if q <= 0:
-                    continue
-                pairs.append((mk, q))
-
-            if not pairs:
-                return 0
-
-            match_keys = sorted({mk for mk, _ in pairs})
-            products = (
-                db.query(Product.match_key, Product.points_value)
-                .filter(Product.brand == brand)
-                .filter(Product.match_key.in_(match_keys))
-                .filter(Product.active.is_(True))
-                .all()
-            )
-            points_by_key = {mk: (pv or 0) for mk, pv in products}
-
-            total = 0
-            unknown = []
-            for mk, q in pairs:
-                pv = points_by_key.get(mk)
-                if pv is None:
-                    unknown.append(mk)
-                    continue
-                total += int(pv) * int(q)
+    def _load_products():
+        rows = (
+            db.query(Product.match_key, Product.points_value)
+            .filter(Product.brand == brand)
+            .filter(Product.match_key.in_(match_keys))
+            .filter(Product.active.is_(True))
+            .all()
+        )
+        return {mk: (pv or 0) for mk, pv in rows}
 
-            if unknown:
-                logger.info(
-                    "sum_product_points_unomi: unknown products ignored (brand=%s): %s",
-                    brand,
-                    ",".join(sorted(set(unknown))),
-                )
+    ctx = _evaluation_context.get()
+    if ctx is not None and ctx.db is db:
+        points_by_key = ctx.load(("products", brand, match_keys), _load_products)
+    else:
+        points_by_key = _load_products()
+
+    total = 0
+    unknown = []
+    for mk, q in pairs:
+        pv = points_by_key.get(mk)
+        if pv is None:
+            unknown.append(mk)
+            continue
+        total += int(pv) * int(q)
+
+    if unknown:
+        logger.info(
+            "sum_product_points_unomi: unknown products ignored (brand=%s): %s",
+            brand,
+            ",".join(sorted(set(unknown))),
+        )
 
-            return total
+    return total
 
-        raise ValueError(f"Unknown function: {fn}")
 
-    # Unknown dict => treat as literal object
-    return expr
+# `$fn` implementations keyed by normalized (lowercase) name.
+_EXPR_FUNCTIONS = {
+    "to_number": _fn_to_number,
+    "lower": _fn_lower,
+    "upper": _fn_upper,
+    "length": _fn_length,
+    "coalesce": _fn_coalesce,
+    "date_diff_days": _fn_date_diff_days,
+    "sum_product_points_unomi": _fn_sum_product_points_unomi,
+    "sum_product_points_unomi_arrays": _fn_sum_product_points_unomi,
+    "sum_product_points_unomi_arrays_v1": _fn_sum_product_points_unomi,
+}
+
+
+def _eval_expr(*, db: Session, customer, transaction, expr):
+    return compile_expr(expr)(db, customer, transaction)
 
 
 def _as_number_from_text(value: str) -> int | None:
@@ -342,6 +382,10 @@ def _resolve_action_number(*, db: Session, customer, action_value, transaction)
     else:
         raw = action_value
 
+    return _coerce_action_number(raw)
+
+
+def _coerce_action_number(raw) -> int | None:
     as_int = _as_int(raw)
     if as_int is not None:
         return as_int
@@ -414,11 +458,16 @@ def _resolve_field_value(*, db: Session, field: str, customer, transaction):
         if field.startswith("customer.metrics."):
             if not getattr(customer, "id", None):
                 return None
-            row = (
-                db.query(CustomerMetrics)
-                .filter(CustomerMetrics.customer_id == customer.id)
-                .filter(CustomerMetrics.brand == getattr(customer, "brand", None))
-                .first()
+            row = _load_field_family(
+                db,
+                customer,
+                "metrics",
+                lambda: (
+                    db.query(CustomerMetrics)
+                    .filter(CustomerMetrics.customer_id == customer.id)
+                    .filter(CustomerMetrics.brand == getattr(customer, "brand", None))
+                    .first()
+                ),
             )
             if not row:
                 return None
@@ -426,8 +475,18 @@ def _resolve_field_value(*, db: Session, field: str, customer, transaction):
         if field == "customer.rewards":
             if not getattr(customer, "id", None):
                 return []
-            rows = db.query(CustomerReward.reward_id).filter(CustomerReward.customer_id == customer.id).all()
-            return [str(r[0]) for r in rows if r and r[0] is not None]
+            reward_ids = _load_field_family(
+                db,
+                customer,
+                "rewards",
+                lambda: [
+                    str(r[0])
+                    for r in db.query(CustomerReward.reward_id).filter(CustomerReward.customer_id == customer.id).all()
+                    if r and r[0] is not None
+                ],
+            )
+            # Callers may mutate the list (contains/in); keep the memoized copy intact.
+            return list(reward_ids)
         if field in {"customer.birthdate", "customer.birthday"}:
             return format_customer_birthdate_wire(customer)
         return _get_by_path(customer, field[len("customer.") :])
@@ -468,301 +527,555 @@ def _op_exists(actual, expected):
     return exists if truthy else (not exists)
 
 
-def _compare(*, op: str, actual, expected) -> bool:
-    op = (op or "").lower()
-
+def _cmp_eq(actual, expected) -> bool:
     # Partial-birthdate-aware comparisons (month/day)
     a_mmdd = _as_mmdd(actual)
     e_mmdd = _as_mmdd(expected)
-    if op in {"eq", "="} and (a_mmdd is not None or e_mmdd is not None):
+    if a_mmdd is not None or e_mmdd is not None:
         return a_mmdd is not None and e_mmdd is not None and a_mmdd == e_mmdd
-    if op in {"neq", "!=", "ne"} and (a_mmdd is not None or e_mmdd is not None):
+    return actual == expected
+
+
+def _cmp_neq(actual, expected) -> bool:
+    a_mmdd = _as_mmdd(actual)
+    e_mmdd = _as_mmdd(expected)
+    if a_mmdd is not None or e_mmdd is not None:
         return not (a_mmdd is not None and e_mmdd is not None and a_mmdd == e_mmdd)
+    return actual != expected
 
-    if op in {"eq", "="}:
-        return actual == expected
-    if op in {"neq", "!=", "ne"}:
-        return actual != expected
-
-    if op == "exists":
-        return _op_exists(actual, expected)
-
-    if op == "in":
-        if not isinstance(expected, list):
-            raise ValueError("Operator 'in' requires list value")
-        if a_mmdd is not None and any(_as_mmdd(v) is not None for v in expected):
-            exp_mmdd = {_as_mmdd(v) for v in expected}
-            return a_mmdd in exp_mmdd
-        if isinstance(actual, list):
-            return any(a in expected for a in actual)
-        return actual in expected
-
-    if op == "contains":
-        if isinstance(actual, list):
-            return expected in actual
-        if isinstance(actual, str):
-            return str(expected) in actual
-        return False
 
-    if op == "between":
-        if not isinstance(expected, list) or len(expected) != 2:
-            raise ValueError("Operator 'between' requires [lo, hi]")
+def _cmp_in(actual, expected) -> bool:
+    if not isinstance(expected, list):
+        raise ValueError("Operator 'in' requires list value")
+    a_mmdd = _as_mmdd(actual)
+    if a_mmdd is not None and any(_as_mmdd(v) is not None for v in expected):
+        exp_mmdd = {_as_mmdd(v) for v in expected}
+        return a_mmdd in exp_mmdd
+    if isinstance(actual, list):
+        return any(a in expected for a in actual)
+    return actual in expected
 
-        if a_mmdd is not None and (_as_mmdd(expected[0]) is not None or _as_mmdd(expected[1]) is not None):
-            lo = _as_mmdd(expected[0])
-            hi = _as_mmdd(expected[1])
-            if lo is None or hi is None:
-                return False
-            return lo <= a_mmdd <= hi
 
-        a_dt = _as_datetime(actual)
-        if a_dt is not None:
-            lo = _as_datetime(expected[0])
-            hi = _as_datetime(expected[1])
-            if lo is None or hi is None:
-                return False
-            return lo <= a_dt <= hi
+def _cmp_contains(actual, expected) -> bool:
+    if isinstance(actual, list):
+        return expected in actual
+    if isinstance(actual, str):
+        return str(expected) in actual
+    return False
 
-        a = _as_float(actual)
-        lo = _as_float(expected[0])
-        hi = _as_float(expected[1])
-        if a is None or lo is None or hi is None:
+
+def _cmp_between(actual, expected) -> bool:
+    if not isinstance(expected, list) or len(expected) != 2:
+        raise ValueError("Operator 'between' requires [lo, hi]")
+
+    a_mmdd = _as_mmdd(actual)
+    if a_mmdd is not None and (_as_mmdd(expected[0]) is not None or _as_mmdd(expected[1]) is not None):
+        lo = _as_mmdd(expected[0])
+        hi = _as_mmdd(expected[1])
+        if lo is None or hi is None:
+            return False
+        return lo <= a_mmdd <= hi
+
+    a_dt = _as_datetime(actual)
+    if a_dt is not None:
+        lo = _as_datetime(expected[0])
+        hi = _as_datetime(expected[1])
+        if lo is None or hi is None:
             return False
-        return lo <= a <= hi
+        return lo <= a_dt <= hi
+
+    a = _as_float(actual)
+    lo = _as_float(expected[0])
+    hi = _as_float(expected[1])
+    if a is None or lo is None or hi is None:
+        return False
+    return lo <= a <= hi
+
 
-    if op in {"gt", "gte", "lt", "lte"}:
+def _ordering_comparator(cmp):
+    def _compare_ordered(actual, expected) -> bool:
+        a_mmdd = _as_mmdd(actual)
+        e_mmdd = _as_mmdd(expected)
         if a_mmdd is not None and e_mmdd is not None:
-            if op == "gt":
-                return a_mmdd > e_mmdd
-            if op == "gte":
-                return a_mmdd >= e_mmdd
-            if op == "lt":
-                return a_mmdd < e_mmdd
-            if op == "lte":
-                return a_mmdd <= e_mmdd
+            return cmp(a_mmdd, e_mmdd)
 
         a_dt = _as_datetime(actual)
         b_dt = _as_datetime(expected)
         if a_dt is not None and b_dt is not None:
-            if op == "gt":
-                return a_dt > b_dt
-            if op == "gte":
-                return a_dt >= b_dt
-            if op == "lt":
-                return a_dt < b_dt
-            if op == "lte":
-                return a_dt <= b_dt
+            return cmp(a_dt, b_dt)
 
         a = _as_float(actual)
         b = _as_float(expected)
         if a is None or b is None:
             return False
-        if op == "gt":
-            return a > b
-        if op == "gte":
-            return a >= b
-        if op == "lt":
-            return a < b
-        if op == "lte":
-            return a <= b
+        return cmp(a, b)
 
-    raise ValueError(f"Unsupported operator: {op}")
+    return _compare_ordered
 
 
-def _evaluate_ast_condition(*, db: Session, customer, transaction, node) -> bool:
+# Comparators keyed by normalized (lowercase) operator name.
+_COMPARATORS = {
+    "eq": _cmp_eq,
+    "=": _cmp_eq,
+    "neq": _cmp_neq,
+    "!=": _cmp_neq,
+    "ne": _cmp_neq,
+    "exists": _op_exists,
+    "in": _cmp_in,
+    "contains": _cmp_contains,
+    "between": _cmp_between,
+    "gt": _ordering_comparator(operator.gt),
+    "gte": _ordering_comparator(operator.ge),
+    "lt": _ordering_comparator(operator.lt),
+    "lte": _ordering_comparator(operator.le),
+}
+
+
+def _compare(*, op: str, actual, expected) -> bool:
+    op = (op or "").lower()
+    comparator = _COMPARATORS.get(op)
+    if comparator is None:
+        raise ValueError(f"Unsupported operator: {op}")
+    return comparator(actual, expected)
+
+
+# ---------------------------------------------------------------------------
+# Compilation: conditions, expressions and actions are turned into closures
+# ``fn(db, customer, transaction)`` once, so op / $fn / action-type dispatch and
+# path splitting happen at compile time instead of on every evaluation.
+# Format errors are deferred into closures that raise when reached, which keeps
+# the interpreter's short-circuit semantics (an invalid branch behind a false
+# ``and`` never fails the rule).
+# ---------------------------------------------------------------------------
+
+
+def _compiled_error(message: str):
+    def _raise(db, customer, transaction):
+        raise ValueError(message)
+
+    return _raise
+
+
+def _compiled_const(value):
+    def _const(db, customer, transaction):
+        return value
+
+    return _const
+
+
+def _always_true(db, customer, transaction) -> bool:
+    return True
+
+
+def _has_expr_marker(value) -> bool:
+    return isinstance(value, dict) and ("$path" in value or "$fn" in value or "$system" in value)
+
+
+def _has_system_marker(value) -> bool:
+    if isinstance(value, dict):
+        return "$system" in value
+    if isinstance(value, list):
+        return any(_has_system_marker(v) for v in value)
+    return False
+
+
+def compile_field_resolver(field):
+    if not isinstance(field, str) or not field:
+        return _compiled_error("Condition leaf requires non-empty 'field'")
+
+    if field.startswith("payload."):
+        parts = tuple(field[len("payload.") :].split("."))
+
+        def _payload_field(db, customer, transaction):
+            return _get_by_parts(transaction.payload or {}, parts)
+
+        return _payload_field
+
+    if field.startswith("customer."):
+        if field.startswith("customer.metrics.") or field == "customer.rewards":
+
+            def _db_field(db, customer, transaction):
+                return _resolve_field_value(db=db, field=field, customer=customer, transaction=transaction)
+
+            return _db_field
+        if field in {"customer.birthdate", "customer.birthday"}:
+
+            def _birthdate_field(db, customer, transaction):
+                return format_customer_birthdate_wire(customer)
+
+            return _birthdate_field
+
+        parts = tuple(field[len("customer.") :].split("."))
+
+        def _customer_field(db, customer, transaction):
+            return _get_by_parts(customer, parts)
+
+        return _customer_field
+
+    if field.startswith("system."):
+        # Time-dependent: resolved on every evaluation.
+        def _system_field(db, customer, transaction):
+            return _resolve_field_value(db=db, field=field, customer=customer, transaction=transaction)
+
+        return _system_field
+
+    return _compiled_error(f"Unsupported field namespace: {field}. Use payload.*, customer.* or system.*")
+
+
+def compile_expr(expr):
+    if expr is None:
+        return _compiled_const(None)
+
+    if isinstance(expr, list):
+        items = tuple(compile_expr(e) for e in expr)
+
+        def _list(db, customer, transaction):
+            return [item(db, customer, transaction) for item in items]
+
+        return _list
+
+    if not isinstance(expr, dict):
+        return _compiled_const(expr)
+
+    if "$system" in expr:
+        key = expr.get("$system")
+        if not isinstance(key, str) or not key:
+            return _compiled_error("Invalid system preset: expected non-empty '$system' string")
+        if len(expr) > 1:
+
+            def _system_preset(db, customer, transaction):
+                from app.services.system_value_presets import resolve_system_preset_value
+
+                return resolve_system_preset_value(expr, context="generic")
+
+            return _system_preset
+
+        def _system(db, customer, transaction):
+            return _resolve_system_value(key=key, customer=customer)
+
+        return _system
+
+    if "$path" in expr:
+        path = expr.get("$path")
+        if not isinstance(path, str) or not path.strip():
+            return _compiled_error("Invalid $path: expected non-empty string")
+        return compile_field_resolver(path.strip())
+
+    if "$fn" in expr:
+        fn = expr.get("$fn")
+        args = expr.get("args")
+        if not isinstance(fn, str) or not fn:
+            return _compiled_error("Invalid $fn: expected non-empty string")
+        if args is None:
+            args = []
+        if not isinstance(args, list):
+            return _compiled_error("Invalid $fn args: expected list")
+
+        compiled_args = tuple(compile_expr(a) for a in args)
+        impl = _EXPR_FUNCTIONS.get(fn.strip().lower())
+
+        def _call(db, customer, transaction):
+            evaled = [a(db, customer, transaction) for a in compiled_args]
+            if impl is None:
+                raise ValueError(f"Unknown function: {fn}")
+            profile = rule_profiling.current_rule_profile()
+            if profile is None:
+                return impl(evaled, db=db, transaction=transaction)
+            with profile.function(fn.strip().lower()):
+                return impl(evaled, db=db, transaction=transaction)
+
+        return _call
+
+    # Unknown dict => treat as literal object
+    return _compiled_const(expr)
+
+
+def _compile_leaf(node: dict):
+    field = node.get("field")
+    op = node.get("operator")
+    if op is None:
+        op = node.get("op")
+    if not op:
+        return _compiled_error("Condition leaf requires 'operator' (or alias 'op')")
+
+    raw_value = node.get("value")
+    if _has_expr_marker(raw_value) and ("$path" in raw_value or "$fn" in raw_value):
+        value_fn = compile_expr(raw_value)
+    elif _has_system_marker(raw_value):
+        # $system presets depend on the current time: resolve per evaluation.
+        def value_fn(db, customer, transaction):
+            return _resolve_expected_value(customer=customer, value=raw_value, field=field)
+
+    else:
+        value_fn = _compiled_const(_resolve_expected_value(customer=None, value=raw_value, field=field))
+
+    if field in {"customer.birthdate", "customer.birthday"}:
+
+        def _birthdate_leaf(db, customer, transaction):
+            return compare_birthdate(op=op, customer=customer, expected=value_fn(db, customer, transaction))
+
+        return _birthdate_leaf
+
+    comparator = _COMPARATORS.get(op.lower()) if isinstance(op, str) else None
+    if comparator is None:
+        # Unknown operator: keep the interpreter's error (raised after operands are resolved).
+        def comparator(actual, expected):
+            return _compare(op=op, actual=actual, expected=expected)
+
+    resolve_actual = compile_field_resolver(field)
+
+    def _leaf(db, customer, transaction):
+        value = value_fn(db, customer, transaction)
+        return comparator(resolve_actual(db, customer, transaction), value)
+
+    return _leaf
+
+
+def compile_condition(node):
+    """Compile a condition AST into ``fn(db, customer, transaction) -> bool``."""
     if node is None:
-        return True
+        return _always_true
 
     if not isinstance(node, dict):
-        raise ValueError("Invalid condition format: expected object")
+        return _compiled_error("Invalid condition format: expected object")
 
     if "and" in node:
         items = node.get("and")
         if not isinstance(items, list):
-            raise ValueError("Invalid 'and' condition: expected list")
-        return all(_evaluate_ast_condition(db=db, customer=customer, transaction=transaction, node=i) for i in items)
+            return _compiled_error("Invalid 'and' condition: expected list")
+        compiled_and = tuple(compile_condition(i) for i in items)
+
+        def _and(db, customer, transaction):
+            return all(c(db, customer, transaction) for c in compiled_and)
+
+        return _and
 
     if "or" in node:
         items = node.get("or")
         if not isinstance(items, list):
-            raise ValueError("Invalid 'or' condition: expected list")
-        return any(_evaluate_ast_condition(db=db, customer=customer, transaction=transaction, node=i) for i in items)
+            return _compiled_error("Invalid 'or' condition: expected list")
+        compiled_or = tuple(compile_condition(i) for i in items)
+
+        def _or(db, customer, transaction):
+            return any(c(db, customer, transaction) for c in compiled_or)
+
+        return _or
 
     if "not" in node:
-        return not _evaluate_ast_condition(db=db, customer=customer, transaction=transaction, node=node.get("not"))
+        inner = compile_condition(node.get("not"))
+
+        def _not(db, customer, transaction):
+            return not inner(db, customer, transaction)
+
+        return _not
 
     if "field" in node:
-        field = node.get("field")
-        op = node.get("operator")
-        if op is None:
-            op = node.get("op")
-        if not op:
-            raise ValueError("Condition leaf requires 'operator' (or alias 'op')")
-        raw_value = node.get("value")
-        if isinstance(raw_value, dict) and ("$path" in raw_value or "$fn" in raw_value or "$system" in raw_value):
-            if "$system" in raw_value and not ("$path" in raw_value or "$fn" in raw_value):
-                value = _resolve_expected_value(customer=customer, value=raw_value, field=field)
-            else:
-                value = _eval_expr(db=db, customer=customer, transaction=transaction, expr=raw_value)
-        else:
-            value = _resolve_expected_value(customer=customer, value=raw_value, field=field)
-        if field in {"customer.birthdate", "customer.birthday"}:
-            return compare_birthdate(op=op, customer=customer, expected=value)
-        actual = _resolve_field_value(db=db, field=field, customer=customer, transaction=transaction)
-        return _compare(op=op, actual=actual, expected=value)
+        return _compile_leaf(node)
 
-    raise ValueError(
+    return _compiled_error(
         "Invalid condition format: expected {'and':[...]}, {'or':[...]}, {'not':...} or leaf {'field':..., 'operator':..., 'value':...}"
     )
 
 
+def _evaluate_ast_condition(*, db: Session, customer, transaction, node) -> bool:
+    return compile_condition(node)(db, customer, transaction)
+
+
 def _evaluate_condition_block(db: Session, customer, transaction, conditions) -> bool:
     return _evaluate_ast_condition(db=db, customer=customer, transaction=transaction, node=conditions)
 
 
-def _execute_actions(db: Session, customer, transaction, actions):
-    if actions is None:
-        return []
-    if isinstance(actions, dict):
-        actions = [actions]
-    if not isinstance(actions, list):
-        raise ValueError("Invalid actions format")
+_DEPRECATED_ACTION_TYPES = {"burn_points", "issue_reward", "use_coupon", "set_rank"}
 
-    executed = []
-    for action_index, action in enumerate(actions):
-        if not isinstance(action, dict):
-            raise ValueError("Invalid action")
 
-        action_type = action.get("type")
+def _compile_deprecated_action(action: dict, action_index: int):
+    action_type = str(action.get("type"))
 
-        # Backward-compatibility: old rules may still exist in DB.
-        # These actions are deprecated and must have no side effects.
-        if action_type in {"burn_points", "issue_reward", "use_coupon", "set_rank"}:
-            executed.append({"type": str(action_type), "ignored": True})
-            continue
+    # Backward-compatibility: old rules may still exist in DB.
+    # These actions are deprecated and must have no side effects.
+    def _ignored(db, customer, transaction):
+        return {"type": action_type, "ignored": True}
 
-        if action_type == "earn_points":
-            points = action.get("points")
-            multiplier = action.get("multiplier")
-            points_int = _resolve_action_number(
-                db=db,
-                customer=customer,
-                action_value=points,
-                transaction=transaction,
-            )
+    return _ignored
+
+
+def _compile_earn_points(action: dict, action_index: int):
+    points = action.get("points")
+    mult_int = _as_int(action.get("multiplier"))
+    points_expr = compile_expr(points) if _has_expr_marker(points) else None
+    static_points = (
+        None
+        if points_expr is not None
+        else _resolve_action_number(db=None, customer=None, action_value=points, transaction=None)
+    )
 
-            if isinstance(points, dict) and points_int is None and (
-                "$path" in points or "$fn" in points or "$system" in points
-            ):
+    def _earn(db, customer, transaction):
+        if points_expr is not None:
+            points_int = _coerce_action_number(points_expr(db, customer, transaction))
+            if points_int is None:
                 payload = transaction.payload if isinstance(transaction.payload, dict) else {}
                 keys = sorted([str(k) for k in payload.keys()])
                 raise ValueError(
                     f"earn_points: points value could not be resolved from expression {points!r}. "
                     f"Check transaction.payload shape. Available payload keys: {keys}"
                 )
+        else:
+            points_int = static_points
+
+        if mult_int is not None:
+            points_int = (points_int or 0) * mult_int
+
+        depth = _as_int(_get_by_path(transaction.payload or {}, "_ruleDepth")) or 0
+        earn_points(
+            db,
+            customer,
+            points=points_int,
+            source_transaction_id=transaction.id,
+            depth=depth,
+        )
+        return {"type": "earn_points", "points": points_int, "multiplier": mult_int}
+
+    return _earn
+
+
+def _compile_issue_coupon(action: dict, action_index: int):
+    coupon_type_id = action.get("coupon_type_id") or action.get("couponTypeId") or action.get("couponTypeID")
+    if isinstance(coupon_type_id, dict):
+        coupon_type_id = coupon_type_id.get("id") or coupon_type_id.get("couponTypeId") or coupon_type_id.get(
+            "coupon_type_id"
+        )
+    if coupon_type_id is not None:
+        coupon_type_id = str(coupon_type_id)
+    if not coupon_type_id:
+        return _compiled_error("issue_coupon requires coupon_type_id")
+
+    frequency = action.get("frequency") or "ONCE_PER_CALENDAR_YEAR"
+    frequency = str(frequency)
+
+    reward_ids = action.get("reward_ids")
+    if reward_ids is None:
+        reward_ids = action.get("rewardIds")
+    if reward_ids is not None and not isinstance(reward_ids, list):
+        return _compiled_error("issue_coupon: reward_ids must be a list")
+
+    def _issue(db, customer, transaction):
+        rule_id = _get_by_path(transaction.payload or {}, "_ruleContext.rule_id")
+        rule_execution_id = _get_by_path(transaction.payload or {}, "_ruleContext.rule_execution_id")
+
+        idempotency_key = None
+        if transaction.id and rule_id and rule_execution_id and coupon_type_id:
+            idempotency_key = f"issue_coupon:{transaction.id}:{rule_id}:{rule_execution_id}:{action_index}:{coupon_type_id}"
+
+        coupon = issue_coupon(
+            db,
+            customer=customer,
+            transaction=transaction,
+            coupon_type_id=coupon_type_id,
+            frequency=frequency,  # validated in service
+            reward_ids=reward_ids,
+            rule_id=str(rule_id) if rule_id is not None else None,
+            rule_execution_id=str(rule_execution_id) if rule_execution_id is not None else None,
+            idempotency_key=idempotency_key,
+        )
+        issued_reward_ids = getattr(coupon, "_issued_reward_ids", None)
+        return {
+            "type": "issue_coupon",
+            "couponId": str(coupon.id) if coupon and getattr(coupon, "id", None) else None,
+            "couponTypeId": coupon_type_id,
+            "frequency": frequency,
+            "requestedRewardIds": reward_ids,
+            "issuedRewardIds": issued_reward_ids,
+        }
+
+    return _issue
 
-            mult_int = _as_int(multiplier)
-            if mult_int is not None:
-                points_int = (points_int or 0) * mult_int
 
-            depth = _as_int(_get_by_path(transaction.payload or {}, "_ruleDepth")) or 0
-            earn_points(
+def _compile_reset_status_points(action: dict, action_index: int):
+    def _reset(db, customer, transaction):
+        locked_customer = db.query(Customer).filter(Customer.id == customer.id).with_for_update().one()
+
+        from app.services.wallet_service import get_status_points_balance
+
+        balance = int(get_status_points_balance(db, locked_customer.id) or 0)
+        if balance > 0:
+            from app.services.point_ledger_service import add_point_movement
+
+            add_point_movement(
                 db,
-                customer,
-                points=points_int,
+                customer_id=locked_customer.id,
+                points=-balance,
+                type="ADJUST",
                 source_transaction_id=transaction.id,
-                depth=depth,
+                expires_at=None,
             )
-            executed.append({"type": action_type, "points": points_int, "multiplier": mult_int})
 
-        elif action_type == "issue_coupon":
-            coupon_type_id = action.get("coupon_type_id") or action.get("couponTypeId") or action.get("couponTypeID")
-            if isinstance(coupon_type_id, dict):
-                coupon_type_id = coupon_type_id.get("id") or coupon_type_id.get("couponTypeId") or coupon_type_id.get(
-                    "coupon_type_id"
-                )
-            if coupon_type_id is not None:
-                coupon_type_id = str(coupon_type_id)
-            if not coupon_type_id:
-                raise ValueError("issue_coupon requires coupon_type_id")
+        locked_customer.status_points = 0
+        locked_customer.status_points_reset_at = datetime.utcnow()
+        db.flush()
 
-            frequency = action.get("frequency") or "ONCE_PER_CALENDAR_YEAR"
-            frequency = str(frequency)
+        from app.services.loyalty_status_service import update_customer_status
 
-            reward_ids = action.get("reward_ids")
-            if reward_ids is None:
-                reward_ids = action.get("rewardIds")
-            if reward_ids is not None and not isinstance(reward_ids, list):
-                raise ValueError("issue_coupon: reward_ids must be a list")
+        depth = _as_int(_get_by_path(transaction.payload or {}, "_ruleDepth")) or 0
+        update_customer_status(
+            db,
+            locked_customer,
+            reason="RESET",
+            source_transaction_id=transaction.id,
+            depth=depth,
+        )
+        return {"type": "reset_status_points"}
 
-            rule_id = _get_by_path(transaction.payload or {}, "_ruleContext.rule_id")
-            rule_execution_id = _get_by_path(transaction.payload or {}, "_ruleContext.rule_execution_id")
+    return _reset
 
-            idempotency_key = None
-            if transaction.id and rule_id and rule_execution_id and coupon_type_id:
-                idempotency_key = f"issue_coupon:{transaction.id}:{rule_id}:{rule_execution_id}:{action_index}:{coupon_type_id}"
 
-            coupon = issue_coupon(
-                db,
-                customer=customer,
-                transaction=transaction,
-                coupon_type_id=coupon_type_id,
-                frequency=frequency,  # validated in service
-                reward_ids=reward_ids,
-                rule_id=str(rule_id) if rule_id is not None else None,
-                rule_execution_id=str(rule_execution_id) if rule_execution_id is not None else None,
-                idempotency_key=idempotency_key,
-            )
-            issued_reward_ids = getattr(coupon, "_issued_reward_ids", None)
-            executed.append(
-                {
-                    "type": action_type,
-                    "couponId": str(coupon.id) if coupon and getattr(coupon, "id", None) else None,
-                    "couponTypeId": coupon_type_id,
-                    "frequency": frequency,
-                    "requestedRewardIds": reward_ids,
-                    "issuedRewardIds": issued_reward_ids,
-                }
-            )
+_ACTION_COMPILERS = {
+    "earn_points": _compile_earn_points,
+    "issue_coupon": _compile_issue_coupon,
+    "reset_status_points": _compile_reset_status_points,
+}
 
-        elif action_type == "reset_status_points":
-            locked_customer = db.query(Customer).filter(Customer.id == customer.id).with_for_update().one()
-
-            from app.models.point_movement import PointMovement
-            from app.services.wallet_service import get_status_points_balance
-
-            balance = int(get_status_points_balance(db, locked_customer.id) or 0)
-            if balance > 0:
-                db.add(
-                    PointMovement(
-                        customer_id=locked_customer.id,
-                        points=-balance,
-                        type="ADJUST",
-                        source_transaction_id=transaction.id,
-                        expires_at=None,
-                    )
-                )
 
-            locked_customer.status_points = 0
-            locked_customer.status_points_reset_at = datetime.utcnow()
-            db.flush()
+def _compile_action(action, action_index: int):
+    if not isinstance(action, dict):
+        return _compiled_error("Invalid action")
 
-            from app.services.loyalty_status_service import update_customer_status
+    action_type = action.get("type")
+    if isinstance(action_type, str) and action_type in _DEPRECATED_ACTION_TYPES:
+        return _compile_deprecated_action(action, action_index)
 
-            depth = _as_int(_get_by_path(transaction.payload or {}, "_ruleDepth")) or 0
-            update_customer_status(
-                db,
-                locked_customer,
-                reason="RESET",
-                source_transaction_id=transaction.id,
-                depth=depth,
-            )
-            executed.append({"type": action_type})
+    compiler = _ACTION_COMPILERS.get(action_type) if isinstance(action_type, str) else None
+    if compiler is None:
+        return _compiled_error(f"Unknown action type: {action_type}")
+    return compiler(action, action_index)
 
-        else:
-            raise ValueError(f"Unknown action type: {action_type}")
 
-    return executed
+def compile_actions(actions):
+    """Compile a rule's actions into ``fn(db, customer, transaction) -> list[dict]``."""
+    if actions is None:
+        return lambda db, customer, transaction: []
+    if isinstance(actions, dict):
+        actions = [actions]
+    if not isinstance(actions, list):
+        return _compiled_error("Invalid actions format")
+
+    steps = tuple(_compile_action(action, action_index) for action_index, action in enumerate(actions))
+    action_types = tuple(a.get("type") if isinstance(a, dict) else None for a in actions)
+
+    def _run(db, customer, transaction):
+        profile = rule_profiling.current_rule_profile()
+        if profile is None:
+            return [step(db, customer, transaction) for step in steps]
+        results = []
+        for index, step in enumerate(steps):
+            with profile.action(index, action_types[index]):
+                results.append(step(db, customer, transaction))
+        return results
+
+    return _run
+
+
+def _execute_actions(db: Session, customer, transaction, actions):
+    return compile_actions(actions)(db, customer, transaction)
 
 
 def process_transaction_rules(db: Session, transaction):
@@ -786,24 +1099,8 @@ def process_transaction_rules(db: Session, transaction):
         transaction.status = "PROCESSED"
         return
 
-    # Match rules by ANY (OR): transaction.transaction_type must be included in rule.transaction_types.
-    # Backward compatibility: legacy rules may have transaction_types NULL; they match via transaction_type.
-    rules = (
-        db.query(Rule)
-        .filter(Rule.brand == transaction.brand)
-        .filter(Rule.active == True)
-        .filter(
-            sa.or_(
-                Rule.transaction_types.any(transaction.transaction_type),
-                sa.and_(Rule.transaction_types.is_(None), Rule.transaction_type == transaction.transaction_type),
-            )
-        )
-        .order_by(asc(Rule.priority), asc(Rule.id))
-        .all()
-    )
-
-    # Rules with no actions are effectively no-ops; skip them entirely to avoid wasting resources.
-    rules = [r for r in rules if r and getattr(r, "actions", None)]
+    plan = get_rule_plan(db, brand=transaction.brand, transaction_type=transaction.transaction_type)
+    rules = plan.rules
 
     if not rules:
         if not transaction.error_code:
@@ -816,75 +1113,137 @@ def process_transaction_rules(db: Session, transaction):
         transaction.status = "PROCESSED"
         return
 
+    # One membership snapshot per transaction: all segment-gated rules share one query.
+    segment_membership = SegmentMembershipResolver(
+        db,
+        customer=customer,
+        segment_ids={sid for rule in rules for sid in rule.segment_ids},
+    )
+
     had_rule_failures = False
     points_earned_total = 0
     had_matching_rule = False
-    for rule in rules:
+    evaluation_seconds = 0.0
+    action_seconds = 0.0
+    profiling = rule_profiling.profiling_enabled()
+    if profiling:
+        rule_profiling.install_statement_counter(db.get_bind())
+    with rule_evaluation_context(db, customer) as eval_ctx:
+
+        def _round_trips() -> int:
+            return eval_ctx.db_round_trips + segment_membership.db_round_trips
+
+        for rule in rules:
+            trips_before = _round_trips()
+            rule_started = time.perf_counter()
+            rule_action_seconds = 0.0
+            outcome = "failed"
+            execution = None
+            profile = rule_profiling.RuleProfile() if profiling else None
+            profile_token = rule_profiling.activate_profile(profile)
 
-        try:
-            seg_ids = getattr(rule, "segment_ids", None)
-            if seg_ids:
-                seg_ids = [s for s in seg_ids if s is not None]
-            if seg_ids:
-                if not is_customer_in_any_segment(db, customer=customer, segment_ids=seg_ids):
+            try:
+                if rule.segment_ids:
+                    with rule_profiling.segment_gate(profile):
+                        in_segment = segment_membership.is_in_any_segment(rule.segment_ids)
+                    if not in_segment:
+                        outcome = "not_in_segment"
+                        execution = TransactionRuleExecution(
+                            transaction_id=transaction.id,
+                            rule_id=rule.id,
+                            result="SKIPPED",
+                            details={
+                                "matched": False,
+                                "segment": "not_in_segment",
+                                "db_round_trips": _round_trips() - trips_before,
+                            },
+                        )
+                        db.add(execution)
+                        continue
+
+                with rule_profiling.condition(profile):
+                    matched = rule.evaluate(db, customer, transaction)
+                if not matched:
+                    outcome = "skipped"
                     execution = TransactionRuleExecution(
                         transaction_id=transaction.id,
                         rule_id=rule.id,
                         result="SKIPPED",
-                        details={"matched": False, "segment": "not_in_segment"},
+                        details={"matched": False, "db_round_trips": _round_trips() - trips_before},
                     )
                     db.add(execution)
                     continue
 
-            matched = _evaluate_condition_block(db, customer, transaction, rule.conditions)
-            if not matched:
+                outcome = "matched"
+                executed_actions = []
                 execution = TransactionRuleExecution(
                     transaction_id=transaction.id,
                     rule_id=rule.id,
-                    result="SKIPPED",
-                    details={"matched": False},
+                    result="SUCCESS",
+                    details={"matched": True, "actions": []},
                 )
                 db.add(execution)
-                continue
-
-            executed_actions = []
-            execution = TransactionRuleExecution(
-                transaction_id=transaction.id,
-                rule_id=rule.id,
-                result="SUCCESS",
-                details={"matched": True, "actions": []},
-            )
-            db.add(execution)
-            db.flush()
-
-            payload = transaction.payload if isinstance(transaction.payload, dict) else {}
-            ctx = payload.get("_ruleContext") if isinstance(payload.get("_ruleContext"), dict) else {}
-            ctx["rule_id"] = str(rule.id)
-            ctx["rule_execution_id"] = str(execution.id)
-            payload["_ruleContext"] = ctx
-            transaction.payload = payload
-
-            with db.begin_nested():
-                executed_actions = _execute_actions(db, customer, transaction, rule.actions)
                 db.flush()
 
-            execution.details = {"matched": True, "actions": executed_actions}
-            had_matching_rule = True
-            for act in executed_actions:
-                if isinstance(act, dict) and act.get("type") == "earn_points":
-                    pts = act.get("points")
-                    if isinstance(pts, int) and pts > 0:
-                        points_earned_total += pts
+                payload = transaction.payload if isinstance(transaction.payload, dict) else {}
+                ctx = payload.get("_ruleContext") if isinstance(payload.get("_ruleContext"), dict) else {}
+                ctx["rule_id"] = str(rule.id)
+                ctx["rule_execution_id"] = str(execution.id)
+                payload["_ruleContext"] = ctx
+                transaction.payload = payload
+
+                actions_started = time.perf_counter()
+                try:
+                    with db.begin_nested():
+                        executed_actions = rule.execute(db, customer, transaction)
+                        db.flush()
+                finally:
+                    rule_action_seconds = time.perf_counter() - actions_started
+                    # Actions may have changed metrics / rewards: later rules must reload them.
+                    eval_ctx.invalidate()
+
+                execution.details = {
+                    "matched": True,
+                    "actions": executed_actions,
+                    "db_round_trips": _round_trips() - trips_before,
+                }
+                had_matching_rule = True
+                for act in executed_actions:
+                    if isinstance(act, dict) and act.get("type") == "earn_points":
+                        pts = act.get("points")
+                        if isinstance(pts, int) and pts > 0:
+                            points_earned_total += pts
+
+            except Exception as e:
+                had_rule_failures = True
+                outcome = "failed"
+                execution = TransactionRuleExecution(
+                    transaction_id=transaction.id,
+                    rule_id=rule.id,
+                    result="FAILED",
+                    details={"error": str(e), "db_round_trips": _round_trips() - trips_before},
+                )
+                db.add(execution)
+
+            finally:
+                rule_evaluation_seconds = time.perf_counter() - rule_started - rule_action_seconds
+                evaluation_seconds += rule_evaluation_seconds
+                action_seconds += rule_action_seconds
+                RULE_EVALUATION_DURATION.observe(rule_evaluation_seconds, rule_id=str(rule.id))
+                RULE_EVALUATIONS.inc(rule_id=str(rule.id), outcome=outcome)
+                rule_profiling.deactivate_profile(profile_token)
+                if profile is not None:
+                    if execution is not None:
+                        execution.details = {**(execution.details or {}), "profile": profile.as_details()}
+                    rule_profiling.record_rule_cost(
+                        rule_id=rule.id, brand=transaction.brand, outcome=outcome, profile=profile
+                    )
 
-        except Exception as e:
-            had_rule_failures = True
-            execution = TransactionRuleExecution(
-                transaction_id=transaction.id,
-                rule_id=rule.id,
-                result="FAILED",
-                details={"error": str(e)},
-            )
-            db.add(execution)
+    if profiling:
+        rule_profiling.flush_rule_costs()
+
+    INGEST_STAGE_DURATION.observe(evaluation_seconds, stage="rule_evaluation")
+    INGEST_STAGE_DURATION.observe(action_seconds, stage="actions")
 
     transaction.status = "PROCESSED_ERRORS" if had_rule_failures else "PROCESSED"
 
@@ -892,7 +1251,8 @@ def process_transaction_rules(db: Session, transaction):
         from app.services.unomi_profile_service import maybe_sync_customer_to_unomi_after_transaction
 
         try:
-            maybe_sync_customer_to_unomi_after_transaction(db, customer=customer, transaction=transaction)
+            with ingest_stage("unomi_sync"):
+                maybe_sync_customer_to_unomi_after_transaction(db, customer=customer, transaction=transaction)
         except Exception as e:
             logger.warning(
                 "post-transaction Unomi sync failed (transaction kept PROCESSED) brand=%s tx=%s: %s",
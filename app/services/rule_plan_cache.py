@@ -0,0 +1,152 @@
+"""Compiled rule plans cached per (brand, transaction_type).
+
+Ingest used to re-query ``rules`` and re-interpret every condition AST for each event.
+A plan holds the active rules for one (brand, transaction_type), already ordered and
+compiled into closures (see ``compile_condition`` / ``compile_actions`` in rule_engine).
+
+Invalidation:
+  - ``invalidate_rule_plans(brand)`` bumps the brand's rule version; it is called by
+    ``app/routes/rules.py`` after every create / patch / reorder / delete commit.
+  - ``RULE_PLAN_CACHE_TTL_SECONDS`` (default 60) bounds staleness for processes that do
+    not see the bump (other uvicorn workers, the internal job scheduler). ``0`` disables
+    the cache entirely (every call loads a fresh plan).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy import asc
+from sqlalchemy.orm import Session
+
+from app.models.rule import Rule
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    id: UUID
+    name: str | None
+    priority: int | None
+    segment_ids: tuple[UUID, ...]
+    conditions: Any
+    actions: Any
+    evaluate: Callable[..., bool]
+    execute: Callable[..., list]
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    brand: str
+    transaction_type: str
+    version: int
+    loaded_at: float
+    rules: tuple[CompiledRule, ...]
+
+
+_lock = threading.Lock()
+_brand_versions: dict[str, int] = {}
+_plans: dict[tuple[str, str], RulePlan] = {}
+
+
+def _brand_key(brand: str | None) -> str:
+    return (brand or "").strip().lower()
+
+
+def _ttl_seconds() -> float:
+    raw = os.getenv("RULE_PLAN_CACHE_TTL_SECONDS")
+    if raw is None or not str(raw).strip():
+        return 60.0
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return 60.0
+
+
+def rule_plan_version(brand: str) -> int:
+    with _lock:
+        return _brand_versions.get(_brand_key(brand), 0)
+
+
+def invalidate_rule_plans(brand: str) -> int:
+    """Bump the brand's rule version and drop its cached plans. Returns the new version."""
+    key = _brand_key(brand)
+    with _lock:
+        version = _brand_versions.get(key, 0) + 1
+        _brand_versions[key] = version
+        for plan_key in [k for k in _plans if _brand_key(k[0]) == key]:
+            del _plans[plan_key]
+    return version
+
+
+def clear_rule_plan_cache() -> None:
+    with _lock:
+        _plans.clear()
+
+
+def compile_rule(rule: Rule) -> CompiledRule:
+    from app.services.rule_engine import compile_actions, compile_condition
+
+    seg_ids = tuple(s for s in (getattr(rule, "segment_ids", None) or []) if s is not None)
+    return CompiledRule(
+        id=rule.id,
+        name=getattr(rule, "name", None),
+        priority=getattr(rule, "priority", None),
+        segment_ids=seg_ids,
+        conditions=rule.conditions,
+        actions=rule.actions,
+        evaluate=compile_condition(rule.conditions),
+        execute=compile_actions(rule.actions),
+    )
+
+
+def load_rule_plan(db: Session, *, brand: str, transaction_type: str, version: int = 0) -> RulePlan:
+    # Match rules by ANY (OR): transaction.transaction_type must be included in rule.transaction_types.
+    # Backward compatibility: legacy rules may have transaction_types NULL; they match via transaction_type.
+    rules = (
+        db.query(Rule)
+        .filter(Rule.brand == brand)
+        .filter(Rule.active == True)
+        .filter(
+            sa.or_(
+                Rule.transaction_types.any(transaction_type),
+                sa.and_(Rule.transaction_types.is_(None), Rule.transaction_type == transaction_type),
+            )
+        )
+        .order_by(asc(Rule.priority), asc(Rule.id))
+        .all()
+    )
+
+    # Rules with no actions are effectively no-ops; skip them entirely to avoid wasting resources.
+    compiled = tuple(compile_rule(r) for r in rules if r and getattr(r, "actions", None))
+    return RulePlan(
+        brand=brand,
+        transaction_type=transaction_type,
+        version=version,
+        loaded_at=time.monotonic(),
+        rules=compiled,
+    )
+
+
+def get_rule_plan(db: Session, *, brand: str, transaction_type: str) -> RulePlan:
+    ttl = _ttl_seconds()
+    cache_key = (brand, transaction_type)
+
+    with _lock:
+        version = _brand_versions.get(_brand_key(brand), 0)
+        plan = _plans.get(cache_key) if ttl > 0 else None
+    if plan is not None and plan.version == version and (time.monotonic() - plan.loaded_at) < ttl:
+        return plan
+
+    plan = load_rule_plan(db, brand=brand, transaction_type=transaction_type, version=version)
+    if ttl > 0:
+        with _lock:
+            # A concurrent invalidation wins: do not publish a plan built from the old version.
+            if _brand_versions.get(_brand_key(brand), 0) == version:
+                _plans[cache_key] = plan
+    return plan
@@ -0,0 +1,422 @@
+"""Opt-in per-rule cost profiling (``RULE_PROFILING_ENABLED=true``, default off).
+
+When enabled, ``process_transaction_rules`` opens a ``RuleProfile`` per evaluated rule
+and stores it under ``TransactionRuleExecution.details["profile"]``:
+
+    {"segment_ms", "condition_ms", "sql_statements",
+     "functions": {"sum_product_points_unomi": {"calls", "ms"}},
+     "actions": [{"index", "type", "ms", "sql_statements"}]}
+
+``sql_statements`` counts cursor executions on the session's engine while the segment
+gate and the condition run (actions carry their own count).
+
+Profiles are also folded into per-process deltas keyed by (rule, UTC day) and upserted
+additively into ``rule_cost_stats`` at most every ``RULE_PROFILING_FLUSH_SECONDS``
+(default 10) on a separate short session, so concurrent ingest never contends on the
+stats rows. Buckets older than ``RULE_PROFILING_RETENTION_DAYS`` (default 30) are pruned.
+``GET /admin/rules/slow`` reads the rolling window.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+
+from app.models.rule_cost_stat import RuleCostStat
+
+
+logger = logging.getLogger(__name__)
+
+
+def profiling_enabled() -> bool:
+    return (os.getenv("RULE_PROFILING_ENABLED", "false") or "false").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _flush_interval_seconds() -> float:
+    raw = os.getenv("RULE_PROFILING_FLUSH_SECONDS")
+    try:
+        return max(0.0, float(raw)) if raw is not None and str(raw).strip() else 10.0
+    except ValueError:
+        return 10.0
+
+
+def _retention_days() -> int:
+    raw = os.getenv("RULE_PROFILING_RETENTION_DAYS")
+    try:
+        return max(1, int(raw)) if raw is not None and str(raw).strip() else 30
+    except ValueError:
+        return 30
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000.0, 3)
+
+
+# ── Statement counting ──────────────────────────────────────────────────────
+
+# One counter cell per open span; nested spans (an action inside a profiled rule) all count.
+_statement_cells: ContextVar[tuple[list[int], ...]] = ContextVar("rule_profiling_statement_cells", default=())
+_instrumented_engines: set[int] = set()
+
+
+def _on_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for cell in _statement_cells.get():
+        cell[0] += 1
+
+
+def install_statement_counter(bind) -> None:
+    """Listen to cursor executions of the session's engine (idempotent, no-op for non-engines)."""
+    engine = getattr(bind, "engine", bind)
+    if not isinstance(engine, Engine) or id(engine) in _instrumented_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _on_cursor_execute)
+    _instrumented_engines.add(id(engine))
+
+
+@dataclass
+class Span:
+    seconds: float = 0.0
+    sql_statements: int = 0
+
+
+@contextmanager
+def measure():
+    """Wall time and SQL statements of the enclosed block."""
+    span = Span()
+    cell = [0]
+    token = _statement_cells.set((*_statement_cells.get(), cell))
+    started = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span.seconds = time.perf_counter() - started
+        span.sql_statements = cell[0]
+        _statement_cells.reset(token)
+
+
+# ── Per-rule profile ────────────────────────────────────────────────────────
+
+@dataclass
+class RuleProfile:
+    segment_seconds: float = 0.0
+    condition_seconds: float = 0.0
+    sql_statements: int = 0
+    functions: dict[str, list] = field(default_factory=dict)
+    actions: list[dict] = field(default_factory=list)
+
+    @property
+    def action_seconds(self) -> float:
+        return sum(a["seconds"] for a in self.actions)
+
+    @property
+    def action_sql_statements(self) -> int:
+        return sum(a["sql_statements"] for a in self.actions)
+
+    @contextmanager
+    def segment_gate(self):
+        span = Span()
+        try:
+            with measure() as span:
+                yield
+        finally:
+            self.segment_seconds += span.seconds
+            self.sql_statements += span.sql_statements
+
+    @contextmanager
+    def condition(self):
+        span = Span()
+        try:
+            with measure() as span:
+                yield
+        finally:
+            self.condition_seconds += span.seconds
+            self.sql_statements += span.sql_statements
+
+    @contextmanager
+    def action(self, index: int, action_type: str | None):
+        span = Span()
+        try:
+            with measure() as span:
+                yield
+        finally:
+            self.actions.append(
+                {"index": index, "type": action_type, "seconds": span.seconds, "sql_statements": span.sql_statements}
+            )
+
+    @contextmanager
+    def function(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.functions.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def as_details(self) -> dict:
+        return {
+            "segment_ms": _ms(self.segment_seconds),
+            "condition_ms": _ms(self.condition_seconds),
+            "sql_statements": self.sql_statements,
+            "functions": {name: {"calls": calls, "ms": _ms(seconds)} for name, (calls, seconds) in self.functions.items()},
+            "actions": [
+                {"index": a["index"], "type": a["type"], "ms": _ms(a["seconds"]), "sql_statements": a["sql_statements"]}
+                for a in self.actions
+            ],
+        }
+
+
+_current_profile: ContextVar[RuleProfile | None] = ContextVar("rule_profiling_current_profile", default=None)
+
+
+def current_rule_profile() -> RuleProfile | None:
+    return _current_profile.get()
+
+
+def activate_profile(profile: RuleProfile | None):
+    """Make ``profile`` the target of action / ``$fn`` timings; returns a token for ``deactivate_profile``."""
+    return _current_profile.set(profile)
+
+
+def deactivate_profile(token) -> None:
+    _current_profile.reset(token)
+
+
+@contextmanager
+def segment_gate(profile: RuleProfile | None):
+    if profile is None:
+        yield
+        return
+    with profile.segment_gate():
+        yield
+
+
+@contextmanager
+def condition(profile: RuleProfile | None):
+    if profile is None:
+        yield
+        return
+    with profile.condition():
+        yield
+
+
+# ── Rolling per-rule stats ──────────────────────────────────────────────────
+
+@dataclass
+class _CostDelta:
+    brand: str
+    evaluations: int = 0
+    matched: int = 0
+    failed: int = 0
+    segment_ms: float = 0.0
+    condition_ms: float = 0.0
+    action_ms: float = 0.0
+    sql_statements: int = 0
+    max_ms: float = 0.0
+
+
+_pending_lock = threading.Lock()
+_pending: dict[tuple[UUID, date], _CostDelta] = {}
+_last_flush = time.monotonic()
+_last_prune: date | None = None
+
+
+def record_rule_cost(*, rule_id: UUID, brand: str, outcome: str, profile: RuleProfile, today: date | None = None) -> None:
+    """Buffer one evaluation (``outcome``: matched, skipped, not_in_segment, failed)."""
+    if today is None:
+        today = datetime.now(timezone.utc).date()
+    total_ms = (profile.segment_seconds + profile.condition_seconds + profile.action_seconds) * 1000.0
+    with _pending_lock:
+        delta = _pending.get((rule_id, today))
+        if delta is None:
+            delta = _pending[(rule_id, today)] = _CostDelta(brand=brand)
+        delta.evaluations += 1
+        delta.matched += 1 if outcome == "matched" else 0
+        delta.failed += 1 if outcome == "failed" else 0
+        delta.segment_ms += profile.segment_seconds * 1000.0
+        delta.condition_ms += profile.condition_seconds * 1000.0
+        delta.action_ms += profile.action_seconds * 1000.0
+        delta.sql_statements += profile.sql_statements + profile.action_sql_statements
+        delta.max_ms = max(delta.max_ms, total_ms)
+
+
+def _take_pending() -> dict[tuple[UUID, date], _CostDelta]:
+    global _pending, _last_flush
+    with _pending_lock:
+        taken, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    return taken
+
+
+def rule_cost_upsert(deltas: dict[tuple[UUID, date], _CostDelta]):
+    rows = [
+        {
+            "rule_id": rule_id,
+            "bucket_date": day,
+            "brand": d.brand,
+            "evaluations": d.evaluations,
+            "matched": d.matched,
+            "failed": d.failed,
+            "segment_ms": d.segment_ms,
+            "condition_ms": d.condition_ms,
+            "action_ms": d.action_ms,
+            "sql_statements": d.sql_statements,
+            "max_ms": d.max_ms,
+        }
+        for (rule_id, day), d in sorted(deltas.items(), key=lambda kv: (str(kv[0][0]), kv[0][1]))
+    ]
+    stmt = pg_insert(RuleCostStat).values(rows)
+    excluded = stmt.excluded
+    additive = ("evaluations", "matched", "failed", "segment_ms", "condition_ms", "action_ms", "sql_statements")
+    return stmt.on_conflict_do_update(
+        index_elements=[RuleCostStat.rule_id, RuleCostStat.bucket_date],
+        set_={
+            **{name: getattr(RuleCostStat, name) + getattr(excluded, name) for name in additive},
+            "max_ms": func.greatest(RuleCostStat.max_ms, excluded.max_ms),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def flush_rule_costs(*, session_factory=None, force: bool = False) -> int:
+    """Upsert buffered deltas (when due, or ``force``). Returns the number of rows written."""
+    global _last_prune
+    if not force and time.monotonic() - _last_flush < _flush_interval_seconds():
+        return 0
+    deltas = _take_pending()
+    if not deltas:
+        return 0
+
+    if session_factory is None:
+        from app.db import SessionLocal as session_factory
+
+    today = datetime.now(timezone.utc).date()
+    db = session_factory()
+    try:
+        db.execute(rule_cost_upsert(deltas))
+        if _last_prune != today:
+            cutoff = today - timedelta(days=_retention_days())
+            db.query(RuleCostStat).filter(RuleCostStat.bucket_date < cutoff).delete(synchronize_session=False)
+            _last_prune = today
+        db.commit()
+    except Exception:
+        # Profiling must never break ingest (e.g. a rule deleted since it was buffered).
+        db.rollback()
+        logger.warning("rule cost stats flush failed; %s buffered rows dropped", len(deltas), exc_info=True)
+        return 0
+    finally:
+        db.close()
+    return len(deltas)
+
+
+# ── Slow-rule report ────────────────────────────────────────────────────────
+
+_REPORT_ORDERS = {"avg_ms", "total_ms", "max_ms", "sql_statements"}
+
+
+def _functions_used(node, out: set[str]) -> set[str]:
+    if isinstance(node, dict):
+        fn = node.get("$fn")
+        if isinstance(fn, str) and fn.strip():
+            out.add(fn.strip().lower())
+        for value in node.values():
+            _functions_used(value, out)
+    elif isinstance(node, list):
+        for value in node:
+            _functions_used(value, out)
+    return out
+
+
+def slow_rules_report(db, *, brand: str, days: int = 7, limit: int = 20, order_by: str = "avg_ms", today: date | None = None) -> dict:
+    """Most expensive rules of a brand over the last ``days`` daily buckets (today included)."""
+    from app.models.rule import Rule
+
+    if order_by not in _REPORT_ORDERS:
+        raise ValueError(f"order_by must be one of {sorted(_REPORT_ORDERS)}")
+    if today is None:
+        today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=max(1, int(days)) - 1)
+
+    evaluations = func.sum(RuleCostStat.evaluations)
+    total_ms = func.sum(RuleCostStat.segment_ms + RuleCostStat.condition_ms + RuleCostStat.action_ms)
+    sql_statements = func.sum(RuleCostStat.sql_statements)
+    order_columns = {
+        "avg_ms": total_ms / func.nullif(evaluations, 0),
+        "total_ms": total_ms,
+        "max_ms": func.max(RuleCostStat.max_ms),
+        "sql_statements": sql_statements / func.nullif(evaluations, 0),
+    }
+
+    rows = (
+        db.query(
+            RuleCostStat.rule_id,
+            evaluations,
+            func.sum(RuleCostStat.matched),
+            func.sum(RuleCostStat.failed),
+            func.sum(RuleCostStat.segment_ms),
+            func.sum(RuleCostStat.condition_ms),
+            func.sum(RuleCostStat.action_ms),
+            sql_statements,
+            func.max(RuleCostStat.max_ms),
+            total_ms,
+        )
+        .filter(RuleCostStat.brand == brand)
+        .filter(RuleCostStat.bucket_date >= since)
+        .group_by(RuleCostStat.rule_id)
+        .order_by(order_columns[order_by].desc().nulls_last(), RuleCostStat.rule_id.asc())
+        .limit(max(1, min(int(limit), 200)))
+        .all()
+    )
+
+    rules = {}
+    if rows:
+        rules = {r.id: r for r in db.query(Rule).filter(Rule.id.in_([row[0] for row in rows])).all()}
+
+    items = []
+    for rule_id, n, matched, failed, segment_ms, condition_ms, action_ms, sql, max_ms, total in rows:
+        n = int(n or 0)
+        rule = rules.get(rule_id)
+        items.append(
+            {
+                "ruleId": str(rule_id),
+                "name": getattr(rule, "name", None),
+                "transactionTypes": list(getattr(rule, "transaction_types", None) or [])
+                or ([rule.transaction_type] if rule is not None and rule.transaction_type else []),
+                "active": getattr(rule, "active", None),
+                "segmentGated": bool(getattr(rule, "segment_ids", None)),
+                "functions": sorted(
+                    _functions_used([getattr(rule, "conditions", None), getattr(rule, "actions", None)], set())
+                ),
+                "evaluations": n,
+                "matched": int(matched or 0),
+                "failed": int(failed or 0),
+                "matchRate": round(int(matched or 0) / n, 4) if n else None,
+                "avgMs": round(float(total or 0) / n, 3) if n else None,
+                "avgSegmentMs": round(float(segment_ms or 0) / n, 3) if n else None,
+                "avgConditionMs": round(float(condition_ms or 0) / n, 3) if n else None,
+                "avgActionMs": round(float(action_ms or 0) / int(matched), 3) if matched else None,
+                "avgSqlStatements": round(int(sql or 0) / n, 2) if n else None,
+                "maxMs": round(float(max_ms or 0), 3),
+                "totalMs": round(float(total or 0), 3),
+            }
+        )
+
+    return {
+        "brand": brand,
+        "since": since.isoformat(),
+        "days": max(1, int(days)),
+        "orderBy": order_by,
+        "profilingEnabled": profiling_enabled(),
+        "items": items,
+    }
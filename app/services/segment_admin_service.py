@@ -230,12 +230,13 @@ def trigger_recompute_if_needed(
     seg: Segment,
     recompute: bool,
     batch_size: int = 500,
+    full: bool = False,
 ) -> dict | None:
     if not recompute or not seg.is_dynamic or not seg.active:
         return None
     if seg.conditions is None:
         return None
-    return recompute_dynamic_segment(db, segment=seg, batch_size=batch_size)
+    return recompute_dynamic_segment(db, segment=seg, batch_size=batch_size, full=full)
 
 
 def recompute_brand_dynamic_segments(
@@ -244,8 +245,9 @@ def recompute_brand_dynamic_segments(
     brand: str,
     batch_size: int = 500,
     now_utc: datetime | None = None,
+    full: bool = False,
 ) -> dict:
-    return recompute_dynamic_segments_for_brand(db, brand=brand, now_utc=now_utc, batch_size=batch_size)
+    return recompute_dynamic_segments_for_brand(db, brand=brand, now_utc=now_utc, batch_size=batch_size, full=full)
 
 
 _SEGMENT_LIST_SORT_BY_ALIASES: dict[str, str] = {
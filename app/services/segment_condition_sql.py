@@ -0,0 +1,332 @@
+"""Segment condition AST -> SQLAlchemy criterion (push-down for dynamic segments).
+
+``compile_segment_condition`` turns the parts of a segment condition that have an exact
+SQL equivalent into one criterion over ``customers`` (optionally LEFT JOINed to
+``customer_metrics``). Everything else is returned as a residual AST, to be evaluated
+in Python by the rule engine on the rows the criterion lets through.
+
+Only top-level ``and`` items can be split; an ``or`` / ``not`` is pushed down only when
+its whole subtree is. A leaf is pushed down only when SQL gives the same answer as the
+rule engine's comparators (``_cmp_eq``, ``_ordering_comparator``, ...) for every row,
+NULLs included, so the result does not depend on where a leaf was evaluated. Leaves the
+engine resolves with partial-date (MM-DD) or text-to-number coercion, ``$path`` / ``$fn``
+values and unknown fields/operators stay in Python.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy import ColumnElement, and_, false, func, not_, or_, true
+
+from app.models.customer import Customer
+from app.models.customer_metrics import CustomerMetrics
+from app.services.birthdate_targeting import birthdate_sql_criterion
+from app.services.rule_engine import _as_datetime, _as_mmdd, _has_expr_marker, _resolve_expected_value
+
+
+_ORDERING_OPS = {"gt", "gte", "lt", "lte"}
+
+# system.* fields that are a day count since a customer timestamp.
+_SYSTEM_DAYS_COLUMNS = {
+    "system.customer_created_days": Customer.created_at,
+    "system.customer_last_activity_days": Customer.last_activity_at,
+}
+
+
+@dataclass(frozen=True)
+class SegmentConditionSql:
+    criterion: ColumnElement[bool]
+    # Conditions left to the Python evaluator (None when everything was pushed down).
+    residual: dict | None
+    joins_metrics: bool
+
+
+def compile_segment_condition(node, *, now_utc: datetime) -> SegmentConditionSql:
+    pushed = []
+    residual = []
+    joins_metrics = False
+    for item in _flatten_and(node):
+        joins: set[str] = set()
+        criterion = _to_criterion(item, now_utc=now_utc, joins=joins)
+        if criterion is None:
+            residual.append(item)
+            continue
+        pushed.append(criterion)
+        joins_metrics = joins_metrics or "metrics" in joins
+
+    if not residual:
+        residual_node = None
+    elif len(residual) == 1:
+        residual_node = residual[0]
+    else:
+        residual_node = {"and": residual}
+
+    return SegmentConditionSql(
+        criterion=and_(*pushed) if pushed else true(),
+        residual=residual_node,
+        joins_metrics=joins_metrics,
+    )
+
+
+def customer_metrics_join_clause():
+    return and_(CustomerMetrics.customer_id == Customer.id, CustomerMetrics.brand == Customer.brand)
+
+
+def _flatten_and(node) -> list:
+    if isinstance(node, dict) and "and" in node and isinstance(node.get("and"), list):
+        out = []
+        for item in node["and"]:
+            out.extend(_flatten_and(item))
+        return out
+    return [node]
+
+
+def _to_criterion(node, *, now_utc: datetime, joins: set[str]):
+    """Criterion for ``node`` or None when any part of it can't be pushed down."""
+    if not isinstance(node, dict):
+        return None
+
+    if "and" in node or "or" in node:
+        key = "and" if "and" in node else "or"
+        items = node.get(key)
+        if not isinstance(items, list):
+            return None
+        parts = []
+        for item in items:
+            c = _to_criterion(item, now_utc=now_utc, joins=joins)
+            if c is None:
+                return None
+            parts.append(c)
+        if key == "and":
+            return and_(*parts) if parts else true()
+        return or_(*parts) if parts else false()
+
+    if "not" in node:
+        inner = _to_criterion(node.get("not"), now_utc=now_utc, joins=joins)
+        if inner is None:
+            return None
+        return not_(inner)
+
+    if "field" in node:
+        return _leaf_criterion(node, now_utc=now_utc, joins=joins)
+
+    return None
+
+
+def _leaf_criterion(node: dict, *, now_utc: datetime, joins: set[str]):
+    field = node.get("field")
+    op = node.get("operator")
+    if op is None:
+        op = node.get("op")
+    if not isinstance(field, str) or not field or not isinstance(op, str) or not op:
+        return None
+    op = op.lower()
+
+    raw_value = node.get("value")
+    if _has_expr_marker(raw_value) and ("$path" in raw_value or "$fn" in raw_value):
+        return None
+    try:
+        value = _resolve_expected_value(customer=None, value=raw_value, field=field)
+    except ValueError:
+        return None
+
+    if field in {"customer.birthdate", "customer.birthday"}:
+        try:
+            criterion = birthdate_sql_criterion(customer_model=Customer, op=op, value=value)
+        except ValueError:
+            return None
+        # Partial birthdates leave columns NULL: make the leaf two-valued so 'not' stays exact.
+        return func.coalesce(criterion, false())
+
+    if field in _SYSTEM_DAYS_COLUMNS:
+        return _days_since_criterion(_SYSTEM_DAYS_COLUMNS[field], op=op, value=value, now_utc=now_utc)
+
+    column = _resolve_column(field, joins=joins)
+    if column is None:
+        return None
+    return _column_criterion(column, op=op, value=value)
+
+
+def _resolve_column(field: str, *, joins: set[str]):
+    if field.startswith("customer.metrics."):
+        model = CustomerMetrics
+        key = field[len("customer.metrics.") :]
+    elif field.startswith("customer."):
+        model = Customer
+        key = field[len("customer.") :]
+    else:
+        return None
+    if "." in key:
+        return None
+
+    column = sa.inspect(model).columns.get(key)
+    if column is None:
+        return None
+    if model is CustomerMetrics:
+        joins.add("metrics")
+    return getattr(model, key)
+
+
+def _column_kind(column) -> str | None:
+    col_type = column.type
+    if isinstance(col_type, sa.DateTime):
+        return "datetime"
+    if isinstance(col_type, sa.Integer):
+        return "int"
+    if isinstance(col_type, sa.String):
+        return "str"
+    return None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_plain_str(value) -> bool:
+    # MM-DD / YYYY-MM-DD strings switch the engine to month/day comparison.
+    return isinstance(value, str) and _as_mmdd(value) is None
+
+
+def _as_naive_datetime(value) -> datetime | None:
+    if not _is_plain_str(value):
+        return None
+    parsed = _as_datetime(value)
+    if parsed is None or parsed.tzinfo is not None:
+        return None
+    return parsed
+
+
+def _matches_kind(kind: str, value) -> bool:
+    if kind == "int":
+        return _is_number(value)
+    if kind == "str":
+        return _is_plain_str(value)
+    return False
+
+
+def _not_null(column, criterion):
+    return and_(column.isnot(None), criterion)
+
+
+def _column_criterion(column, *, op: str, value):
+    kind = _column_kind(column)
+    if kind is None:
+        return None
+
+    if op == "exists":
+        exists = column.isnot(None)
+        if kind == "str":
+            exists = and_(exists, column != "")
+        truthy = True if value is None else bool(value)
+        return exists if truthy else not_(exists)
+
+    if op == "contains":
+        if kind != "str":
+            return false()
+        return _not_null(column, column.contains(str(value), autoescape=True))
+
+    if kind == "datetime":
+        # Equality on timestamps is month/day-based in the engine; only ranges map to SQL.
+        if op in _ORDERING_OPS:
+            bound = _as_naive_datetime(value)
+            if bound is None:
+                return None
+            return _not_null(column, _ordering(column, op, bound))
+        if op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                return None
+            lo, hi = _as_naive_datetime(value[0]), _as_naive_datetime(value[1])
+            if lo is None or hi is None:
+                return None
+            return _not_null(column, column.between(lo, hi))
+        return None
+
+    if op in {"eq", "="}:
+        if value is None:
+            return column.is_(None)
+        if not _matches_kind(kind, value):
+            return None
+        return _not_null(column, column == value)
+
+    if op in {"neq", "!=", "ne"}:
+        if value is None:
+            return column.isnot(None)
+        if not _matches_kind(kind, value):
+            return None
+        return column.is_distinct_from(value)
+
+    if op == "in":
+        if not isinstance(value, list):
+            return None
+        non_null = [v for v in value if v is not None]
+        if not all(_matches_kind(kind, v) for v in non_null):
+            return None
+        parts = []
+        if non_null:
+            parts.append(_not_null(column, column.in_(non_null)))
+        if len(non_null) != len(value):
+            parts.append(column.is_(None))
+        return or_(*parts) if parts else false()
+
+    if kind != "int":
+        # Text ordering goes through date / number coercion in the engine.
+        return None
+
+    if op in _ORDERING_OPS:
+        if not _is_number(value):
+            return None
+        return _not_null(column, _ordering(column, op, value))
+
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2 or not all(_is_number(v) for v in value):
+            return None
+        return _not_null(column, column.between(value[0], value[1]))
+
+    return None
+
+
+def _ordering(column, op: str, value):
+    if op == "gt":
+        return column > value
+    if op == "gte":
+        return column >= value
+    if op == "lt":
+        return column < value
+    return column <= value
+
+
+def _days_since_criterion(column, *, op: str, value, now_utc: datetime):
+    """``floor((now - column) / 1 day) <op> value`` rewritten as a range on ``column``."""
+
+    def at_least(days: int):
+        return _not_null(column, column <= now_utc - timedelta(days=days))
+
+    def below(days: int):
+        return _not_null(column, column > now_utc - timedelta(days=days))
+
+    if op == "exists":
+        truthy = True if value is None else bool(value)
+        return column.isnot(None) if truthy else column.is_(None)
+
+    if op in _ORDERING_OPS:
+        if not _is_number(value):
+            return None
+        if op == "gte":
+            return at_least(math.ceil(value))
+        if op == "gt":
+            return at_least(math.floor(value) + 1)
+        if op == "lt":
+            return below(math.ceil(value))
+        return below(math.floor(value) + 1)
+
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2 or not all(_is_number(v) for v in value):
+            return None
+        lo, hi = value
+        return and_(at_least(math.ceil(lo)), below(math.floor(hi) + 1))
+
+    return None
@@ -42,13 +42,20 @@ def _enrich_members_payload(
     if not verify or not seg.is_dynamic or not seg.conditions:
         return payload
 
+    items = payload.get("items") or []
+    ids = {item.get("customer_id") for item in items if item.get("customer_id")}
+    customers_by_id: dict = {}
+    if ids:
+        rows = db.query(Customer).filter(Customer.id.in_(ids), Customer.brand == seg.brand).all()
+        customers_by_id = {c.id: c for c in rows}
+
     mismatch = 0
-    for item in payload.get("items") or []:
+    for item in items:
         cid = item.get("customer_id")
         if not cid:
             item["matches_conditions"] = None
             continue
-        cust = db.query(Customer).filter(Customer.id == cid, Customer.brand == seg.brand).first()
+        cust = customers_by_id.get(cid)
         if not cust:
             item["matches_conditions"] = None
             continue
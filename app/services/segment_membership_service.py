@@ -4,12 +4,13 @@ from __future__ import annotations
 
 from uuid import UUID
 
+from sqlalchemy import and_, false
 from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
 from app.models.segment import Segment
 from app.models.segment_member import SegmentMember
-from app.services.unomi_segment_service import manual_profile_ids_list
+from app.services.unomi_segment_service import manual_profile_ids_list, manual_profile_ids_set
 
 
 def unomi_dynamic_uses_engine_membership(segment: Segment) -> bool:
@@ -65,6 +66,75 @@ def is_customer_in_any_segment(db: Session, *, customer: Customer, segment_ids:
     return False
 
 
+class SegmentMembershipResolver:
+    """Segment checks for one customer, answered from memory.
+
+    Create one per transaction. The first check loads every requested segment (plus the
+    ``segment_ids`` given up front) with the customer's ``segment_members`` row for each,
+    in one query (``LEFT OUTER JOIN``); later checks run no query. Same answers as
+    ``is_customer_in_segment``.
+    """
+
+    def __init__(self, db: Session, *, customer: Customer, segment_ids=()):
+        self._db = db
+        self._customer = customer
+        self._prefetch_ids = set(segment_ids)
+        self._loaded_ids: set[UUID] = set()
+        self._segments: dict[UUID, Segment] = {}
+        self._member_sources: dict[UUID, set[str]] = {}
+        self.db_round_trips = 0
+
+    def _load(self, segment_ids) -> None:
+        missing = set(segment_ids) - self._loaded_ids
+        if not missing:
+            return
+        missing |= self._prefetch_ids - self._loaded_ids
+
+        customer_id = getattr(self._customer, "id", None)
+        # (segment_id, customer_id) is the primary key: at most one member row per segment.
+        membership = (
+            and_(SegmentMember.segment_id == Segment.id, SegmentMember.customer_id == customer_id)
+            if customer_id is not None
+            else false()
+        )
+        rows = (
+            self._db.query(Segment, SegmentMember.source)
+            .outerjoin(SegmentMember, membership)
+            .filter(Segment.id.in_(missing))
+            .filter(Segment.brand == self._customer.brand)
+            .filter(Segment.active.is_(True))
+            .all()
+        )
+        self.db_round_trips += 1
+
+        for seg, source in rows:
+            self._segments[seg.id] = seg
+            if source is not None:
+                self._member_sources.setdefault(seg.id, set()).add(source)
+        self._loaded_ids |= missing
+
+    def _is_member(self, segment: Segment) -> bool:
+        if segment.brand != self._customer.brand:
+            return False
+        sources = self._member_sources.get(segment.id, set())
+        if getattr(segment, "provider", "INTERNAL") == "UNOMI":
+            if unomi_dynamic_uses_engine_membership(segment):
+                return "DYNAMIC" in sources
+            pid = (self._customer.profile_id or "").strip()
+            return bool(pid) and pid in manual_profile_ids_set(segment)
+        return bool(sources)
+
+    def is_in_any_segment(self, segment_ids) -> bool:
+        if not segment_ids:
+            return True
+        self._load(segment_ids)
+        for segment_id in segment_ids:
+            seg = self._segments.get(segment_id)
+            if seg is not None and self._is_member(seg):
+                return True
+        return False
+
+
 def filter_customers_by_segment(
     db: Session,
     *,
@@ -111,4 +181,4 @@ def _is_customer_in_unomi_segment(db: Session, *, customer: Customer, segment: S
     pid = (customer.profile_id or "").strip()
     if not pid:
         return False
-    return pid in manual_profile_ids_list(segment)
+    return pid in manual_profile_ids_set(segment)
@@ -1,82 +1,264 @@
-from datetime import datetime
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
 
+from sqlalchemy import delete, func, literal, not_, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
+from app.models.customer_metrics import CustomerMetrics
 from app.models.segment import Segment
 from app.models.segment_member import SegmentMember
+from app.services.segment_condition_sql import (
+    SegmentConditionSql,
+    compile_segment_condition,
+    customer_metrics_join_clause,
+)
 
 
-def recompute_dynamic_segment(
+def conditions_fingerprint(conditions) -> str:
+    raw = json.dumps(conditions, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _delta_overlap_seconds() -> int:
+    # Re-read a small window before last_computed_at: rows committed by transactions that
+    # were still open at the previous run carry an updated_at older than its watermark.
+    try:
+        return max(0, int(os.getenv("SEGMENT_DELTA_OVERLAP_SECONDS") or "300"))
+    except ValueError:
+        return 300
+
+
+def conditions_support_delta(node) -> bool:
+    """False when membership can change without any customer row changing.
+
+    ``$system`` values and ``system.*`` fields move with the clock, ``$fn`` may read other
+    tables (products) and ``customer.rewards`` is not reflected in ``Customer.updated_at``.
+    """
+    if isinstance(node, list):
+        return all(conditions_support_delta(n) for n in node)
+    if not isinstance(node, dict):
+        return True
+    if "$system" in node or "$fn" in node:
+        return False
+    field = node.get("field")
+    if isinstance(field, str) and (field.startswith("system.") or field == "customer.rewards"):
+        return False
+    return all(conditions_support_delta(v) for v in node.values())
+
+
+def _changed_customers_scope(*, brand: str, since: datetime):
+    """Customers whose segment inputs may have changed since ``since``."""
+    metrics_changed = (
+        select(CustomerMetrics.customer_id)
+        .where(CustomerMetrics.brand == brand)
+        .where(CustomerMetrics.computed_at > since)
+    )
+    return or_(Customer.updated_at > since, Customer.id.in_(metrics_changed))
+
+
+def _select_customers(*columns, brand: str, plan: SegmentConditionSql, scope, criterion):
+    stmt = select(*columns).select_from(Customer)
+    if plan.joins_metrics:
+        stmt = stmt.outerjoin(CustomerMetrics, customer_metrics_join_clause())
+    stmt = stmt.where(Customer.brand == brand)
+    if scope is not None:
+        stmt = stmt.where(scope)
+    return stmt.where(criterion)
+
+
+def _remove_members(db: Session, *, segment: Segment, customer_ids) -> int:
+    result = db.execute(
+        delete(SegmentMember)
+        .where(SegmentMember.segment_id == segment.id)
+        .where(SegmentMember.customer_id.in_(customer_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return int(result.rowcount or 0)
+
+
+def _apply_diff_from_select(
+    db: Session, *, segment: Segment, plan: SegmentConditionSql, scope, now_utc: datetime
+) -> tuple[int, int]:
+    """Whole condition pushed down: one DELETE and one INSERT ... SELECT over the scope."""
+    brand = segment.brand
+    removed = _remove_members(
+        db,
+        segment=segment,
+        customer_ids=_select_customers(Customer.id, brand=brand, plan=plan, scope=scope, criterion=not_(plan.criterion)),
+    )
+
+    source = _select_customers(
+        literal(segment.id, SegmentMember.segment_id.type),
+        Customer.id,
+        literal("DYNAMIC"),
+        literal(now_utc, SegmentMember.computed_at.type),
+        brand=brand,
+        plan=plan,
+        scope=scope,
+        criterion=plan.criterion,
+    )
+    stmt = (
+        pg_insert(SegmentMember)
+        .from_select(["segment_id", "customer_id", "source", "computed_at"], source)
+        .on_conflict_do_nothing(index_elements=["segment_id", "customer_id"])
+    )
+    added = int(db.execute(stmt).rowcount or 0)
+    return added, removed
+
+
+def _apply_diff_with_residual(
     db: Session,
     *,
     segment: Segment,
-    now_utc: datetime | None = None,
-    batch_size: int = 500,
-) -> dict:
-    """Recompute membership for one active dynamic segment."""
-    if now_utc is None:
-        now_utc = datetime.utcnow()
-
-    if not segment.is_dynamic:
-        raise ValueError("Segment is not dynamic")
-    if not segment.active:
-        raise ValueError("Segment is not active")
-    if segment.conditions is None:
-        raise ValueError("Dynamic segment requires conditions")
+    plan: SegmentConditionSql,
+    scope,
+    now_utc: datetime,
+    batch_size: int,
+) -> tuple[int, int]:
+    """Pushed-down part filters candidates in SQL; the residual is evaluated in Python."""
+    from app.services.rule_engine import compile_condition  # noqa
 
     brand = segment.brand
-    from app.services.rule_engine import _evaluate_ast_condition  # noqa
+    removed = _remove_members(
+        db,
+        segment=segment,
+        customer_ids=_select_customers(Customer.id, brand=brand, plan=plan, scope=scope, criterion=not_(plan.criterion)),
+    )
 
-    # Dynamic membership is DYNAMIC-only; drop legacy STATIC rows if any.
-    db.query(SegmentMember).filter(SegmentMember.segment_id == segment.id).filter(
-        SegmentMember.source == "STATIC"
-    ).delete(synchronize_session=False)
-    db.query(SegmentMember).filter(SegmentMember.segment_id == segment.id).filter(
-        SegmentMember.source == "DYNAMIC"
-    ).delete(synchronize_session=False)
-
-    touched_members = 0
+    check = compile_condition(plan.residual)
+    tx = type("SegTx", (), {"payload": {}, "brand": brand})()
+
+    added = 0
     cursor = None
     while True:
-        q = db.query(Customer).filter(Customer.brand == brand).order_by(Customer.id.asc())
+        q = db.query(Customer)
+        if plan.joins_metrics:
+            q = q.outerjoin(CustomerMetrics, customer_metrics_join_clause())
+        q = q.filter(Customer.brand == brand)
+        if scope is not None:
+            q = q.filter(scope)
+        q = q.filter(plan.criterion).order_by(Customer.id.asc())
         if cursor is not None:
             q = q.filter(Customer.id > cursor)
         customers = q.limit(batch_size).all()
         if not customers:
             break
 
+        rows = []
+        unmatched = []
         for c in customers:
             cursor = c.id
-            tx = type("SegTx", (), {"payload": {}, "brand": brand})()
             try:
-                matched = _evaluate_ast_condition(db=db, customer=c, transaction=tx, node=segment.conditions)
+                matched = check(db, c, tx)
             except Exception:
                 matched = False
-
             if not matched:
+                unmatched.append(c.id)
                 continue
+            rows.append(
+                {
+                    "segment_id": segment.id,
+                    "customer_id": c.id,
+                    "source": "DYNAMIC",
+                    "computed_at": now_utc,
+                }
+            )
 
-            db.add(
-                SegmentMember(
-                    segment_id=segment.id,
-                    customer_id=c.id,
-                    source="DYNAMIC",
-                    computed_at=now_utc,
-                )
+        if rows:
+            stmt = (
+                pg_insert(SegmentMember)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["segment_id", "customer_id"])
             )
-            touched_members += 1
+            added += int(db.execute(stmt).rowcount or 0)
+        if unmatched:
+            removed += _remove_members(db, segment=segment, customer_ids=unmatched)
 
         if len(customers) < batch_size:
             break
 
+    return added, removed
+
+
+def recompute_dynamic_segment(
+    db: Session,
+    *,
+    segment: Segment,
+    now_utc: datetime | None = None,
+    batch_size: int = 500,
+    full: bool = False,
+) -> dict:
+    """Recompute membership for one active dynamic segment.
+
+    Membership is updated as an insert/delete diff, so readers never see an emptied
+    segment. When the segment was already computed with the same conditions, only
+    customers changed since ``last_computed_at`` (``Customer.updated_at`` /
+    ``CustomerMetrics.computed_at``) are re-evaluated; ``full=True``, new conditions,
+    time-dependent conditions or legacy STATIC rows re-evaluate the whole brand.
+    """
+    if now_utc is None:
+        now_utc = datetime.utcnow()
+
+    if not segment.is_dynamic:
+        raise ValueError("Segment is not dynamic")
+    if not segment.active:
+        raise ValueError("Segment is not active")
+    if segment.conditions is None:
+        raise ValueError("Dynamic segment requires conditions")
+
+    brand = segment.brand
+    plan = compile_segment_condition(segment.conditions, now_utc=now_utc)
+    fingerprint = conditions_fingerprint(segment.conditions)
+
+    # Dynamic membership is DYNAMIC-only; drop legacy STATIC rows if any.
+    static_removed = (
+        db.query(SegmentMember)
+        .filter(SegmentMember.segment_id == segment.id)
+        .filter(SegmentMember.source == "STATIC")
+        .delete(synchronize_session=False)
+    )
+
+    incremental = (
+        not full
+        and not static_removed
+        and segment.last_computed_at is not None
+        and getattr(segment, "computed_conditions_hash", None) == fingerprint
+        and conditions_support_delta(segment.conditions)
+    )
+    scope = None
+    if incremental:
+        since = segment.last_computed_at - timedelta(seconds=_delta_overlap_seconds())
+        scope = _changed_customers_scope(brand=brand, since=since)
+
+    if plan.residual is None:
+        added, removed = _apply_diff_from_select(db, segment=segment, plan=plan, scope=scope, now_utc=now_utc)
+    else:
+        added, removed = _apply_diff_with_residual(
+            db, segment=segment, plan=plan, scope=scope, now_utc=now_utc, batch_size=batch_size
+        )
+
+    members = (
+        db.query(func.count())
+        .select_from(SegmentMember)
+        .filter(SegmentMember.segment_id == segment.id)
+        .scalar()
+    )
+
     segment.last_computed_at = now_utc
+    segment.computed_conditions_hash = fingerprint
     db.flush()
 
     return {
         "brand": brand,
         "segments": 1,
-        "members": int(touched_members),
+        "members": int(members or 0),
+        "added": int(added),
+        "removed": int(removed) + int(static_removed or 0),
+        "incremental_segments": 1 if incremental else 0,
         "computed_at": now_utc,
     }
 
@@ -87,6 +269,7 @@ def recompute_dynamic_segments_for_brand(
     brand: str,
     now_utc: datetime | None = None,
     batch_size: int = 500,
+    full: bool = False,
 ) -> dict:
     if now_utc is None:
         now_utc = datetime.utcnow()
@@ -101,18 +284,19 @@ def recompute_dynamic_segments_for_brand(
     )
 
     processed_segments = 0
-    touched_members = 0
+    totals = {"members": 0, "added": 0, "removed": 0, "incremental_segments": 0}
 
     for seg in segs:
         if seg.conditions is None:
             continue
-        stats = recompute_dynamic_segment(db, segment=seg, now_utc=now_utc, batch_size=batch_size)
+        stats = recompute_dynamic_segment(db, segment=seg, now_utc=now_utc, batch_size=batch_size, full=full)
         processed_segments += 1
-        touched_members += int(stats["members"])
+        for key in totals:
+            totals[key] += int(stats[key])
 
     return {
         "brand": brand,
         "segments": int(processed_segments),
-        "members": int(touched_members),
+        **totals,
         "computed_at": now_utc,
     }
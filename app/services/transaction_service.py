@@ -1,16 +1,23 @@
 from datetime import datetime
 import os
+import time
 from typing import Any
+import uuid
 
 from fastapi import HTTPException
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.services.contact_service import resolve_customer_for_transaction
+from app.services.brand_config_cache import get_brand_config, invalidate_brand_config
+from app.services.contact_service import resolve_customer_for_transaction, transaction_identity_email
 from app.models.customer import Customer
 from app.models.event_type import TransactionType
 from app.models.transaction import Transaction
 from app.services.loyalty_status_service import update_customer_status
-from app.services.payload_schema_service import enrich_payload_schema_on_ingest, infer_json_schema_from_payload
+from app.services.metrics import INGEST_DURATION, ingest_stage
+from app.services.payload_schema_learning import flush_payload_shapes, record_payload_shape
+from app.services.payload_schema_service import infer_json_schema_from_payload
 from app.services.rule_engine import process_transaction_rules
 from app.services.sale_payload_service import normalize_sale_payload
 
@@ -50,6 +57,11 @@ def _merge_json_schemas(a: dict | None, b: dict | None) -> dict | None:
 
 
 def _find_transaction_type(db: Session, *, brand: str, key: str):
+    """Active type for ``(brand, key)``: cached snapshot, or the row when the cache misses."""
+    cached = get_brand_config(db, brand=brand).transaction_types.get(key)
+    if cached is not None:
+        return cached
+    # A type created by another process since the snapshot was taken must not be duplicated.
     return (
         db.query(TransactionType)
         .filter(TransactionType.key == key)
@@ -84,37 +96,32 @@ def create_internal_transaction(
     if existing:
         return existing
 
+    payload = payload or {"_ruleDepth": depth + 1}
     transaction = Transaction(
         transaction_id=transaction_id,
         brand=brand,
         profile_id=profile_id,
         transaction_type=transaction_type,
         source=source,
-        payload=payload or {"_ruleDepth": depth + 1},
+        payload=payload,
+        customer_email=transaction_identity_email(payload, brand=brand),
         status="PENDING",
     )
     db.add(transaction)
-    if commit:
-        db.commit()
-        db.refresh(transaction)
-    else:
-        db.flush()
+    db.flush()
 
     try:
         process_transaction_rules(db, transaction)
         transaction.processed_at = datetime.utcnow()
-        if commit:
-            db.commit()
-        else:
-            db.flush()
     except Exception as e:
         transaction.status = "FAILED"
         transaction.error_message = str(e)
         transaction.processed_at = datetime.utcnow()
-        if commit:
-            db.commit()
-        else:
-            db.flush()
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
 
     return transaction
 
@@ -144,14 +151,19 @@ def _retry_ignored_unregistered_customer(db: Session, transaction: Transaction)
     transaction.error_code = None
     transaction.error_message = None
     transaction.processed_at = None
+
+    _run_transaction_rules(db, transaction)
     db.commit()
+    return transaction
+
 
+def _run_transaction_rules(db: Session, transaction: Transaction) -> None:
+    """Rules for one event inside a savepoint: a failure undoes the rules' writes and marks the event."""
     try:
-        process_transaction_rules(db, transaction)
+        with db.begin_nested():
+            process_transaction_rules(db, transaction)
         transaction.processed_at = datetime.utcnow()
-        db.commit()
     except Exception as e:
-        db.rollback()
         msg = str(e)
         if "Customer not found" in msg or "not enrolled" in msg.lower():
             _ignore_unregistered_customer(transaction)
@@ -159,155 +171,442 @@ def _retry_ignored_unregistered_customer(db: Session, transaction: Transaction)
             transaction.status = "FAILED"
             transaction.error_message = msg
             transaction.processed_at = datetime.utcnow()
-        db.commit()
-
-    return transaction
 
 
 # Backward-compatible alias for tests/scripts.
 _retry_blocked_customer_not_found = _retry_ignored_unregistered_customer
 
 
-def create_transaction(db: Session, event_data):
-    """
-    Crée une transaction de manière idempotente.
-    Si un event avec le même eventId existe déjà,
-    on retourne la transaction existante sans retraitement.
-    """
-
-    # 🔐 IDPOTENCE — vérifier si l'événement existe déjà
-    existing = (
-        db.query(Transaction)
-        .filter(Transaction.transaction_id == event_data.eventId)
-        .filter(Transaction.brand == event_data.brand)
-        .first()
-    )
+_PROFILE_EVENT_TYPES = {
+    "CUSTOMER_PROFILE",
+    "CONTACT",
+    "CUSTOMER_UPSERT",
+    "CONTACTINFOSUBMITTED",
+    "SOCIALCONTACTS",
+}
 
-    if existing:
-        return _retry_ignored_unregistered_customer(db, existing)
-
-    blocked_customer_profile_event = (event_data.eventType or "").upper() in {
-        "CUSTOMER_PROFILE",
-        "CONTACT",
-        "CUSTOMER_UPSERT",
-        "CONTACTINFOSUBMITTED",
-        "SOCIALCONTACTS",
-    }
 
+def _event_validation_error(event_data) -> str | None:
     # validation minimale métier (strict)
-    if not (event_data.brand and event_data.brand.strip()):
-        raise HTTPException(status_code=400, detail="brand is required")
-    if not (event_data.profileId and event_data.profileId.strip()):
-        raise HTTPException(status_code=400, detail="profileId is required")
-    if not (event_data.eventType and event_data.eventType.strip()):
-        raise HTTPException(status_code=400, detail="eventType is required")
-    if not (event_data.eventId and event_data.eventId.strip()):
-        raise HTTPException(status_code=400, detail="eventId is required")
+    for attr in ("brand", "profileId", "eventType", "eventId"):
+        value = getattr(event_data, attr, None)
+        if not (value and value.strip()):
+            return f"{attr} is required"
+    return None
 
-    status = "PENDING"
 
-    if blocked_customer_profile_event:
-        status = "BLOCKED"
+def _new_transaction_values(event_data) -> dict:
+    blocked_customer_profile_event = (event_data.eventType or "").upper() in _PROFILE_EVENT_TYPES
 
     normalized_payload = _maybe_normalize_business_payload(
         transaction_type=event_data.eventType,
         payload=event_data.payload,
     )
 
-    transaction = Transaction(
-        transaction_id=event_data.eventId,   # 🔐 clé d'idempotence
-        brand=event_data.brand,
-        profile_id=event_data.profileId,
-        transaction_type=event_data.eventType,
-        source=event_data.source,
-        payload=normalized_payload,
-        status=status,
-    )
+    values = {
+        "transaction_id": event_data.eventId,  # 🔐 clé d'idempotence
+        "brand": event_data.brand,
+        "profile_id": event_data.profileId,
+        "transaction_type": event_data.eventType,
+        "source": event_data.source,
+        "payload": normalized_payload,
+        "customer_email": transaction_identity_email(normalized_payload, brand=event_data.brand),
+        "status": "PENDING",
+        "error_code": None,
+        "error_message": None,
+        "processed_at": None,
+    }
 
-    if status == "BLOCKED":
-        transaction.error_code = "WRONG_INGESTION_ROUTE"
-        transaction.error_message = "Customer profile events must use /customers/upsert (no rules executed)."
-        transaction.processed_at = datetime.utcnow()
+    if blocked_customer_profile_event:
+        values["status"] = "BLOCKED"
+        values["error_code"] = "WRONG_INGESTION_ROUTE"
+        values["error_message"] = "Customer profile events must use /customers/upsert (no rules executed)."
+        values["processed_at"] = datetime.utcnow()
 
-    if status != "PENDING":
-        transaction.processed_at = datetime.utcnow()
+    return values
 
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
 
-    auto_update_schema = (os.getenv("AUTO_UPDATE_TRANSACTIONTYPE_PAYLOAD_SCHEMA", "true") or "true").strip().lower() in {
+def _auto_update_payload_schema_enabled() -> bool:
+    return (os.getenv("AUTO_UPDATE_TRANSACTIONTYPE_PAYLOAD_SCHEMA", "true") or "true").strip().lower() in {
         "1",
         "true",
         "yes",
         "on",
     }
 
-    tt = _find_transaction_type(db, brand=transaction.brand, key=transaction.transaction_type)
-    if not tt:
-        inferred_schema = _infer_json_schema_from_payload(transaction.payload) if transaction.payload is not None else None
-        tt = TransactionType(
-            brand=transaction.brand,
-            key=transaction.transaction_type,
-            origin="EXTERNAL",
-            name=transaction.transaction_type,
-            description="Auto-created from inbound event",
-            payload_schema=inferred_schema,
-            active=True,
-        )
-        db.add(tt)
-        db.commit()
 
-    if auto_update_schema and tt:
-        merged = enrich_payload_schema_on_ingest(tt.payload_schema, transaction.payload)
-        if merged and merged != tt.payload_schema:
-            tt.payload_schema = merged
-            db.commit()
+def _new_auto_transaction_type(transaction: Transaction) -> TransactionType:
+    inferred_schema = _infer_json_schema_from_payload(transaction.payload) if transaction.payload is not None else None
+    return TransactionType(
+        brand=transaction.brand,
+        key=transaction.transaction_type,
+        origin="EXTERNAL",
+        name=transaction.transaction_type,
+        description="Auto-created from inbound event",
+        payload_schema=inferred_schema,
+        active=True,
+    )
+
+
+def _insert_new_transaction(db: Session, values: dict) -> Transaction | None:
+    """``INSERT ... ON CONFLICT DO NOTHING RETURNING``: the stored row, or None if the event id exists.
+
+    The unique constraint is the idempotency guarantee, including for concurrent deliveries.
+    """
+    stmt = (
+        pg_insert(Transaction)
+        .values(id=uuid.uuid4(), **values)
+        .on_conflict_do_nothing(constraint="uq_transactions_brand_event_id")
+        .returning(Transaction)
+    )
+    return db.scalars(stmt).first()
+
+
+def _find_existing_transaction(db: Session, event_data) -> Transaction | None:
+    return (
+        db.query(Transaction)
+        .filter(Transaction.transaction_id == event_data.eventId)
+        .filter(Transaction.brand == event_data.brand)
+        .first()
+    )
+
+
+def create_transaction(db: Session, event_data):
+    """
+    Crée une transaction de manière idempotente.
+    Si un event avec le même eventId existe déjà,
+    on retourne la transaction existante sans retraitement.
+
+    Insert, TransactionType upkeep, customer activity and rules form one unit of work
+    (a single commit per event).
+    """
+
+    started = time.perf_counter()
+
+    validation_error = _event_validation_error(event_data)
+    if validation_error:
+        raise HTTPException(status_code=400, detail=validation_error)
+
+    # 🔐 IDPOTENCE — la contrainte unique décide (INSERT ... ON CONFLICT DO NOTHING)
+    with ingest_stage("idempotency_check"):
+        transaction = _insert_new_transaction(db, _new_transaction_values(event_data))
+        existing = _find_existing_transaction(db, event_data) if transaction is None else None
+
+    if existing is not None:
+        transaction = _retry_ignored_unregistered_customer(db, existing)
+        INGEST_DURATION.observe(time.perf_counter() - started, status="DUPLICATE")
+        return transaction
+
+    transaction = process_ingested_transaction(db, transaction)
+    INGEST_DURATION.observe(time.perf_counter() - started, status=transaction.status or "UNKNOWN")
+    return transaction
+
+
+def process_ingested_transaction(db: Session, transaction: Transaction) -> Transaction:
+    """TransactionType upkeep, customer resolution and rules for a freshly stored transaction.
+
+    Shared by the synchronous ingest path and the async ingest worker. Everything is
+    committed once at the end; rules run in a savepoint so a rule failure only undoes
+    their own writes.
+    """
+    auto_update_schema = _auto_update_payload_schema_enabled()
+    config_changed = False
+
+    with ingest_stage("schema_merge"):
+        tt = _find_transaction_type(db, brand=transaction.brand, key=transaction.transaction_type)
+        if not tt:
+            tt = _new_auto_transaction_type(transaction)
+            db.add(tt)
+            config_changed = True
+        elif auto_update_schema:
+            # Learned off the hot path (sampled, new shapes only): no TransactionType write here.
+            record_payload_shape(
+                brand=transaction.brand, transaction_type=transaction.transaction_type, payload=transaction.payload
+            )
+
+    if transaction.status == "PENDING":
+        with ingest_stage("customer_resolution"):
+            customer = resolve_customer_for_transaction(
+                db,
+                brand=transaction.brand,
+                profile_id=transaction.profile_id,
+                payload=transaction.payload if isinstance(transaction.payload, dict) else None,
+            )
+            if not customer:
+                _ignore_unregistered_customer(transaction)
+            else:
+                customer.last_activity_at = datetime.utcnow()
+
+                # If tiers are configured after some customers were created, they may still be
+                # marked as UNCONFIGURED. Refresh their tier assignment opportunistically on
+                # any external ingestion, even when no rules matched.
+                if customer.loyalty_status in (None, "UNCONFIGURED"):
+                    update_customer_status(
+                        db,
+                        customer,
+                        reason="AUTO_TIER_REFRESH",
+                        source_transaction_id=transaction.id,
+                        depth=0,
+                        refresh_window=True,
+                        emit_events=False,
+                    )
 
     if transaction.status == "PENDING":
-        customer = resolve_customer_for_transaction(
+        _run_transaction_rules(db, transaction)
+
+    db.commit()
+    if config_changed:
+        invalidate_brand_config(transaction.brand)
+    if auto_update_schema:
+        flush_payload_shapes()
+    return transaction
+
+
+def ingest_mode_is_async(mode: str | None = None) -> bool:
+    """Per-request ``mode`` wins; otherwise ``TRANSACTION_INGEST_MODE`` (sync | async, default sync)."""
+    raw = mode if mode is not None and mode.strip() else os.getenv("TRANSACTION_INGEST_MODE", "sync")
+    value = (raw or "sync").strip().lower()
+    if value not in {"sync", "async"}:
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
+    return value == "async"
+
+
+def enqueue_transaction(db: Session, event_data) -> Transaction:
+    """
+    Async ingest: persist the event as PENDING with ``queued_at`` set and return immediately.
+    Rules run later in ``app.services.ingest_worker``.
+    """
+    existing = _find_existing_transaction(db, event_data)
+    if existing:
+        if _is_unregistered_customer_transaction(existing) and resolve_customer_for_transaction(
             db,
-            brand=transaction.brand,
-            profile_id=transaction.profile_id,
-            payload=transaction.payload if isinstance(transaction.payload, dict) else None,
-        )
-        if not customer:
-            _ignore_unregistered_customer(transaction)
+            brand=existing.brand,
+            profile_id=existing.profile_id,
+            payload=existing.payload if isinstance(existing.payload, dict) else None,
+            transaction_type=existing.transaction_type,
+        ):
+            # Customer registered since the ignored ingest: same retry as the sync path, deferred to the worker.
+            existing.status = "PENDING"
+            existing.error_code = None
+            existing.error_message = None
+            existing.processed_at = None
+            existing.queued_at = datetime.utcnow()
+            existing.claimed_at = None
+            existing.claimed_by = None
+            existing.ingest_attempts = 0
             db.commit()
-            return transaction
+        return existing
+
+    validation_error = _event_validation_error(event_data)
+    if validation_error:
+        raise HTTPException(status_code=400, detail=validation_error)
+
+    values = _new_transaction_values(event_data)
+    if values["status"] == "PENDING":
+        values["queued_at"] = datetime.utcnow()
 
-        customer.last_activity_at = datetime.utcnow()
+    transaction = _insert_new_transaction(db, values)
+    if transaction is None:
+        # Lost a race with a concurrent delivery of the same event.
+        db.rollback()
+        return _find_existing_transaction(db, event_data)
+    db.commit()
+    return transaction
+
+
+def _batch_item_result(index: int, event_data, *, result: str, transaction: Transaction | None = None, **extra) -> dict:
+    out = {
+        "index": index,
+        "brand": getattr(event_data, "brand", None),
+        "eventId": getattr(event_data, "eventId", None),
+        "result": result,
+        "transactionId": str(transaction.id) if transaction is not None else None,
+        "status": transaction.status if transaction is not None else None,
+        "errorCode": transaction.error_code if transaction is not None else None,
+        "errorMessage": transaction.error_message if transaction is not None else None,
+    }
+    out.update(extra)
+    return out
+
+
+def _ensure_transaction_types_for_batch(db: Session, transactions: list[Transaction]) -> set[str]:
+    """Auto-create missing TransactionTypes once for the whole batch; buffer payload shapes of known types.
+
+    Returns the brands whose types changed (their cached config is stale once committed).
+    """
+    if not transactions:
+        return set()
+
+    brands = sorted({tx.brand for tx in transactions})
+    keys = sorted({tx.transaction_type for tx in transactions})
+    types_by_key: dict[tuple[str, str], TransactionType] = {}
+    for tt in (
+        db.query(TransactionType)
+        .filter(TransactionType.active.is_(True))
+        .filter(TransactionType.brand.in_(brands))
+        .filter(TransactionType.key.in_(keys))
+        .all()
+    ):
+        types_by_key.setdefault((tt.brand, tt.key), tt)
+
+    auto_update_schema = _auto_update_payload_schema_enabled()
+    changed_brands: set[str] = set()
+    for tx in transactions:
+        tt = types_by_key.get((tx.brand, tx.transaction_type))
+        if tt is None:
+            tt = _new_auto_transaction_type(tx)
+            db.add(tt)
+            types_by_key[(tx.brand, tx.transaction_type)] = tt
+            changed_brands.add(tx.brand)
+            continue
+
+        if auto_update_schema:
+            record_payload_shape(brand=tx.brand, transaction_type=tx.transaction_type, payload=tx.payload)
+    return changed_brands
+
+
+def _process_customer_transactions(db: Session, customer: Customer, transactions: list[Transaction]) -> None:
+    """Run rules for one customer's events (input order) inside a single bounded DB transaction."""
+    customer.last_activity_at = datetime.utcnow()
+
+    if customer.loyalty_status in (None, "UNCONFIGURED"):
+        update_customer_status(
+            db,
+            customer,
+            reason="AUTO_TIER_REFRESH",
+            source_transaction_id=transactions[0].id,
+            depth=0,
+            refresh_window=True,
+            emit_events=False,
+        )
+
+    for transaction in transactions:
+        # Savepoint per event: a failing event does not roll back the customer's other events.
+        _run_transaction_rules(db, transaction)
+
+
+def create_transactions_batch(db: Session, events: list) -> list[dict]:
+    """
+    Ingest many events at once (POS replays, WooCommerce backfills).
+
+    - one query to find events already stored (``uq_transactions_brand_event_id``)
+    - one multi-row ``INSERT ... ON CONFLICT DO NOTHING`` for the new rows
+    - TransactionType auto-create once per batch, payload schemas learned off-path
+    - rules run per customer, one commit per customer (events keep their input order)
+
+    Returns one result dict per input item, in input order.
+    """
+    results: list[dict | None] = [None] * len(events)
+
+    # 1) Validation + in-batch duplicates.
+    candidates: dict[tuple[str, str], int] = {}
+    for index, event_data in enumerate(events):
+        validation_error = _event_validation_error(event_data)
+        if validation_error:
+            results[index] = _batch_item_result(
+                index, event_data, result="REJECTED", errorCode="INVALID_EVENT", errorMessage=validation_error
+            )
+            continue
+        key = (event_data.brand, event_data.eventId)
+        if key in candidates:
+            results[index] = _batch_item_result(index, event_data, result="DUPLICATE_IN_BATCH", duplicateOf=candidates[key])
+            continue
+        candidates[key] = index
+
+    if not candidates:
+        return results
+
+    # 2) Set-based idempotency check.
+    existing_by_key = {
+        (tx.brand, tx.transaction_id): tx
+        for tx in db.query(Transaction)
+        .filter(sa.tuple_(Transaction.brand, Transaction.transaction_id).in_(list(candidates.keys())))
+        .all()
+    }
+
+    # 3) Bulk insert of new rows (concurrent inserts of the same event id are skipped by the constraint).
+    rows = []
+    for key, index in candidates.items():
+        if key in existing_by_key:
+            continue
+        rows.append({"id": uuid.uuid4(), **_new_transaction_values(events[index])})
+
+    inserted_ids: list = []
+    if rows:
+        stmt = (
+            pg_insert(Transaction)
+            .values(rows)
+            .on_conflict_do_nothing(constraint="uq_transactions_brand_event_id")
+            .returning(Transaction.id)
+        )
+        inserted_ids = [row[0] for row in db.execute(stmt).all()]
         db.commit()
 
-        # If tiers are configured after some customers were created, they may still be
-        # marked as UNCONFIGURED. Refresh their tier assignment opportunistically on
-        # any external ingestion, even when no rules matched.
-        if customer.loyalty_status in (None, "UNCONFIGURED"):
-            update_customer_status(
+    created_by_key: dict[tuple[str, str], Transaction] = {}
+    if inserted_ids:
+        for tx in db.query(Transaction).filter(Transaction.id.in_(inserted_ids)).all():
+            created_by_key[(tx.brand, tx.transaction_id)] = tx
+
+    lost_race = [key for key, _ in candidates.items() if key not in existing_by_key and key not in created_by_key]
+    if lost_race:
+        for tx in (
+            db.query(Transaction)
+            .filter(sa.tuple_(Transaction.brand, Transaction.transaction_id).in_(lost_race))
+            .all()
+        ):
+            existing_by_key[(tx.brand, tx.transaction_id)] = tx
+
+    created = [created_by_key[key] for key in candidates if key in created_by_key]
+    changed_brands = _ensure_transaction_types_for_batch(db, created)
+    db.commit()
+    for brand in changed_brands:
+        invalidate_brand_config(brand)
+    if _auto_update_payload_schema_enabled():
+        flush_payload_shapes()
+
+    # 4) Customer resolution (memoized per brand/profile) and per-customer rule processing.
+    customers_by_profile: dict[tuple[str, str], Customer] = {}
+    groups: dict = {}
+    for tx in created:
+        if tx.status != "PENDING":
+            continue
+        profile_key = (tx.brand, tx.profile_id)
+        customer = customers_by_profile.get(profile_key)
+        if customer is None:
+            customer = resolve_customer_for_transaction(
                 db,
-                customer,
-                reason="AUTO_TIER_REFRESH",
-                source_transaction_id=transaction.id,
-                depth=0,
-                refresh_window=True,
-                emit_events=False,
+                brand=tx.brand,
+                profile_id=tx.profile_id,
+                payload=tx.payload if isinstance(tx.payload, dict) else None,
             )
-            db.commit()
+            if customer is not None:
+                customers_by_profile[profile_key] = customer
+        if customer is None:
+            _ignore_unregistered_customer(tx)
+            continue
+        groups.setdefault(customer.id, (customer, []))[1].append(tx)
+    db.commit()
 
-    if transaction.status == "PENDING":
+    for customer, txs in groups.values():
         try:
-            process_transaction_rules(db, transaction)
-            transaction.processed_at = datetime.utcnow()
+            _process_customer_transactions(db, customer, txs)
             db.commit()
         except Exception as e:
             db.rollback()
-            msg = str(e)
-            if "Customer not found" in msg or "not enrolled" in msg.lower():
-                _ignore_unregistered_customer(transaction)
-            else:
-                transaction.status = "FAILED"
-                transaction.error_message = msg
-                transaction.processed_at = datetime.utcnow()
+            for tx in txs:
+                tx.status = "FAILED"
+                tx.error_message = str(e)
+                tx.processed_at = datetime.utcnow()
             db.commit()
 
-    return transaction
+    # 5) Results.
+    for key, index in candidates.items():
+        if key in created_by_key:
+            results[index] = _batch_item_result(index, events[index], result="CREATED", transaction=created_by_key[key])
+            continue
+        existing = existing_by_key.get(key)
+        if existing is not None:
+            existing = _retry_ignored_unregistered_customer(db, existing)
+        results[index] = _batch_item_result(index, events[index], result="EXISTING", transaction=existing)
+
+    return results
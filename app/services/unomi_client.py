@@ -1,17 +1,22 @@
-"""Minimal Apache Unomi REST client (stdlib HTTP, no extra dependency)."""
+"""Minimal Apache Unomi REST client (stdlib HTTP, no extra dependency).
+
+Calls go through a pooled keep-alive transport (``unomi_transport``) shared by every
+client of the process; ``AsyncUnomiClient`` is the asyncio variant for handlers/workers.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 import os
 import time
 from typing import Any
-from urllib.error import HTTPError, URLError
 from urllib.parse import quote
-from urllib.request import Request, urlopen
 
+from app.services.metrics import UNOMI_REQUEST_DURATION, UNOMI_REQUEST_ERRORS
 from app.services.unomi_settings_service import UnomiConnectionConfig
+from app.services.unomi_transport import RetryPolicy, default_pool_size, get_default_transport
 
 
 def _default_timeout_sec() -> float:
@@ -30,12 +35,23 @@ def _default_retries() -> int:
         return 2
 
 
-def _is_transient_url_error(e: URLError) -> bool:
-    msg = str(e).lower()
-    reason = getattr(e, "reason", None)
-    if reason is not None:
-        msg = f"{msg} {reason}".lower()
-    return "timed out" in msg or "timeout" in msg or "temporary failure" in msg
+def _default_async_concurrency() -> int:
+    raw = (os.getenv("UNOMI_ASYNC_MAX_CONCURRENCY") or "").strip()
+    try:
+        return max(1, int(raw)) if raw else default_pool_size()
+    except ValueError:
+        return default_pool_size()
+
+
+# Path segments kept verbatim in metric labels; anything else (ids) becomes "{id}".
+_METRIC_PATH_LITERALS = frozenset({"segments", "profiles", "privacy", "eventcollector", "match", "impacted", "query"})
+
+
+def metric_path(path: str) -> str:
+    """Low-cardinality template of a Unomi path: ``/segments/abc/match/p1`` -> ``/segments/{id}/match/{id}``."""
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    shaped = [p if (i == 0 or p in _METRIC_PATH_LITERALS) else "{id}" for i, p in enumerate(parts) if p]
+    return "/" + "/".join(shaped) + ("/" if path.endswith("/") and shaped else "")
 
 
 class UnomiClientError(Exception):
@@ -52,25 +68,30 @@ class UnomiClient:
         *,
         timeout_sec: float | None = None,
         max_retries: int | None = None,
+        retry_policy: RetryPolicy | None = None,
+        transport=None,
     ):
         self._config = config
         self._timeout = timeout_sec if timeout_sec is not None else _default_timeout_sec()
-        self._max_retries = max_retries if max_retries is not None else _default_retries()
+        if retry_policy is None:
+            retry_policy = RetryPolicy(max_retries=max_retries if max_retries is not None else _default_retries())
+        self._retry_policy = retry_policy
+        self._transport = transport if transport is not None else get_default_transport()
         self._api_root = f"{config.base_url}/cxs"
 
     def _auth_header(self) -> str:
         token = base64.b64encode(f"{self._config.username}:{self._config.password}".encode("utf-8")).decode("ascii")
         return f"Basic {token}"
 
-    def request(
+    def _prepare(
         self,
         method: str,
         path: str,
         *,
-        json_body: dict | list | None = None,
-        query: str = "",
-        extra_headers: dict[str, str] | None = None,
-    ) -> Any:
+        json_body: dict | list | None,
+        query: str,
+        extra_headers: dict[str, str] | None,
+    ) -> dict:
         path = path if path.startswith("/") else f"/{path}"
         url = f"{self._api_root}{path}"
         if query:
@@ -86,40 +107,60 @@ class UnomiClient:
         if json_body is not None:
             data = json.dumps(json_body).encode("utf-8")
             headers["Content-Type"] = "application/json"
+        return {"method": method.upper(), "path": path, "url": url, "body": data, "headers": headers}
 
-        req = Request(url, data=data, headers=headers, method=method.upper())
-        last_url_error: URLError | None = None
-        attempts = 1 + self._max_retries
-        for attempt in range(attempts):
+    def _send_once(self, prepared: dict) -> Any:
+        """One attempt. HTTP errors raise UnomiClientError; transport errors raise OSError."""
+        labels = {"method": prepared["method"], "path": metric_path(prepared["path"])}
+        started = time.perf_counter()
+        try:
+            resp = self._transport.send(
+                prepared["method"],
+                prepared["url"],
+                body=prepared["body"],
+                headers=prepared["headers"],
+                timeout=self._timeout,
+            )
+        except OSError:
+            UNOMI_REQUEST_ERRORS.inc(kind="connection", **labels)
+            raise
+        finally:
+            UNOMI_REQUEST_DURATION.observe(time.perf_counter() - started, **labels)
+        if resp.status >= 400:
+            UNOMI_REQUEST_ERRORS.inc(kind="http_5xx" if resp.status >= 500 else "http_4xx", **labels)
+            raise UnomiClientError(
+                f"Unomi HTTP {resp.status} for {prepared['method']} {prepared['path']}",
+                status_code=resp.status,
+                body=resp.body.decode("utf-8", errors="replace"),
+            )
+        raw = resp.body.decode("utf-8")
+        if not raw.strip():
+            return None
+        return json.loads(raw)
+
+    def _connection_error(self, prepared: dict, e: OSError) -> UnomiClientError:
+        return UnomiClientError(f"Unomi connection failed for {prepared['method']} {prepared['path']}: {e}")
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json_body: dict | list | None = None,
+        query: str = "",
+        extra_headers: dict[str, str] | None = None,
+    ) -> Any:
+        prepared = self._prepare(method, path, json_body=json_body, query=query, extra_headers=extra_headers)
+        attempt = 0
+        while True:
             try:
-                with urlopen(req, timeout=self._timeout) as resp:
-                    raw = resp.read().decode("utf-8")
-                    if not raw.strip():
-                        return None
-                    return json.loads(raw)
-            except HTTPError as e:
-                body = ""
-                try:
-                    body = e.read().decode("utf-8")
-                except Exception:
-                    pass
-                raise UnomiClientError(
-                    f"Unomi HTTP {e.code} for {method} {path}",
-                    status_code=e.code,
-                    body=body,
-                ) from e
-            except URLError as e:
-                last_url_error = e
-                if attempt + 1 < attempts and _is_transient_url_error(e):
-                    time.sleep(min(0.25 * (2**attempt), 2.0))
+                return self._send_once(prepared)
+            except OSError as e:
+                if self._retry_policy.should_retry(e, attempt):
+                    time.sleep(self._retry_policy.backoff_seconds(attempt))
+                    attempt += 1
                     continue
-                raise UnomiClientError(f"Unomi connection failed for {method} {path}: {e}") from e
-
-        if last_url_error is not None:
-            raise UnomiClientError(
-                f"Unomi connection failed for {method} {path}: {last_url_error}"
-            ) from last_url_error
-        return None
+                raise self._connection_error(prepared, e) from e
 
     def list_segment_metadata(self, *, offset: int = 0, size: int = 200) -> list[dict]:
         items = self.request("GET", "/segments/", query=f"offset={offset}&size={size}")
@@ -211,3 +252,62 @@ class UnomiClient:
                     if pid:
                         ids.append(str(pid))
         return ids
+
+
+class AsyncUnomiClient:
+    """asyncio variant of UnomiClient for FastAPI handlers and workers.
+
+    Each attempt runs in a worker thread over the shared keep-alive pool; at most
+    ``max_concurrency`` calls are in flight per client and retries wait with
+    ``asyncio.sleep`` instead of blocking the event loop.
+    """
+
+    def __init__(self, config: UnomiConnectionConfig, *, max_concurrency: int | None = None, **client_kwargs):
+        self._client = UnomiClient(config, **client_kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency or _default_async_concurrency())
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json_body: dict | list | None = None,
+        query: str = "",
+        extra_headers: dict[str, str] | None = None,
+    ) -> Any:
+        client = self._client
+        prepared = client._prepare(method, path, json_body=json_body, query=query, extra_headers=extra_headers)
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await asyncio.to_thread(client._send_once, prepared)
+            except OSError as e:
+                if client._retry_policy.should_retry(e, attempt):
+                    await asyncio.sleep(client._retry_policy.backoff_seconds(attempt))
+                    attempt += 1
+                    continue
+                raise client._connection_error(prepared, e) from e
+
+    async def get_profile(self, profile_id: str) -> dict | None:
+        pid = quote(profile_id, safe="")
+        try:
+            result = await self.request("GET", f"/profiles/{pid}")
+            return result if isinstance(result, dict) else None
+        except UnomiClientError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    async def save_profile(self, profile_body: dict) -> dict | None:
+        return await self.request("POST", "/profiles", json_body=profile_body)
+
+    async def collect_events(self, payload: dict, *, peer_key: str | None = None) -> dict | None:
+        extra: dict[str, str] = {}
+        if peer_key:
+            extra["X-Unomi-Peer"] = peer_key
+        return await self.request("POST", "/eventcollector", json_body=payload, extra_headers=extra or None)
+
+    async def gather(self, calls) -> list:
+        """Run ``[(method, path, kwargs), ...]`` concurrently (bounded); results keep input order."""
+        return await asyncio.gather(*(self.request(m, p, **(kw or {})) for m, p, kw in calls))
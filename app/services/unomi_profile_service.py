@@ -5,13 +5,16 @@ from __future__ import annotations
 import logging
 import os
 from contextvars import ContextVar
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Any
 
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models.customer import Customer
 from app.models.customer_metrics import CustomerMetrics
+from app.models.unomi_sync_outbox import UnomiSyncOutbox
 from app.services.customer_serialization import _format_birthdate, _tier_name_for_customer
 from app.services.unomi_client import UnomiClient, UnomiClientError
 from app.services.unomi_settings_service import (
@@ -121,6 +124,8 @@ def maybe_sync_customer_to_unomi_after_transaction(
         return {"skipped": True, "reason": "sync_source_unomi"}
     if not should_sync_customer_to_unomi_after_transaction(transaction=transaction):
         return None
+    if unomi_profile_sync_dispatch_mode() == "outbox":
+        return enqueue_customer_profile_sync(db, customer=customer, reason="transaction_processed")
     return sync_customer_profile_to_unomi(
         db,
         customer=customer,
@@ -130,6 +135,74 @@ def maybe_sync_customer_to_unomi_after_transaction(
     )
 
 
+def unomi_profile_sync_dispatch_mode() -> str:
+    """``inline`` (push during the request) or ``outbox`` (queue for ``unomi_sync_dispatcher``)."""
+    raw = (os.getenv("UNOMI_PROFILE_SYNC_DISPATCH") or "inline").strip().lower()
+    return "outbox" if raw == "outbox" else "inline"
+
+
+def _outbox_delay_seconds() -> int:
+    # Entries wait a little before dispatch so a burst of events collapses into one push.
+    try:
+        return max(0, int(os.getenv("UNOMI_SYNC_OUTBOX_DELAY_SECONDS") or "5"))
+    except ValueError:
+        return 5
+
+
+def enqueue_customer_profile_sync(db: Session, *, customer: Customer, reason: str) -> dict[str, Any]:
+    """Queue a profile push in the caller's transaction (no commit).
+
+    A PENDING entry for the same ``(brand, profile_id)`` absorbs the request instead of
+    adding a row; the dispatcher reads the customer at push time, so the latest state wins.
+    An enqueue error is logged and reported as ``queued: False``, never raised.
+    """
+    if should_skip_unomi_profile_push():
+        return {"skipped": True, "reason": "sync_source_unomi"}
+
+    profile_id = (customer.profile_id or "").strip()
+    if not unomi_profile_sync_enabled_for_brand(brand=customer.brand):
+        return {"synced": False, "skipped": True, "reason": "profile_sync_disabled", "profileId": profile_id}
+    if not profile_id:
+        return {"synced": False, "skipped": True, "reason": "missing_profile_id"}
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    stmt = pg_insert(UnomiSyncOutbox).values(
+        brand=customer.brand,
+        profile_id=profile_id,
+        customer_id=customer.id,
+        reason=reason,
+        status="PENDING",
+        coalesced_count=1,
+        attempts=0,
+        next_attempt_at=now + timedelta(seconds=_outbox_delay_seconds()),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UnomiSyncOutbox.brand, UnomiSyncOutbox.profile_id],
+        index_where=text("status = 'PENDING'"),
+        set_={
+            "reason": stmt.excluded.reason,
+            "customer_id": stmt.excluded.customer_id,
+            "coalesced_count": UnomiSyncOutbox.coalesced_count + 1,
+            "updated_at": now,
+        },
+    )
+    # Savepoint: a failed enqueue must not abort the caller's transaction.
+    try:
+        with db.begin_nested():
+            db.execute(stmt)
+    except Exception as e:
+        logger.exception("unomi outbox enqueue failed brand=%s profile_id=%s", customer.brand, profile_id)
+        return {"queued": False, "profileId": profile_id, "reason": reason, "error": str(e)}
+    return {"queued": True, "profileId": profile_id, "reason": reason}
+
+
+def request_customer_profile_sync(db: Session, *, customer: Customer, reason: str) -> dict[str, Any] | None:
+    """Inline push or outbox entry, depending on ``UNOMI_PROFILE_SYNC_DISPATCH``."""
+    if unomi_profile_sync_dispatch_mode() == "outbox":
+        return enqueue_customer_profile_sync(db, customer=customer, reason=reason)
+    return sync_customer_profile_to_unomi(db, customer=customer, reason=reason)
+
+
 def build_upsert_unomi_sync_result(
     db: Session,
     *,
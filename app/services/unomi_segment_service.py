@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import re
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 from uuid import UUID
@@ -106,6 +107,33 @@ def manual_profile_ids_list(seg: Segment) -> list[str]:
     return []
 
 
+_manual_ids_lock = threading.Lock()
+_manual_ids_sets: dict[UUID, tuple[tuple, frozenset[str]]] = {}
+
+
+def manual_profile_ids_set(seg: Segment) -> frozenset[str]:
+    """``manual_profile_ids_list`` as a set, memoized per segment version.
+
+    The version is ``(updated_at, len(manual_profile_ids))``: ``updated_at`` moves on every
+    committed edit, the length catches in-session edits not yet flushed.
+    """
+    raw = seg.manual_profile_ids
+    updated_at = getattr(seg, "updated_at", None)
+    if seg.id is None or updated_at is None:
+        return frozenset(manual_profile_ids_list(seg))
+
+    version = (updated_at, len(raw) if isinstance(raw, list) else 0)
+    with _manual_ids_lock:
+        cached = _manual_ids_sets.get(seg.id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    ids = frozenset(manual_profile_ids_list(seg))
+    with _manual_ids_lock:
+        _manual_ids_sets[seg.id] = (version, ids)
+    return ids
+
+
 def set_manual_profile_ids(seg: Segment, profile_ids: list[str]) -> None:
     seg.manual_profile_ids = sorted({str(p).strip() for p in profile_ids if str(p).strip()})
 
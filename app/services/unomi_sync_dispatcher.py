@@ -0,0 +1,377 @@
+"""Unomi profile sync dispatcher: drains ``unomi_sync_outbox``.
+
+Run next to the API when ``UNOMI_PROFILE_SYNC_DISPATCH=outbox``:
+
+    python -m app.services.unomi_sync_dispatcher
+
+Each loop claims due PENDING entries with ``FOR UPDATE SKIP LOCKED``, marks them
+DISPATCHING and commits the claim (new requests for the same customer then open a fresh
+PENDING entry). Entries are coalesced per ``(brand, profile_id)``; the payload is built
+from the customer row as it is now, and pushed through the event collector. Pushes run
+concurrently over the pooled Unomi transport.
+
+A pushed entry is deleted. A failed one goes back to PENDING with exponential backoff,
+unless a newer PENDING entry already covers the customer (then it is dropped) or
+``UNOMI_SYNC_DISPATCHER_MAX_ATTEMPTS`` is reached (then it is kept as FAILED).
+DISPATCHING entries older than ``UNOMI_SYNC_DISPATCHER_STALE_SECONDS`` (crashed
+dispatcher) are put back in the queue.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.customer import Customer
+from app.models.unomi_sync_outbox import UnomiSyncOutbox
+from app.services.metrics import maybe_start_metrics_server
+from app.services.unomi_client import UnomiClient, UnomiClientError
+from app.services.unomi_profile_service import (
+    _push_profile_via_eventcollector,
+    build_unomi_profile_payload,
+    unomi_profile_sync_mode,
+)
+from app.services.unomi_settings_service import resolve_unomi_profile_connection
+from app.services.unomi_transport import default_pool_size
+
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    # Keep naive UTC timestamps to match existing DB column types/semantics.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class ProfilePush:
+    brand: str
+    profile_id: str
+    reason: str | None
+    entry_ids: list[UUID] = field(default_factory=list)
+    attempts: int = 0
+
+
+def coalesce_entries(claimed: list[tuple]) -> list[ProfilePush]:
+    """Merge claimed ``(id, brand, profile_id, reason, attempts)`` rows per customer.
+
+    The reason of the latest entry wins; attempts is the highest of the merged entries.
+    """
+    pushes: dict[tuple[str, str], ProfilePush] = {}
+    for entry_id, brand, profile_id, reason, attempts in claimed:
+        push = pushes.get((brand, profile_id))
+        if push is None:
+            push = pushes[(brand, profile_id)] = ProfilePush(brand=brand, profile_id=profile_id, reason=reason)
+        elif reason:
+            push.reason = reason
+        push.entry_ids.append(entry_id)
+        push.attempts = max(push.attempts, int(attempts or 0))
+    return list(pushes.values())
+
+
+def retry_delay_seconds(attempts: int, *, base_seconds: int = 30, max_seconds: int = 3600) -> int:
+    return min(base_seconds * (2 ** max(0, attempts - 1)), max_seconds)
+
+
+def _claim_outbox_entries(db: Session, *, batch_size: int, now: datetime) -> list[tuple]:
+    rows = (
+        db.query(UnomiSyncOutbox)
+        .filter(UnomiSyncOutbox.status == "PENDING")
+        .filter(UnomiSyncOutbox.next_attempt_at <= now)
+        .order_by(UnomiSyncOutbox.next_attempt_at.asc(), UnomiSyncOutbox.created_at.asc())
+        .with_for_update(skip_locked=True)
+        .limit(batch_size)
+        .all()
+    )
+
+    claimed = []
+    for row in rows:
+        row.status = "DISPATCHING"
+        row.claimed_at = now
+        row.attempts = int(row.attempts or 0) + 1
+        claimed.append((row.id, row.brand, row.profile_id, row.reason, row.attempts))
+    return claimed
+
+
+def _pending_keys(db: Session, pushes: list[ProfilePush]) -> set[tuple[str, str]]:
+    if not pushes:
+        return set()
+    rows = (
+        db.query(UnomiSyncOutbox.brand, UnomiSyncOutbox.profile_id)
+        .filter(UnomiSyncOutbox.status == "PENDING")
+        .filter(UnomiSyncOutbox.profile_id.in_({p.profile_id for p in pushes}))
+        .all()
+    )
+    return {(brand, profile_id) for brand, profile_id in rows}
+
+
+def _requeue_stale_entries(db: Session, *, now: datetime, stale_seconds: int) -> int:
+    """Put stale DISPATCHING entries back to PENDING, one per ``(brand, profile_id)``.
+
+    Stale entries of a customer that already has a PENDING entry, and all but the newest
+    stale entry of each customer, are deleted: only one PENDING row per customer may exist
+    (``uq_unomi_sync_outbox_pending_profile``).
+    """
+    stale_before = now - timedelta(seconds=int(stale_seconds))
+    rows = (
+        db.query(UnomiSyncOutbox)
+        .filter(UnomiSyncOutbox.status == "DISPATCHING")
+        .filter(UnomiSyncOutbox.claimed_at < stale_before)
+        .order_by(UnomiSyncOutbox.created_at.asc())
+        .with_for_update(skip_locked=True)
+        .limit(1000)
+        .all()
+    )
+    if not rows:
+        return 0
+    stale = [ProfilePush(brand=r.brand, profile_id=r.profile_id, reason=r.reason) for r in rows]
+    pending = _pending_keys(db, stale)
+
+    latest: dict[tuple[str, str], UnomiSyncOutbox] = {}
+    for row in rows:
+        key = (row.brand, row.profile_id)
+        if key in pending:
+            db.delete(row)
+            continue
+        kept = latest.get(key)
+        if kept is not None:
+            row.attempts = max(int(row.attempts or 0), int(kept.attempts or 0))
+            row.reason = row.reason or kept.reason
+            db.delete(kept)
+        latest[key] = row
+
+    for row in latest.values():
+        row.status = "PENDING"
+        row.claimed_at = None
+        row.next_attempt_at = now
+    db.flush()
+    return len(latest)
+
+
+class _BrandClients:
+    """One connection config / client per brand for the duration of a batch."""
+
+    def __init__(self):
+        self._clients: dict[str, tuple[UnomiClient, str] | None] = {}
+
+    def get(self, brand: str) -> tuple[UnomiClient, str] | None:
+        if brand not in self._clients:
+            cfg = resolve_unomi_profile_connection(brand=brand)
+            self._clients[brand] = (UnomiClient(cfg), cfg.scope) if cfg else None
+        return self._clients[brand]
+
+
+def _load_customers(db: Session, pushes: list[ProfilePush]) -> dict[tuple[str, str], Customer]:
+    by_brand: dict[str, set[str]] = {}
+    for push in pushes:
+        by_brand.setdefault(push.brand, set()).add(push.profile_id)
+    customers = {}
+    for brand, profile_ids in by_brand.items():
+        rows = db.query(Customer).filter(Customer.brand == brand).filter(Customer.profile_id.in_(profile_ids)).all()
+        for c in rows:
+            customers[(brand, c.profile_id)] = c
+    return customers
+
+
+def _send(job) -> str | None:
+    client, push, scope, properties = job
+    try:
+        _push_profile_via_eventcollector(
+            client,
+            profile_id=push.profile_id,
+            scope=scope,
+            properties=properties,
+            brand=push.brand,
+        )
+        return None
+    except (UnomiClientError, OSError) as e:
+        return str(e)[:1000] or repr(e)
+
+
+def dispatch_outbox_batch(
+    db: Session,
+    *,
+    pool: ThreadPoolExecutor,
+    batch_size: int = 200,
+    max_attempts: int = 8,
+    now: datetime | None = None,
+) -> dict:
+    """Claim, coalesce, push and settle one batch. Returns counters for logging."""
+    now = now or _utcnow()
+    claimed = _claim_outbox_entries(db, batch_size=batch_size, now=now)
+    db.commit()
+    stats = {"claimed": len(claimed), "profiles": 0, "pushed": 0, "dropped": 0, "retried": 0, "failed": 0}
+    if not claimed:
+        return stats
+
+    pushes = coalesce_entries(claimed)
+    stats["profiles"] = len(pushes)
+    customers = _load_customers(db, pushes)
+    clients = _BrandClients()
+
+    jobs = []
+    done_ids: list[UUID] = []
+    for push in pushes:
+        customer = customers.get((push.brand, push.profile_id))
+        target = clients.get(push.brand)
+        if customer is None or target is None:
+            # Customer deleted, or profile sync disabled / unconfigured since enqueue.
+            done_ids.extend(push.entry_ids)
+            stats["dropped"] += 1
+            continue
+        client, scope = target
+        body = build_unomi_profile_payload(
+            db,
+            customer=customer,
+            scope=scope,
+            sync_mode=unomi_profile_sync_mode(reason=push.reason),
+            item_id=push.profile_id,
+        )
+        jobs.append((client, push, scope, body.get("properties") or {}))
+
+    errors = list(pool.map(_send, jobs))
+    # Payload building only read; end that transaction before settling the batch.
+    db.rollback()
+
+    failures = []
+    for (_, push, _, _), error in zip(jobs, errors):
+        if error is None:
+            done_ids.extend(push.entry_ids)
+            stats["pushed"] += 1
+        else:
+            failures.append((push, error))
+
+    if done_ids:
+        db.query(UnomiSyncOutbox).filter(UnomiSyncOutbox.id.in_(done_ids)).delete(synchronize_session=False)
+
+    pending = _pending_keys(db, [push for push, _ in failures])
+    for push, error in failures:
+        logger.warning(
+            "unomi outbox push failed brand=%s profile_id=%s attempts=%s error=%s",
+            push.brand,
+            push.profile_id,
+            push.attempts,
+            error,
+        )
+        q = db.query(UnomiSyncOutbox).filter(UnomiSyncOutbox.id.in_(push.entry_ids))
+        if (push.brand, push.profile_id) in pending:
+            # A newer request is queued; it will push the latest state anyway.
+            q.delete(synchronize_session=False)
+            stats["dropped"] += 1
+            continue
+        rows = q.all()
+        keep, extra = rows[0], rows[1:]
+        for row in extra:
+            db.delete(row)
+        keep.last_error = error
+        keep.attempts = push.attempts
+        keep.claimed_at = None
+        if push.attempts >= max_attempts:
+            keep.status = "FAILED"
+            stats["failed"] += 1
+        else:
+            keep.status = "PENDING"
+            keep.next_attempt_at = now + timedelta(seconds=retry_delay_seconds(push.attempts))
+            stats["retried"] += 1
+
+    db.commit()
+    return stats
+
+
+def run_unomi_sync_dispatcher_loop(
+    *,
+    threads: int = 10,
+    batch_size: int = 200,
+    idle_sleep_seconds: float = 1.0,
+    max_attempts: int = 8,
+    stale_seconds: int = 300,
+):
+    logger.info(
+        "unomi sync dispatcher started",
+        extra={
+            "threads": threads,
+            "batch_size": batch_size,
+            "idle_sleep_seconds": idle_sleep_seconds,
+            "max_attempts": max_attempts,
+            "stale_seconds": stale_seconds,
+        },
+    )
+
+    last_stale_check = 0.0
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="unomi-sync") as pool:
+        while True:
+            db = SessionLocal()
+            try:
+                if time.monotonic() - last_stale_check >= 60:
+                    # Own commit: a failed requeue is logged and retried at the next check,
+                    # it never blocks dispatching.
+                    last_stale_check = time.monotonic()
+                    try:
+                        requeued = _requeue_stale_entries(db, now=_utcnow(), stale_seconds=stale_seconds)
+                        db.commit()
+                        if requeued:
+                            logger.warning("requeued stale DISPATCHING outbox entries count=%s", requeued)
+                    except Exception:
+                        db.rollback()
+                        logger.exception("unomi outbox stale requeue failed")
+
+                started_at = time.perf_counter()
+                stats = dispatch_outbox_batch(db, pool=pool, batch_size=batch_size, max_attempts=max_attempts)
+            except Exception:
+                db.rollback()
+                logger.exception("unomi outbox batch failed")
+                stats = {"claimed": 0}
+            finally:
+                db.close()
+
+            if not stats["claimed"]:
+                time.sleep(idle_sleep_seconds)
+                continue
+
+            logger.info(
+                "unomi outbox batch claimed=%s profiles=%s pushed=%s dropped=%s retried=%s failed=%s duration_ms=%s",
+                stats["claimed"],
+                stats["profiles"],
+                stats["pushed"],
+                stats["dropped"],
+                stats["retried"],
+                stats["failed"],
+                int((time.perf_counter() - started_at) * 1000),
+            )
+
+
+def main():
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        )
+
+    threads = int(os.getenv("UNOMI_SYNC_DISPATCHER_THREADS") or str(default_pool_size()))
+    batch_size = int(os.getenv("UNOMI_SYNC_DISPATCHER_BATCH_SIZE") or "200")
+    idle_sleep_seconds = float(os.getenv("UNOMI_SYNC_DISPATCHER_IDLE_SLEEP_SECONDS") or "1")
+    max_attempts = int(os.getenv("UNOMI_SYNC_DISPATCHER_MAX_ATTEMPTS") or "8")
+    stale_seconds = int(os.getenv("UNOMI_SYNC_DISPATCHER_STALE_SECONDS") or "300")
+
+    logger.info("starting unomi sync dispatcher")
+    maybe_start_metrics_server()
+    run_unomi_sync_dispatcher_loop(
+        threads=threads,
+        batch_size=batch_size,
+        idle_sleep_seconds=idle_sleep_seconds,
+        max_attempts=max_attempts,
+        stale_seconds=stale_seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""HTTP transport for UnomiClient: pooled keep-alive connections (stdlib ``http.client``).
+
+``urlopen`` opens a new TCP (and TLS) connection per call. ``PooledHttpTransport`` keeps
+idle HTTP/1.1 connections per ``(scheme, host, port)`` and reuses them, with at most
+``UNOMI_HTTP_POOL_SIZE`` connections in use per host (callers wait for a free slot).
+A request that fails on a reused connection the server already closed is replayed once
+on a fresh connection. Retry / backoff for everything else is ``RetryPolicy``'s job.
+"""
+
+from __future__ import annotations
+
+import http.client
+import os
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+
+def _env_int(name: str, default: int, *, minimum: int) -> int:
+    raw = (os.getenv(name) or str(default)).strip()
+    try:
+        return max(minimum, int(raw))
+    except ValueError:
+        return default
+
+
+def default_pool_size() -> int:
+    return _env_int("UNOMI_HTTP_POOL_SIZE", 10, minimum=1)
+
+
+def default_pool_idle_seconds() -> int:
+    return _env_int("UNOMI_HTTP_POOL_IDLE_SEC", 30, minimum=0)
+
+
+def is_transient_error(e: OSError) -> bool:
+    if isinstance(e, TimeoutError):
+        return True
+    msg = str(e).lower()
+    reason = getattr(e, "reason", None)
+    if reason is not None:
+        msg = f"{msg} {reason}".lower()
+    return "timed out" in msg or "timeout" in msg or "temporary failure" in msg
+
+
+class RetryPolicy:
+    """Which transport errors are retried and how long to wait before each retry.
+
+    Subclass (or pass any object with the same two methods) to change the policy.
+    """
+
+    def __init__(self, *, max_retries: int = 2, base_delay_sec: float = 0.25, max_delay_sec: float = 2.0):
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+
+    def should_retry(self, error: OSError, attempt: int) -> bool:
+        return attempt < self.max_retries and is_transient_error(error)
+
+    def backoff_seconds(self, attempt: int) -> float:
+        return min(self.base_delay_sec * (2**attempt), self.max_delay_sec)
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    status: int
+    body: bytes
+
+
+def _default_connection_factory(scheme: str, host: str, port: int | None, timeout: float):
+    if scheme == "https":
+        return http.client.HTTPSConnection(host, port, timeout=timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+class _HostPool:
+    def __init__(self, scheme: str, host: str, port: int | None, *, max_connections: int, idle_seconds: int, factory):
+        self._scheme = scheme
+        self._host = host
+        self._port = port
+        self._idle_seconds = idle_seconds
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def acquire(self, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"Unomi connection pool to {self._host} exhausted (timed out waiting)")
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate, released_at = self._idle.pop()
+                if now - released_at <= self._idle_seconds:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for old in stale:
+            old.close()
+        if conn is not None:
+            return conn, True
+        try:
+            return self._factory(self._scheme, self._host, self._port, timeout), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: http.client.HTTPConnection, *, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+class PooledHttpTransport:
+    def __init__(
+        self,
+        *,
+        max_connections_per_host: int | None = None,
+        idle_seconds: int | None = None,
+        connection_factory=None,
+    ):
+        self._max_connections = max_connections_per_host or default_pool_size()
+        self._idle_seconds = default_pool_idle_seconds() if idle_seconds is None else idle_seconds
+        self._factory = connection_factory or _default_connection_factory
+        self._lock = threading.Lock()
+        self._pools: dict[tuple[str, str, int | None], _HostPool] = {}
+
+    @property
+    def max_connections_per_host(self) -> int:
+        return self._max_connections
+
+    def _pool_for(self, scheme: str, host: str, port: int | None) -> _HostPool:
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(
+                    scheme,
+                    host,
+                    port,
+                    max_connections=self._max_connections,
+                    idle_seconds=self._idle_seconds,
+                    factory=self._factory,
+                )
+                self._pools[key] = pool
+            return pool
+
+    def send(self, method: str, url: str, *, body: bytes | None, headers: dict[str, str], timeout: float) -> HttpResponse:
+        """One HTTP exchange. Transport failures raise ``OSError`` (``TimeoutError``, ``ConnectionError``...)."""
+        parts = urlsplit(url)
+        scheme = (parts.scheme or "http").lower()
+        if scheme not in {"http", "https"} or not parts.hostname:
+            raise ConnectionError(f"Unsupported Unomi URL: {url}")
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        pool = self._pool_for(scheme, parts.hostname, parts.port)
+        while True:
+            conn, reused = pool.acquire(timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (ConnectionResetError, BrokenPipeError):
+                pool.release(conn, reusable=False)
+                if reused:
+                    # Keep-alive connection closed by the server while idle: replay on a fresh one.
+                    continue
+                raise
+            except http.client.HTTPException as e:
+                pool.release(conn, reusable=False)
+                raise ConnectionError(f"Invalid HTTP response from {parts.hostname}: {e!r}") from e
+            except BaseException:
+                pool.release(conn, reusable=False)
+                raise
+            pool.release(conn, reusable=not resp.will_close)
+            return HttpResponse(status=int(resp.status), body=data)
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+_default_transport: PooledHttpTransport | None = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> PooledHttpTransport:
+    """Process-wide transport: clients are created per call, their connections are shared."""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = PooledHttpTransport()
+        return _default_transport
@@ -1,22 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import date
-from app.models.point_movement import PointMovement
+
+from app.services.point_ledger_service import get_point_balance, get_point_balances
 
 
 def get_status_points_balance(db: Session, customer_id):
-    today = date.today()
+    # Materialized ledger (point_balances / point_balance_buckets), see point_ledger_service.
+    return get_point_balance(db, customer_id)
 
-    balance = (
-        db.query(func.coalesce(func.sum(PointMovement.points), 0))
-        .filter(
-            PointMovement.customer_id == customer_id,
-            (PointMovement.expires_at.is_(None)) | (PointMovement.expires_at >= today)
-        )
-        .scalar()
-    )
 
-    return max(0, int(balance or 0))
+def get_status_points_balances(db: Session, customer_ids: list) -> dict:
+    # Same balances for a page of customers (list endpoints), keyed by customer id.
+    return get_point_balances(db, customer_ids)
 
 
 def get_points_balance(db: Session, customer_id):
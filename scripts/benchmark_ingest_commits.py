@@ -0,0 +1,127 @@
+"""Measure commits, SQL statements and latency per synchronously ingested event.
+
+Ingests synthetic events for a throwaway brand through ``create_transaction`` (the
+``POST /transactions`` path), then replays them to measure the duplicate path, and
+deletes the brand's rows afterwards (unless ``--keep``).
+
+Usage (from repo root, against a migrated database):
+  python scripts/benchmark_ingest_commits.py --events 200
+  python scripts/benchmark_ingest_commits.py --brand batira --profile-id p-123 --events 50 --keep
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal, engine
+from app.models.customer import Customer
+from app.models.event_type import TransactionType
+from app.models.transaction import Transaction
+from app.schemas.event import EventCreate
+from app.services.transaction_service import create_transaction
+
+
+class _Counters:
+    def __init__(self):
+        self.commits = 0
+        self.statements = 0
+
+    def on_commit(self, session):
+        self.commits += 1
+
+    def on_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+
+def _run(db, events: list[EventCreate], counters: _Counters) -> dict:
+    commits, statements, latencies_ms, statuses = [], [], [], {}
+    for event_data in events:
+        c0, s0 = counters.commits, counters.statements
+        started = time.perf_counter()
+        tx = create_transaction(db, event_data)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        commits.append(counters.commits - c0)
+        statements.append(counters.statements - s0)
+        statuses[tx.status] = statuses.get(tx.status, 0) + 1
+    return {
+        "commits/event": f"avg={statistics.mean(commits):.2f} max={max(commits)}",
+        "statements/event": f"avg={statistics.mean(statements):.1f} max={max(statements)}",
+        "latency_ms": f"p50={statistics.median(latencies_ms):.2f} max={max(latencies_ms):.2f}",
+        "statuses": statuses,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Commits / statements per ingested event")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--brand", help="Default: a throwaway bench-<hex> brand")
+    parser.add_argument("--profile-id", dest="profile_id", help="Existing customer (default: create one)")
+    parser.add_argument("--event-type", dest="event_type", default="bench_visit")
+    parser.add_argument("--keep", action="store_true", help="Keep the ingested rows")
+    args = parser.parse_args()
+
+    brand = args.brand or f"bench-{uuid.uuid4().hex[:8]}"
+    run_id = uuid.uuid4().hex[:8]
+    counters = _Counters()
+
+    with SessionLocal() as db:
+        created_customer = None
+        profile_id = args.profile_id
+        if not profile_id:
+            profile_id = f"bench-profile-{run_id}"
+            created_customer = Customer(brand=brand, profile_id=profile_id, loyalty_status="UNCONFIGURED")
+            db.add(created_customer)
+            db.commit()
+
+        events = [
+            EventCreate(
+                brand=brand,
+                profileId=profile_id,
+                eventType=args.event_type,
+                eventId=f"bench-{run_id}-{i}",
+                source="BENCH",
+                payload={"index": i, "amount": i % 97},
+            )
+            for i in range(args.events)
+        ]
+
+        event.listen(db, "after_commit", counters.on_commit)
+        event.listen(engine, "before_cursor_execute", counters.on_statement)
+        try:
+            print(f"brand={brand} profile_id={profile_id} events={len(events)}")
+            print("new events:      ", _run(db, events, counters))
+            print("duplicate events:", _run(db, events, counters))
+        finally:
+            event.remove(engine, "before_cursor_execute", counters.on_statement)
+            event.remove(db, "after_commit", counters.on_commit)
+
+        if not args.keep:
+            db.rollback()
+            db.query(Transaction).filter(Transaction.brand == brand).filter(
+                Transaction.transaction_id.like(f"bench-{run_id}-%")
+            ).delete(synchronize_session=False)
+            if not args.brand:
+                db.query(TransactionType).filter(TransactionType.brand == brand).delete(synchronize_session=False)
+            db.commit()
+            if created_customer is not None:
+                try:
+                    db.delete(created_customer)
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    print(f"kept customer {profile_id} (still referenced)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
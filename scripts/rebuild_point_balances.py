@@ -0,0 +1,106 @@
+"""Check or rebuild the materialized point balances (point_balances / point_balance_buckets).
+
+The balances are replayed from point_movements (FIFO deductions, expiry per bucket) and
+compared with the stored rows.
+
+Usage (from repo root):
+  # Compare only, print mismatches
+  python scripts/rebuild_point_balances.py --brand batira --check
+
+  # Rewrite missing / mismatched rows (dry-run, rolled back)
+  python scripts/rebuild_point_balances.py --brand batira
+
+  # Persist, one commit per chunk (run once after the point_balances migration)
+  python scripts/rebuild_point_balances.py --brand batira --commit
+
+  # Single customer
+  python scripts/rebuild_point_balances.py --brand batira --customer 6a5aa537-e2c5-447d-b1df-9f28528a87b8 --commit
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import SessionLocal
+from app.services.point_ledger_service import PointBalanceRebuildStats, rebuild_point_balances
+
+
+def _print_report(stats: PointBalanceRebuildStats, *, write: bool, commit: bool) -> None:
+    print(f"customers scanned:      {stats.customers}")
+    print(f"missing rows:           {stats.missing}")
+    print(f"mismatched rows:        {stats.mismatched}")
+    print(f"status_points drift:    {stats.status_points_drift}")
+    if write:
+        print(f"rows {'rewritten' if commit else 'to rewrite'}:      {stats.written}")
+
+    for m in stats.mismatches:
+        print(f"\n  customer {m.customer_id}")
+        print(f"    stored:   buckets={m.stored_buckets} debt={m.stored_debt}")
+        print(f"    expected: buckets={m.expected_buckets} debt={m.expected_debt}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check/rebuild materialized point balances from point_movements")
+    parser.add_argument("--brand", default="batira")
+    parser.add_argument(
+        "--customer",
+        action="append",
+        default=[],
+        help="Customer UUID (repeatable); default: every customer of the brand",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Compare only, never write (exit code 1 on mismatch)",
+    )
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="Persist changes, one commit per chunk (default: dry-run / rollback)",
+    )
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=500)
+    parser.add_argument("--max-samples", dest="max_samples", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.check and args.commit:
+        parser.error("--check and --commit are mutually exclusive")
+
+    try:
+        customer_ids = [UUID(c) for c in args.customer] or None
+    except ValueError:
+        print("Invalid UUID for --customer")
+        return 1
+
+    write = not args.check
+    with SessionLocal() as db:
+        stats = rebuild_point_balances(
+            db,
+            brand=args.brand,
+            customer_ids=customer_ids,
+            write=write,
+            commit=args.commit,
+            chunk_size=args.chunk_size,
+            max_samples=args.max_samples,
+            on_chunk=lambda s: print(f"... {s.customers} customers", file=sys.stderr),
+        )
+        _print_report(stats, write=write, commit=args.commit)
+
+        if write and not args.commit:
+            db.rollback()
+            print("\nRolled back (pass --commit to persist).")
+        elif args.commit:
+            db.commit()
+            print("\nCommitted.")
+
+    if args.check and (stats.missing or stats.mismatched):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
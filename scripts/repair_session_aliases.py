@@ -47,6 +47,7 @@ from app.models.point_movement import PointMovement
 from app.models.transaction import Transaction
 from app.services.contact_service import _extract_email_from_payload, get_customer
 from app.services.loyalty_status_service import update_customer_status
+from app.services.point_ledger_service import add_point_movement
 from app.services.unomi_profile_service import sync_customer_profile_to_unomi
 from app.services.wallet_service import get_status_points_balance
 
@@ -329,25 +330,22 @@ def _execute_point_transfer(
     db.add(corr_tx)
     db.flush()
 
-    db.add(
-        PointMovement(
-            customer_id=wrong.id,
-            points=-amount,
-            type="ADJUST",
-            source_transaction_id=corr_tx.id,
-            expires_at=None,
-        )
+    add_point_movement(
+        db,
+        customer_id=wrong.id,
+        points=-amount,
+        type="ADJUST",
+        source_transaction_id=corr_tx.id,
+        expires_at=None,
     )
-    db.add(
-        PointMovement(
-            customer_id=target.id,
-            points=amount,
-            type="ADJUST",
-            source_transaction_id=corr_tx.id,
-            expires_at=earn_expires_at,
-        )
+    add_point_movement(
+        db,
+        customer_id=target.id,
+        points=amount,
+        type="ADJUST",
+        source_transaction_id=corr_tx.id,
+        expires_at=earn_expires_at,
     )
-    db.flush()
 
     wrong.status_points = int(get_status_points_balance(db, wrong.id) or 0)
     target.status_points = int(get_status_points_balance(db, target.id) or 0)
@@ -0,0 +1,97 @@
+"""Brand config cache: tier ladder bisect, TTL and explicit invalidation."""
+
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.routes import admin
+from app.services.brand_config_cache import (
+    BrandConfig,
+    TierLadder,
+    TierStep,
+    clear_brand_config_cache,
+    get_brand_config,
+    invalidate_brand_config,
+)
+
+
+LADDER = TierLadder.build(
+    [
+        TierStep(key="base", min_status_points=0),
+        TierStep(key="silver", min_status_points=100),
+        TierStep(key="gold", min_status_points=500),
+    ]
+)
+
+
+def _config(version: int) -> BrandConfig:
+    return BrandConfig(
+        brand="batira",
+        version=version,
+        loaded_at=10.0,
+        tiers=LADDER,
+        settings=None,
+        transaction_types=MappingProxyType({}),
+    )
+
+
+def test_ladder_resolves_status_like_the_tier_queries():
+    assert LADDER.status_for_points(0) == "base"
+    assert LADDER.status_for_points(99) == "base"
+    assert LADDER.status_for_points(100) == "silver"
+    assert LADDER.status_for_points(10_000) == "gold"
+    assert LADDER.status_for_points(None) == "base"
+    # Below every minimum: lowest active tier rather than UNCONFIGURED.
+    assert LADDER.status_for_points(-5) == "base"
+    assert LADDER.base_key == "base"
+    assert LADDER.min_points("silver") == 100
+    assert LADDER.min_points("unknown") is None
+
+
+def test_empty_ladder_leaves_status_unconfigured():
+    ladder = TierLadder.build([])
+    assert ladder.status_for_points(100) is None
+    assert ladder.base_key is None
+
+
+@patch("app.services.brand_config_cache.time.monotonic", return_value=10.0)
+@patch("app.services.brand_config_cache.load_brand_config")
+def test_get_brand_config_is_cached_until_invalidation(mock_load, _mock_clock, monkeypatch):
+    monkeypatch.delenv("BRAND_CONFIG_CACHE_TTL_SECONDS", raising=False)
+    clear_brand_config_cache()
+    mock_load.side_effect = lambda db, brand, version: _config(version)
+    db = MagicMock()
+
+    first = get_brand_config(db, brand="batira")
+    assert get_brand_config(db, brand="batira") is first
+    assert mock_load.call_count == 1
+
+    invalidate_brand_config("Batira")
+    second = get_brand_config(db, brand="batira")
+    assert second is not first
+    assert second.version == first.version + 1
+    assert mock_load.call_count == 2
+
+
+@patch("app.services.brand_config_cache.load_brand_config", side_effect=lambda db, brand, version: _config(version))
+def test_ttl_zero_disables_the_cache(mock_load, monkeypatch):
+    monkeypatch.setenv("BRAND_CONFIG_CACHE_TTL_SECONDS", "0")
+    clear_brand_config_cache()
+    get_brand_config(MagicMock(), brand="batira")
+    get_brand_config(MagicMock(), brand="batira")
+    assert mock_load.call_count == 2
+
+
+@pytest.mark.parametrize("existing, invalidated", [(SimpleNamespace(), []), (None, ["batira"])])
+def test_admin_settings_read_invalidates_only_when_it_creates_the_row(monkeypatch, existing, invalidated):
+    settings = SimpleNamespace(brand="batira", points_validity_days=365, loyalty_status_validity_days=None)
+    monkeypatch.setattr(admin, "find_loyalty_settings", lambda db, *, brand: existing)
+    monkeypatch.setattr(admin, "get_or_create_loyalty_settings", lambda db, *, brand: settings)
+    calls = []
+    monkeypatch.setattr(admin, "invalidate_brand_config", calls.append)
+
+    out = admin.get_loyalty_settings(brand="batira", db=MagicMock())
+
+    assert out["points_validity_days"] == 365
+    assert calls == invalidated
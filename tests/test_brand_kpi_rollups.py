@@ -0,0 +1,97 @@
+"""Brand KPI rollups: hourly rebuild with a settle window, reads from rollups plus live edges."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from app.services import brand_kpi_service
+from app.services.internal_job_runner import run_internal_job_once
+
+
+COUNTERS = {
+    "total": 10,
+    "new": {7: 1, 30: 2},
+    "active": {7: 3, 30: 4},
+    "configured": 5,
+    "by_loyalty_status": [{"key": "GOLD", "count": 5}],
+}
+
+
+def test_job_rebuilds_the_settle_window_and_advances_by_batch(monkeypatch):
+    rebuilt = []
+    monkeypatch.setattr(
+        brand_kpi_service,
+        "rebuild_transaction_rollups",
+        lambda db, *, brand, start, end: rebuilt.append((start, end)) or 7,
+    )
+    monkeypatch.setattr(brand_kpi_service, "_customer_counters", lambda db, *, brand, now: COUNTERS)
+    snapshot = SimpleNamespace(transactions_rolled_up_to=datetime(2026, 3, 1, 0, 0), computed_at=None)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = snapshot
+    job = SimpleNamespace(
+        id=UUID(int=1),
+        job_key="MAINT_ROLLUP_BRAND_KPIS",
+        brand="batira",
+        selector={"batch_hours": 24},
+        schedule=None,
+    )
+
+    stats = run_internal_job_once(db, job=job, now=datetime(2026, 3, 3, 10, 20))
+
+    assert rebuilt == [(datetime(2026, 2, 28, 22, 0), datetime(2026, 3, 2, 0, 0))]
+    assert (stats.processed, stats.updated, stats.finished) == (26, 7, False)
+    assert snapshot.transactions_rolled_up_to == datetime(2026, 3, 2, 0, 0)
+    assert (snapshot.customers_new_30d, snapshot.customers_by_loyalty_status) == (2, COUNTERS["by_loyalty_status"])
+
+    stats = run_internal_job_once(db, job=job, now=datetime(2026, 3, 2, 0, 40))
+    assert stats.finished is True
+
+
+def test_window_kpis_sum_rollups_and_count_only_the_edges_live(monkeypatch):
+    live_ranges = []
+
+    def live(db, *, brand, start, end=None):
+        live_ranges.append((start, end))
+        return [("PROCESSED", "PURCHASE", None, 1)]
+
+    monkeypatch.setattr(brand_kpi_service, "_live_transaction_counts", live)
+    db = MagicMock()
+    db.get.return_value = SimpleNamespace(transactions_rolled_up_to=datetime(2026, 3, 31, 10, 0))
+    db.query.return_value.filter.return_value.filter.return_value.filter.return_value.group_by.return_value.all.return_value = [
+        ("PROCESSED", "PURCHASE", "", 40),
+        ("IGNORED", "PURCHASE", "NO_RULES", 6),
+        ("FAILED", "VISIT", "CUSTOMER_NOT_FOUND", 3),
+        ("PROCESSED", "TIER_UPGRADED", "", 2),
+        ("PROCESSED", "NEW_TYPE", "TRANSACTION_TYPE_CREATED", 1),
+    ]
+
+    kpis = brand_kpi_service.transaction_window_kpis(db, brand="batira", window_from=datetime(2026, 3, 1, 10, 15))
+
+    assert live_ranges == [
+        (datetime(2026, 3, 1, 10, 15), datetime(2026, 3, 1, 11, 0)),
+        (datetime(2026, 3, 31, 10, 0), None),
+    ]
+    assert kpis["ingested"] == 54
+    assert kpis["top_types"][0] == {"transactionType": "PURCHASE", "count": 48}
+    assert kpis["top_error_codes"] == [
+        {"errorCode": "NO_RULES", "count": 6},
+        {"errorCode": "CUSTOMER_NOT_FOUND", "count": 3},
+    ]
+    assert (kpis["no_rules"], kpis["blocked_customer_not_found"], kpis["tier_upgraded"]) == (6, 3, 2)
+
+
+def test_window_kpis_are_fully_live_before_the_first_rollup(monkeypatch):
+    live_ranges = []
+    monkeypatch.setattr(
+        brand_kpi_service,
+        "_live_transaction_counts",
+        lambda db, *, brand, start, end=None: live_ranges.append((start, end)) or [],
+    )
+    db = MagicMock()
+    db.get.return_value = None
+
+    kpis = brand_kpi_service.transaction_window_kpis(db, brand="batira", window_from=datetime(2026, 3, 1, 10, 15))
+
+    assert live_ranges == [(datetime(2026, 3, 1, 10, 15), None)]
+    assert (kpis["ingested"], kpis["rolled_up_to"]) == (0, None)
@@ -1,10 +1,16 @@
 """Unit tests for catalog invalidation helpers."""
 
 from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
 
+from sqlalchemy.dialects import postgresql
+
+from app.models.customer_reward import CustomerReward
 from app.services.catalog_invalidation_service import (
     coupon_admin_allowed_transitions,
     invalidate_product_in_snapshot,
+    preview_product_delete,
     reward_admin_allowed_transitions,
     stamp_catalog_removed,
 )
@@ -38,6 +44,21 @@ def test_invalidate_product_in_snapshot_marks_only_target():
     assert updated["productSnapshots"][1]["invalidatedAt"]
 
 
+def test_preview_product_delete_counts_snapshots_with_jsonb_containment():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.count.side_effect = [2, 3]
+    product = SimpleNamespace(id=UUID(int=5), name="Café")
+
+    preview = preview_product_delete(db, product=product)
+
+    clause = db.query.return_value.filter.call_args_list[-1].args[0]
+    compiled = clause.compile(dialect=postgresql.dialect())
+    assert str(compiled) == "(customer_rewards.payload -> %(payload_1)s) @> %(param_1)s::JSONB"
+    assert compiled.params == {"payload_1": "productSnapshots", "param_1": [{"id": str(UUID(int=5))}]}
+    assert preview["counts"]["customer_rewards_with_product_snapshots"] == 3
+    assert "ix_customer_rewards_payload_product_snapshots" in {i.name for i in CustomerReward.__table__.indexes}
+
+
 def test_coupon_admin_allowed_transitions_invalidated_is_empty():
     coupon = SimpleNamespace(status="INVALIDATED", payload={})
     assert coupon_admin_allowed_transitions(coupon) == []
@@ -0,0 +1,107 @@
+"""Streaming CSV customer import: row validation, chunked COPY staging, rejection."""
+
+import csv
+import io
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services import customer_import_service
+from app.services.customer_import_service import (
+    import_customers_csv_stream,
+    iter_csv_rows,
+    stage_chunk_csv,
+    validate_import_row,
+)
+
+
+def _csv(*lines: str) -> io.BytesIO:
+    return io.BytesIO(("﻿" + "\n".join(lines) + "\n").encode("utf-8"))
+
+
+def test_iter_csv_rows_strips_bom_and_numbers_lines_like_before():
+    stream = _csv("brand,profileId", "batira,p1", "batira,p2")
+    assert list(iter_csv_rows(stream)) == [
+        (2, {"brand": "batira", "profileId": "p1"}),
+        (3, {"brand": "batira", "profileId": "p2"}),
+    ]
+    assert not stream.closed
+
+
+def test_validate_import_row_normalizes_gender_and_birthdate():
+    staged = validate_import_row(
+        2, {"brand": "batira", "profile_id": " p1 ", "gender": "Femme", "birthdate": "1990-06-12"}, brand="batira"
+    )
+    assert staged.profile_id == "p1"
+    assert staged.gender == "F"
+    assert (staged.has_birthdate, staged.birthdate, staged.birth_month, staged.birth_day, staged.birth_year) == (
+        True,
+        date(1990, 6, 12),
+        6,
+        12,
+        1990,
+    )
+
+    partial = validate_import_row(3, {"brand": "batira", "profileId": "p2", "birthdate": "06-12"}, brand="batira")
+    assert partial.gender is None
+    assert (partial.birthdate, partial.birth_month, partial.birth_day, partial.birth_year) == (None, 6, 12, None)
+
+
+@pytest.mark.parametrize(
+    "row, message",
+    [
+        ({"profileId": "p1"}, "brand is required"),
+        ({"brand": "other", "profileId": "p1"}, "brand mismatch: expected 'batira' got 'other'"),
+        ({"brand": "batira"}, "profileId is required"),
+    ],
+)
+def test_validate_import_row_errors(row, message):
+    with pytest.raises(ValueError, match=message):
+        validate_import_row(2, row, brand="batira")
+
+
+def test_stage_chunk_csv_writes_nulls_as_empty_fields():
+    staged = validate_import_row(2, {"brand": "batira", "profileId": "p,1", "gender": "m"}, brand="batira")
+    (line,) = list(csv.reader(stage_chunk_csv([staged])))
+    assert line[:2] == ["2", "p,1"]
+    assert line[3:] == ["M", "f", "", "", "", ""]
+
+
+def test_import_stages_in_chunks_then_merges(monkeypatch):
+    copies = []
+    monkeypatch.setattr(customer_import_service, "_copy_into_stage", lambda db, rows: copies.append(len(rows)))
+    monkeypatch.setattr(customer_import_service, "_merge_stage", lambda db, brand: (3, 1))
+    phases = []
+
+    result = import_customers_csv_stream(
+        MagicMock(),
+        brand="batira",
+        stream=_csv("brand,profileId", *(f"batira,p{i}" for i in range(5))),
+        chunk_size=2,
+        on_progress=lambda phase, stats: phases.append((phase, stats["staged"])),
+    )
+
+    assert copies == [2, 2, 1]
+    assert result["rejected"] is False
+    assert (result["processed"], result["staged"], result["created"], result["updated"]) == (5, 5, 3, 1)
+    assert phases[-1] == ("MERGING", 5)
+
+
+def test_import_with_invalid_rows_is_rejected_without_merge(monkeypatch):
+    monkeypatch.setattr(customer_import_service, "_copy_into_stage", lambda db, rows: None)
+    monkeypatch.setattr(
+        customer_import_service, "_merge_stage", MagicMock(side_effect=AssertionError("must not merge"))
+    )
+
+    result = import_customers_csv_stream(
+        MagicMock(),
+        brand="batira",
+        stream=_csv("brand,profileId", "batira,p1", "other,p2", ",p3", "batira,"),
+        max_errors=2,
+    )
+
+    assert result["rejected"] is True
+    assert result["errorCount"] == 3
+    assert result["summary"] == {"brandMissing": 1, "brandMismatch": 1, "profileIdMissing": 1, "invalid": 0}
+    assert [e["line"] for e in result["errors"]] == [3, 4]
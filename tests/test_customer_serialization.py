@@ -0,0 +1,74 @@
+"""Batched customer serialization: page-wide tier and balance reads, constant query count."""
+
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from app.models.customer import Customer
+from app.models.loyalty_tier import LoyaltyTier
+from app.models.point_balance import PointBalance
+from app.models.point_balance_bucket import PointBalanceBucket
+from app.services.customer_serialization import serialize_customers_out
+from app.services.point_ledger_service import get_point_balances
+
+
+TODAY = date(2026, 3, 1)
+
+
+def _customer(n: int, tier: str | None = "gold") -> Customer:
+    return Customer(
+        id=UUID(int=n),
+        brand="batira",
+        profile_id=f"p{n}",
+        status="ACTIVE",
+        loyalty_status=tier,
+        status_points=0,
+    )
+
+
+def _db(results: dict) -> MagicMock:
+    """``db.query(first_column, ...)`` returns ``results[first_column]`` from ``.all()``."""
+    db = MagicMock()
+
+    def query(entity, *_rest):
+        q = MagicMock()
+        q.filter.return_value = q
+        q.group_by.return_value = q
+        q.order_by.return_value = q
+        q.all.return_value = results.get(entity, [])
+        return q
+
+    db.query.side_effect = query
+    return db
+
+
+def test_balances_come_from_one_query_per_source():
+    fresh, stale, unmaterialized = UUID(int=1), UUID(int=2), UUID(int=3)
+    db = _db(
+        {
+            PointBalance.customer_id: [(fresh, 120, TODAY), (stale, 90, TODAY - timedelta(days=1))],
+            PointBalanceBucket.customer_id: [(stale, 40)],
+        }
+    )
+
+    balances = get_point_balances(db, [fresh, stale, unmaterialized, fresh], today=TODAY)
+
+    assert balances == {fresh: 120, stale: 40, unmaterialized: 0}
+    assert db.query.call_count == 3
+
+
+def test_serialize_customers_out_query_count_does_not_grow_with_the_page():
+    page = [_customer(n, tier="gold" if n % 2 else None) for n in range(1, 501)]
+    db = _db(
+        {
+            LoyaltyTier.key: [("gold", "Or")],
+            PointBalance.customer_id: [(c.id, n, None) for n, c in enumerate(page)],
+        }
+    )
+
+    items = serialize_customers_out(db, customers=page, brand="batira")
+
+    assert db.query.call_count == 2
+    assert len(items) == 500
+    assert (items[0]["loyalty_status_name"], items[0]["points_balance"]) == ("Or", 0)
+    assert (items[1]["loyalty_status_name"], items[1]["points_balance"]) == (None, 1)
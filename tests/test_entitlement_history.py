@@ -0,0 +1,123 @@
+"""Customer entitlement history: UNION ALL page with a per-source LIMIT and an (occurred_at, id) keyset."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models.customer_coupon import CustomerCoupon
+from app.models.transaction import Transaction
+from app.services import entitlement_history_service
+from app.services.entitlement_history_service import (
+    _customer_history_sources,
+    _history_page_statement,
+    build_customer_entitlement_history,
+)
+from app.services.keyset_pagination import decode_cursor, encode_cursor
+
+
+CUSTOMER = SimpleNamespace(id=UUID(int=1), profile_id="p1", brand="batira", email=None)
+
+
+class _Row(tuple):
+    """``(kind, id, occurred_at)`` result row with attribute access, like ``Row``."""
+
+    id = property(lambda self: self[1])
+    occurred_at = property(lambda self: self[2])
+
+
+def _no_alias_filter(monkeypatch):
+    monkeypatch.setattr(
+        entitlement_history_service, "customer_transaction_filters", lambda db, *, brand, customer: sa.true()
+    )
+
+
+def test_page_statement_seeks_and_limits_every_source_before_the_union(monkeypatch):
+    _no_alias_filter(monkeypatch)
+    sources = _customer_history_sources(Session(), brand="batira", customer=CUSTOMER)
+
+    stmt = _history_page_statement(
+        sources, cursor=encode_cursor(datetime(2026, 3, 1), UUID(int=9)), limit=20, offset=40
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert sql.count("UNION ALL") == 2
+    assert sql.count(" LIMIT ") == 4
+    assert "(customer_rewards.issued_at, customer_rewards.id) < " in sql
+    assert "(coalesce(customer_coupons.issued_at, customer_coupons.created_at), customer_coupons.id) < " in sql
+    assert "ORDER BY history.occurred_at DESC, history.id DESC" in sql
+    assert "OFFSET" not in sql
+
+
+def test_history_keeps_page_order_and_returns_the_next_cursor(monkeypatch):
+    _no_alias_filter(monkeypatch)
+    monkeypatch.setattr(entitlement_history_service, "_history_page_statement", lambda *a, **k: "page")
+    tx = SimpleNamespace(
+        id=UUID(int=2),
+        processed_at=datetime(2026, 3, 2),
+        created_at=datetime(2026, 3, 2),
+        transaction_type="ADMIN_USE_COUPON",
+        source="ADMIN",
+        profile_id="p1",
+        brand="batira",
+        payload={},
+    )
+    coupon = SimpleNamespace(
+        id=UUID(int=3),
+        issued_at=datetime(2026, 3, 1),
+        created_at=datetime(2026, 3, 1),
+        status="ISSUED",
+        coupon_type_id=None,
+        payload={"couponTypeSnapshot": {"name": "Anniversaire"}},
+    )
+    loaded = {Transaction: [tx], CustomerCoupon: [coupon]}
+
+    def query(entity, *_rest):
+        q = MagicMock()
+        q.filter.return_value = q
+        q.all.return_value = loaded.get(entity, [])
+        return q
+
+    db = MagicMock()
+    db.query.side_effect = query
+    db.execute.return_value.all.return_value = [
+        _Row(("transaction", tx.id, tx.processed_at)),
+        _Row(("coupon_issued", coupon.id, coupon.issued_at)),
+    ]
+
+    out = build_customer_entitlement_history(db, brand="batira", customer=CUSTOMER, limit=2, total_mode="none")
+
+    assert [(e["kind"], e["id"]) for e in out["items"]] == [
+        ("transaction", str(tx.id)),
+        ("coupon_issued", str(coupon.id)),
+    ]
+    assert out["items"][1]["summary"] == "Coupon émis : Anniversaire"
+    assert out["total"] is None
+    assert decode_cursor(out["nextCursor"]) == (coupon.issued_at, coupon.id)
+
+
+def test_cursor_pages_skip_the_total_unless_asked(monkeypatch):
+    _no_alias_filter(monkeypatch)
+    monkeypatch.setattr(entitlement_history_service, "_history_page_statement", lambda *a, **k: "page")
+    counted = []
+    monkeypatch.setattr(
+        entitlement_history_service, "count_rows", lambda db, query, mode: counted.append(mode) or 4
+    )
+    db = MagicMock()
+    db.execute.return_value.all.return_value = []
+    cursor = encode_cursor(datetime(2026, 3, 1), UUID(int=9))
+
+    first = build_customer_entitlement_history(db, brand="batira", customer=CUSTOMER)
+    deeper = build_customer_entitlement_history(db, brand="batira", customer=CUSTOMER, cursor=cursor)
+    asked = build_customer_entitlement_history(
+        db, brand="batira", customer=CUSTOMER, cursor=cursor, total_mode="estimate"
+    )
+
+    assert (first["total"], first["countMode"]) == (12, "exact")
+    assert (deeper["total"], deeper["countMode"]) == (None, "none")
+    assert (asked["total"], asked["countMode"]) == (12, "estimate")
+    assert counted == ["exact"] * 3 + ["estimate"] * 3
@@ -0,0 +1,106 @@
+"""Chunked expiry engine: keyset chunk driver, set-based UPDATE statements, tier refresh filter."""
+
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import expiry_engine
+from app.services.brand_config_cache import TierLadder, TierStep
+from app.services.expiry_engine import _run_chunks, status_refresh_needed
+
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+LADDER = TierLadder.build(
+    [
+        TierStep(key="base", min_status_points=0),
+        TierStep(key="silver", min_status_points=100),
+    ]
+)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_run_chunks_commits_each_chunk_and_follows_the_cursor():
+    db = MagicMock()
+    cursors = []
+    results = iter([(2, 2, 1, 0, UUID(int=2)), (2, 2, 0, 0, UUID(int=4)), (1, 1, 0, 0, UUID(int=5))])
+
+    def step(after_id, limit):
+        cursors.append((after_id, limit))
+        return next(results)
+
+    seen = []
+    result = _run_chunks(db, kind="coupons", step=step, chunk_size=2, commit=True, on_chunk=seen.append)
+
+    assert cursors == [(None, 2), (UUID(int=2), 2), (UUID(int=4), 2)]
+    assert db.commit.call_count == 3
+    assert (result.expired, result.cascaded, len(result.chunks)) == (5, 1, 3)
+    assert [c.index for c in seen] == [0, 1, 2]
+
+
+def test_run_chunks_without_commit_only_flushes_and_stops_on_empty_chunk(monkeypatch):
+    monkeypatch.setenv("EXPIRY_CHUNK_SIZE", "10")
+    db = MagicMock()
+    result = _run_chunks(db, kind="rewards", step=lambda a, n: (0, 0, 0, 0, None), chunk_size=None, commit=False, on_chunk=None)
+    assert result.chunks == []
+    db.commit.assert_not_called()
+
+
+def test_coupon_chunk_is_one_locked_keyset_update_plus_one_reward_update():
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = [UUID(int=3), UUID(int=9)]
+    db.execute.return_value.rowcount = 4
+
+    out = expiry_engine._expire_coupons_chunk(db, brand="batira", now=NOW, after_id=UUID(int=1), limit=500)
+
+    assert out == (2, 2, 4, 0, UUID(int=9))
+    coupon_sql, reward_sql = (_sql(call.args[0]) for call in db.execute.call_args_list)
+    assert coupon_sql.startswith("UPDATE customer_coupons SET status=")
+    assert "FOR UPDATE OF customer_coupons SKIP LOCKED" in coupon_sql
+    assert "customer_coupons.id > " in coupon_sql
+    assert "RETURNING customer_coupons.id" in coupon_sql
+    assert reward_sql.startswith("UPDATE customer_rewards SET status=")
+    assert "customer_rewards.customer_coupon_id IN" in reward_sql
+
+
+def test_points_chunk_drops_expired_buckets_and_refreshes_balances_in_bulk(monkeypatch):
+    ids = [UUID(int=1), UUID(int=2)]
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.side_effect = [ids, [UUID(int=2)]]
+    db.execute.return_value.all.return_value = [
+        (UUID(int=1), 150, "silver", NOW, NOW + timedelta(days=10)),
+        (UUID(int=2), 20, "base", NOW, None),
+    ]
+    refresh = MagicMock()
+    monkeypatch.setattr(expiry_engine, "update_customer_status", refresh)
+
+    out = expiry_engine._expire_points_chunk(
+        db, brand="batira", today=date(2026, 3, 1), now=NOW, tiers=LADDER, after_id=None, limit=2
+    )
+
+    assert out == (2, 2, 0, 1, UUID(int=2))
+    select_sql, delete_sql, balance_sql, customer_sql = (_sql(c.args[0]) for c in db.execute.call_args_list[:4])
+    assert "point_balances.next_expires_at < " in select_sql
+    assert "FOR UPDATE OF customers SKIP LOCKED" in select_sql
+    assert delete_sql.startswith("DELETE FROM point_balance_buckets")
+    assert "GROUP BY point_balances_1.customer_id" in balance_sql
+    assert customer_sql.startswith("UPDATE customers SET status_points=point_balances.total")
+    assert "IS DISTINCT FROM point_balances.total" in customer_sql
+    refresh.assert_not_called()
+
+
+def test_status_refresh_needed_mirrors_update_customer_status():
+    later = NOW + timedelta(days=30)
+    common = {"assigned_at": NOW, "now": NOW}
+    assert status_refresh_needed(LADDER, status_points=150, loyalty_status="base", expires_at=None, **common)
+    assert not status_refresh_needed(LADDER, status_points=150, loyalty_status="silver", expires_at=later, **common)
+    # Downgrade blocked until the window ends.
+    assert not status_refresh_needed(LADDER, status_points=10, loyalty_status="silver", expires_at=later, **common)
+    assert status_refresh_needed(LADDER, status_points=10, loyalty_status="silver", expires_at=NOW, **common)
+    # Base tier must never carry an expiration.
+    assert status_refresh_needed(LADDER, status_points=10, loyalty_status="base", expires_at=later, **common)
+    assert status_refresh_needed(TierLadder.build([]), status_points=10, loyalty_status=None, expires_at=None, **common)
@@ -0,0 +1,154 @@
+"""Async ingest: enqueue on the API side, ordered lanes in the worker."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.models.transaction import Transaction
+from app.services import ingest_worker
+from app.services.ingest_worker import group_into_lanes, parse_shard
+from app.services.transaction_service import enqueue_transaction, ingest_mode_is_async
+
+
+def test_group_into_lanes_keeps_per_customer_order():
+    claimed = [
+        ("t1", "batira", "p1"),
+        ("t2", "batira", "p2"),
+        ("t3", "batira", "p1"),
+        ("t4", "other", "p1"),
+    ]
+    assert group_into_lanes(claimed) == [["t1", "t3"], ["t2"], ["t4"]]
+
+
+def test_parse_shard():
+    assert parse_shard(None) == (0, 1)
+    assert parse_shard("2/4") == (2, 4)
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+    with pytest.raises(ValueError):
+        parse_shard("x")
+
+
+def _locked_rows_query(db, rows):
+    query = MagicMock()
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.with_for_update.return_value = query
+    query.limit.return_value = query
+    query.first.return_value = rows[0] if rows else None
+    query.all.return_value = rows
+    db.query.return_value = query
+    return query
+
+
+def test_claim_stamps_a_lease_and_counts_attempts():
+    db = MagicMock()
+    tx = SimpleNamespace(
+        id="t1", brand="batira", profile_id="p1", queued_at=datetime(2026, 3, 1), ingest_attempts=0
+    )
+    _locked_rows_query(db, [tx])
+    now = datetime(2026, 3, 1, 0, 5)
+
+    claimed = ingest_worker._claim_queued_transactions(
+        db, batch_size=10, shard=(0, 1), worker_id="w1", now=now
+    )
+
+    assert claimed == [("t1", "batira", "p1")]
+    assert (tx.queued_at, tx.claimed_at, tx.claimed_by, tx.ingest_attempts) == (None, now, "w1", 1)
+
+
+def test_requeue_only_sweeps_expired_leases_and_fails_after_max_attempts():
+    db = MagicMock()
+    retry = SimpleNamespace(
+        created_at=datetime(2026, 3, 1), claimed_at=datetime(2026, 3, 1), claimed_by="w1", ingest_attempts=2
+    )
+    exhausted = SimpleNamespace(
+        created_at=datetime(2026, 3, 1), claimed_at=datetime(2026, 3, 1), claimed_by="w1", ingest_attempts=5
+    )
+    query = _locked_rows_query(db, [retry, exhausted])
+    now = datetime(2026, 3, 1, 1, 0)
+
+    result = ingest_worker._requeue_stale_transactions(
+        db, now=now, stale_seconds=600, shard=(0, 1), max_attempts=5
+    )
+
+    assert result == (1, 1)
+    where = " AND ".join(
+        str(call.args[0].compile(dialect=postgresql.dialect())) for call in query.filter.call_args_list
+    )
+    assert "transactions.claimed_at IS NOT NULL" in where
+    assert "created_at" not in where
+    query.with_for_update.assert_called_once_with(skip_locked=True)
+    assert (retry.queued_at, retry.claimed_at, retry.claimed_by) == (retry.created_at, None, None)
+    assert (exhausted.status, exhausted.error_code, exhausted.processed_at) == ("FAILED", "INGEST_MAX_ATTEMPTS", now)
+    assert not hasattr(exhausted, "queued_at")
+
+
+@pytest.mark.parametrize("status, claimed_by", [("PROCESSED", "w1"), ("PENDING", "w2")])
+def test_lane_skips_rows_no_longer_pending_or_leased_elsewhere(monkeypatch, status, claimed_by):
+    db = MagicMock()
+    query = _locked_rows_query(db, [SimpleNamespace(status=status, claimed_by=claimed_by)])
+    monkeypatch.setattr(ingest_worker, "SessionLocal", lambda: db)
+    processed = []
+    monkeypatch.setattr(ingest_worker, "process_ingested_transaction", lambda db, tx: processed.append(tx))
+
+    assert ingest_worker._process_lane(["t1"], worker_id="w1") == (0, 0)
+    assert processed == []
+    query.with_for_update.assert_called_once_with()
+
+
+def test_ingest_mode_resolution(monkeypatch):
+    monkeypatch.delenv("TRANSACTION_INGEST_MODE", raising=False)
+    assert ingest_mode_is_async(None) is False
+    assert ingest_mode_is_async("ASYNC") is True
+    monkeypatch.setenv("TRANSACTION_INGEST_MODE", "async")
+    assert ingest_mode_is_async(None) is True
+    assert ingest_mode_is_async("sync") is False
+    with pytest.raises(HTTPException):
+        ingest_mode_is_async("later")
+
+
+def test_enqueue_transaction_persists_pending_with_queued_at():
+    db = MagicMock()
+    query = MagicMock()
+    query.filter.return_value = query
+    query.first.return_value = None
+    db.query.return_value = query
+    inserted = []
+
+    def scalars(stmt):
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        assert "ON CONFLICT ON CONSTRAINT uq_transactions_brand_event_id DO NOTHING" in str(compiled)
+        params = dict(compiled.params)
+        inserted.append(Transaction(transaction_id=params.pop("event_id"), **params))
+        return MagicMock(first=MagicMock(return_value=inserted[-1]))
+
+    db.scalars.side_effect = scalars
+
+    event = SimpleNamespace(
+        brand="batira",
+        profileId="p1",
+        eventType="sale",
+        eventId="order-1",
+        source="UNOMI",
+        payload={"orderTotal": "1 000 CFA"},
+    )
+    tx = enqueue_transaction(db, event)
+
+    assert tx is inserted[0]
+    assert tx.status == "PENDING"
+    assert tx.queued_at is not None
+    assert tx.payload["orderTotal"] == 1000
+    db.commit.assert_called_once()
+
+
+def test_worker_queue_indexes_are_declared_on_the_model():
+    indexes = {i.name: i for i in Transaction.__table__.indexes}
+    queue = indexes["ix_transactions_ingest_queue"]
+    assert [c.name for c in queue.columns] == ["queued_at"]
+    assert str(queue.dialect_options["postgresql"]["where"]) == "status = 'PENDING' AND queued_at IS NOT NULL"
+    assert "ix_transactions_pending_claimed_at" in indexes
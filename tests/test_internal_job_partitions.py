@@ -0,0 +1,112 @@
+"""Partitioned internal jobs: keyspace split, idempotent planning, chunked cursor resume."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import internal_job_partition_worker as worker
+from app.services.internal_job_partition_worker import partition_bounds, plan_job_partitions, run_partition
+from app.services.internal_job_runner import InternalJobRunStats
+
+
+NOW = datetime(2026, 3, 1, 8, 0, 0)
+
+
+def test_partition_bounds_cover_the_keyspace_without_gaps():
+    bounds = partition_bounds(4)
+    assert len(bounds) == 4
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+    assert [b[1].int for b in bounds[:-1]] == [1 << 126, 2 << 126, 3 << 126]
+    assert partition_bounds(1) == [(None, None)]
+
+
+def test_plan_job_partitions_inserts_one_row_per_slice_and_skips_existing_runs():
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = [UUID(int=1), UUID(int=2), UUID(int=3)]
+    job = SimpleNamespace(id=UUID(int=7), schedule={"type": "cron", "cron": "0 8 * * *", "timezone": "UTC"})
+
+    stats = plan_job_partitions(db, job=job, now=NOW, count=3)
+
+    assert (stats.partitions, stats.planned, stats.job_status) == (3, 3, "RUNNING")
+    sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("INSERT INTO internal_job_partitions")
+    assert "ON CONFLICT ON CONSTRAINT uq_internal_job_partitions_job_run_index DO NOTHING" in sql
+
+
+def test_run_partition_checkpoints_each_chunk_and_marks_done(monkeypatch):
+    unit = SimpleNamespace(
+        id=UUID(int=1),
+        job_id=UUID(int=7),
+        run_key="2026-03-01T08:00:00",
+        attempts=1,
+        cursor=None,
+        processed=0,
+        created=0,
+        idempotent_existing=0,
+        failed=0,
+        locked_by="w:0",
+        locked_at=NOW,
+        status="RUNNING",
+        last_error=None,
+        finished_at=None,
+    )
+    job = SimpleNamespace(id=UUID(int=7))
+    db = MagicMock()
+    db.get.side_effect = lambda model, _id: unit if model is worker.InternalJobPartition else job
+
+    chunks = iter(
+        [
+            [(UUID(int=10), "batira", "p1"), (UUID(int=11), "batira", "p2")],
+            [(UUID(int=12), "batira", "p3")],
+        ]
+    )
+    cursors = []
+
+    def fetch(db, *, job, unit, run_date, limit):
+        cursors.append((unit.cursor, run_date.isoformat(), limit))
+        return next(chunks)
+
+    emitted = []
+
+    def emit(db, *, job, customers, bucket_key):
+        emitted.append((len(customers), bucket_key))
+        return InternalJobRunStats(processed=len(customers), created=len(customers), idempotent_existing=0, failed=0)
+
+    finalize = MagicMock(return_value=True)
+    monkeypatch.setattr(worker, "_fetch_chunk", fetch)
+    monkeypatch.setattr(worker, "emit_job_transactions", emit)
+    monkeypatch.setattr(worker, "finalize_partitioned_run", finalize)
+
+    stats = run_partition(db, unit_id=unit.id, worker_id="w:0", chunk_size=2)
+
+    assert cursors == [(None, "2026-03-01", 2), (UUID(int=11), "2026-03-01", 2)]
+    assert emitted == [(2, "2026-03-01T08:00:00"), (1, "2026-03-01T08:00:00")]
+    assert (stats.status, stats.chunks, stats.processed) == ("DONE", 2, 3)
+    assert (unit.status, unit.cursor, unit.processed, unit.locked_by) == ("DONE", UUID(int=12), 3, None)
+    assert db.commit.call_count == 2
+    finalize.assert_called_once_with(db, job_id=unit.job_id, run_key=unit.run_key)
+
+
+def test_run_partition_stops_when_another_worker_took_the_lease(monkeypatch):
+    unit = SimpleNamespace(
+        id=UUID(int=1), job_id=UUID(int=7), run_key="2026-03-01", attempts=2, cursor=None, locked_by="w:1"
+    )
+    db = MagicMock()
+    db.get.side_effect = lambda model, _id: unit if model is worker.InternalJobPartition else SimpleNamespace(id=7)
+    monkeypatch.setattr(worker, "_fetch_chunk", lambda db, **kw: [(UUID(int=10), "batira", "p1")])
+    monkeypatch.setattr(
+        worker,
+        "emit_job_transactions",
+        lambda db, **kw: InternalJobRunStats(processed=1, created=0, idempotent_existing=1, failed=0),
+    )
+
+    stats = run_partition(db, unit_id=unit.id, worker_id="w:0", chunk_size=10)
+
+    assert stats.status == "LOST"
+    assert unit.cursor is None
+    db.commit.assert_not_called()
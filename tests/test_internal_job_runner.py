@@ -0,0 +1,91 @@
+"""Generic internal jobs: keyset customer chunks, one existence query per chunk, commit per chunk."""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from app.services import internal_job_runner as runner
+from app.services.internal_job_runner import emit_job_transactions, fetch_job_customer_chunk
+
+
+JOB = SimpleNamespace(
+    id=UUID(int=7),
+    job_key="BIRTHDAY_BONUS",
+    brand="batira",
+    segment_id=None,
+    selector={},
+    schedule={"type": "cron", "cron": "0 8 * * *", "timezone": "UTC"},
+    transaction_type="BIRTHDAY",
+    payload_template={"points": 50},
+)
+
+
+class _RecordingQuery(Query):
+    statements: list = []
+
+    def all(self):
+        self.statements.append(str(self.statement.compile(dialect=postgresql.dialect())))
+        return []
+
+
+def test_fetch_job_customer_chunk_is_a_bounded_keyset_slice_of_column_tuples():
+    db = Session(query_cls=_RecordingQuery)
+
+    fetch_job_customer_chunk(
+        db, job=JOB, today=date(2026, 3, 1), after_id=UUID(int=5), limit=500, range_end=UUID(int=9)
+    )
+
+    sql = _RecordingQuery.statements[-1]
+    assert sql.startswith("SELECT customers.id, customers.brand, customers.profile_id \nFROM customers")
+    assert "customers.id < " in sql and "customers.id > " in sql
+    assert sql.endswith("ORDER BY customers.id ASC \n LIMIT %(param_1)s")
+
+
+def test_emit_job_transactions_prefetches_existing_event_ids_once(monkeypatch):
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [("batira", f"job_{JOB.id}_b_batira_p1")]
+    created = []
+    monkeypatch.setattr(runner, "create_transaction", lambda db, event: created.append(event.eventId))
+
+    rows = [(UUID(int=1), "batira", "p1"), (UUID(int=2), "batira", "p2"), (UUID(int=3), "batira", "p3")]
+    customers = [SimpleNamespace(id=r[0], brand=r[1], profile_id=r[2]) for r in rows]
+    stats = emit_job_transactions(db, job=JOB, customers=customers, bucket_key="b")
+
+    assert db.query.call_count == 1
+    assert (stats.processed, stats.created, stats.idempotent_existing, stats.failed) == (3, 2, 1, 0)
+    assert created == [f"job_{JOB.id}_b_batira_p2", f"job_{JOB.id}_b_batira_p3"]
+
+
+def test_generic_job_streams_keyset_chunks_and_commits_each(monkeypatch):
+    monkeypatch.setenv("INTERNAL_JOB_CHUNK_SIZE", "2")
+    chunks = iter(
+        [
+            [(UUID(int=1), "batira", "p1"), (UUID(int=2), "batira", "p2")],
+            [(UUID(int=3), "batira", "p3")],
+        ]
+    )
+    cursors = []
+
+    def fetch(db, *, job, today, after_id, limit):
+        cursors.append((after_id, limit))
+        return next(chunks)
+
+    monkeypatch.setattr(runner, "fetch_job_customer_chunk", fetch)
+    monkeypatch.setattr(
+        runner,
+        "emit_job_transactions",
+        lambda db, *, job, customers, bucket_key: runner.InternalJobRunStats(
+            processed=len(customers), created=len(customers), idempotent_existing=0, failed=0
+        ),
+    )
+    db = MagicMock()
+
+    stats = runner.run_internal_job_once(db, job=JOB, now=datetime(2026, 3, 1, 8, 0, 0))
+
+    assert cursors == [(None, 2), (UUID(int=2), 2)]
+    assert (stats.chunks, stats.processed, stats.created) == (2, 3, 3)
+    assert db.commit.call_count == 2
@@ -0,0 +1,108 @@
+"""Keyset cursors on transaction / customer listings (created_at, id), total modes."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from app.models.transaction import Transaction
+from app.routes.transactions import list_transactions
+from app.services.keyset_pagination import (
+    decode_cursor,
+    encode_cursor,
+    estimated_count,
+    next_cursor,
+    normalize_total_mode,
+)
+
+
+ROW = SimpleNamespace(created_at=datetime(2026, 3, 1, 12, 30, 5, 123456), id=UUID(int=7))
+
+
+class _PageQuery(Query):
+    statements: list = []
+    rows: list = []
+
+    def all(self):
+        self.statements.append(str(self.statement.compile(dialect=postgresql.dialect())))
+        return list(self.rows)
+
+
+def test_cursor_round_trip_and_rejection():
+    cursor = encode_cursor(ROW.created_at, ROW.id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ROW.created_at, ROW.id)
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_next_cursor_only_for_full_pages():
+    assert next_cursor([ROW], limit=2) is None
+    assert decode_cursor(next_cursor([ROW, ROW], limit=2)) == (ROW.created_at, ROW.id)
+
+
+def test_list_transactions_seeks_after_cursor_and_returns_next_one(monkeypatch):
+    monkeypatch.setattr("app.routes.transactions._serialize_transaction_out", lambda tx: {"id": tx.id})
+    _PageQuery.rows = [ROW]
+    response = Response()
+
+    items = list_transactions(
+        response=response,
+        active_brand="batira",
+        status="PROCESSED",
+        limit=1,
+        cursor=encode_cursor(datetime(2026, 3, 2), UUID(int=9)),
+        db=Session(query_cls=_PageQuery),
+    )
+
+    sql = _PageQuery.statements[-1]
+    assert "(transactions.created_at, transactions.id) < (%(param_1)s, %(param_2)s::UUID)" in sql
+    assert "ORDER BY transactions.created_at DESC, transactions.id DESC" in sql
+    assert "OFFSET" not in sql
+    assert items == [{"id": ROW.id}]
+    assert decode_cursor(response.headers["X-Next-Cursor"]) == (ROW.created_at, ROW.id)
+
+
+def test_total_mode_validation():
+    assert normalize_total_mode(None) == "exact"
+    assert normalize_total_mode("Estimate") == "estimate"
+    assert normalize_total_mode(None, cursor="abc") == "none"
+    assert normalize_total_mode("exact", cursor="abc") == "exact"
+    with pytest.raises(HTTPException):
+        normalize_total_mode("approx")
+
+
+def test_estimated_count_expands_in_lists():
+    db = MagicMock()
+    db.get_bind.return_value.dialect = postgresql.psycopg2.dialect()
+    explained = []
+
+    def exec_driver_sql(sql, params):
+        explained.append((sql, params))
+        return MagicMock(scalar=MagicMock(return_value='[{"Plan": {"Plan Rows": 42}}]'))
+
+    db.connection.return_value.exec_driver_sql.side_effect = exec_driver_sql
+    query = Session().query(Transaction).filter(Transaction.status.in_(["PROCESSED", "FAILED"]))
+
+    assert estimated_count(db, query) == 42
+    sql, params = explained[0]
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "POSTCOMPILE" not in sql
+    assert "transactions.status IN (%(status_1_1)s, %(status_1_2)s)" in sql
+    assert params == {"status_1_1": "PROCESSED", "status_1_2": "FAILED"}
+
+
+def test_listing_indexes_are_declared_on_the_models():
+    names = {i.name for i in Transaction.__table__.indexes}
+    assert {
+        "ix_transactions_brand_created_at",
+        "ix_transactions_brand_profile_id",
+        "ix_transactions_brand_status_created_at",
+    } <= names
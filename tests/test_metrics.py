@@ -0,0 +1,101 @@
+"""Prometheus metrics: text exposition, per-request DB usage, Unomi path templates and errors."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services import metrics
+from app.services.metrics import MetricsRegistry
+from app.services.unomi_client import UnomiClient, UnomiClientError, metric_path
+from app.services.unomi_settings_service import UnomiConnectionConfig
+from app.services.unomi_transport import HttpResponse, RetryPolicy
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    h = registry.histogram("stage_seconds", "Stage latency.", ("stage",), buckets=(0.1, 1.0))
+    h.observe(0.05, stage="rules")
+    h.observe(0.1, stage="rules")
+    h.observe(3.0, stage="rules")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP stage_seconds Stage latency.", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="rules",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="rules",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="rules",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="rules"} 3.15' in lines
+    assert 'stage_seconds_count{stage="rules"} 3' in lines
+
+
+def test_counter_escapes_label_values_and_rejects_wrong_labels():
+    registry = MetricsRegistry()
+    c = registry.counter("errors_total", "Errors.", ("path",))
+    c.inc(path='/a"b\\c')
+    c.inc(2, path='/a"b\\c')
+
+    assert 'errors_total{path="/a\\"b\\\\c"} 3' in registry.render()
+    with pytest.raises(ValueError):
+        c.inc(route="/x")
+    assert registry.counter("errors_total", "Errors.", ("path",)) is c
+    with pytest.raises(ValueError):
+        registry.histogram("errors_total", "Errors.", ("path",))
+
+
+def test_request_db_usage_counts_statements_and_transactions_of_the_current_request():
+    engine = create_engine("sqlite://")
+    factory = sessionmaker(bind=engine)
+    metrics.install_db_instrumentation(engine, factory)
+
+    with factory() as db:
+        db.execute(text("select 1"))  # outside a request: not counted, no error
+        db.commit()
+
+        token, usage = metrics.begin_request_db_usage()
+        try:
+            db.execute(text("select 1"))
+            db.execute(text("select 2"))
+            db.commit()
+            db.execute(text("select 3"))
+            db.rollback()
+        finally:
+            metrics.end_request_db_usage(token)
+
+    assert (usage.queries, usage.transactions) == (3, 2)
+
+
+def test_unomi_metric_paths_replace_ids():
+    assert metric_path("/segments/") == "/segments/"
+    assert metric_path("/segments/seg-1/match/p1") == "/segments/{id}/match/{id}"
+    assert metric_path("/privacy/profiles/p1") == "/privacy/profiles/{id}"
+    assert metric_path("/eventcollector") == "/eventcollector"
+
+
+def test_unomi_client_records_latency_and_errors_per_attempt():
+    class NoRetry(RetryPolicy):
+        def should_retry(self, error, attempt):
+            return False
+
+    labels = {"method": "GET", "path": "/profiles/{id}"}
+    count_before, _ = metrics.UNOMI_REQUEST_DURATION.snapshot(**labels)
+    http_before = metrics.UNOMI_REQUEST_ERRORS.value(kind="http_5xx", **labels)
+    conn_before = metrics.UNOMI_REQUEST_ERRORS.value(kind="connection", **labels)
+
+    transport = MagicMock()
+    transport.send.side_effect = [HttpResponse(200, b"{}"), HttpResponse(503, b"down"), TimeoutError("timed out")]
+    client = UnomiClient(
+        UnomiConnectionConfig(base_url="https://u", username="k", password="p", scope="b"),
+        retry_policy=NoRetry(),
+        transport=transport,
+    )
+    client.get_profile("p1")
+    with pytest.raises(UnomiClientError):
+        client.get_profile("p2")
+    with pytest.raises(UnomiClientError):
+        client.get_profile("p3")
+
+    assert metrics.UNOMI_REQUEST_DURATION.snapshot(**labels)[0] == count_before + 3
+    assert metrics.UNOMI_REQUEST_ERRORS.value(kind="http_5xx", **labels) == http_before + 1
+    assert metrics.UNOMI_REQUEST_ERRORS.value(kind="connection", **labels) == conn_before + 1
@@ -0,0 +1,84 @@
+"""Off-path payload schema learning: shape fingerprints, per-process dedup, batched merge of new shapes."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import payload_schema_learning as learning
+from app.services.payload_schema_service import payload_shape_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def _fresh_buffers(monkeypatch):
+    monkeypatch.setattr(learning, "_seen", set())
+    monkeypatch.setattr(learning, "_pending", {})
+
+
+def test_fingerprint_depends_on_key_paths_and_types_only():
+    base = payload_shape_fingerprint({"orderTotal": 1000, "items": [{"sku": "A"}], "email": "a@x.sn"})
+
+    assert payload_shape_fingerprint({"email": "b@y.sn", "items": [{"sku": "B"}, {"sku": "C"}], "orderTotal": 5}) == base
+    assert payload_shape_fingerprint({"orderTotal": "1000", "items": [{"sku": "A"}], "email": "a@x.sn"}) != base
+    assert payload_shape_fingerprint({"orderTotal": 1000, "items": [{"sku": "A", "qty": 2}], "email": "a@x.sn"}) != base
+    assert len(base) == 32
+
+
+def test_record_buffers_each_new_shape_once(monkeypatch):
+    monkeypatch.delenv("PAYLOAD_SCHEMA_SAMPLE_RATE", raising=False)
+
+    assert learning.record_payload_shape(brand="batira", transaction_type="sale", payload={"orderTotal": 1})
+    assert not learning.record_payload_shape(brand="batira", transaction_type="sale", payload={"orderTotal": 2})
+    assert learning.record_payload_shape(brand="batira", transaction_type="visit", payload={"orderTotal": 3})
+    assert [k[:2] for k in learning._pending] == [("batira", "sale"), ("batira", "visit")]
+    assert learning._pending[next(iter(learning._pending))] == {"type": "object", "properties": {"orderTotal": {"type": "integer"}}}
+
+    monkeypatch.setenv("PAYLOAD_SCHEMA_SAMPLE_RATE", "0")
+    assert not learning.record_payload_shape(brand="batira", transaction_type="sale", payload={"tva": 18})
+
+
+def test_merge_only_applies_shapes_won_by_this_insert():
+    known = ("batira", "sale", "f" * 32)
+    new = ("batira", "sale", "e" * 32)
+    shapes = {
+        known: {"type": "object", "properties": {"orderTotal": {"type": "integer"}}},
+        new: {"type": "object", "properties": {"tva": {"type": "integer"}}},
+    }
+    tt = SimpleNamespace(brand="batira", key="sale", payload_schema={"type": "object", "properties": {"orderTotal": {"type": "integer"}}})
+
+    db = MagicMock()
+    statements = []
+
+    def execute(stmt):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return MagicMock(all=MagicMock(return_value=[new]))
+
+    db.execute.side_effect = execute
+    query = db.query.return_value
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.with_for_update.return_value = query
+    query.all.return_value = [tt]
+
+    assert learning.merge_payload_shapes(db, shapes) == {"batira"}
+    assert statements[0].startswith("INSERT INTO transaction_type_payload_shapes")
+    assert "ON CONFLICT (brand, transaction_type, fingerprint) DO NOTHING RETURNING" in statements[0]
+    assert set(tt.payload_schema["properties"]) == {"orderTotal", "tva"}
+    query.with_for_update.assert_called_once_with()
+
+
+def test_flush_marks_shapes_seen_and_invalidates_changed_brands(monkeypatch):
+    learning.record_payload_shape(brand="batira", transaction_type="sale", payload={"orderTotal": 1})
+    monkeypatch.setattr(learning, "merge_payload_shapes", lambda db, shapes: {"batira"})
+    invalidated = []
+    monkeypatch.setattr(learning, "invalidate_brand_config", invalidated.append)
+    db = MagicMock()
+
+    assert learning.flush_payload_shapes(session_factory=lambda: db) == 0  # not due yet
+    assert learning.flush_payload_shapes(session_factory=lambda: db, force=True) == 1
+
+    db.commit.assert_called_once_with()
+    assert invalidated == ["batira"]
+    assert learning._pending == {}
+    assert not learning.record_payload_shape(brand="batira", transaction_type="sale", payload={"orderTotal": 9})
@@ -0,0 +1,111 @@
+"""Materialized point ledger: FIFO deductions, debt, bucket expiry, replay and reads."""
+
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from app.services import point_ledger_service
+from app.services.point_ledger_service import (
+    LedgerState,
+    add_point_movement,
+    get_point_balance,
+    replay_movements,
+)
+
+
+TODAY = date(2026, 3, 1)
+D1 = TODAY + timedelta(days=10)
+D2 = TODAY + timedelta(days=40)
+
+
+def test_deduct_consumes_earliest_bucket_first_and_never_expiring_last():
+    state = LedgerState()
+    state.apply(100, D2, today=TODAY)
+    state.apply(50, None, today=TODAY)
+    state.apply(80, D1, today=TODAY)
+
+    state.apply(-120, None, today=TODAY)
+
+    assert state.buckets == {D2: 60, None: 50}
+    assert state.debt == 0
+    assert (state.total, state.next_expires_at) == (110, D2)
+
+
+def test_overdraft_becomes_debt_paid_back_by_next_earn():
+    state = LedgerState()
+    state.apply(30, D1, today=TODAY)
+    state.apply(-50, None, today=TODAY)
+    assert (state.buckets, state.debt) == ({}, 20)
+
+    state.apply(25, D2, today=TODAY)
+    assert (state.buckets, state.debt) == ({D2: 5}, 0)
+
+
+def test_expired_buckets_are_dropped_before_applying_and_ignored_by_balance():
+    state = LedgerState(buckets={TODAY - timedelta(days=1): 40, D1: 10})
+    assert state.balance(TODAY) == 10
+
+    state.apply(-5, None, today=TODAY)
+    assert state.buckets == {D1: 5}
+
+
+def test_replay_expires_buckets_at_each_movement_date():
+    earned_on = datetime(2026, 1, 1, 9, 0)
+    state = replay_movements(
+        [
+            (100, date(2026, 1, 31), earned_on),
+            (50, D2, earned_on),
+            # Spent after the first bucket expired: only the second one can pay.
+            (-30, None, datetime(2026, 2, 15)),
+        ],
+        today=TODAY,
+    )
+    assert (state.buckets, state.debt) == ({D2: 20}, 0)
+
+
+def test_add_point_movement_materializes_from_history_then_applies(monkeypatch):
+    customer_id = UUID(int=7)
+    db = MagicMock()
+    db.get.return_value = None
+    monkeypatch.setattr(
+        point_ledger_service,
+        "replay_customers",
+        lambda db, ids, today: {customer_id: LedgerState(buckets={D1: 40})},
+    )
+
+    movement = add_point_movement(db, customer_id=customer_id, points=-10, type="DEDUCT", today=TODAY)
+
+    added = [c.args[0] for c in db.add.call_args_list]
+    balance = next(a for a in added if type(a).__name__ == "PointBalance")
+    bucket = next(a for a in added if type(a).__name__ == "PointBalanceBucket")
+    assert (balance.total, balance.debt, balance.next_expires_at) == (30, 0, D1)
+    assert (bucket.expires_at, bucket.remaining) == (D1, 30)
+    assert movement in added and movement.points == -10
+    db.flush.assert_called_once()
+
+
+def test_add_point_movement_updates_existing_buckets_in_place():
+    customer_id = UUID(int=8)
+    balance = SimpleNamespace(customer_id=customer_id, total=70, debt=0, next_expires_at=D1)
+    first = SimpleNamespace(customer_id=customer_id, expires_at=D1, remaining=20)
+    second = SimpleNamespace(customer_id=customer_id, expires_at=D2, remaining=50)
+    db = MagicMock()
+    db.get.return_value = balance
+    db.query.return_value.filter.return_value.all.return_value = [first, second]
+
+    add_point_movement(db, customer_id=customer_id, points=-30, type="DEDUCT", today=TODAY)
+
+    db.delete.assert_called_once_with(first)
+    assert second.remaining == 40
+    assert (balance.total, balance.next_expires_at) == (40, D2)
+
+
+def test_get_point_balance_uses_stored_total_until_a_bucket_is_past_its_date():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = (120, D1)
+    assert get_point_balance(db, UUID(int=1), today=TODAY) == 120
+
+    db.query.return_value.filter.return_value.first.return_value = (120, TODAY - timedelta(days=1))
+    db.query.return_value.filter.return_value.filter.return_value.scalar.return_value = 70
+    assert get_point_balance(db, UUID(int=1), today=TODAY) == 70
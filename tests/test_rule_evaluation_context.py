@@ -0,0 +1,61 @@
+"""Per-transaction evaluation context: DB-backed condition fields load once."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from app.services.rule_engine import compile_condition, rule_evaluation_context
+
+
+def _db(metrics_row=None, reward_rows=()):
+    db = MagicMock()
+    query = MagicMock()
+    query.filter.return_value = query
+    query.first.return_value = metrics_row
+    query.all.return_value = list(reward_rows)
+    db.query.return_value = query
+    return db
+
+
+def _tx():
+    return SimpleNamespace(id=None, brand="batira", payload={})
+
+
+def test_metrics_family_is_loaded_once_per_context():
+    db = _db(metrics_row=SimpleNamespace(transactions_count_30d=4, transactions_count_90d=9))
+    customer = SimpleNamespace(id="c1", brand="batira")
+    rule_a = compile_condition({"field": "customer.metrics.transactions_count_30d", "operator": "gte", "value": 3})
+    rule_b = compile_condition(
+        {
+            "or": [
+                {"field": "customer.metrics.transactions_count_90d", "operator": "gt", "value": 10},
+                {"field": "customer.metrics.transactions_count_30d", "operator": "eq", "value": 4},
+            ]
+        }
+    )
+
+    with rule_evaluation_context(db, customer) as ctx:
+        assert rule_a(db, customer, _tx()) is True
+        assert rule_b(db, customer, _tx()) is True
+        assert ctx.db_round_trips == 1
+        ctx.invalidate()
+        rule_a(db, customer, _tx())
+        assert ctx.db_round_trips == 2
+
+    assert db.query.call_count == 2
+
+
+def test_without_context_each_evaluation_queries():
+    db = _db(reward_rows=[("r1",), ("r2",)])
+    customer = SimpleNamespace(id="c1", brand="batira")
+    check = compile_condition({"field": "customer.rewards", "operator": "contains", "value": "r2"})
+    assert check(db, customer, _tx()) is True
+    assert check(db, customer, _tx()) is True
+    assert db.query.call_count == 2
+
+
+def test_context_is_ignored_for_another_customer():
+    db = _db(reward_rows=[("r1",)])
+    check = compile_condition({"field": "customer.rewards", "operator": "contains", "value": "r1"})
+    with rule_evaluation_context(db, SimpleNamespace(id="c1", brand="batira")) as ctx:
+        check(db, SimpleNamespace(id="c2", brand="batira"), _tx())
+        assert ctx.db_round_trips == 0
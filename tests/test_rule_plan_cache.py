@@ -0,0 +1,111 @@
+"""Compiled rule plans: condition/action compilation and per-brand invalidation."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.rule_engine import compile_actions, compile_condition
+from app.services.rule_plan_cache import (
+    RulePlan,
+    clear_rule_plan_cache,
+    compile_rule,
+    get_rule_plan,
+    invalidate_rule_plans,
+)
+
+
+def _tx(**payload):
+    return SimpleNamespace(id=None, brand="batira", payload=payload)
+
+
+def test_compiled_condition_matches_payload_and_customer_fields():
+    node = {
+        "and": [
+            {"field": "payload.order.total", "operator": "gte", "value": 100},
+            {"field": "customer.loyalty_status", "op": "IN", "value": ["GOLD", "SILVER"]},
+        ]
+    }
+    check = compile_condition(node)
+    customer = SimpleNamespace(loyalty_status="GOLD")
+    assert check(None, customer, _tx(order={"total": "150"})) is True
+    assert check(None, customer, _tx(order={"total": 50})) is False
+
+
+def test_compiled_condition_defers_format_errors_behind_short_circuit():
+    node = {"and": [{"field": "payload.x", "operator": "eq", "value": 1}, {"bogus": True}]}
+    check = compile_condition(node)
+    assert check(None, None, _tx(x=2)) is False
+    with pytest.raises(ValueError, match="Invalid condition format"):
+        check(None, None, _tx(x=1))
+
+
+def test_compiled_condition_unknown_operator_raises_on_evaluation():
+    check = compile_condition({"field": "payload.x", "operator": "approx", "value": 1})
+    with pytest.raises(ValueError, match="Unsupported operator: approx"):
+        check(None, None, _tx(x=1))
+
+
+def test_compiled_condition_fn_expression_value():
+    node = {
+        "field": "payload.total",
+        "operator": "eq",
+        "value": {"$fn": "to_number", "args": [{"$path": "payload.expected"}]},
+    }
+    check = compile_condition(node)
+    assert check(None, None, _tx(total=525, expected="525 CFA")) is True
+
+
+def test_compiled_actions_unknown_type_fails_on_execution():
+    run = compile_actions([{"type": "burn_points"}, {"type": "teleport"}])
+    with pytest.raises(ValueError, match="Unknown action type: teleport"):
+        run(None, None, _tx())
+    assert compile_actions([{"type": "set_rank"}])(None, None, _tx()) == [{"type": "set_rank", "ignored": True}]
+
+
+def test_compile_rule_drops_null_segment_ids():
+    rule = SimpleNamespace(
+        id="r1",
+        name="Sale",
+        priority=0,
+        segment_ids=[None, "seg-1"],
+        conditions=None,
+        actions=[{"type": "earn_points", "points": 10}],
+    )
+    compiled = compile_rule(rule)
+    assert compiled.segment_ids == ("seg-1",)
+    assert compiled.evaluate(None, None, _tx()) is True
+
+
+def _plan(version: int) -> RulePlan:
+    return RulePlan(brand="batira", transaction_type="sale", version=version, loaded_at=0.0, rules=())
+
+
+@patch("app.services.rule_plan_cache.time.monotonic", return_value=10.0)
+@patch("app.services.rule_plan_cache.load_rule_plan")
+def test_get_rule_plan_is_cached_until_brand_invalidation(mock_load, _mock_clock, monkeypatch):
+    monkeypatch.setenv("RULE_PLAN_CACHE_TTL_SECONDS", "60")
+    clear_rule_plan_cache()
+    mock_load.side_effect = lambda db, *, brand, transaction_type, version: RulePlan(
+        brand=brand, transaction_type=transaction_type, version=version, loaded_at=10.0, rules=()
+    )
+    db = MagicMock()
+
+    first = get_rule_plan(db, brand="batira", transaction_type="sale")
+    assert get_rule_plan(db, brand="batira", transaction_type="sale") is first
+    assert mock_load.call_count == 1
+
+    invalidate_rule_plans("Batira")
+    second = get_rule_plan(db, brand="batira", transaction_type="sale")
+    assert second is not first
+    assert second.version == first.version + 1
+    assert mock_load.call_count == 2
+
+
+@patch("app.services.rule_plan_cache.load_rule_plan", side_effect=lambda db, **kw: _plan(kw["version"]))
+def test_get_rule_plan_ttl_zero_disables_cache(mock_load, monkeypatch):
+    monkeypatch.setenv("RULE_PLAN_CACHE_TTL_SECONDS", "0")
+    clear_rule_plan_cache()
+    get_rule_plan(MagicMock(), brand="batira", transaction_type="sale")
+    get_rule_plan(MagicMock(), brand="batira", transaction_type="sale")
+    assert mock_load.call_count == 2
@@ -0,0 +1,114 @@
+"""Opt-in rule profiling: per-rule details, $fn / action timings, additive cost-stat upserts."""
+
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from app.services import rule_engine, rule_profiling
+from app.services.rule_engine import compile_actions, compile_condition
+from app.services.rule_plan_cache import CompiledRule, RulePlan
+from app.services.rule_profiling import RuleProfile, measure
+
+
+RULE_ID = UUID(int=1)
+
+
+def test_measure_counts_statements_of_nested_spans():
+    engine = create_engine("sqlite://")
+    rule_profiling.install_statement_counter(engine)
+
+    with engine.connect() as conn:
+        with measure() as outer:
+            conn.execute(text("select 1"))
+            with measure() as inner:
+                conn.execute(text("select 2"))
+        conn.execute(text("select 3"))
+
+    assert (outer.sql_statements, inner.sql_statements) == (2, 1)
+    assert outer.seconds >= inner.seconds
+
+
+def _profiled_plan(monkeypatch):
+    monkeypatch.setitem(rule_engine._EXPR_FUNCTIONS, "slow_fn", lambda evaled, *, db, transaction: 150)
+    monkeypatch.setitem(
+        rule_engine._ACTION_COMPILERS,
+        "noop",
+        lambda action, index: (lambda db, customer, transaction: {"type": "noop", "index": index}),
+    )
+    conditions = {"field": "payload.amount", "operator": "lt", "value": {"$fn": "SLOW_FN", "args": []}}
+    actions = [{"type": "noop"}, {"type": "noop"}]
+    rule = CompiledRule(
+        id=RULE_ID,
+        name="r",
+        priority=0,
+        segment_ids=(),
+        conditions=conditions,
+        actions=actions,
+        evaluate=compile_condition(conditions),
+        execute=compile_actions(actions),
+    )
+    return RulePlan(brand="batira", transaction_type="sale", version=0, loaded_at=0.0, rules=(rule,))
+
+
+def test_process_transaction_rules_attaches_profile_and_buffers_costs(monkeypatch):
+    monkeypatch.setenv("RULE_PROFILING_ENABLED", "true")
+    plan = _profiled_plan(monkeypatch)
+    monkeypatch.setattr(rule_engine, "get_rule_plan", lambda db, **kw: plan)
+    monkeypatch.setattr(rule_engine, "resolve_customer_for_transaction", lambda db, **kw: SimpleNamespace(id=UUID(int=9)))
+    monkeypatch.setattr(
+        "app.services.unomi_profile_service.maybe_sync_customer_to_unomi_after_transaction", lambda db, **kw: None
+    )
+    flush = MagicMock()
+    monkeypatch.setattr(rule_profiling, "flush_rule_costs", flush)
+    recorded = []
+    monkeypatch.setattr(rule_profiling, "record_rule_cost", lambda **kw: recorded.append(kw))
+
+    db = MagicMock()
+    tx = SimpleNamespace(
+        id=UUID(int=5), brand="batira", profile_id="p1", transaction_type="purchase", payload={"amount": 100},
+        status="PENDING", error_code=None, error_message=None,
+    )
+    rule_engine.process_transaction_rules(db, tx)
+
+    execution = db.add.call_args_list[0].args[0]
+    profile = execution.details["profile"]
+    assert execution.result == "SUCCESS"
+    assert profile["functions"]["slow_fn"]["calls"] == 1
+    assert [a["type"] for a in profile["actions"]] == ["noop", "noop"]
+    assert set(profile) == {"segment_ms", "condition_ms", "sql_statements", "functions", "actions"}
+    assert [(r["rule_id"], r["outcome"]) for r in recorded] == [(RULE_ID, "matched")]
+    flush.assert_called_once_with()
+    assert rule_profiling.current_rule_profile() is None
+
+
+def test_profiling_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("RULE_PROFILING_ENABLED", raising=False)
+    plan = _profiled_plan(monkeypatch)
+    rule = plan.rules[0]
+    assert rule.execute(MagicMock(), None, SimpleNamespace()) == [{"type": "noop", "index": 0}, {"type": "noop", "index": 1}]
+    assert not rule_profiling.profiling_enabled()
+
+
+def test_cost_deltas_are_upserted_additively():
+    rule_profiling._take_pending()
+    profile = RuleProfile(condition_seconds=0.004, sql_statements=2)
+    profile.actions.append({"index": 0, "type": "earn_points", "seconds": 0.006, "sql_statements": 3})
+    for outcome in ("matched", "skipped"):
+        rule_profiling.record_rule_cost(
+            rule_id=RULE_ID, brand="batira", outcome=outcome, profile=profile, today=date(2026, 3, 1)
+        )
+
+    deltas = rule_profiling._take_pending()
+    delta = deltas[(RULE_ID, date(2026, 3, 1))]
+    assert (delta.evaluations, delta.matched, delta.sql_statements) == (2, 1, 10)
+    assert round(delta.max_ms, 3) == 10.0
+
+    sql = str(rule_profiling.rule_cost_upsert(deltas).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("INSERT INTO rule_cost_stats")
+    assert "ON CONFLICT (rule_id, bucket_date) DO UPDATE SET" in sql
+    assert "evaluations = (rule_cost_stats.evaluations + excluded.evaluations)" in sql
+    assert "max_ms = greatest(rule_cost_stats.max_ms, excluded.max_ms)" in sql
@@ -0,0 +1,70 @@
+"""Dynamic segments: condition push-down to SQL with a Python residual."""
+
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.segment_condition_sql import compile_segment_condition
+
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+
+
+def _sql(criterion) -> str:
+    return str(criterion.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_fully_pushable_condition_has_no_residual():
+    plan = compile_segment_condition(
+        {
+            "and": [
+                {"field": "customer.loyalty_status", "operator": "in", "value": ["GOLD", "SILVER"]},
+                {"not": {"field": "customer.status", "operator": "eq", "value": "BLOCKED"}},
+                {"field": "customer.metrics.transactions_count_30d", "operator": "gte", "value": 3},
+            ]
+        },
+        now_utc=NOW,
+    )
+    assert plan.residual is None
+    assert plan.joins_metrics is True
+    sql = _sql(plan.criterion)
+    assert "customers.loyalty_status IN ('GOLD', 'SILVER')" in sql
+    assert "customer_metrics.transactions_count_30d >= 3" in sql
+
+
+def test_unpushable_and_items_become_residual_in_order():
+    payload_leaf = {"field": "payload.channel", "operator": "eq", "value": "web"}
+    mmdd_leaf = {"field": "customer.created_at", "operator": "eq", "value": "03-10"}
+    plan = compile_segment_condition(
+        {"and": [payload_leaf, {"field": "customer.gender", "operator": "eq", "value": "F"}, mmdd_leaf]},
+        now_utc=NOW,
+    )
+    assert plan.residual == {"and": [payload_leaf, mmdd_leaf]}
+    assert plan.joins_metrics is False
+    assert "customers.gender = 'F'" in _sql(plan.criterion)
+
+
+def test_or_with_one_unpushable_branch_stays_in_python():
+    node = {
+        "or": [
+            {"field": "customer.gender", "operator": "eq", "value": "F"},
+            {"field": "customer.status_points", "operator": "gt", "value": "100 pts"},
+        ]
+    }
+    plan = compile_segment_condition(node, now_utc=NOW)
+    assert plan.residual == node
+
+
+def test_neq_keeps_null_customers_like_the_rule_engine():
+    plan = compile_segment_condition({"field": "customer.gender", "operator": "neq", "value": "M"}, now_utc=NOW)
+    assert _sql(plan.criterion) == "customers.gender IS DISTINCT FROM 'M'"
+
+
+def test_days_since_is_rewritten_as_timestamp_range():
+    plan = compile_segment_condition(
+        {"field": "system.customer_last_activity_days", "operator": "between", "value": [30, 59]},
+        now_utc=NOW,
+    )
+    sql = _sql(plan.criterion)
+    assert "customers.last_activity_at <= '2026-02-08 12:00:00'" in sql
+    assert "customers.last_activity_at > '2026-01-09 12:00:00'" in sql
@@ -0,0 +1,95 @@
+"""Dynamic segments: insert/delete diff and delta scope since last_computed_at."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Delete, Insert
+
+from app.services.segment_service import (
+    conditions_fingerprint,
+    conditions_support_delta,
+    recompute_dynamic_segment,
+)
+
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+GOLD = {"field": "customer.loyalty_status", "operator": "eq", "value": "GOLD"}
+
+
+def _db(*, static_rows: int = 0, members: int = 0):
+    db = MagicMock()
+    query = MagicMock()
+    query.filter.return_value = query
+    query.select_from.return_value = query
+    query.delete.return_value = static_rows
+    query.scalar.return_value = members
+    db.query.return_value = query
+    db.execute.side_effect = [SimpleNamespace(rowcount=2), SimpleNamespace(rowcount=5)]
+    return db
+
+
+def _segment(**kw):
+    data = dict(
+        id="seg-1",
+        brand="batira",
+        is_dynamic=True,
+        active=True,
+        conditions=GOLD,
+        last_computed_at=None,
+        computed_conditions_hash=None,
+    )
+    data.update(kw)
+    return SimpleNamespace(**data)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_first_recompute_is_full_and_applies_a_diff():
+    db = _db(members=40)
+    seg = _segment()
+
+    stats = recompute_dynamic_segment(db, segment=seg, now_utc=NOW)
+
+    delete_stmt, insert_stmt = [c.args[0] for c in db.execute.call_args_list]
+    assert isinstance(delete_stmt, Delete)
+    assert isinstance(insert_stmt, Insert)
+    assert "ON CONFLICT (segment_id, customer_id) DO NOTHING" in _sql(insert_stmt)
+    assert "updated_at" not in _sql(insert_stmt)
+    assert stats["members"] == 40
+    assert (stats["added"], stats["removed"], stats["incremental_segments"]) == (5, 2, 0)
+    assert seg.last_computed_at == NOW
+    assert seg.computed_conditions_hash == conditions_fingerprint(GOLD)
+
+
+def test_same_conditions_only_rescan_changed_customers():
+    db = _db()
+    seg = _segment(last_computed_at=datetime(2026, 3, 9), computed_conditions_hash=conditions_fingerprint(GOLD))
+
+    stats = recompute_dynamic_segment(db, segment=seg, now_utc=NOW)
+
+    assert stats["incremental_segments"] == 1
+    for call in db.execute.call_args_list:
+        sql = _sql(call.args[0])
+        assert "customers.updated_at >" in sql
+        assert "customer_metrics.computed_at >" in sql
+
+
+def test_changed_conditions_or_static_rows_force_full_rescan():
+    stale = _segment(last_computed_at=datetime(2026, 3, 9), computed_conditions_hash="old")
+    assert recompute_dynamic_segment(_db(), segment=stale, now_utc=NOW)["incremental_segments"] == 0
+
+    legacy = _segment(last_computed_at=datetime(2026, 3, 9), computed_conditions_hash=conditions_fingerprint(GOLD))
+    assert recompute_dynamic_segment(_db(static_rows=3), segment=legacy, now_utc=NOW)["incremental_segments"] == 0
+
+
+def test_time_dependent_conditions_do_not_support_delta():
+    assert conditions_support_delta({"and": [GOLD, {"field": "payload.x", "operator": "eq", "value": 1}]})
+    assert not conditions_support_delta({"field": "system.customer_created_days", "operator": "gte", "value": 30})
+    assert not conditions_support_delta(
+        {"field": "customer.last_activity_at", "operator": "gte", "value": {"$system": "now", "offsetDays": -30}}
+    )
+    assert not conditions_support_delta({"not": {"field": "customer.rewards", "operator": "contains", "value": "r1"}})
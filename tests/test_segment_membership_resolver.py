@@ -0,0 +1,90 @@
+"""Per-transaction segment membership: one load, checks answered from memory."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from app.services.segment_membership_service import SegmentMembershipResolver
+from app.services.unomi_segment_service import manual_profile_ids_set
+
+
+def _segment(**kw):
+    data = dict(
+        id=uuid4(),
+        brand="batira",
+        provider="INTERNAL",
+        is_dynamic=True,
+        manual_profile_ids=None,
+        updated_at=datetime(2026, 1, 1),
+    )
+    data.update(kw)
+    return SimpleNamespace(**data)
+
+
+def _db(segments, member_rows):
+    """One ``(Segment, source)`` row per segment, ``source`` None without a member row."""
+    sources = dict(member_rows)
+    db = MagicMock()
+    query = MagicMock()
+    query.outerjoin.return_value = query
+    query.filter.return_value = query
+    query.all.return_value = [(seg, sources.get(seg.id)) for seg in segments]
+    db.query.return_value = query
+    return db
+
+
+def test_resolver_loads_once_for_all_rules():
+    internal = _segment()
+    unomi_static = _segment(provider="UNOMI", is_dynamic=False, manual_profile_ids=["p1", "p2"])
+    other = _segment()
+    db = _db([internal, unomi_static, other], [(internal.id, "DYNAMIC")])
+    customer = SimpleNamespace(id=uuid4(), brand="batira", profile_id="p2")
+
+    resolver = SegmentMembershipResolver(
+        db, customer=customer, segment_ids={internal.id, unomi_static.id, other.id}
+    )
+    assert resolver.is_in_any_segment((internal.id,)) is True
+    assert resolver.is_in_any_segment((unomi_static.id,)) is True
+    assert resolver.is_in_any_segment((other.id,)) is False
+    assert resolver.is_in_any_segment(()) is True
+    assert db.query.call_count == 1
+    assert resolver.db_round_trips == 1
+
+
+def test_resolver_joins_members_in_the_segment_query():
+    captured = []
+
+    class _CaptureQuery(Query):
+        def all(self):
+            captured.append(str(self.statement.compile(dialect=postgresql.dialect())))
+            return []
+
+    customer = SimpleNamespace(id=uuid4(), brand="batira", profile_id="p1")
+    SegmentMembershipResolver(Session(query_cls=_CaptureQuery), customer=customer).is_in_any_segment((uuid4(),))
+
+    (sql,) = captured
+    assert "FROM segments LEFT OUTER JOIN segment_members ON segment_members.segment_id = segments.id" in sql
+    assert "segment_members.customer_id = %(customer_id_1)s::UUID" in sql
+
+
+def test_unomi_dynamic_segment_requires_dynamic_row():
+    seg = _segment(provider="UNOMI", is_dynamic=True)
+    db = _db([seg], [(seg.id, "STATIC")])
+    resolver = SegmentMembershipResolver(db, customer=SimpleNamespace(id=uuid4(), brand="batira", profile_id="p1"))
+    assert resolver.is_in_any_segment((seg.id,)) is False
+
+
+@patch("app.services.unomi_segment_service.manual_profile_ids_list", return_value=["p1"])
+def test_manual_profile_ids_set_is_memoized_per_version(mock_list):
+    seg = _segment(manual_profile_ids=["p1"])
+    assert manual_profile_ids_set(seg) == frozenset({"p1"})
+    assert manual_profile_ids_set(seg) == frozenset({"p1"})
+    assert mock_list.call_count == 1
+
+    seg.updated_at = datetime(2026, 1, 2)
+    manual_profile_ids_set(seg)
+    assert mock_list.call_count == 2
@@ -0,0 +1,59 @@
+"""POST /transactions/batch: per-item results, in-batch duplicates, set-based idempotency."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.schemas.event import EventCreate
+from app.services.transaction_service import _new_transaction_values, create_transactions_batch
+
+
+def _event(event_id: str, **kw) -> EventCreate:
+    data = {"brand": "batira", "profileId": "p1", "eventType": "sale", "eventId": event_id, "payload": {}}
+    data.update(kw)
+    return EventCreate(**data)
+
+
+def test_batch_rejects_invalid_items_without_touching_db():
+    db = MagicMock()
+    results = create_transactions_batch(db, [_event(" "), _event("e1", profileId="")])
+    assert [r["result"] for r in results] == ["REJECTED", "REJECTED"]
+    assert results[0]["errorMessage"] == "eventId is required"
+    assert results[1]["errorMessage"] == "profileId is required"
+    db.query.assert_not_called()
+
+
+@patch("app.services.transaction_service._retry_ignored_unregistered_customer", side_effect=lambda db, tx: tx)
+def test_batch_reports_existing_and_in_batch_duplicates(_mock_retry):
+    existing = SimpleNamespace(
+        id="tx-1",
+        brand="batira",
+        transaction_id="e1",
+        status="PROCESSED",
+        error_code=None,
+        error_message=None,
+    )
+    db = MagicMock()
+    query = MagicMock()
+    query.filter.return_value = query
+    query.all.return_value = [existing]
+    db.query.return_value = query
+
+    results = create_transactions_batch(db, [_event("e1"), _event("e1")])
+
+    assert results[0]["result"] == "EXISTING"
+    assert results[0]["transactionId"] == "tx-1"
+    assert results[0]["status"] == "PROCESSED"
+    assert results[1]["result"] == "DUPLICATE_IN_BATCH"
+    assert results[1]["duplicateOf"] == 0
+    db.execute.assert_not_called()
+
+
+def test_new_transaction_values_blocks_profile_events_and_normalizes_sale():
+    blocked = _new_transaction_values(_event("e1", eventType="customer_profile"))
+    assert blocked["status"] == "BLOCKED"
+    assert blocked["error_code"] == "WRONG_INGESTION_ROUTE"
+    assert blocked["processed_at"] is not None
+
+    sale = _new_transaction_values(_event("e2", payload={"orderTotal": "525 CFA"}))
+    assert sale["status"] == "PENDING"
+    assert sale["payload"]["orderTotal"] == 525
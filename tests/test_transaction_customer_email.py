@@ -0,0 +1,65 @@
+"""transactions.customer_email: extracted at ingest, used by history filters, backfilled by a batched job."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.contact_service import customer_transaction_filters
+from app.services.internal_job_runner import run_internal_job_once
+from app.services.transaction_service import _new_transaction_values
+
+
+def _event(payload):
+    return SimpleNamespace(brand="batira", profileId="p1", eventType="visit", eventId="e1", source="UNOMI", payload=payload)
+
+
+def test_identity_email_is_extracted_at_ingest():
+    assert _new_transaction_values(_event({"email": " Jane@Example.com "}))["customer_email"] == "jane@example.com"
+    assert _new_transaction_values(_event({"scopeEmail": "batira-Jane@example.com"}))["customer_email"] == "jane@example.com"
+    assert _new_transaction_values(_event({"billing_email": "jane@example.com"}))["customer_email"] is None
+    assert _new_transaction_values(_event(None))["customer_email"] is None
+
+
+def test_history_filter_uses_the_indexed_column_not_the_payload():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [("alias-1",)]
+    customer = SimpleNamespace(id=UUID(int=1), profile_id="p1", email="Jane@Example.com")
+
+    clause = customer_transaction_filters(db, brand="batira", customer=customer)
+    sql = str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "transactions.customer_email = 'jane@example.com'" in sql
+    assert "transactions.profile_id IN ('p1', 'alias-1')" in sql
+    assert "payload" not in sql
+
+
+def test_backfill_job_updates_one_batch_and_advances_its_cursor():
+    rows = [
+        (UUID(int=1), {"email": "a@x.sn"}),
+        (UUID(int=2), {"orderTotal": 10}),
+        (UUID(int=3), {"scopeEmail": "batira-c@x.sn"}),
+    ]
+    db = MagicMock()
+    query = db.query.return_value
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.limit.return_value.all.return_value = rows
+    job = SimpleNamespace(
+        id=UUID(int=9),
+        job_key="MAINT_BACKFILL_TRANSACTION_CUSTOMER_EMAIL",
+        brand="batira",
+        selector={"batch_size": 3},
+        schedule=None,
+    )
+
+    stats = run_internal_job_once(db, job=job, now=datetime(2026, 3, 1))
+
+    assert (stats.processed, stats.updated, stats.finished) == (3, 2, False)
+    assert db.execute.call_args.args[1] == [
+        {"id": UUID(int=1), "customer_email": "a@x.sn"},
+        {"id": UUID(int=3), "customer_email": "c@x.sn"},
+    ]
+    assert job.selector == {"after_id": str(UUID(int=3)), "batch_size": 3}
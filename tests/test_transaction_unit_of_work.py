@@ -0,0 +1,102 @@
+"""Synchronous ingest is one unit of work: a single commit per event, rules in a savepoint."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.transaction import Transaction
+from app.services import transaction_service
+from app.services.transaction_service import create_transaction
+
+
+EVENT = SimpleNamespace(
+    brand="batira",
+    profileId="p1",
+    eventType="visit",
+    eventId="visit-1",
+    source="UNOMI",
+    payload={"store": "dakar"},
+)
+
+
+def _ingest_db(*, inserted: bool):
+    """Session mock whose ``db.scalars`` plays the ``INSERT ... ON CONFLICT DO NOTHING RETURNING``."""
+    db = MagicMock()
+    calls = []
+    db.commit.side_effect = lambda: calls.append("commit")
+    db.begin_nested.side_effect = lambda: calls.append("savepoint") or MagicMock()
+    db.rollback.side_effect = lambda: calls.append("rollback")
+
+    def scalars(stmt):
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        assert "ON CONFLICT ON CONSTRAINT uq_transactions_brand_event_id DO NOTHING RETURNING" in str(compiled)
+        params = dict(compiled.params)
+        row = Transaction(transaction_id=params.pop("event_id"), **params) if inserted else None
+        return MagicMock(first=MagicMock(return_value=row))
+
+    db.scalars.side_effect = scalars
+    return db, calls
+
+
+def test_new_event_commits_once_with_rules_in_a_savepoint(monkeypatch):
+    customer = SimpleNamespace(id="c1", loyalty_status=None, last_activity_at=None)
+    monkeypatch.setattr(transaction_service, "_find_transaction_type", lambda db, **kw: None)
+    monkeypatch.setattr(transaction_service, "resolve_customer_for_transaction", lambda db, **kw: customer)
+    tier_refresh = MagicMock()
+    monkeypatch.setattr(transaction_service, "update_customer_status", tier_refresh)
+
+    def rules(db, tx):
+        tx.status = "PROCESSED"
+
+    monkeypatch.setattr(transaction_service, "process_transaction_rules", rules)
+    db, calls = _ingest_db(inserted=True)
+    invalidated = []
+    monkeypatch.setattr(
+        transaction_service, "invalidate_brand_config", lambda brand: invalidated.append((brand, list(calls)))
+    )
+
+    tx = create_transaction(db, EVENT)
+
+    assert tx.status == "PROCESSED"
+    assert tx.processed_at is not None
+    assert customer.last_activity_at is not None
+    tier_refresh.assert_called_once()
+    assert db.add.call_args.args[0].key == "visit"  # auto-created TransactionType, same unit of work
+    assert calls == ["savepoint", "commit"]
+    assert invalidated == [("batira", ["savepoint", "commit"])]  # only after the commit
+
+
+def test_rule_failure_rolls_back_to_the_savepoint_and_still_commits_once(monkeypatch):
+    monkeypatch.setattr(
+        transaction_service, "_find_transaction_type", lambda db, **kw: SimpleNamespace(payload_schema={"type": "object"})
+    )
+    monkeypatch.setattr(transaction_service, "_auto_update_payload_schema_enabled", lambda: False)
+    monkeypatch.setattr(
+        transaction_service,
+        "resolve_customer_for_transaction",
+        lambda db, **kw: SimpleNamespace(loyalty_status="GOLD", last_activity_at=None),
+    )
+    monkeypatch.setattr(
+        transaction_service, "process_transaction_rules", MagicMock(side_effect=RuntimeError("boom"))
+    )
+    db, calls = _ingest_db(inserted=True)
+
+    tx = create_transaction(db, EVENT)
+
+    assert (tx.status, tx.error_message) == ("FAILED", "boom")
+    assert calls == ["savepoint", "commit"]
+
+
+def test_duplicate_event_returns_the_stored_row_without_writing(monkeypatch):
+    stored = SimpleNamespace(status="PROCESSED", error_code=None)
+    db, calls = _ingest_db(inserted=False)
+    query = db.query.return_value
+    query.filter.return_value = query
+    query.first.return_value = stored
+    monkeypatch.setattr(
+        transaction_service, "process_ingested_transaction", MagicMock(side_effect=AssertionError("reprocessed"))
+    )
+
+    assert create_transaction(db, EVENT) is stored
+    assert calls == []
@@ -3,9 +3,23 @@
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy.dialects import postgresql
+
+from app.models.transaction import Transaction
 from app.services.transaction_service import create_transaction
 
 
+def _returning_inserted_row(captured):
+    """``db.scalars`` stand-in for the ``INSERT ... RETURNING`` of a new event."""
+
+    def scalars(stmt):
+        params = dict(stmt.compile(dialect=postgresql.dialect()).params)
+        captured.append(Transaction(transaction_id=params.pop("event_id"), **params))
+        return MagicMock(first=MagicMock(return_value=captured[-1]))
+
+    return scalars
+
+
 @patch("app.services.transaction_service.process_transaction_rules")
 @patch("app.services.transaction_service.resolve_customer_for_transaction", return_value=None)
 @patch("app.services.transaction_service._find_transaction_type")
@@ -20,11 +34,7 @@ def test_create_transaction_ignores_unregistered_customer(mock_find_tt, mock_res
     mock_find_tt.return_value = SimpleNamespace(payload_schema=None, key="sale")
 
     captured = []
-
-    def capture_add(obj):
-        captured.append(obj)
-
-    db.add.side_effect = capture_add
+    db.scalars.side_effect = _returning_inserted_row(captured)
 
     event = SimpleNamespace(
         brand="batira",
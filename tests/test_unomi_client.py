@@ -1,20 +1,108 @@
-﻿from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import MagicMock, patch
 import pytest
-from urllib.error import URLError
-from app.services.unomi_client import UnomiClient, UnomiClientError
+from app.services.unomi_client import AsyncUnomiClient, UnomiClient, UnomiClientError
 from app.services.unomi_settings_service import UnomiConnectionConfig
+from app.services.unomi_transport import HttpResponse, PooledHttpTransport, RetryPolicy
 
 def _cfg():
     return UnomiConnectionConfig(base_url="https://u", username="k", password="p", scope="b")
 
-@patch("app.services.unomi_client.urlopen")
 @patch("app.services.unomi_client.time.sleep")
-def test_client_retries_transient_read_timeout(mock_sleep, mock_urlopen):
-    ok_resp = MagicMock()
-    ok_resp.read.return_value = b'{"itemId":"p1"}'
-    ok_resp.__enter__.return_value = ok_resp
-    ok_resp.__exit__.return_value = False
-    mock_urlopen.side_effect = [URLError("The read operation timed out"), ok_resp]
-    client = UnomiClient(_cfg(), timeout_sec=5.0, max_retries=2)
+def test_client_retries_transient_read_timeout(mock_sleep):
+    transport = MagicMock()
+    transport.send.side_effect = [TimeoutError("The read operation timed out"), HttpResponse(200, b'{"itemId":"p1"}')]
+    client = UnomiClient(_cfg(), timeout_sec=5.0, max_retries=2, transport=transport)
     assert client.get_profile("p1") == {"itemId": "p1"}
-    assert mock_urlopen.call_count == 2
+    assert transport.send.call_count == 2
+    mock_sleep.assert_called_once_with(0.25)
+    method, url = transport.send.call_args.args
+    assert (method, url) == ("GET", "https://u/cxs/profiles/p1")
+
+@patch("app.services.unomi_client.time.sleep")
+def test_client_maps_http_errors_without_retry(mock_sleep):
+    transport = MagicMock()
+    transport.send.return_value = HttpResponse(500, b"boom")
+    client = UnomiClient(_cfg(), transport=transport)
+    with pytest.raises(UnomiClientError) as exc:
+        client.save_profile({"itemId": "p1"})
+    assert exc.value.status_code == 500
+    assert exc.value.body == "boom"
+    assert transport.send.call_count == 1
+    mock_sleep.assert_not_called()
+
+def test_client_uses_pluggable_retry_policy():
+    class NoRetry(RetryPolicy):
+        def should_retry(self, error, attempt):
+            return False
+
+    transport = MagicMock()
+    transport.send.side_effect = TimeoutError("timed out")
+    client = UnomiClient(_cfg(), retry_policy=NoRetry(), transport=transport)
+    with pytest.raises(UnomiClientError, match="connection failed"):
+        client.get_profile("p1")
+    assert transport.send.call_count == 1
+
+
+class _FakeConn:
+    created = 0
+
+    def __init__(self, fail_first=False):
+        _FakeConn.created += 1
+        self.sock = None
+        self.timeout = None
+        self.closed = False
+        self._fail_first = fail_first
+
+    def request(self, method, target, body=None, headers=None):
+        if self._fail_first:
+            self._fail_first = False
+            raise ConnectionResetError("closed by peer")
+        self.target = target
+
+    def getresponse(self):
+        resp = MagicMock(status=200, will_close=False)
+        resp.read.return_value = b"{}"
+        return resp
+
+    def close(self):
+        self.closed = True
+
+
+def test_pooled_transport_reuses_keep_alive_connection():
+    _FakeConn.created = 0
+    transport = PooledHttpTransport(connection_factory=lambda *a: _FakeConn())
+    for _ in range(3):
+        assert transport.send("GET", "https://u/cxs/profiles/p1?x=1", body=None, headers={}, timeout=1).status == 200
+    assert _FakeConn.created == 1
+
+
+def test_pooled_transport_replays_request_when_idle_connection_was_closed():
+    conns = [_FakeConn(), _FakeConn()]
+    transport = PooledHttpTransport(connection_factory=lambda *a: conns.pop(0))
+    transport.send("GET", "https://u/a", body=None, headers={}, timeout=1)
+    # Make the pooled connection fail as a server-closed keep-alive socket would.
+    transport._pool_for("https", "u", None)._idle[0][0]._fail_first = True
+    assert transport.send("GET", "https://u/b", body=None, headers={}, timeout=1).status == 200
+    assert not conns
+
+
+def test_async_client_bounds_concurrency():
+    in_flight = []
+    peak = []
+
+    def send(*args, **kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        import time as _t
+
+        _t.sleep(0.01)
+        in_flight.pop()
+        return HttpResponse(200, b"[]")
+
+    transport = MagicMock()
+    transport.send.side_effect = send
+    client = AsyncUnomiClient(_cfg(), max_concurrency=2, transport=transport)
+    results = asyncio.run(client.gather([("GET", f"/segments/{i}", None) for i in range(6)]))
+    assert results == [[]] * 6
+    assert max(peak) <= 2
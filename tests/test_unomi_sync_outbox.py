@@ -0,0 +1,185 @@
+"""Unomi profile sync outbox: coalescing enqueue and the batch dispatcher."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+from app.models.unomi_sync_outbox import UnomiSyncOutbox
+
+from app.services import unomi_profile_service, unomi_sync_dispatcher
+from app.services.unomi_profile_service import (
+    enqueue_customer_profile_sync,
+    maybe_sync_customer_to_unomi_after_transaction,
+)
+from app.services.unomi_sync_dispatcher import coalesce_entries, retry_delay_seconds
+
+
+def _customer(profile_id="p1"):
+    return SimpleNamespace(id="c-1", brand="batira", profile_id=profile_id)
+
+
+def test_enqueue_upserts_into_pending_entry_without_commit(monkeypatch):
+    monkeypatch.setattr(unomi_profile_service, "unomi_profile_sync_enabled_for_brand", lambda **_: True)
+    db = MagicMock()
+
+    result = enqueue_customer_profile_sync(db, customer=_customer(), reason="loyalty_status")
+
+    assert result == {"queued": True, "profileId": "p1", "reason": "loyalty_status"}
+    db.begin_nested.assert_called_once()
+    db.commit.assert_not_called()
+    stmt = db.execute.call_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (brand, profile_id) WHERE status = 'PENDING' DO UPDATE" in sql
+    assert "coalesced_count = (unomi_sync_outbox.coalesced_count +" in sql
+
+
+def test_enqueue_coalesces_on_a_table_created_from_metadata(monkeypatch):
+    monkeypatch.setattr(unomi_profile_service, "unomi_profile_sync_enabled_for_brand", lambda **_: True)
+    engine = sa.create_engine("sqlite://")
+    UnomiSyncOutbox.__table__.create(engine)
+    customer = SimpleNamespace(id=UUID(int=1), brand="batira", profile_id="p1")
+
+    with Session(engine) as db:
+        assert enqueue_customer_profile_sync(db, customer=customer, reason="transaction_processed")["queued"]
+        assert enqueue_customer_profile_sync(db, customer=customer, reason="loyalty_status")["queued"]
+        rows = db.query(UnomiSyncOutbox.status, UnomiSyncOutbox.reason, UnomiSyncOutbox.coalesced_count).all()
+
+    assert rows == [("PENDING", "loyalty_status", 2)]
+    (index,) = [i for i in UnomiSyncOutbox.__table__.indexes if i.name == "uq_unomi_sync_outbox_pending_profile"]
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    assert "UNIQUE INDEX uq_unomi_sync_outbox_pending_profile ON unomi_sync_outbox (brand, profile_id) WHERE status = 'PENDING'" in ddl
+
+
+def test_enqueue_failure_is_logged_without_raising(monkeypatch):
+    monkeypatch.setattr(unomi_profile_service, "unomi_profile_sync_enabled_for_brand", lambda **_: True)
+    db = MagicMock()
+    db.execute.side_effect = RuntimeError("no unique or exclusion constraint matching the ON CONFLICT specification")
+
+    result = enqueue_customer_profile_sync(db, customer=_customer(), reason="loyalty_status")
+
+    assert result["queued"] is False
+    assert "ON CONFLICT" in result["error"]
+    db.begin_nested.assert_called_once()
+
+
+def test_enqueue_skips_customer_without_profile_id(monkeypatch):
+    monkeypatch.setattr(unomi_profile_service, "unomi_profile_sync_enabled_for_brand", lambda **_: True)
+    db = MagicMock()
+    result = enqueue_customer_profile_sync(db, customer=_customer(profile_id=" "), reason="x")
+    assert result["reason"] == "missing_profile_id"
+    db.execute.assert_not_called()
+
+
+def test_post_transaction_sync_is_queued_in_outbox_mode(monkeypatch):
+    monkeypatch.setenv("UNOMI_PROFILE_SYNC_DISPATCH", "outbox")
+    monkeypatch.setattr(unomi_profile_service, "unomi_profile_sync_enabled_for_brand", lambda **_: True)
+    monkeypatch.setattr(
+        unomi_profile_service,
+        "sync_customer_profile_to_unomi",
+        MagicMock(side_effect=AssertionError("no inline push in outbox mode")),
+    )
+    db = MagicMock()
+    tx = SimpleNamespace(status="PROCESSED", transaction_type="sale", brand="batira")
+
+    result = maybe_sync_customer_to_unomi_after_transaction(db, customer=_customer(), transaction=tx)
+
+    assert result["queued"] is True
+    assert result["reason"] == "transaction_processed"
+
+
+def test_coalesce_entries_keeps_latest_reason_per_profile():
+    pushes = coalesce_entries(
+        [
+            ("e1", "batira", "p1", "transaction_processed", 1),
+            ("e2", "batira", "p2", "transaction_processed", 1),
+            ("e3", "batira", "p1", "loyalty_status", 3),
+            ("e4", "other", "p1", None, 1),
+        ]
+    )
+    assert [(p.brand, p.profile_id, p.reason, p.entry_ids, p.attempts) for p in pushes] == [
+        ("batira", "p1", "loyalty_status", ["e1", "e3"], 3),
+        ("batira", "p2", "transaction_processed", ["e2"], 1),
+        ("other", "p1", None, ["e4"], 1),
+    ]
+
+
+def test_retry_delay_is_exponential_and_capped():
+    assert [retry_delay_seconds(a) for a in (1, 2, 3)] == [30, 60, 120]
+    assert retry_delay_seconds(20) == 3600
+
+
+def test_dispatch_batch_pushes_one_event_per_profile(monkeypatch):
+    claimed = [
+        ("e1", "batira", "p1", "transaction_processed", 1),
+        ("e2", "batira", "p1", "transaction_processed", 1),
+        ("e3", "batira", "p2", "loyalty_status", 1),
+    ]
+    monkeypatch.setattr(unomi_sync_dispatcher, "_claim_outbox_entries", lambda db, **_: claimed)
+    monkeypatch.setattr(
+        unomi_sync_dispatcher,
+        "_load_customers",
+        lambda db, pushes: {(p.brand, p.profile_id): SimpleNamespace(profile_id=p.profile_id) for p in pushes},
+    )
+    monkeypatch.setattr(
+        unomi_sync_dispatcher,
+        "resolve_unomi_profile_connection",
+        lambda brand: SimpleNamespace(scope="batira", base_url="http://unomi", username="k", password="x"),
+    )
+    monkeypatch.setattr(
+        unomi_sync_dispatcher,
+        "build_unomi_profile_payload",
+        lambda db, customer, **_: {"properties": {"profileId": customer.profile_id}},
+    )
+    pushed = []
+    monkeypatch.setattr(
+        unomi_sync_dispatcher,
+        "_push_profile_via_eventcollector",
+        lambda client, **kw: pushed.append((kw["profile_id"], kw["properties"])),
+    )
+    db = MagicMock()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        stats = unomi_sync_dispatcher.dispatch_outbox_batch(db, pool=pool)
+
+    assert sorted(pushed) == [("p1", {"profileId": "p1"}), ("p2", {"profileId": "p2"})]
+    assert stats["claimed"] == 3
+    assert stats["profiles"] == 2
+    assert stats["pushed"] == 2
+    assert db.commit.call_count == 2
+
+
+def test_requeue_stale_keeps_one_entry_per_profile(monkeypatch):
+    def entry(brand, profile_id, reason, attempts):
+        return SimpleNamespace(
+            brand=brand, profile_id=profile_id, reason=reason, attempts=attempts, status="DISPATCHING"
+        )
+
+    older = entry("batira", "p1", "loyalty_status", 3)
+    newer = entry("batira", "p1", None, 1)
+    covered = entry("batira", "p2", "transaction_processed", 1)
+    single = entry("batira", "p3", "transaction_processed", 2)
+    query = MagicMock()
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.with_for_update.return_value = query
+    query.limit.return_value = query
+    query.all.return_value = [older, newer, covered, single]
+    db = MagicMock()
+    db.query.return_value = query
+    monkeypatch.setattr(unomi_sync_dispatcher, "_pending_keys", lambda db, pushes: {("batira", "p2")})
+    now = datetime(2026, 3, 1, 12, 0)
+
+    requeued = unomi_sync_dispatcher._requeue_stale_entries(db, now=now, stale_seconds=300)
+
+    assert requeued == 2
+    assert [call.args[0] for call in db.delete.call_args_list] == [older, covered]
+    assert (newer.status, newer.claimed_at, newer.next_attempt_at) == ("PENDING", None, now)
+    assert (newer.reason, newer.attempts) == ("loyalty_status", 3)
+    assert single.status == "PENDING"